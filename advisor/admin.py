@@ -3,8 +3,8 @@
 
 from django.contrib import admin
 from .models import (
-    SubsidyType, Question, Answer, ConversationHistory, 
-    AdoptionStatistics, AdoptionTips
+    SubsidyType, Question, Answer, ConversationHistory, ConversationSession,
+    AdoptionStatistics, AdoptionTips, SubsidyAlias
 )
 
 # 新しいモデル（マイグレーション後に利用可能）
@@ -194,6 +194,33 @@ class ConversationHistoryAdmin(admin.ModelAdmin):
         return obj.content[:100] + '...' if len(obj.content) > 100 else obj.content
     get_content_preview.short_description = 'メッセージ内容'
 
+@admin.register(ConversationSession)
+class ConversationSessionAdmin(admin.ModelAdmin):
+    """会話セッション集計の管理画面（会話履歴から自動更新）"""
+    
+    list_display = [
+        'session_id',
+        'user',
+        'message_count',
+        'user_messages',
+        'assistant_messages',
+        'started_at',
+        'last_activity'
+    ]
+    
+    search_fields = [
+        'session_id',
+        'user__username',
+        'last_user_message'
+    ]
+    
+    list_select_related = ['user']
+    date_hierarchy = 'last_activity'
+    readonly_fields = [
+        'started_at', 'last_activity', 'message_count', 'user_messages',
+        'assistant_messages', 'system_messages', 'last_user_message', 'last_user_message_at'
+    ]
+
 @admin.register(AdoptionStatistics)
 class AdoptionStatisticsAdmin(admin.ModelAdmin):
     """採択統計の管理画面"""
@@ -252,6 +279,35 @@ class AdoptionTipsAdmin(admin.ModelAdmin):
         return obj.content[:100] + '...' if len(obj.content) > 100 else obj.content
     get_content_preview.short_description = 'コンテンツプレビュー'
 
+@admin.register(SubsidyAlias)
+class SubsidyAliasAdmin(admin.ModelAdmin):
+    """補助金エイリアスの管理画面（保存後、各ワーカーの照合器に数秒で反映）"""
+    
+    list_display = [
+        'alias',
+        'subsidy_name',
+        'normalized',
+        'weight',
+        'source',
+        'is_active',
+        'updated_at'
+    ]
+    
+    list_filter = [
+        'source',
+        'is_active',
+        'subsidy_name'
+    ]
+    
+    search_fields = [
+        'alias',
+        'normalized',
+        'subsidy_name'
+    ]
+    
+    list_editable = ['weight', 'is_active']
+    readonly_fields = ['normalized', 'updated_at']
+
 # 新しいモデルの管理画面（利用可能な場合のみ）
 if NEW_MODELS_AVAILABLE:
     
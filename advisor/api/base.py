@@ -1,9 +1,12 @@
-from django.http import JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 from functools import wraps
 import time
 import json
 
+from ..services.streaming import split_answer_sections
+
 def rate_limit(requests_per_minute=60):
     """
     簡易レート制限デコレーター
@@ -103,4 +106,63 @@ def validate_json_request(required_fields=None):
             return func(request, *args, **kwargs)
         
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
+
+def wants_event_stream(request, data=None):
+    """
+    SSEストリーミングが要求されているか判定
+    （Accept: text/event-stream、または stream パラメータ）
+    """
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        return True
+    
+    flag = (data or {}).get('stream', request.GET.get('stream', ''))
+    return str(flag).lower() in ('1', 'true', 'yes')
+
+def sse_event(event, data):
+    """
+    SSEイベント1件分の文字列を生成
+    """
+    payload = json.dumps(data, ensure_ascii=False, cls=DjangoJSONEncoder)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+def sse_response(events):
+    """
+    イベント文字列のイテレータから SSE レスポンスを生成
+    """
+    response = StreamingHttpResponse(events, content_type='text/event-stream; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # リバースプロキシのバッファリングを無効化
+    return response
+
+def stream_chat_events(chunks, start_data=None):
+    """
+    ('chunk', テキスト) / ('end', 回答辞書) のイテレータを SSE イベント列に変換
+    
+    event: start  -> start_data
+    event: chunk  -> {"text": "..."}
+    event: end    -> 回答辞書（answer を含む完全な結果）
+    event: error  -> {"success": false, "error": "..."}
+    """
+    yield sse_event('start', start_data or {})
+    
+    try:
+        for kind, payload in chunks:
+            if kind == 'chunk':
+                yield sse_event('chunk', {'text': payload})
+            else:
+                yield sse_event('end', payload)
+    except Exception as e:
+        print(f"SSE stream error: {e}")
+        yield sse_event('error', {
+            'success': False,
+            'error': '処理中にエラーが発生しました。もう一度お試しください。'
+        })
+
+def iter_answer_sections(answer, end_data):
+    """
+    完成済みの回答を見出し単位で ('chunk', ...) として返し、最後に ('end', end_data) を返す
+    """
+    for section in split_answer_sections(answer):
+        yield 'chunk', section
+    yield 'end', end_data
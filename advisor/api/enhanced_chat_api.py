@@ -8,7 +8,11 @@ from django.contrib.auth.decorators import login_required
 import json
 import uuid
 
+from .base import wants_event_stream, sse_response, stream_chat_events
 from ..services.enhanced_chat_service import EnhancedChatService
+from ..services.registry import get_service, service_registry
+from ..services.dify_client import get_dify_client
+from ..services.response_cache import get_response_cache
 from ..services.subsidy_prediction_service import SubsidyPredictionService
 from ..models import ConversationHistory, UserAlert
 
@@ -26,7 +30,8 @@ def enhanced_chat_conversation(request):
             "business_type": "事業種別",
             "company_size": "企業規模",
             "region": "地域"
-        }
+        },
+        "stream": "オプション：true で Server-Sent Events 配信"
     }
     """
     
@@ -51,8 +56,22 @@ def enhanced_chat_conversation(request):
                 'error': 'メッセージが入力されていません'
             }, status=400)
         
-        # チャットサービスの初期化
-        chat_service = EnhancedChatService()
+        # チャットサービスの取得（ワーカー共有）
+        chat_service = get_service(EnhancedChatService)
+        
+        # ストリーミング配信（回答断片を逐次送信）
+        if wants_event_stream(request, data):
+            chunks = chat_service.stream_conversation(
+                message=message,
+                session_id=session_id,
+                user_context=user_context
+            )
+            return sse_response(stream_chat_events(chunks, {
+                'success': True,
+                'session_id': session_id,
+                'timestamp': timezone.now().isoformat(),
+                'user_context': user_context
+            }))
         
         # 会話処理
         response = chat_service.process_conversation(
@@ -104,8 +123,8 @@ def subsidy_predictions(request):
                 'error': '月数は1-24の範囲で指定してください'
             }, status=400)
         
-        # 予測サービスの初期化
-        prediction_service = SubsidyPredictionService()
+        # 予測サービスの取得（ワーカー共有）
+        prediction_service = get_service(SubsidyPredictionService)
         
         # データ取得
         predictions = prediction_service.predict_next_opportunities(months_ahead)
@@ -180,7 +199,7 @@ def prediction_calendar(request):
         year = request.GET.get('year')
         month = request.GET.get('month')
         
-        prediction_service = SubsidyPredictionService()
+        prediction_service = get_service(SubsidyPredictionService)
         
         if year and month:
             # 特定月のデータ
@@ -360,5 +379,8 @@ def api_status(request):
             'calendar': True,
             'alerts': True,
             'history': True
-        }
+        },
+        'services': service_registry.stats(),
+        'dify_client': get_dify_client().stats(),
+        'response_cache': get_response_cache().stats()
     })
\ No newline at end of file
@@ -3,4 +3,12 @@ from django.apps import AppConfig
 class AdvisorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'advisor'
-    verbose_name = '補助金アドバイザー'
\ No newline at end of file
+    verbose_name = '補助金アドバイザー'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .db import configure_sqlite_connection
+
+        connection_created.connect(configure_sqlite_connection, dispatch_uid='advisor_sqlite_pragmas')
@@ -0,0 +1,91 @@
+# advisor/db.py - データベース接続の調整と読み取りレプリカへの振り分け
+
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_PRAGMA_NAME_RE = re.compile(r'^[a-z_]+$')
+_PRAGMA_VALUE_RE = re.compile(r'^-?\w+$')
+
+
+def apply_sqlite_pragmas(cursor, pragmas):
+    """PRAGMA を定義順に設定（Django のカーソル・sqlite3 のカーソルのどちらでも可）
+
+    PRAGMA はプレースホルダーを使えないため、名前と値は英数字のみ許可する。
+    """
+    for name, value in pragmas.items():
+        if not _PRAGMA_NAME_RE.match(name) or not _PRAGMA_VALUE_RE.match(str(value)):
+            raise ValueError(f'Invalid SQLite PRAGMA: {name}={value}')
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """新しい SQLite 接続に SQLITE_PRAGMAS を適用（connection_created シグナル）
+
+    WAL は DB ファイルに記録されるが、synchronous・busy_timeout・mmap_size などは
+    接続ごとの設定のため、接続を作るたびに設定する（CONN_MAX_AGE で接続を再利用すれば1回で済む）。
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        apply_sqlite_pragmas(cursor, pragmas)
+
+
+# 読み取り専用ビューの実行中に読み取りを向ける DB エイリアス（None なら既定の DB）
+_read_database = ContextVar('advisor_read_database', default=None)
+
+
+def replica_database_alias():
+    """設定されているレプリカのエイリアス（DATABASES に無ければ None）"""
+    alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+    return alias if alias in connections.databases else None
+
+
+@contextmanager
+def read_from_replica():
+    """ブロック内（デコレーターとして使えばビュー内）の読み取りをレプリカに向ける
+
+    レプリカが設定されていない場合は何もしない。書き込みは常にプライマリ。
+    """
+    token = _read_database.set(replica_database_alias())
+    try:
+        yield
+    finally:
+        _read_database.reset(token)
+
+
+class ReadReplicaRouter:
+    """ダッシュボードの読み取りをレプリカへ、それ以外の読み書きをプライマリへ振り分けるルーター
+
+    レプリカへ向けるのは REPLICA_APP_LABELS のアプリのモデルのみ。認証・セッション・
+    contenttypes などはレプリカの遅延で古い状態を読まないよう常にプライマリから読む。
+    """
+
+    REPLICA_APP_LABELS = frozenset({'advisor'})
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in self.REPLICA_APP_LABELS:
+            return None
+        return _read_database.get()
+
+    def db_for_write(self, model, **hints):
+        # レプリカから読んだオブジェクトの保存もプライマリへ
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, replica_database_alias()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # レプリカはプライマリの複製なのでマイグレーションしない
+        if db == replica_database_alias():
+            return False
+        return None
@@ -0,0 +1,39 @@
+# advisor/management/commands/backfill_conversation_sessions.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from advisor.models import ConversationSession
+from advisor.services.session_summary import rebuild_session_summaries
+
+
+class Command(BaseCommand):
+    help = '会話履歴から ConversationSession（セッション集計）を再構築します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clear', action='store_true', help='既存の集計を削除してから再構築')
+        parser.add_argument('--session', action='append', dest='sessions', help='対象セッションID（複数指定可）')
+        parser.add_argument('--batch-size', type=int, default=1000, help='一括書き込みの件数')
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔄 セッション集計の再構築を開始します...')
+        start = time.perf_counter()
+
+        with transaction.atomic():
+            if options['clear']:
+                sessions = ConversationSession.objects.all()
+                if options['sessions']:
+                    sessions = sessions.filter(session_id__in=options['sessions'])
+                deleted, _ = sessions.delete()
+                self.stdout.write(f'🧹 既存の集計を削除しました: {deleted}件')
+
+            rebuilt = rebuild_session_summaries(
+                session_ids=options['sessions'], batch_size=options['batch_size']
+            )
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {rebuilt}セッションの集計を再構築しました（{elapsed:.1f}秒）')
+        )
@@ -0,0 +1,156 @@
+# advisor/management/commands/benchmark_adoption_overview.py
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+
+from advisor.models import SubsidyType, AdoptionStatistics
+from advisor.services.enhanced_adoption_analysis import EnhancedAdoptionAnalysisService
+
+BENCH_SUBSIDY_PREFIX = 'ベンチマーク補助金'
+
+
+def legacy_comprehensive_overview(service):
+    """旧実装（年度・補助金ごとに aggregate を2回ずつ発行）"""
+    all_stats = AdoptionStatistics.objects.filter(
+        year__gte=service.current_year - 3
+    ).select_related('subsidy_type')
+
+    if not all_stats.exists():
+        return service._empty_overview()
+
+    total_applications = all_stats.aggregate(Sum('total_applications'))['total_applications__sum'] or 0
+    total_adoptions = all_stats.aggregate(Sum('total_adoptions'))['total_adoptions__sum'] or 0
+    overall_rate = (total_adoptions / total_applications * 100) if total_applications > 0 else 0
+
+    yearly_stats = []
+    for year in range(service.current_year - 3, service.current_year + 1):
+        year_stats = all_stats.filter(year=year)
+        if year_stats.exists():
+            year_apps = year_stats.aggregate(Sum('total_applications'))['total_applications__sum'] or 0
+            year_adoptions = year_stats.aggregate(Sum('total_adoptions'))['total_adoptions__sum'] or 0
+            year_rate = (year_adoptions / year_apps * 100) if year_apps > 0 else 0
+            yearly_stats.append({
+                'year': year,
+                'total_applications': year_apps,
+                'total_adoptions': year_adoptions,
+                'adoption_rate': round(year_rate, 1)
+            })
+
+    subsidy_stats = {}
+    for subsidy in SubsidyType.objects.filter(is_active=True).order_by('id'):
+        subsidy_data = all_stats.filter(subsidy_type=subsidy)
+        if subsidy_data.exists():
+            subsidy_apps = subsidy_data.aggregate(Sum('total_applications'))['total_applications__sum'] or 0
+            subsidy_adoptions = subsidy_data.aggregate(Sum('total_adoptions'))['total_adoptions__sum'] or 0
+            subsidy_rate = (subsidy_adoptions / subsidy_apps * 100) if subsidy_apps > 0 else 0
+            subsidy_stats[subsidy.name] = {
+                'adoption_rate': round(subsidy_rate, 1),
+                'total_applications': subsidy_apps,
+                'total_adoptions': subsidy_adoptions,
+                'competitiveness': service._calculate_competitiveness(subsidy_rate)
+            }
+
+    return {
+        'overall_stats': {
+            'adoption_rate': round(overall_rate, 1),
+            'total_applications': total_applications,
+            'total_adoptions': total_adoptions,
+            'trend': service._analyze_trend(yearly_stats)
+        },
+        'yearly_stats': yearly_stats,
+        'subsidy_breakdown': subsidy_stats,
+        'analysis_period': f'{service.current_year - 3}-{service.current_year}',
+    }
+
+
+class Command(BaseCommand):
+    help = 'get_comprehensive_overview の旧実装（補助金・年度ごとの集計）と1クエリ集計を比較します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subsidies', type=int, default=300, help='合成する補助金数')
+        parser.add_argument('--years', type=int, default=10, help='合成する年度数（今年から遡る）')
+        parser.add_argument('--rounds', type=int, default=4, help='年度あたりの回次数')
+        parser.add_argument('--repeat', type=int, default=5, help='計測回数')
+        parser.add_argument('--keep', action='store_true', help='合成データを削除せず残す')
+
+    def handle(self, *args, **options):
+        self.stdout.write('⏱️ 採択率概要ベンチマークを開始します...')
+
+        with transaction.atomic():
+            self.seed(options['subsidies'], options['years'], options['rounds'])
+            self.measure(options['repeat'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+                self.stdout.write('🧹 合成データを破棄しました')
+
+        self.stdout.write(self.style.SUCCESS('✅ ベンチマークが完了しました！'))
+
+    def seed(self, subsidies, years, rounds):
+        rng = random.Random(42)
+        current_year = EnhancedAdoptionAnalysisService().current_year
+
+        subsidy_types = SubsidyType.objects.bulk_create([
+            SubsidyType(
+                name=f'{BENCH_SUBSIDY_PREFIX}{i:04d}',
+                description='ベンチマーク用',
+                max_amount=rng.randrange(50, 5000),
+                target_business_type='中小企業',
+                requirements='ベンチマーク用',
+                is_active=rng.random() > 0.1,
+            )
+            for i in range(subsidies)
+        ])
+        # bulk_create で主キーが返らないDB向けに取り直す
+        subsidy_types = list(SubsidyType.objects.filter(name__startswith=BENCH_SUBSIDY_PREFIX))
+
+        stats = []
+        for subsidy in subsidy_types:
+            for year in range(current_year - years + 1, current_year + 1):
+                for round_number in range(1, rounds + 1):
+                    applications = rng.randrange(100, 20000)
+                    adoptions = int(applications * rng.uniform(0.2, 0.8))
+                    stats.append(AdoptionStatistics(
+                        subsidy_type=subsidy,
+                        year=year,
+                        round_number=round_number,
+                        total_applications=applications,
+                        total_adoptions=adoptions,
+                        adoption_rate=round(adoptions / applications * 100, 1),
+                    ))
+        AdoptionStatistics.objects.bulk_create(stats, batch_size=5000)
+        self.stdout.write(f'📥 補助金{len(subsidy_types):,}件・採択統計{len(stats):,}件を投入しました')
+
+    def measure(self, repeat):
+        service = EnhancedAdoptionAnalysisService()
+        paths = {
+            '旧実装（補助金・年度ごとの aggregate）': lambda: legacy_comprehensive_overview(service),
+            '1クエリ集計': service.get_comprehensive_overview,
+        }
+
+        results = {}
+        for label, func in paths.items():
+            timings = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    result = func()
+                    timings.append((time.perf_counter() - start) * 1000)
+            result.pop('last_updated', None)
+            results[label] = (statistics.median(timings), len(queries.captured_queries), result)
+
+        self.stdout.write('')
+        self.stdout.write('=== get_comprehensive_overview 所要時間（中央値） ===')
+        for label, (elapsed_ms, query_count, _) in results.items():
+            self.stdout.write(f'  {label}: {elapsed_ms:.2f}ms（{query_count}クエリ）')
+
+        legacy, grouped = (result for _, _, result in results.values())
+        if legacy == grouped:
+            self.stdout.write('  結果一致: ✅')
+        else:
+            self.stdout.write(self.style.WARNING('  結果一致: ❌ 旧実装と結果が異なります'))
@@ -0,0 +1,213 @@
+# advisor/management/commands/benchmark_conversation_history.py
+
+import os
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from advisor.models import ConversationHistory
+
+BENCH_SESSION_PREFIX = 'bench-'
+BENCH_DB_ALIAS = 'conversation_benchmark'
+
+
+class Command(BaseCommand):
+    help = ('モデル定義から作った使い捨ての SQLite DB に ConversationHistory の大量データを投入し、'
+            'インデックス有無でのクエリ速度を比較します（本番の DB には触れません）')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000000, help='投入件数（既定: 200万件）')
+        parser.add_argument('--sessions', type=int, default=50000, help='セッション数')
+        parser.add_argument('--days', type=int, default=365, help='タイムスタンプを分散させる日数')
+        parser.add_argument('--batch-size', type=int, default=20000, help='一括INSERTの件数')
+        parser.add_argument('--repeat', type=int, default=20, help='各クエリの計測回数')
+        parser.add_argument('--skip-before', action='store_true', help='インデックス無しの計測を省略')
+        parser.add_argument('--db-path', default=None,
+                            help='ベンチマーク用 SQLite ファイル（指定時は終了後も残し、次回は投入済みデータを再利用）。'
+                                 '既定は一時ファイルで、終了後に削除')
+
+    def handle(self, *args, **options):
+        self.stdout.write('⏱️ ConversationHistory ベンチマークを開始します...')
+
+        with self.benchmark_database(options['db_path']) as (using, reuse):
+            if reuse:
+                self.stdout.write(f'♻️ 投入済みのデータを再利用します: {options["db_path"]}')
+            else:
+                self.seed(using, options['rows'], options['sessions'], options['days'], options['batch_size'])
+
+            total = ConversationHistory.objects.using(using).count()
+            self.stdout.write(f'📊 対象件数: {total:,}件')
+
+            session_ids = list(
+                ConversationHistory.objects.using(using).filter(session_id__startswith=BENCH_SESSION_PREFIX)
+                .values_list('session_id', flat=True)[:1000]
+            ) or ['missing-session']
+
+            results = {}
+            if not options['skip_before']:
+                with self.indexes_dropped(using):
+                    results['before'] = self.run_queries(using, session_ids, options['repeat'])
+            results['after'] = self.run_queries(using, session_ids, options['repeat'])
+
+            self.report(results)
+
+        self.stdout.write(self.style.SUCCESS('✅ ベンチマークが完了しました！'))
+
+    @contextmanager
+    def benchmark_database(self, path=None):
+        """実際のモデル定義からテーブルを作った SQLite を一時的な DB エイリアスとして登録
+
+        path を省略した場合は一時ディレクトリに作り、終了後に削除する。
+        path に既存のファイルを指定した場合は、ベンチマーク用の DB であることを確認して再利用する。
+        """
+        directory = None
+        if path is None:
+            directory = tempfile.TemporaryDirectory()
+            path = os.path.join(directory.name, 'conversation_benchmark.sqlite3')
+        reuse = os.path.exists(path)
+
+        connections.settings[BENCH_DB_ALIAS] = {
+            **connections['default'].settings_dict,
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': path, 'OPTIONS': {},
+        }
+        connection = connections[BENCH_DB_ALIAS]
+        try:
+            table = ConversationHistory._meta.db_table
+            if reuse:
+                if table not in connection.introspection.table_names():
+                    raise CommandError(f'{path} はベンチマーク用の DB ではありません（{table} がありません）')
+                if ConversationHistory.objects.using(BENCH_DB_ALIAS).exclude(
+                        session_id__startswith=BENCH_SESSION_PREFIX).exists():
+                    raise CommandError(f'{path} にベンチマーク以外の会話履歴があります。別のファイルを指定してください')
+            else:
+                with connection.schema_editor(atomic=False) as editor:
+                    # user 列の外部キーが参照する auth_user も作る（投入する行は NULL）
+                    editor.create_model(User)
+                    editor.create_model(ConversationHistory)
+            yield BENCH_DB_ALIAS, reuse
+        finally:
+            connection.close()
+            del connections[BENCH_DB_ALIAS]
+            del connections.settings[BENCH_DB_ALIAS]
+            if directory is not None:
+                directory.cleanup()
+
+    def seed(self, using, rows, sessions, days, batch_size):
+        """生SQLの executemany で高速に投入（auto_now_add を回避して時刻を分散）"""
+        connection = connections[using]
+        table = ConversationHistory._meta.db_table
+        columns = ['session_id', 'message_type', 'content', 'metadata', 'intent_analysis', 'user_context', 'timestamp']
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(table),
+            ', '.join(connection.ops.quote_name(column) for column in columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+
+        now = timezone.now()
+        span_seconds = days * 86400
+        message_types = ['user', 'assistant', 'user', 'assistant', 'system']
+        rng = random.Random(42)
+
+        start = time.perf_counter()
+        inserted = 0
+        with connection.cursor() as cursor:
+            while inserted < rows:
+                size = min(batch_size, rows - inserted)
+                batch = []
+                for _ in range(size):
+                    timestamp = now - timedelta(seconds=rng.randrange(span_seconds))
+                    batch.append((
+                        f'{BENCH_SESSION_PREFIX}{rng.randrange(sessions)}',
+                        rng.choice(message_types),
+                        'IT導入補助金の申請方法について教えてください',
+                        '{}', '{}', '{}',
+                        connection.ops.adapt_datetimefield_value(timestamp),
+                    ))
+                with transaction.atomic(using=using):
+                    cursor.executemany(sql, batch)
+                inserted += size
+                self.stdout.write(f'  投入中... {inserted:,}/{rows:,}', ending='\r')
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write('')
+        self.stdout.write(f'📥 {rows:,}件を投入しました（{elapsed:.1f}秒, {rows / max(elapsed, 1e-9):,.0f}件/秒）')
+
+    def indexes_dropped(self, using):
+        """Meta.indexes を一時的に削除するコンテキスト（ベンチマーク用 DB のみ）"""
+        command = self
+        connection = connections[using]
+
+        class _IndexesDropped:
+            def __enter__(self):
+                with connection.schema_editor() as editor:
+                    for index in ConversationHistory._meta.indexes:
+                        editor.remove_index(ConversationHistory, index)
+                command.stdout.write('🔧 インデックスを一時的に削除しました')
+
+            def __exit__(self, *exc_info):
+                with connection.schema_editor() as editor:
+                    for index in ConversationHistory._meta.indexes:
+                        editor.add_index(ConversationHistory, index)
+                command.stdout.write('🔧 インデックスを再作成しました')
+                return False
+
+        return _IndexesDropped()
+
+    def run_queries(self, using, session_ids, repeat):
+        """ビュー・サービスで実際に使われる検索パターンを計測"""
+        now = timezone.now()
+        rng = random.Random(7)
+        history = ConversationHistory.objects.using(using)
+
+        queries = {
+            'セッション履歴（conversation_history / export_session）': lambda: list(
+                history.filter(session_id=rng.choice(session_ids)).order_by('timestamp')
+            ),
+            '直近10件（_analyze_conversation_history）': lambda: list(
+                history.filter(session_id=rng.choice(session_ids)).order_by('-timestamp')[:10]
+            ),
+            '24時間の件数（ダッシュボード）': lambda: history.filter(
+                timestamp__gte=now - timedelta(days=1)
+            ).count(),
+            '7日間のユーザー発言数（ダッシュボード）': lambda: history.filter(
+                message_type='user', timestamp__gte=now - timedelta(days=7)
+            ).count(),
+            '最新50件（debug_history）': lambda: list(history.order_by('-timestamp')[:50]),
+            '7日間のセッション一覧（session_list）': lambda: list(
+                history.filter(timestamp__gte=now - timedelta(days=7))
+                .values('session_id').annotate(message_count=Count('id'), last=Max('timestamp'))
+                .order_by('-last')[:20]
+            ),
+        }
+
+        results = {}
+        for label, query in queries.items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                query()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[label] = statistics.median(timings)
+        return results
+
+    def report(self, results):
+        self.stdout.write('')
+        self.stdout.write('=== クエリ所要時間（中央値） ===')
+        after = results['after']
+        before = results.get('before')
+        for label, after_ms in after.items():
+            if before:
+                before_ms = before[label]
+                speedup = before_ms / after_ms if after_ms else float('inf')
+                self.stdout.write(f'  {label}: {before_ms:.2f}ms → {after_ms:.2f}ms（{speedup:.1f}倍）')
+            else:
+                self.stdout.write(f'  {label}: {after_ms:.2f}ms')
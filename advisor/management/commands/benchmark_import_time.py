@@ -0,0 +1,94 @@
+# advisor/management/commands/benchmark_import_time.py
+
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# python -X importtime の出力行: "import time:  self [us] | cumulative | imported package"
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+# 起動時に読み込まれると遅くなる重い依存パッケージ
+HEAVY_PACKAGES = ('pandas', 'numpy', 'requests', 'sentence_transformers', 'faiss', 'janome')
+
+
+def parse_importtime(stderr):
+    """-X importtime の出力を (モジュール名, 自身のµs, 累積µs, 深さ) のリストに変換（出力順）"""
+    entries = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def script_entries(entries):
+    """インタプリタ起動処理（site）より後、つまり -c のコードが読み込んだモジュール"""
+    for position in range(len(entries) - 1, -1, -1):
+        name, _, _, depth = entries[position]
+        if name == 'site' and depth == 0:
+            return entries[position + 1:]
+    return entries
+
+
+class Command(BaseCommand):
+    help = ('python -X importtime で advisor.services などを新しいインタプリタから import した時間を計測し、'
+            '予算を超えたら失敗します')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default='advisor.services', help='計測するモジュール')
+        parser.add_argument('--django-setup', action='store_true',
+                            help='モデルを使うモジュール（advisor.views など）用に django.setup() してから import '
+                                 '（django.setup() の時間も計測に含む）')
+        parser.add_argument('--budget-ms', type=float, default=100.0,
+                            help='許容する import 時間（親パッケージ・依存を含む累積、ミリ秒）')
+        parser.add_argument('--repeat', type=int, default=3, help='計測回数（最小値で判定）')
+        parser.add_argument('--top', type=int, default=10, help='表示する重いモジュールの件数')
+
+    def handle(self, *args, **options):
+        module = options['module']
+        # DJANGO_SETTINGS_MODULE のみ設定した新しいインタプリタで計測（読み込み済みの分を除外しない）
+        code = f'import {module}'
+        if options['django_setup']:
+            code = f'import django; django.setup(); {code}'
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+
+        runs = []
+        for _ in range(max(options['repeat'], 1)):
+            # モジュールキャッシュの影響を受けないよう毎回新しいプロセスで計測
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', code],
+                capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+            )
+            if result.returncode != 0:
+                hint = '' if options['django_setup'] else '（モデルを使うモジュールは --django-setup を指定）'
+                raise CommandError(f'{module} の import に失敗しました{hint}:\n{result.stderr[-2000:]}')
+            entries = script_entries(parse_importtime(result.stderr))
+            total_us = sum(cumulative_us for _, _, cumulative_us, depth in entries if depth == 0)
+            runs.append((total_us, entries))
+
+        total_us, entries = min(runs, key=lambda run: run[0])
+        elapsed_ms = total_us / 1000
+        self.stdout.write(
+            f'📋 {module} の import 時間: ' + ' / '.join(f'{run[0] / 1000:.1f}ms' for run in runs)
+        )
+
+        self.stdout.write(f'  自身の処理時間が長いモジュール（上位{options["top"]}件）')
+        for name, self_us, cumulative_us, _ in sorted(entries, key=lambda entry: -entry[1])[:options['top']]:
+            self.stdout.write(f'    {name:<50} {self_us / 1000:7.1f}ms（累積 {cumulative_us / 1000:.1f}ms）')
+
+        loaded = sorted({name for name, _, _, _ in entries} & set(HEAVY_PACKAGES))
+        if loaded:
+            self.stdout.write(self.style.WARNING(f'⚠️  起動時に読み込まれた重いパッケージ: {", ".join(loaded)}'))
+
+        if elapsed_ms > options['budget_ms']:
+            raise CommandError(
+                f'{module} の import 時間 {elapsed_ms:.1f}ms が予算 {options["budget_ms"]:g}ms を超えています'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {module} の import 時間 {elapsed_ms:.1f}ms（予算 {options["budget_ms"]:g}ms 以内）'
+        ))
@@ -0,0 +1,159 @@
+# advisor/management/commands/benchmark_intent_engine.py
+
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from advisor.models import ConversationHistory
+from advisor.services.intent_engine import (
+    INTENT_SCHEMES, NLP_DETAIL_PATTERNS, NLP_PATTERN_WEIGHT, analyze_chat_intent, get_intent_engine,
+    nlp_intent_patterns,
+)
+
+SAMPLE_QUESTIONS = [
+    'IT導入補助金について教えてください',
+    'ものづくり補助金の採択率はどのくらいですか？',
+    '事業再構築補助金の申請方法を教えて',
+    '小規模事業者持続化補助金の要件は何ですか',
+    '補助金の上限はいくらまでもらえますか',
+    '申請の締切はいつまでですか',
+    'ITツールの導入に使える補助金はありますか',
+    '採択率を上げるコツを教えてください',
+    'うちの会社は対象になりますか？製造業で従業員20名です',
+    'IT導入補助金とものづくり補助金の違いは？',
+    '必要な書類は何ですか',
+    'もっと詳しく教えて',
+    '省力化投資補助金の補助率は何割ですか',
+    '事業計画書の書き方のポイントは？',
+    '補助金とは何ですか',
+    'どんな補助金がありますか。飲食店です',
+    '申請から入金までの流れとスケジュールを知りたい',
+    '成功率の高い申請方法は',
+    '予算が500万円なのですが使える補助金はありますか',
+    'ありがとうございました',
+]
+
+
+def _lower_contains(keywords, text_lower):
+    return any(keyword in text_lower for keyword in keywords)
+
+
+def legacy_first(scheme, text, default):
+    """旧実装: if/elif で各意図のキーワード一覧を順に in で確認"""
+    text_lower = text.lower()
+    for intent, keywords in INTENT_SCHEMES[scheme].items():
+        if _lower_contains(keywords, text_lower):
+            return intent
+    return default
+
+
+def legacy_chat_intent(message, flow='initial'):
+    """旧実装: EnhancedChatService._detect_question_intent"""
+    detected_intents = []
+    confidence_scores = {}
+    message_lower = message.lower()
+
+    for intent, keywords in INTENT_SCHEMES['chat'].items():
+        score = sum(1 for keyword in keywords if keyword in message_lower)
+        if score > 0:
+            detected_intents.append(intent)
+            confidence_scores[intent] = score / len(keywords)
+
+    if flow == 'continuing' and 'follow_up' not in detected_intents:
+        detected_intents.append('follow_up')
+        confidence_scores['follow_up'] = 0.8
+
+    primary_intent = max(detected_intents, key=lambda x: confidence_scores[x]) if detected_intents else 'general_inquiry'
+    return {
+        'primary_intent': primary_intent,
+        'all_intents': detected_intents,
+        'confidence': confidence_scores.get(primary_intent, 0.5),
+        'is_follow_up': 'follow_up' in detected_intents
+    }
+
+
+def legacy_nlp_scores(intent_patterns, question_text):
+    """旧実装: NLPAIAdvisorService._analyze_intent のパターン・キーワード採点部分"""
+    question_lower = question_text.lower()
+    intent_scores = {}
+    for intent_type, config in intent_patterns.items():
+        score = 0
+        for pattern in config['patterns']:
+            if re.search(pattern, question_text):
+                score += NLP_PATTERN_WEIGHT
+        for keyword in config['keywords']:
+            if keyword.lower() in question_lower:
+                score += 1
+        intent_scores[intent_type] = score
+    detail = bool(re.search('|'.join(NLP_DETAIL_PATTERNS), question_text))
+    return intent_scores, detail
+
+
+class Command(BaseCommand):
+    help = '意図判定エンジンと旧実装（キーワードごとの in / re.search ループ）の速度・結果を比較します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=5000,
+                            help='会話履歴から使う質問数（履歴が無い場合は組み込みの質問例を使用）')
+        parser.add_argument('--samples', action='store_true', help='会話履歴を使わず組み込みの質問例を使う')
+        parser.add_argument('--repeat', type=int, default=50, help='質問一覧を繰り返す回数')
+
+    def handle(self, *args, **options):
+        questions = []
+        if not options['samples']:
+            questions = list(
+                ConversationHistory.objects.filter(message_type='user')
+                .order_by('-id').values_list('content', flat=True)[:options['limit']]
+            )
+        source = '会話履歴'
+        if not questions:
+            questions = SAMPLE_QUESTIONS
+            source = '質問例'
+        questions = list(questions) * options['repeat']
+
+        engine = get_intent_engine()
+        intent_patterns = nlp_intent_patterns()
+        self.stdout.write(f'📋 {source} {len(questions):,}件で比較します')
+
+        cases = [
+            ('DetailedResponseService', lambda q: legacy_first('detailed', q, 'overview'),
+             lambda q: engine.first(q, 'detailed', 'overview')),
+            ('ContextAwareAIAdvisor', lambda q: legacy_first('context_aware', q, 'general'),
+             lambda q: engine.first(q, 'context_aware', 'general')),
+            ('EnhancedChatService', legacy_chat_intent, analyze_chat_intent),
+            ('build_contextual_prompt', lambda q: legacy_first('prompt', q, None),
+             lambda q: engine.first(q, 'prompt')),
+            ('NLPAIAdvisorService', lambda q: legacy_nlp_scores(intent_patterns, q), self.engine_nlp_scores),
+        ]
+
+        legacy_total = 0.0
+        for label, legacy, current in cases:
+            legacy_results, legacy_seconds = self.timed(legacy, questions)
+            results, seconds = self.timed(current, questions)
+            legacy_total += legacy_seconds
+            mismatches = sum(1 for a, b in zip(legacy_results, results) if a != b)
+            self.stdout.write(
+                f'  {label:<26} 旧 {self.per_question(legacy_seconds, questions):7.1f}µs'
+                f' → 新 {self.per_question(seconds, questions):6.1f}µs'
+                f'（{legacy_seconds / max(seconds, 1e-9):.1f}倍） 不一致 {mismatches}件'
+            )
+
+        # 1回の走査で全スキームを判定した場合
+        _, combined_seconds = self.timed(engine.analyze, questions)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ 全呼び出し元の判定: 旧 {self.per_question(legacy_total, questions):.1f}µs'
+            f' → 新（1回の走査） {self.per_question(combined_seconds, questions):.1f}µs / 質問'
+        ))
+
+    def engine_nlp_scores(self, question_text):
+        results = get_intent_engine().analyze(question_text, schemes=('nlp', 'nlp_detail'))
+        return dict(results['nlp'].scores), bool(results['nlp_detail'].first())
+
+    def timed(self, func, questions):
+        start = time.perf_counter()
+        results = [func(question) for question in questions]
+        return results, time.perf_counter() - start
+
+    def per_question(self, seconds, questions):
+        return seconds / max(len(questions), 1) * 1e6
@@ -0,0 +1,220 @@
+# advisor/management/commands/benchmark_sqlite_concurrency.py
+
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+
+from advisor.db import apply_sqlite_pragmas
+from advisor.models import ConversationHistory, ConversationSession
+
+INSERT_MESSAGE_SQL = (
+    'INSERT INTO advisor_conversationhistory '
+    '(session_id, user_id, message_type, content, metadata, intent_analysis, user_context, timestamp) '
+    "VALUES (?, NULL, ?, ?, '{}', '{}', '{}', ?)"
+)
+UPSERT_SESSION_SQL = (
+    'INSERT INTO advisor_conversationsession '
+    '(session_id, user_id, started_at, last_activity, message_count, user_messages, assistant_messages, '
+    'system_messages, last_user_message, last_user_message_at) '
+    'VALUES (?, NULL, ?, ?, 2, 1, 1, 0, ?, ?) '
+    'ON CONFLICT(session_id) DO UPDATE SET last_activity = excluded.last_activity, '
+    'message_count = message_count + 2, user_messages = user_messages + 1, '
+    'assistant_messages = assistant_messages + 1, last_user_message = excluded.last_user_message, '
+    'last_user_message_at = excluded.last_user_message_at'
+)
+# ダッシュボード相当の読み取り（期間内の日別・種別件数とセッション一覧）
+DASHBOARD_QUERIES = [
+    'SELECT date(timestamp), message_type, COUNT(*) FROM advisor_conversationhistory '
+    'WHERE timestamp >= ? GROUP BY 1, 2',
+    'SELECT session_id, message_count, last_activity FROM advisor_conversationsession '
+    'ORDER BY last_activity DESC LIMIT 20',
+]
+
+
+def _timestamp(value):
+    # Django の SQLite バックエンドと同じ形式（UTC・タイムゾーン表記なし）
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+class Profile:
+    """比較する接続設定"""
+
+    def __init__(self, name, label, pragmas, reuse_connection, begin):
+        self.name = name
+        self.label = label
+        self.pragmas = pragmas
+        self.reuse_connection = reuse_connection
+        self.begin = begin
+
+
+class Command(BaseCommand):
+    help = ('SQLite の既定設定と本番向け設定（WAL・接続再利用など）で、'
+            'チャットの書き込みとダッシュボードの読み取りを同時に行った場合の性能を比較します')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='チャットの書き込みスレッド数')
+        parser.add_argument('--readers', type=int, default=4, help='ダッシュボードの読み取りスレッド数')
+        parser.add_argument('--duration', type=float, default=5.0, help='各設定での計測秒数')
+        parser.add_argument('--seed-rows', type=int, default=20000, help='事前に投入する会話履歴の件数')
+        parser.add_argument('--timeout', type=float, default=5.0,
+                            help='既定設定での待ち時間（秒、Django の SQLite 既定値と同じ）')
+
+    def handle(self, *args, **options):
+        profiles = [
+            Profile('default', 'rollback journal・接続を毎回作成・DEFERRED', {}, False, 'BEGIN'),
+            Profile('tuned', 'WAL・接続を再利用・IMMEDIATE', settings.SQLITE_PRODUCTION_PRAGMAS, True,
+                    'BEGIN IMMEDIATE'),
+        ]
+        self.stdout.write(
+            f'📋 書き込み {options["writers"]}スレッド・読み取り {options["readers"]}スレッドで'
+            f'各 {options["duration"]:g}秒計測します'
+        )
+
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in profiles:
+                path = os.path.join(directory, f'{profile.name}.sqlite3')
+                self.create_database(path, options['seed_rows'])
+                results[profile.name] = self.run_profile(profile, path, options)
+                self.report(profile, results[profile.name], options['duration'])
+
+        default, tuned = results['default'], results['tuned']
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ 書き込み {self.ratio(tuned["write"], default["write"])}・'
+            f'読み取り {self.ratio(tuned["read"], default["read"])}（本番向け設定 / 既定設定）、'
+            f'ロック待ちエラー {self.errors(default)}件 → {self.errors(tuned)}件'
+        ))
+
+    def create_database(self, path, seed_rows):
+        """実際のモデル定義からテーブルを作成し、過去30日分の会話を投入"""
+        settings_dict = {
+            **connections['default'].settings_dict,
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': path, 'OPTIONS': {},
+        }
+        wrapper = DatabaseWrapper(settings_dict, alias='sqlite_benchmark')
+        try:
+            with wrapper.schema_editor(atomic=False) as editor:
+                editor.create_model(ConversationHistory)
+                editor.create_model(ConversationSession)
+        finally:
+            wrapper.close()
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        sessions = max(seed_rows // 10, 1)
+        messages = [
+            (f'seed-{i % sessions}', 'user' if i % 2 == 0 else 'assistant', f'過去の質問 {i}',
+             _timestamp(now - timedelta(minutes=(seed_rows - i) * 30 * 24 * 60 / max(seed_rows, 1))))
+            for i in range(seed_rows)
+        ]
+        with sqlite3.connect(path) as db:
+            db.executemany(INSERT_MESSAGE_SQL, messages)
+            seeded_at = _timestamp(now)
+            db.executemany(
+                UPSERT_SESSION_SQL,
+                [(f'seed-{i}', seeded_at, seeded_at, '過去の質問', seeded_at) for i in range(sessions)]
+            )
+        db.close()
+
+    def run_profile(self, profile, path, options):
+        deadline = time.perf_counter() + options['duration']
+        results = {'write': [], 'read': [], 'write_errors': [0], 'read_errors': [0]}
+        lock = threading.Lock()
+        since = _timestamp(datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=30))
+
+        def connect():
+            db = sqlite3.connect(path, timeout=options['timeout'], isolation_level=None, check_same_thread=False)
+            apply_sqlite_pragmas(db, profile.pragmas)
+            return db
+
+        def chat_turn(db, worker, turn):
+            now = _timestamp(datetime.now(timezone.utc).replace(tzinfo=None))
+            session_id = f'bench-{worker}-{turn % 50}'
+            db.execute(profile.begin)
+            try:
+                db.executemany(INSERT_MESSAGE_SQL, [
+                    (session_id, 'user', f'質問 {turn}', now),
+                    (session_id, 'assistant', f'回答 {turn}', now),
+                ])
+                db.execute(UPSERT_SESSION_SQL, (session_id, now, now, f'質問 {turn}', now))
+                db.execute('COMMIT')
+            except sqlite3.Error:
+                if db.in_transaction:
+                    db.execute('ROLLBACK')
+                raise
+
+        def dashboard(db, worker, turn):
+            db.execute(DASHBOARD_QUERIES[0], (since,)).fetchall()
+            db.execute(DASHBOARD_QUERIES[1]).fetchall()
+
+        def worker(kind, operation, index):
+            latencies = []
+            errors = 0
+            db = connect() if profile.reuse_connection else None
+            turn = 0
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    if profile.reuse_connection:
+                        operation(db, index, turn)
+                    else:
+                        # CONN_MAX_AGE=0 と同じくリクエストごとに接続・切断
+                        per_request = connect()
+                        try:
+                            operation(per_request, index, turn)
+                        finally:
+                            per_request.close()
+                    latencies.append(time.perf_counter() - start)
+                except sqlite3.OperationalError as e:
+                    if 'locked' not in str(e) and 'busy' not in str(e):
+                        raise
+                    errors += 1
+                    time.sleep(random.uniform(0, 0.005))
+                turn += 1
+            if db is not None:
+                db.close()
+            with lock:
+                results[kind].extend(latencies)
+                results[f'{kind}_errors'][0] += errors
+
+        threads = [
+            threading.Thread(target=worker, args=('write', chat_turn, i)) for i in range(options['writers'])
+        ] + [
+            threading.Thread(target=worker, args=('read', dashboard, i)) for i in range(options['readers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return {
+            'write': results['write'], 'read': results['read'],
+            'write_errors': results['write_errors'][0], 'read_errors': results['read_errors'][0],
+        }
+
+    def report(self, profile, result, duration):
+        self.stdout.write(f'  [{profile.name}] {profile.label}')
+        for kind, label, unit in [('write', '書き込み', 'ターン'), ('read', '読み取り', '回')]:
+            latencies = result[kind]
+            p95 = statistics.quantiles(latencies, n=20)[-1] * 1000 if len(latencies) >= 2 else 0.0
+            self.stdout.write(
+                f'    {label} {len(latencies):>7,}{unit}（{len(latencies) / duration:8,.1f}/秒）'
+                f' p95 {p95:7.1f}ms  ロック待ちエラー {result[f"{kind}_errors"]}件'
+            )
+
+    def ratio(self, tuned, default):
+        if not default:
+            return f'{len(tuned):,}件（既定設定は0件）'
+        return f'{len(tuned) / len(default):.1f}倍'
+
+    def errors(self, result):
+        return result['write_errors'] + result['read_errors']
@@ -0,0 +1,63 @@
+# advisor/management/commands/build_embedding_index.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from advisor.services.embedding_index import (
+    EmbeddingIndex, index_options, index_directory, iter_documents, parse_key, reset_embedding_index, text_hash,
+)
+from advisor.services.embeddings import get_text_encoder
+
+
+class Command(BaseCommand):
+    help = '補助金（説明・要件）とティップス（タイトル・内容）の意味検索インデックスを構築します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', help='出力先（既定: settings.EMBEDDING_INDEX["DIRECTORY"]）')
+        parser.add_argument('--incremental', action='store_true',
+                            help='既存インデックスを読み込み、変更・追加・削除された行だけを反映')
+        parser.add_argument('--batch-size', type=int, default=256, help='一度にエンコードする件数')
+        parser.add_argument('--query', help='構築後に試し検索する質問')
+
+    def handle(self, *args, **options):
+        directory = options['directory'] or index_directory()
+        encoder = get_text_encoder(allow_download=True)
+        self.stdout.write(f'🔧 エンコーダー: {encoder.name}（{encoder.dimension}次元）')
+
+        start = time.perf_counter()
+        documents = list(iter_documents())
+        index = None
+        if options['incremental']:
+            index = EmbeddingIndex.load(directory, encoder, mmap=False, **index_options())
+            if index is None:
+                self.stdout.write('⚠️ 既存インデックスが使えないため全件を構築します')
+
+        if index is None:
+            index = EmbeddingIndex.build(documents, encoder, batch_size=options['batch_size'], **index_options())
+            self.stdout.write(f'📥 {len(documents):,}件をエンコードしました')
+        else:
+            current = {key for key, _ in documents}
+            previous = index.hashes()
+            changed = [(key, text) for key, text in documents if previous.get(key) != text_hash(text)]
+            removed = [key for key in previous if key not in current]
+            updated = 0
+            for i in range(0, len(changed), options['batch_size']):
+                updated += index.upsert(changed[i:i + options['batch_size']])
+            index.remove(removed)
+            self.stdout.write(f'🔄 更新 {updated:,}件 / 削除 {len(removed):,}件 / 変更なし {len(documents) - updated:,}件')
+
+        saved = index.save(directory)
+        reset_embedding_index()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'✅ {saved:,}件のインデックスを保存しました（{elapsed:.2f}秒）→ {directory}'))
+
+        if options['query']:
+            index = EmbeddingIndex.load(directory, encoder, **index_options())
+            start = time.perf_counter()
+            hits = index.search(options['query'], k=5)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.stdout.write(f'🔍 「{options["query"]}」（{elapsed_ms:.1f}ms）')
+            for key, score in hits:
+                source, object_id = parse_key(key)
+                self.stdout.write(f'  {score:.3f}  {source} #{object_id}')
@@ -0,0 +1,77 @@
+# advisor/management/commands/export_conversations.py
+
+import importlib.util
+import os
+import shutil
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from advisor.db import replica_database_alias
+from advisor.services.analytics_export import EXPORT_FORMATS, WATERMARK_FILENAME, export_conversations
+
+
+class Command(BaseCommand):
+    help = ('会話履歴全体を分析用に日付パーティション（date=YYYY-MM-DD）の Parquet/NDJSON へ書き出します。'
+            'metadata・intent_analysis・user_context は列に展開します')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help='出力先ディレクトリ')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='parquet', help='出力形式')
+        parser.add_argument('--incremental', action='store_true',
+                            help='前回の透かし（_watermark.json）より新しい行のみ出力')
+        parser.add_argument('--overwrite', action='store_true',
+                            help='既存の出力を削除してから全件出力')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='1回のクエリで読む行数')
+        parser.add_argument('--settle-seconds', type=int, default=60,
+                            help='直近この秒数以内の行は書き込み中の可能性があるため次回に回す')
+        parser.add_argument('--database', default=None,
+                            help='読み取り元の DB エイリアス（既定: レプリカがあればレプリカ）')
+
+    def handle(self, *args, **options):
+        if options['format'] == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+            raise CommandError('Parquet 出力には pyarrow が必要です（pip install pyarrow、または --format ndjson）')
+
+        directory = options['output_dir']
+        watermark_path = os.path.join(directory, WATERMARK_FILENAME)
+        if os.path.exists(watermark_path) and not options['incremental']:
+            if not options['overwrite']:
+                raise CommandError(
+                    f'{directory} には出力済みのデータがあります。差分のみなら --incremental、'
+                    '全件出し直すなら --overwrite を指定してください'
+                )
+            self.clear_output(directory)
+        os.makedirs(directory, exist_ok=True)
+
+        using = options['database'] or replica_database_alias() or DEFAULT_DB_ALIAS
+        mode = '差分' if options['incremental'] else '全件'
+        self.stdout.write(f'📦 会話履歴を{mode}出力します（{options["format"]}・読み取り元: {using}）...')
+        start = time.perf_counter()
+
+        def progress(rows):
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'  {rows:,}行（{rows / elapsed if elapsed else 0:,.0f}行/秒）')
+
+        rows, files, watermark = export_conversations(
+            directory, export_format=options['format'], incremental=options['incremental'],
+            chunk_size=options['chunk_size'], settle_seconds=options['settle_seconds'],
+            using=using, progress=progress,
+        )
+
+        elapsed = time.perf_counter() - start
+        if not rows:
+            self.stdout.write(self.style.SUCCESS('✅ 新しい会話履歴はありません'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {rows:,}行を {files}ファイルに出力しました（{elapsed:.1f}秒）。'
+            f'透かし: {watermark.timestamp.isoformat()} / id={watermark.message_id}'
+        ))
+
+    def clear_output(self, directory):
+        """このコマンドが作った日付パーティションと透かしのみ削除"""
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.startswith('date=') and os.path.isdir(path):
+                shutil.rmtree(path)
+        os.remove(os.path.join(directory, WATERMARK_FILENAME))
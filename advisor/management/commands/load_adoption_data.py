@@ -1,7 +1,8 @@
 # advisor/management/commands/load_adoption_data.py
 
 from django.core.management.base import BaseCommand
-from advisor.models import SubsidyType, AdoptionStatistics, AdoptionTips
+from advisor.models import AdoptionStatistics, AdoptionTips
+from advisor.services.bulk_import import DEFAULT_CHUNK_SIZE, BulkImporter, resolve_subsidies
 import random
 from datetime import datetime
 
@@ -20,6 +21,12 @@ class Command(BaseCommand):
             default=3,
             help='生成する年数（デフォルト: 3年）'
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'1トランザクションで投入する件数（デフォルト: {DEFAULT_CHUNK_SIZE}）'
+        )
 
     def handle(self, *args, **options):
         if options['reset']:
@@ -29,11 +36,14 @@ class Command(BaseCommand):
                 self.style.WARNING('既存の採択統計・ティップスデータを削除しました')
             )
 
+        # 補助金は最初に1回だけ読み込む
+        subsidies = list(resolve_subsidies().values())
+
         # 統計データの生成
-        self._create_adoption_statistics(options['years'])
+        self._create_adoption_statistics(subsidies, options['years'], options['chunk_size'])
         
         # ティップスデータの生成
-        self._create_adoption_tips()
+        self._create_adoption_tips(subsidies, options['chunk_size'])
 
         self.stdout.write('\n' + '='*60)
         self.stdout.write(
@@ -45,11 +55,12 @@ class Command(BaseCommand):
         )
         self.stdout.write('='*60)
 
-    def _create_adoption_statistics(self, years):
-        """採択統計データを生成"""
-        subsidies = SubsidyType.objects.all()
+    def _create_adoption_statistics(self, subsidies, years, chunk_size):
+        """採択統計データを生成（既存の年度・回次はそのまま残す）"""
         current_year = datetime.now().year
-        created_count = 0
+        importer = BulkImporter(
+            AdoptionStatistics, ['subsidy_type', 'year', 'round_number'], chunk_size=chunk_size
+        )
 
         for subsidy in subsidies:
             # 補助金の特性に応じたベース採択率を設定
@@ -76,14 +87,6 @@ class Command(BaseCommand):
                 rounds = 2 if '持続化' in subsidy.name or 'IT導入' in subsidy.name else 1
                 
                 for round_num in range(1, rounds + 1):
-                    # 既存データをスキップ
-                    if AdoptionStatistics.objects.filter(
-                        subsidy_type=subsidy, 
-                        year=year, 
-                        round_number=round_num
-                    ).exists():
-                        continue
-
                     # 年ごとのトレンドを追加
                     trend_adjustment = (year - (current_year - years)) * random.uniform(-2, 3)
                     adoption_rate = max(15.0, min(85.0, base_rate + trend_adjustment + random.uniform(-variance, variance)))
@@ -115,8 +118,8 @@ class Command(BaseCommand):
                     # 業種別統計
                     industry_stats = self._generate_industry_statistics(subsidy, adoption_rate, total_apps, total_adoptions)
 
-                    # 統計データ作成
-                    stat = AdoptionStatistics.objects.create(
+                    # 統計データ作成（既存の年度・回次は投入時にスキップ）
+                    importer.add(AdoptionStatistics(
                         subsidy_type=subsidy,
                         year=year,
                         round_number=round_num,
@@ -128,12 +131,10 @@ class Command(BaseCommand):
                         medium_business_applications=medium_apps,
                         medium_business_adoptions=medium_adoptions,
                         industry_statistics=industry_stats
-                    )
-                    created_count += 1
+                    ))
 
-                    self.stdout.write(
-                        self.style.SUCCESS(f'✅ 統計作成: {subsidy.name} {year}年 第{round_num}回 (採択率: {adoption_rate:.1f}%, 小規模: {stat.small_business_adoption_rate:.1f}%)')
-                    )
+        stats = importer.close()
+        self.stdout.write(self.style.SUCCESS(f'✅ 統計作成: {stats.summary()}'))
 
     def _generate_industry_statistics(self, subsidy, base_rate, total_apps, total_adoptions):
         """業種別統計を生成"""
@@ -192,9 +193,8 @@ class Command(BaseCommand):
 
         return industry_stats
 
-    def _create_adoption_tips(self):
-        """採択ティップスを生成"""
-        subsidies = SubsidyType.objects.all()
+    def _create_adoption_tips(self, subsidies, chunk_size):
+        """採択ティップスを生成（同じ補助金・カテゴリ・タイトルの既存ティップスはそのまま残す）"""
 
         # 共通ティップス
         common_tips = [
@@ -314,43 +314,29 @@ class Command(BaseCommand):
             ]
         }
 
-        created_count = 0
+        importer = BulkImporter(AdoptionTips, ['subsidy_type', 'category', 'title'], chunk_size=chunk_size)
 
         for subsidy in subsidies:
             # 共通ティップスを追加
-            for tip_data in common_tips:
-                tip, created = AdoptionTips.objects.get_or_create(
-                    subsidy_type=subsidy,
-                    category=tip_data['category'],
-                    title=tip_data['title'],
-                    defaults={
-                        'content': tip_data['content'],
-                        'importance': tip_data['importance'],
-                        'effective_timing': tip_data['effective_timing'],
-                        'is_success_case': tip_data['is_success_case']
-                    }
-                )
-                if created:
-                    created_count += 1
+            tips = list(common_tips)
 
             # 補助金固有のティップスを追加
-            for keyword, tips in special_tips.items():
+            for keyword, special in special_tips.items():
                 if keyword in subsidy.name:
-                    for tip_data in tips:
-                        tip, created = AdoptionTips.objects.get_or_create(
-                            subsidy_type=subsidy,
-                            category=tip_data['category'],
-                            title=tip_data['title'],
-                            defaults={
-                                'content': tip_data['content'],
-                                'importance': tip_data['importance'],
-                                'effective_timing': tip_data['effective_timing'],
-                                'is_success_case': tip_data['is_success_case']
-                            }
-                        )
-                        if created:
-                            created_count += 1
+                    tips.extend(special)
 
+            for tip_data in tips:
+                importer.add(AdoptionTips(
+                    subsidy_type=subsidy,
+                    category=tip_data['category'],
+                    title=tip_data['title'],
+                    content=tip_data['content'],
+                    importance=tip_data['importance'],
+                    effective_timing=tip_data['effective_timing'],
+                    is_success_case=tip_data['is_success_case']
+                ))
+
+        stats = importer.close()
         self.stdout.write(
-            self.style.SUCCESS(f'✅ ティップス作成: {created_count}件')
-        )
\ No newline at end of file
+            self.style.SUCCESS(f'✅ ティップス作成: {stats.summary()}')
+        )
@@ -2,7 +2,8 @@
 
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
-from advisor.models import SubsidyType, AdoptionStatistics, AdoptionTips
+from advisor.models import AdoptionStatistics, AdoptionTips
+from advisor.services.bulk_import import DEFAULT_CHUNK_SIZE, BulkImporter, resolve_subsidies
 from datetime import date
 import json
 
@@ -15,9 +16,16 @@ class Command(BaseCommand):
             action='store_true',
             help='既存データを上書きして投入します',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'1トランザクションで投入する件数（デフォルト: {DEFAULT_CHUNK_SIZE}）',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write('📊 過去3年分の詳細な採択率データの投入を開始します...\n')
+        self.chunk_size = options['chunk_size']
         
         # 1. 実際の採択統計データを投入
         self.load_realistic_adoption_statistics(options['force'])
@@ -338,57 +346,40 @@ class Command(BaseCommand):
             }
         }
         
-        created_count = 0
-        updated_count = 0
+        # 既存の年度・回次は --force のときのみ上書き
+        stat_fields = [
+            'total_applications', 'total_adoptions', 'adoption_rate',
+            'small_business_applications', 'small_business_adoptions',
+            'medium_business_applications', 'medium_business_adoptions', 'industry_statistics'
+        ]
+        importer = BulkImporter(
+            AdoptionStatistics, ['subsidy_type', 'year', 'round_number'],
+            update_fields=stat_fields if force else None, chunk_size=self.chunk_size
+        )
+        subsidies = resolve_subsidies(realistic_data, stdout=self.stdout)
         
         for subsidy_name, year_data in realistic_data.items():
-            try:
-                subsidy = SubsidyType.objects.get(name=subsidy_name)
-                
-                for year, rounds_data in year_data.items():
-                    for round_data in rounds_data:
-                        
-                        # 既存データをチェック
-                        existing_stat = AdoptionStatistics.objects.filter(
-                            subsidy_type=subsidy,
-                            year=year,
-                            round_number=round_data['round']
-                        ).first()
-                        
-                        stat_data = {
-                            'total_applications': round_data['total_apps'],
-                            'total_adoptions': round_data['total_adoptions'],
-                            'adoption_rate': round_data['adoption_rate'],
-                            'small_business_applications': round_data['small_business']['apps'],
-                            'small_business_adoptions': round_data['small_business']['adoptions'],
-                            'medium_business_applications': round_data['medium_business']['apps'],
-                            'medium_business_adoptions': round_data['medium_business']['adoptions'],
-                            'industry_statistics': round_data['industry_breakdown']
-                        }
-                        
-                        if existing_stat and force:
-                            # 既存データを更新
-                            for field, value in stat_data.items():
-                                setattr(existing_stat, field, value)
-                            existing_stat.save()
-                            updated_count += 1
-                            self.stdout.write(f'  ▲ 更新: {subsidy_name} {year}年度第{round_data["round"]}回')
-                        
-                        elif not existing_stat:
-                            # 新規作成
-                            stat = AdoptionStatistics.objects.create(
-                                subsidy_type=subsidy,
-                                year=year,
-                                round_number=round_data['round'],
-                                **stat_data
-                            )
-                            created_count += 1
-                            self.stdout.write(f'  ✓ {subsidy_name} {year}年度第{round_data["round"]}回: 採択率{round_data["adoption_rate"]}%')
-                        
-            except SubsidyType.DoesNotExist:
-                self.stdout.write(f'  ⚠️ 補助金が見つかりません: {subsidy_name}')
+            subsidy = subsidies.get(subsidy_name)
+            if subsidy is None:
+                continue
+            
+            for year, rounds_data in year_data.items():
+                for round_data in rounds_data:
+                    importer.add(AdoptionStatistics(
+                        subsidy_type=subsidy,
+                        year=year,
+                        round_number=round_data['round'],
+                        total_applications=round_data['total_apps'],
+                        total_adoptions=round_data['total_adoptions'],
+                        adoption_rate=round_data['adoption_rate'],
+                        small_business_applications=round_data['small_business']['apps'],
+                        small_business_adoptions=round_data['small_business']['adoptions'],
+                        medium_business_applications=round_data['medium_business']['apps'],
+                        medium_business_adoptions=round_data['medium_business']['adoptions'],
+                        industry_statistics=round_data['industry_breakdown']
+                    ))
         
-        self.stdout.write(f'  ✅ 採択統計データ: 新規{created_count}件、更新{updated_count}件')
+        self.stdout.write(f'  ✅ 採択統計データ: {importer.close().summary()}')
 
     def load_detailed_analysis_data(self, force=False):
         """より詳細な分析用データを投入"""
@@ -584,38 +575,29 @@ class Command(BaseCommand):
             ]
         }
         
-        created_count = 0
+        # 同じ補助金・タイトルの既存ティップスは --force のときのみ内容を更新
+        importer = BulkImporter(
+            AdoptionTips, ['subsidy_type', 'title'],
+            update_fields=['content', 'importance', 'effective_timing'] if force else None,
+            chunk_size=self.chunk_size
+        )
+        subsidies = resolve_subsidies(comprehensive_tips, stdout=self.stdout)
         
         for subsidy_name, tips_data in comprehensive_tips.items():
-            try:
-                subsidy = SubsidyType.objects.get(name=subsidy_name)
-                
-                for tip_data in tips_data:
-                    tip, created = AdoptionTips.objects.get_or_create(
-                        subsidy_type=subsidy,
-                        title=tip_data['title'],
-                        defaults={
-                            'category': tip_data['category'],
-                            'content': tip_data['content'],
-                            'importance': tip_data['importance'],
-                            'effective_timing': tip_data['effective_timing'],
-                            'reference_url': '',
-                            'is_success_case': True
-                        }
-                    )
-                    
-                    if created:
-                        created_count += 1
-                        self.stdout.write(f'  ✓ {subsidy_name}: {tip_data["title"]}')
-                    elif force:
-                        # 強制更新
-                        tip.content = tip_data['content']
-                        tip.importance = tip_data['importance']
-                        tip.effective_timing = tip_data['effective_timing']
-                        tip.save()
-                        self.stdout.write(f'  ▲ 更新: {subsidy_name}: {tip_data["title"]}')
-                        
-            except SubsidyType.DoesNotExist:
-                self.stdout.write(f'  ⚠️ 補助金が見つかりません: {subsidy_name}')
+            subsidy = subsidies.get(subsidy_name)
+            if subsidy is None:
+                continue
+            
+            for tip_data in tips_data:
+                importer.add(AdoptionTips(
+                    subsidy_type=subsidy,
+                    title=tip_data['title'],
+                    category=tip_data['category'],
+                    content=tip_data['content'],
+                    importance=tip_data['importance'],
+                    effective_timing=tip_data['effective_timing'],
+                    reference_url='',
+                    is_success_case=True
+                ))
         
-        self.stdout.write(f'  ✅ 採択ティップス {created_count}件を作成')
\ No newline at end of file
+        self.stdout.write(f'  ✅ 採択ティップス: {importer.close().summary()}')
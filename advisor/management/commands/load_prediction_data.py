@@ -1,7 +1,8 @@
 # advisor/management/commands/load_prediction_data.py
 
 from django.core.management.base import BaseCommand
-from advisor.models import SubsidyType, SubsidySchedule, SubsidyPrediction
+from advisor.models import SubsidySchedule, SubsidyPrediction
+from advisor.services.bulk_import import DEFAULT_CHUNK_SIZE, BulkImporter, resolve_subsidies
 from datetime import date, timedelta
 import random
 
@@ -10,6 +11,7 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         self.stdout.write('🔮 補助金予測データの投入を開始します...\n')
+        self.chunk_size = options['chunk_size']
         
         # 1. 過去の実績データを投入
         self.load_historical_schedules()
@@ -84,36 +86,32 @@ class Command(BaseCommand):
             ]
         }
 
-        created_count = 0
+        # 既存の年度・回次はそのまま残す
+        importer = BulkImporter(
+            SubsidySchedule, ['subsidy_type', 'year', 'round_number'], chunk_size=self.chunk_size
+        )
+        subsidies = resolve_subsidies(historical_data, stdout=self.stdout)
         
         for subsidy_name, schedules in historical_data.items():
-            try:
-                subsidy = SubsidyType.objects.get(name=subsidy_name)
-                
-                for schedule_data in schedules:
-                    schedule, created = SubsidySchedule.objects.get_or_create(
-                        subsidy_type=subsidy,
-                        year=schedule_data['year'],
-                        round_number=schedule_data['round'],
-                        defaults={
-                            'application_start_date': schedule_data['start'],
-                            'application_end_date': schedule_data['end'],
-                            'result_announcement_date': schedule_data['result'],
-                            'status': 'completed',
-                            'is_prediction': False,
-                            'total_budget': random.randint(50, 500) * 100000000,  # 50-500億円
-                            'notes': f'{schedule_data["year"]}年度第{schedule_data["round"]}回公募（実績）'
-                        }
-                    )
-                    
-                    if created:
-                        created_count += 1
-                        self.stdout.write(f'  ✓ {subsidy_name} {schedule_data["year"]}年度第{schedule_data["round"]}回')
+            subsidy = subsidies.get(subsidy_name)
+            if subsidy is None:
+                continue
             
-            except SubsidyType.DoesNotExist:
-                self.stdout.write(f'  ⚠️ 補助金が見つかりません: {subsidy_name}')
+            for schedule_data in schedules:
+                importer.add(SubsidySchedule(
+                    subsidy_type=subsidy,
+                    year=schedule_data['year'],
+                    round_number=schedule_data['round'],
+                    application_start_date=schedule_data['start'],
+                    application_end_date=schedule_data['end'],
+                    result_announcement_date=schedule_data['result'],
+                    status='completed',
+                    is_prediction=False,
+                    total_budget=random.randint(50, 500) * 100000000,  # 50-500億円
+                    notes=f'{schedule_data["year"]}年度第{schedule_data["round"]}回公募（実績）'
+                ))
         
-        self.stdout.write(f'  ✅ 過去スケジュール {created_count}件を作成')
+        self.stdout.write(f'  ✅ 過去スケジュール: {importer.close().summary()}')
 
     def load_prediction_data(self):
         """2025年度の予測データを投入"""
@@ -209,41 +207,41 @@ class Command(BaseCommand):
             ]
         }
 
-        created_count = 0
+        # 同じ補助金・予測公募日の既存予測はそのまま残す
+        importer = BulkImporter(
+            SubsidyPrediction, ['subsidy_type', 'predicted_date'], chunk_size=self.chunk_size
+        )
+        subsidies = resolve_subsidies(predictions_data, stdout=self.stdout)
         
         for subsidy_name, predictions in predictions_data.items():
-            try:
-                subsidy = SubsidyType.objects.get(name=subsidy_name)
-                
-                for pred_data in predictions:
-                    prediction, created = SubsidyPrediction.objects.get_or_create(
-                        subsidy_type=subsidy,
-                        predicted_year=2025,
-                        predicted_round=pred_data['round'],
-                        defaults={
-                            'predicted_start_date': pred_data['start'],
-                            'predicted_end_date': pred_data['end'],
-                            'predicted_announcement_date': pred_data['announce'],
-                            'prediction_basis': pred_data['basis'],
-                            'confidence_score': pred_data['confidence'],
-                            'probability_percentage': pred_data['probability'],
-                            'prediction_notes': pred_data['notes'],
-                            'risk_factors': pred_data['risk_factors'],
-                            'historical_data_years': 3
-                        }
-                    )
-                    
-                    if created:
-                        created_count += 1
-                        self.stdout.write(f'  ✓ {subsidy_name} 2025年度第{pred_data["round"]}回 (信頼度{pred_data["confidence"]}%)')
+            subsidy = subsidies.get(subsidy_name)
+            if subsidy is None:
+                continue
             
-            except SubsidyType.DoesNotExist:
-                self.stdout.write(f'  ⚠️ 補助金が見つかりません: {subsidy_name}')
+            for pred_data in predictions:
+                importer.add(SubsidyPrediction(
+                    subsidy_type=subsidy,
+                    predicted_date=pred_data['start'],
+                    confidence_score=pred_data['confidence'] / 100,
+                    # 締切までに申請準備を終える
+                    preparation_deadline=pred_data['end'],
+                    success_probability=pred_data['probability'] / 100,
+                    prediction_basis={
+                        'basis': pred_data['basis'],
+                        'year': 2025,
+                        'round': pred_data['round'],
+                        'predicted_end_date': pred_data['end'],
+                        'predicted_announcement_date': pred_data['announce'],
+                        'notes': pred_data['notes'],
+                        'risk_factors': pred_data['risk_factors'],
+                        'historical_data_years': 3
+                    }
+                ))
         
         # 確定スケジュール（公式発表済み）も追加
         self.load_confirmed_2025_schedules()
         
-        self.stdout.write(f'  ✅ 2025年度予測データ {created_count}件を作成')
+        self.stdout.write(f'  ✅ 2025年度予測データ: {importer.close().summary()}')
 
     def load_confirmed_2025_schedules(self):
         """2025年度の確定スケジュール（公式発表済み）"""
@@ -260,37 +258,33 @@ class Command(BaseCommand):
             ]
         }
         
-        confirmed_count = 0
+        # 既存の年度・回次はそのまま残す
+        importer = BulkImporter(
+            SubsidySchedule, ['subsidy_type', 'year', 'round_number'], chunk_size=self.chunk_size
+        )
+        subsidies = resolve_subsidies(confirmed_schedules, stdout=self.stdout)
         
         for subsidy_name, schedules in confirmed_schedules.items():
-            try:
-                subsidy = SubsidyType.objects.get(name=subsidy_name)
-                
-                for schedule_data in schedules:
-                    schedule, created = SubsidySchedule.objects.get_or_create(
-                        subsidy_type=subsidy,
-                        year=2025,
-                        round_number=schedule_data['round'],
-                        defaults={
-                            'application_start_date': schedule_data['start'],
-                            'application_end_date': schedule_data['end'],
-                            'result_announcement_date': schedule_data['announce'],
-                            'status': schedule_data['status'],
-                            'is_prediction': False,
-                            'confidence_level': 100,
-                            'total_budget': schedule_data['budget'],
-                            'notes': schedule_data['notes']
-                        }
-                    )
-                    
-                    if created:
-                        confirmed_count += 1
-                        self.stdout.write(f'  ✓ {subsidy_name} 2025年度第{schedule_data["round"]}回（確定）')
+            subsidy = subsidies.get(subsidy_name)
+            if subsidy is None:
+                continue
             
-            except SubsidyType.DoesNotExist:
-                self.stdout.write(f'  ⚠️ 補助金が見つかりません: {subsidy_name}')
+            for schedule_data in schedules:
+                importer.add(SubsidySchedule(
+                    subsidy_type=subsidy,
+                    year=2025,
+                    round_number=schedule_data['round'],
+                    application_start_date=schedule_data['start'],
+                    application_end_date=schedule_data['end'],
+                    result_announcement_date=schedule_data['announce'],
+                    status=schedule_data['status'],
+                    is_prediction=False,
+                    confidence_level=100,
+                    total_budget=schedule_data['budget'],
+                    notes=schedule_data['notes']
+                ))
         
-        self.stdout.write(f'  ✅ 確定スケジュール {confirmed_count}件を作成')
+        self.stdout.write(f'  ✅ 確定スケジュール: {importer.close().summary()}')
 
     def add_arguments(self, parser):
         """コマンドライン引数を追加"""
@@ -305,4 +299,11 @@ class Command(BaseCommand):
             '--historical-only',
             action='store_true',
             help='過去データのみを投入'
-        )
\ No newline at end of file
+        )
+        
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'1トランザクションで投入する件数（デフォルト: {DEFAULT_CHUNK_SIZE}）'
+        )
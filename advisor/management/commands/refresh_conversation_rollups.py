@@ -0,0 +1,31 @@
+# advisor/management/commands/refresh_conversation_rollups.py
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from advisor.services.time_buckets import refresh_daily_rollups
+
+
+class Command(BaseCommand):
+    help = '会話数の日次ロールアップ（ConversationDailyStat）を更新します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=2,
+            help='再計算する日数（昨日から遡る、既定: 2）。初回は --days 400 などで過去分を作成'
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        start_day = today - timedelta(days=options['days'])
+
+        self.stdout.write(f'📅 {start_day} ～ {today - timedelta(days=1)} の日次ロールアップを更新します...')
+        start = time.perf_counter()
+
+        updated = refresh_daily_rollups(start_day, today)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'✅ {updated}日分を更新しました（{elapsed:.1f}秒）'))
@@ -0,0 +1,81 @@
+# advisor/management/commands/relabel_conversation_intents.py
+
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from advisor.models import ConversationHistory
+from advisor.services.intent_engine import analyze_chat_intent, conversation_flow, get_intent_engine
+
+# チャット画面と同じく、直前の履歴は最大この件数までで会話の流れを判定する
+HISTORY_WINDOW = 10
+
+
+class Command(BaseCommand):
+    help = '会話履歴のユーザー発言の意図分析（intent_analysis）を意図判定エンジンで一括で付け直します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='一度に判定・更新する件数')
+        parser.add_argument('--only-missing', action='store_true', help='意図分析が空の発言だけを対象にする')
+        parser.add_argument('--session', help='対象のセッションID（省略時は全セッション）')
+        parser.add_argument('--dry-run', action='store_true', help='更新せず件数のみ表示')
+
+    def handle(self, *args, **options):
+        messages = ConversationHistory.objects.order_by('session_id', 'timestamp', 'id')
+        if options['session']:
+            messages = messages.filter(session_id=options['session'])
+        messages = messages.only('id', 'session_id', 'message_type', 'content', 'intent_analysis')
+
+        start = time.perf_counter()
+        scanned = changed = 0
+        batch = []
+        current_session, position = None, 0
+
+        for message in messages.iterator(chunk_size=options['batch_size']):
+            # セッション内で何件目の発言か（= 判定時点で参照できた履歴の件数）
+            if message.session_id != current_session:
+                current_session, position = message.session_id, 0
+            previous = min(position, HISTORY_WINDOW)
+            position += 1
+
+            if message.message_type != 'user' or (options['only_missing'] and message.intent_analysis):
+                continue
+            batch.append((message, conversation_flow(previous)))
+            if len(batch) >= options['batch_size']:
+                scanned, changed = self.flush(batch, scanned, changed, options['dry_run'])
+                batch = []
+        if batch:
+            scanned, changed = self.flush(batch, scanned, changed, options['dry_run'])
+
+        elapsed = time.perf_counter() - start
+        result = f'{changed:,}件が変更対象です（ドライラン）' if options['dry_run'] else f'{changed:,}件を更新しました'
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {scanned:,}件を判定し、{result}（{elapsed:.2f}秒, {scanned / max(elapsed, 1e-9):,.0f}件/秒）'
+        ))
+
+    def flush(self, batch, scanned, changed, dry_run):
+        """まとめて判定し、結果が変わった行だけを更新
+
+        判定結果の種類は少ないため、同じ結果の行を1回の UPDATE ... WHERE id IN (...) でまとめる
+        （行ごとに CASE 式を組み立てる bulk_update より速い）。
+        """
+        scores = get_intent_engine().classify_many([message.content for message, _ in batch], 'chat')
+        groups = {}
+        for (message, flow), message_scores in zip(batch, scores):
+            analysis = analyze_chat_intent(message.content, flow, scores=message_scores)
+            if message.intent_analysis != analysis:
+                key = json.dumps(analysis, sort_keys=True)
+                groups.setdefault(key, (analysis, []))[1].append(message.id)
+
+        if groups and not dry_run:
+            with transaction.atomic():
+                for analysis, ids in groups.values():
+                    ConversationHistory.objects.filter(id__in=ids).update(intent_analysis=analysis)
+
+        scanned += len(batch)
+        changed += sum(len(ids) for _, ids in groups.values())
+        self.stdout.write(f'  判定中... {scanned:,}件', ending='\r')
+        return scanned, changed
@@ -0,0 +1,99 @@
+# advisor/management/commands/score_adoption_probabilities.py
+
+import csv
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from advisor.models import SubsidyType
+from advisor.services.enhanced_adoption_analysis import EnhancedAdoptionAnalysisService
+from advisor.services.probability_matrix import PROFILE_FIELDS, ProbabilityTables
+
+
+class Command(BaseCommand):
+    help = '顧客プロファイルのCSVを読み込み、補助金ごとの採択確率を一括計算してCSVに書き出します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='入力CSV（business_type, company_size, experience, support_agency 列）')
+        parser.add_argument('output', help='出力CSV')
+        parser.add_argument('--id-column', default='client_id', help='顧客IDの列名（出力にそのまま残す）')
+        parser.add_argument('--subsidy', action='append', type=int, dest='subsidy_ids',
+                            help='対象の補助金ID（複数指定可、省略時は有効な全補助金）')
+        parser.add_argument('--top', type=int, default=0,
+                            help='上位N件の補助金のみ出力（0 は全補助金の確率を列として出力）')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='一度に計算する行数')
+        parser.add_argument('--encoding', default='utf-8-sig', help='入出力CSVの文字コード')
+
+    def handle(self, *args, **options):
+        subsidies = SubsidyType.objects.filter(is_active=True).order_by('id')
+        if options['subsidy_ids']:
+            subsidies = SubsidyType.objects.filter(id__in=options['subsidy_ids']).order_by('id')
+        tables = ProbabilityTables(EnhancedAdoptionAnalysisService(), subsidies)
+        if not tables.subsidies:
+            raise CommandError('対象の補助金がありません')
+
+        start = time.perf_counter()
+        total = 0
+        try:
+            with open(options['input'], newline='', encoding=options['encoding']) as src, \
+                    open(options['output'], 'w', newline='', encoding=options['encoding']) as dst:
+                reader = csv.DictReader(src)
+                missing = [field for field in PROFILE_FIELDS if field not in (reader.fieldnames or [])]
+                if missing:
+                    raise CommandError(f"入力CSVに列がありません: {', '.join(missing)}")
+
+                id_column = options['id_column'] if options['id_column'] in reader.fieldnames else None
+                writer = csv.writer(dst)
+                writer.writerow(self.header(tables, id_column, options['top']))
+
+                while True:
+                    rows = list(islice(reader, options['chunk_size']))
+                    if not rows:
+                        break
+                    matrix = tables.score(rows)
+                    writer.writerows(self.output_rows(rows, matrix, id_column, options['top']))
+                    total += len(rows)
+                    self.stdout.write(f'  計算中... {total:,}件', ending='\r')
+        except OSError as e:
+            raise CommandError(f'CSVの読み書きに失敗しました: {e}')
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {total:,}件 × 補助金{len(tables.subsidies)}件を計算しました'
+            f'（{elapsed:.2f}秒, {total / max(elapsed, 1e-9):,.0f}件/秒）→ {options["output"]}'
+        ))
+
+    def header(self, tables, id_column, top):
+        header = [id_column] if id_column else []
+        header.extend(PROFILE_FIELDS)
+        if top:
+            for rank in range(1, min(top, len(tables.subsidies)) + 1):
+                header.extend([f'rank{rank}_subsidy', f'rank{rank}_probability'])
+        else:
+            header.extend(subsidy.name for subsidy in tables.subsidies)
+            header.extend(['best_subsidy', 'best_probability'])
+        return header
+
+    def output_rows(self, rows, matrix, id_column, top):
+        probabilities = matrix.probabilities.round(1).tolist()
+        names = [subsidy.name for subsidy in matrix.subsidies]
+
+        if top:
+            ranked = matrix.top_k(top).tolist()
+            for row, scores, columns in zip(rows, probabilities, ranked):
+                values = self.profile_values(row, id_column)
+                for column in columns:
+                    values.extend([names[column], scores[column]])
+                yield values
+            return
+
+        best_columns, _ = matrix.best()
+        for row, scores, best in zip(rows, probabilities, best_columns.tolist()):
+            yield self.profile_values(row, id_column) + scores + [names[best], scores[best]]
+
+    def profile_values(self, row, id_column):
+        values = [row.get(id_column, '')] if id_column else []
+        values.extend(row.get(field, '') for field in PROFILE_FIELDS)
+        return values
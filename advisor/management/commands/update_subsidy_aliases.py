@@ -1,11 +1,21 @@
 # advisor/management/commands/update_subsidy_aliases.py
-from django.core.management.base import BaseCommand
-import os
 import re
-from advisor.models import SubsidyType
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from advisor.models import SubsidyAlias, SubsidyType
+from advisor.services.subsidy_matcher import SUBSIDY_ALIASES, alias_weight, invalidate_alias_table
+from advisor.services.text_normalization import normalize_text
+
+# 上書き・削除の対象にする登録元（管理画面からの手動登録は変更しない）
+MANAGED_SOURCES = ('builtin', 'generated')
+
 
 class Command(BaseCommand):
-    help = 'AIアドバイザーのエイリアス辞書を現在の補助金データベースに合わせて更新します'
+    help = '補助金エイリアス表（SubsidyAlias）を組み込み辞書と現在の補助金データベースに合わせて一括更新します'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -13,29 +23,106 @@ class Command(BaseCommand):
             action='store_true',
             help='変更内容をプレビューのみ表示（実際の更新は行わない）'
         )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='組み込み辞書・自動生成に含まれなくなったエイリアスを削除する'
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='一度に登録する件数')
 
     def handle(self, *args, **options):
-        self.stdout.write('🔧 補助金エイリアス辞書の更新を開始します...\n')
+        self.stdout.write('🔧 補助金エイリアス表の更新を開始します...\n')
+        start = time.perf_counter()
         
         # 現在登録されている補助金を取得
-        current_subsidies = SubsidyType.objects.all().values_list('name', flat=True)
+        current_subsidies = list(SubsidyType.objects.all().values_list('name', flat=True))
         
-        # 完全版エイリアス辞書を生成
+        # 組み込み辞書 + 補助金ごとの自動生成エイリアス
         complete_aliases = self._generate_complete_aliases(current_subsidies)
+        rows = self._build_rows(complete_aliases)
         
-        # ファイルパスを特定
-        nlp_service_path = 'advisor/services/nlp_ai_advisor.py'
+        existing = {
+            (alias.subsidy_name, alias.alias): alias
+            for alias in SubsidyAlias.objects.only(
+                'id', 'subsidy_name', 'alias', 'normalized', 'weight', 'source', 'is_active'
+            )
+        }
+        changed = []
+        created = 0
+        for key, row in rows.items():
+            current = existing.get(key)
+            if current is not None and current.source not in MANAGED_SOURCES:
+                continue
+            if current is None:
+                created += 1
+            elif (current.normalized, current.weight, current.source, current.is_active) == row:
+                continue
+            normalized, weight, source, is_active = row
+            changed.append(SubsidyAlias(
+                subsidy_name=key[0], alias=key[1], normalized=normalized,
+                weight=weight, source=source, is_active=is_active,
+            ))
         
-        if not os.path.exists(nlp_service_path):
-            self.stdout.write(self.style.ERROR(f'❌ ファイルが見つかりません: {nlp_service_path}'))
-            return
+        stale_ids = []
+        if options['prune']:
+            stale_ids = [
+                alias.id for key, alias in existing.items()
+                if alias.source in MANAGED_SOURCES and key not in rows
+            ]
         
         if options['preview']:
             self._preview_changes(complete_aliases, current_subsidies)
-        else:
-            self._update_nlp_service_file(nlp_service_path, complete_aliases)
-            
-        self.stdout.write('✅ エイリアス辞書の更新が完了しました！')
+            self.stdout.write(
+                f'📝 新規 {created}件 / 更新 {len(changed) - created}件 / 削除 {len(stale_ids)}件'
+            )
+            self.stdout.write('⚠️  --preview モードのため、実際の更新は行いませんでした')
+            self.stdout.write('   実際に更新するには --preview オプションを外して実行してください')
+            return
+        
+        with transaction.atomic():
+            SubsidyAlias.objects.bulk_create(
+                changed,
+                batch_size=options['batch_size'],
+                update_conflicts=True,
+                unique_fields=['subsidy_name', 'alias'],
+                update_fields=['normalized', 'weight', 'source', 'is_active', 'updated_at'],
+            )
+            if stale_ids:
+                SubsidyAlias.objects.filter(id__in=stale_ids).delete()
+        
+        # 一括更新ではシグナルが飛ばないため、このプロセスの照合器はここで作り直させる
+        invalidate_alias_table()
+        
+        elapsed = time.perf_counter() - start
+        interval = getattr(settings, 'SUBSIDY_ALIAS_RELOAD_INTERVAL', 5)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ エイリアス表を更新しました（新規 {created}件 / 更新 {len(changed) - created}件 / '
+            f'削除 {len(stale_ids)}件, {elapsed:.2f}秒）'
+        ))
+        self.stdout.write(f'   稼働中のワーカーには {interval:g} 秒以内に反映されます')
+
+    def _build_rows(self, complete_aliases):
+        """(補助金名, エイリアス) → (正規化済み, 重み, 登録元, 有効) の表を作成
+
+        組み込み辞書内で重複するエイリアスは、辞書のまま照合した場合と同じスコアになるよう
+        重みを出現回数倍にする（重み None は照合時にエイリアスの長さから算出）。
+        """
+        rows = {}
+        for subsidy_name, aliases in SUBSIDY_ALIASES.items():
+            counts = {}
+            for alias in aliases:
+                counts[alias] = counts.get(alias, 0) + 1
+            for alias, count in counts.items():
+                normalized = normalize_text(alias)
+                weight = alias_weight(normalized) * count if count > 1 and normalized else None
+                rows[(subsidy_name, alias)] = (normalized, weight, 'builtin', True)
+        
+        for subsidy_name, aliases in complete_aliases.items():
+            for alias in sorted(aliases):
+                key = (subsidy_name, alias)
+                if key not in rows:
+                    rows[key] = (normalize_text(alias), None, 'generated', True)
+        return rows
 
     def _generate_complete_aliases(self, subsidies):
         """現在の補助金データベースから完全なエイリアス辞書を生成"""
@@ -170,59 +257,3 @@ class Command(BaseCommand):
             if len(aliases) <= 10:
                 self.stdout.write(f'   └ {", ".join(aliases[:5])}{"..." if len(aliases) > 5 else ""}')
             self.stdout.write('')
-        
-        self.stdout.write('⚠️  --preview モードのため、実際の更新は行いませんでした')
-        self.stdout.write('   実際に更新するには --preview オプションを外して実行してください')
-
-    def _update_nlp_service_file(self, file_path, complete_aliases):
-        """NLPサービスファイルのエイリア辞書を更新"""
-        
-        # ファイルを読み込み
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 新しいエイリアス辞書のコードを生成
-        new_aliases_code = self._generate_aliases_code(complete_aliases)
-        
-        # subsidy_aliases の部分を置換
-        pattern = r'self\.subsidy_aliases\s*=\s*{[^}]*}(?:\s*})*'
-        
-        if re.search(pattern, content, re.DOTALL):
-            new_content = re.sub(
-                pattern,
-                f'self.subsidy_aliases = {new_aliases_code}',
-                content,
-                flags=re.DOTALL
-            )
-        else:
-            # パターンが見つからない場合は、_initialize_nlp_patterns メソッド内に追加
-            init_pattern = r'(def _initialize_nlp_patterns\(self\):.*?""")'
-            replacement = r'\1\n        \n        # 完全版補助金エイリアス辞書\n        self.subsidy_aliases = ' + new_aliases_code
-            new_content = re.sub(init_pattern, replacement, content, flags=re.DOTALL)
-        
-        # ファイルに書き戻し
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(new_content)
-        
-        self.stdout.write(f'✅ {file_path} を更新しました')
-
-    def _generate_aliases_code(self, aliases_dict):
-        """エイリアス辞書のPythonコードを生成"""
-        lines = ['{']
-        
-        for subsidy_name, aliases in sorted(aliases_dict.items()):
-            # エイリアスリストを整形
-            if len(aliases) <= 3:
-                aliases_str = str(aliases)
-            else:
-                # 長いリストは複数行に分割
-                aliases_formatted = '[\n                '
-                aliases_formatted += ',\n                '.join(f"'{alias}'" for alias in aliases)
-                aliases_formatted += '\n            ]'
-                aliases_str = aliases_formatted
-            
-            lines.append(f"            '{subsidy_name}': {aliases_str},")
-        
-        lines.append('        }')
-        
-        return '\n'.join(lines)
\ No newline at end of file
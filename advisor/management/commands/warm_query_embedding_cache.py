@@ -0,0 +1,43 @@
+# advisor/management/commands/warm_query_embedding_cache.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from advisor.models import ConversationHistory
+from advisor.services.embedding_cache import get_query_embedding_cache
+from advisor.services.embeddings import get_text_encoder
+
+
+class Command(BaseCommand):
+    help = '会話履歴でよく聞かれる質問のベクトルを事前に計算し、質問ベクトルキャッシュに保存します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=5000, help='対象にする質問数（頻度の高い順）')
+        parser.add_argument('--batch-size', type=int, default=256, help='一度にエンコードする件数')
+
+    def handle(self, *args, **options):
+        cache = get_query_embedding_cache()
+        if cache.path is None:
+            raise CommandError('EMBEDDING_QUERY_CACHE が無効、または PATH が未設定です')
+
+        questions = list(
+            ConversationHistory.objects.filter(message_type='user')
+            .values('content')
+            .annotate(count=Count('id'))
+            .order_by('-count')
+            .values_list('content', flat=True)[:options['limit']]
+        )
+        encoder = get_text_encoder(allow_download=True)
+
+        start = time.perf_counter()
+        for i in range(0, len(questions), options['batch_size']):
+            cache.encode(questions[i:i + options['batch_size']], encoder)
+        elapsed = time.perf_counter() - start
+
+        stats = cache.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(questions):,}件の質問を処理しました（新規計算 {stats['misses']:,}件, "
+            f"キャッシュ済み {stats['memory_hits'] + stats['disk_hits']:,}件, {elapsed:.2f}秒）→ {cache.path}"
+        ))
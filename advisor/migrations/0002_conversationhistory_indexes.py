@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advisor', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversationhistory',
+            index=models.Index(fields=['session_id', 'timestamp'], name='conv_session_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversationhistory',
+            index=models.Index(fields=['message_type', 'timestamp'], name='conv_type_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversationhistory',
+            index=models.Index(fields=['timestamp'], name='conv_ts_idx'),
+        ),
+    ]
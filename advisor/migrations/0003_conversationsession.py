@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 14:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advisor', '0002_conversationhistory_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(max_length=255, unique=True, verbose_name='セッションID')),
+                ('started_at', models.DateTimeField(verbose_name='開始日時')),
+                ('last_activity', models.DateTimeField(db_index=True, verbose_name='最終アクティビティ')),
+                ('message_count', models.PositiveIntegerField(default=0, verbose_name='メッセージ数')),
+                ('user_messages', models.PositiveIntegerField(default=0, verbose_name='ユーザーメッセージ数')),
+                ('assistant_messages', models.PositiveIntegerField(default=0, verbose_name='アシスタントメッセージ数')),
+                ('system_messages', models.PositiveIntegerField(default=0, verbose_name='システムメッセージ数')),
+                ('last_user_message', models.CharField(blank=True, max_length=200, verbose_name='最新ユーザーメッセージ')),
+                ('last_user_message_at', models.DateTimeField(blank=True, null=True, verbose_name='最新ユーザーメッセージ日時')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='ユーザー')),
+            ],
+            options={
+                'verbose_name': '会話セッション',
+                'verbose_name_plural': '会話セッション',
+                'ordering': ['-last_activity'],
+            },
+        ),
+    ]
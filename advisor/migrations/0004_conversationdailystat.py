@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 14:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advisor', '0003_conversationsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='日付')),
+                ('message_count', models.PositiveIntegerField(default=0, verbose_name='メッセージ数')),
+                ('user_messages', models.PositiveIntegerField(default=0, verbose_name='ユーザーメッセージ数')),
+                ('assistant_messages', models.PositiveIntegerField(default=0, verbose_name='アシスタントメッセージ数')),
+                ('system_messages', models.PositiveIntegerField(default=0, verbose_name='システムメッセージ数')),
+                ('session_count', models.PositiveIntegerField(default=0, verbose_name='セッション数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+            ],
+            options={
+                'verbose_name': '会話日次統計',
+                'verbose_name_plural': '会話日次統計',
+                'ordering': ['-date'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 15:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advisor', '0004_conversationdailystat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubsidyAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subsidy_name', models.CharField(db_index=True, max_length=255, verbose_name='補助金名')),
+                ('alias', models.CharField(max_length=255, verbose_name='エイリアス')),
+                ('normalized', models.CharField(editable=False, max_length=255, verbose_name='正規化済みエイリアス')),
+                ('weight', models.PositiveSmallIntegerField(blank=True, help_text='未入力時はエイリアスの長さから算出', null=True, verbose_name='スコア重み')),
+                ('source', models.CharField(choices=[('builtin', '組み込み辞書'), ('generated', '自動生成'), ('manual', '手動登録')], default='manual', max_length=20, verbose_name='登録元')),
+                ('is_active', models.BooleanField(default=True, verbose_name='有効')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='更新日時')),
+            ],
+            options={
+                'verbose_name': '補助金エイリアス',
+                'verbose_name_plural': '補助金エイリアス',
+                'ordering': ['id'],
+                'unique_together': {('subsidy_name', 'alias')},
+            },
+        ),
+    ]
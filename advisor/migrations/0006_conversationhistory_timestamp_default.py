@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 15:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advisor', '0005_subsidyalias'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='conversationhistory',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='タイムスタンプ'),
+        ),
+    ]
@@ -4,6 +4,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 import datetime
 
 class SubsidyType(models.Model):
@@ -116,17 +117,117 @@ class ConversationHistory(models.Model):
         verbose_name="ユーザーコンテキスト"
     )
     
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name="タイムスタンプ")
+    # auto_now_add は保存時に上書きするため default にする（1ターン内の順序は build_turn で明示的に設定）
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, verbose_name="タイムスタンプ")
     
     class Meta:
         verbose_name = "会話履歴"
         verbose_name_plural = "会話履歴"
         ordering = ['-timestamp']
+        indexes = [
+            # セッション単位の履歴表示・エクスポート・削除
+            models.Index(fields=['session_id', 'timestamp'], name='conv_session_ts_idx'),
+            # メッセージ種別ごとの期間集計（ダッシュボード）
+            models.Index(fields=['message_type', 'timestamp'], name='conv_type_ts_idx'),
+            # 期間指定・最新順の一覧
+            models.Index(fields=['timestamp'], name='conv_ts_idx'),
+        ]
     
     def __str__(self):
         return f"{self.session_id} - {self.message_type} - {self.timestamp}"
 
 
+class ConversationSession(models.Model):
+    """会話セッションの集計（ConversationHistory 書き込み時に差分更新）"""
+    session_id = models.CharField(max_length=255, unique=True, verbose_name="セッションID")
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="ユーザー"
+    )
+    
+    started_at = models.DateTimeField(verbose_name="開始日時")
+    last_activity = models.DateTimeField(db_index=True, verbose_name="最終アクティビティ")
+    
+    # メッセージ種別ごとの件数
+    message_count = models.PositiveIntegerField(default=0, verbose_name="メッセージ数")
+    user_messages = models.PositiveIntegerField(default=0, verbose_name="ユーザーメッセージ数")
+    assistant_messages = models.PositiveIntegerField(default=0, verbose_name="アシスタントメッセージ数")
+    system_messages = models.PositiveIntegerField(default=0, verbose_name="システムメッセージ数")
+    
+    # 一覧表示用のプレビュー
+    last_user_message = models.CharField(max_length=200, blank=True, verbose_name="最新ユーザーメッセージ")
+    last_user_message_at = models.DateTimeField(null=True, blank=True, verbose_name="最新ユーザーメッセージ日時")
+    
+    class Meta:
+        verbose_name = "会話セッション"
+        verbose_name_plural = "会話セッション"
+        ordering = ['-last_activity']
+    
+    def __str__(self):
+        return f"{self.session_id} ({self.message_count}件)"
+    
+    @property
+    def last_message_preview(self):
+        """一覧表示用のプレビュー（50文字）"""
+        content = self.last_user_message
+        return content[:50] + '...' if len(content) > 50 else content
+
+
+class ConversationDailyStat(models.Model):
+    """会話数の日次ロールアップ（確定済みの日のみ、refresh_conversation_rollups で更新）"""
+    date = models.DateField(unique=True, verbose_name="日付")
+    message_count = models.PositiveIntegerField(default=0, verbose_name="メッセージ数")
+    user_messages = models.PositiveIntegerField(default=0, verbose_name="ユーザーメッセージ数")
+    assistant_messages = models.PositiveIntegerField(default=0, verbose_name="アシスタントメッセージ数")
+    system_messages = models.PositiveIntegerField(default=0, verbose_name="システムメッセージ数")
+    session_count = models.PositiveIntegerField(default=0, verbose_name="セッション数")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+    
+    class Meta:
+        verbose_name = "会話日次統計"
+        verbose_name_plural = "会話日次統計"
+        ordering = ['-date']
+    
+    def __str__(self):
+        return f"{self.date} ({self.message_count}件)"
+
+
+class SubsidyAlias(models.Model):
+    """補助金の別名（照合エンジンが稼働中のワーカーで定期的に読み直す）"""
+    SOURCE_CHOICES = [
+        ('builtin', '組み込み辞書'),
+        ('generated', '自動生成'),
+        ('manual', '手動登録'),
+    ]
+    
+    subsidy_name = models.CharField(max_length=255, db_index=True, verbose_name="補助金名")
+    alias = models.CharField(max_length=255, verbose_name="エイリアス")
+    normalized = models.CharField(max_length=255, editable=False, verbose_name="正規化済みエイリアス")
+    weight = models.PositiveSmallIntegerField(
+        null=True, blank=True, verbose_name="スコア重み", help_text="未入力時はエイリアスの長さから算出"
+    )
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='manual', verbose_name="登録元")
+    is_active = models.BooleanField(default=True, verbose_name="有効")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="更新日時")
+    
+    class Meta:
+        verbose_name = "補助金エイリアス"
+        verbose_name_plural = "補助金エイリアス"
+        unique_together = ['subsidy_name', 'alias']
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"{self.alias} → {self.subsidy_name}"
+    
+    def save(self, *args, **kwargs):
+        from .services.text_normalization import normalize_text
+        self.normalized = normalize_text(self.alias)
+        super().save(*args, **kwargs)
+
+
 
 
 class AdoptionStatistics(models.Model):
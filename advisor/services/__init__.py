@@ -1,24 +1,15 @@
 # advisor/services/__init__.py
-# 強制的に改良版サービスを使用
+# 強制的に改良版サービスを使用（初回参照時に読み込み、起動時の import を軽くする）
 
-print("Loading improved AI advisor service...")
-
-try:
-    from .improved_ai_advisor import ImprovedAIAdvisorService
-    AIAdvisorService = ImprovedAIAdvisorService
-    print("✅ ImprovedAIAdvisorService loaded successfully")
-except ImportError as e:
-    print(f"❌ Import error: {e}")
-    
-    # 最終フォールバック
-    class FinalFallbackService:
-        def analyze_question(self, question_text, user_context=None):
-            question_lower = question_text.lower()
-            
-            # ものづくり補助金の検出を強化
-            if any(keyword in question_lower for keyword in ['ものづくり', 'monozukuri', '設備投資']):
-                return {
-                    'answer': """## 🏭 ものづくり補助金の申請方法
+# 最終フォールバック
+class FinalFallbackService:
+    def analyze_question(self, question_text, user_context=None):
+        question_lower = question_text.lower()
+        
+        # ものづくり補助金の検出を強化
+        if any(keyword in question_lower for keyword in ['ものづくり', 'monozukuri', '設備投資']):
+            return {
+                'answer': """## 🏭 ものづくり補助金の申請方法
 
 ### 📋 基本情報
 - **補助上限額**: 1,250万円
@@ -48,20 +39,39 @@ except ImportError as e:
 - 投資効果の説明
 
 詳しい手順についてもお尋ねください！""",
-                    'recommended_subsidies': [],
-                    'confidence_score': 0.9,
-                    'model_used': 'fallback-monozukuri'
-                }
-            
-            return {
-                'answer': "申し訳ございません。システムエラーが発生しました。",
                 'recommended_subsidies': [],
-                'confidence_score': 0.1,
-                'model_used': 'error-fallback'
+                'confidence_score': 0.9,
+                'model_used': 'fallback-monozukuri'
             }
-    
-    AIAdvisorService = FinalFallbackService
-    print("⚠️ Using FinalFallbackService")
+        
+        return {
+            'answer': "申し訳ございません。システムエラーが発生しました。",
+            'recommended_subsidies': [],
+            'confidence_score': 0.1,
+            'model_used': 'error-fallback'
+        }
+
+
+def _load_ai_advisor_service():
+    print("Loading improved AI advisor service...")
+    try:
+        from .improved_ai_advisor import ImprovedAIAdvisorService
+        print("✅ ImprovedAIAdvisorService loaded successfully")
+        return ImprovedAIAdvisorService
+    except ImportError as e:
+        print(f"❌ Import error: {e}")
+        print("⚠️ Using FinalFallbackService")
+        return FinalFallbackService
+
+
+def __getattr__(name):
+    """AIAdvisorService は参照された時点でサービスモジュールを読み込む"""
+    if name == 'AIAdvisorService':
+        service_class = _load_ai_advisor_service()
+        globals()['AIAdvisorService'] = service_class
+        return service_class
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # 会話管理
 class SimpleConversationManager:
@@ -8,6 +8,7 @@ from ..models import (
     SubsidyType, AdoptionStatistics, AdoptionTips, 
     UserApplicationHistory, ApplicationScoreCard
 )
+from .adoption_rollup import get_adoption_rollup
 
 class AdoptionAnalysisService:
     """採択率分析・向上支援サービス"""
@@ -92,10 +93,8 @@ class AdoptionAnalysisService:
     def calculate_adoption_probability(self, user, subsidy_type, user_context):
         """ユーザーの採択可能性を計算"""
         # 基本確率は過去の採択率から
-        recent_stats = AdoptionStatistics.objects.filter(
-            subsidy_type=subsidy_type,
-            year__gte=datetime.now().year - 2
-        ).order_by('-year', '-round_number').first()
+        rollup = get_adoption_rollup().get(subsidy_type)
+        recent_stats = rollup.latest_since(datetime.now().year - 2)
         
         if recent_stats:
             base_probability = recent_stats.adoption_rate
@@ -123,10 +122,9 @@ class AdoptionAnalysisService:
         
         # 業種適合度による調整
         business_type = user_context.get('business_type', '')
-        if business_type and recent_stats and recent_stats.industry_statistics:
-            industry_stats = recent_stats.industry_statistics.get(business_type)
-            if industry_stats:
-                industry_rate = industry_stats.get('adoption_rate', base_probability)
+        if business_type and recent_stats:
+            industry_rate = rollup.industry_rates.get(business_type)
+            if industry_rate is not None:
                 base_probability = (base_probability + industry_rate) / 2
         
         return min(95, max(5, base_probability))  # 5-95%の範囲に制限
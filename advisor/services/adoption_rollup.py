@@ -0,0 +1,175 @@
+# advisor/services/adoption_rollup.py - 採択統計の補助金別集計スナップショット
+
+import threading
+import time
+from datetime import datetime
+from types import MappingProxyType
+
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .snapshot_version import reload_interval, table_version
+
+
+def _rate(adoptions, applications):
+    return adoptions / applications * 100 if applications > 0 else None
+
+
+class SubsidyAdoptionRollup:
+    """1補助金分の採択統計の集計値
+
+    stats は (year, round_number) の降順。保持するインスタンスは共有されるため変更しないこと。
+    """
+
+    def __init__(self, subsidy_id, stats, current_year):
+        self.subsidy_id = subsidy_id
+        self.stats = tuple(stats)
+        self.latest = self.stats[0] if self.stats else None
+
+        latest = self.latest
+        self.latest_rate = latest.adoption_rate if latest else None
+        self.latest_applications = latest.total_applications if latest else 0
+        self.small_business_rate = latest.small_business_adoption_rate if latest else 0
+        self.medium_business_rate = latest.medium_business_adoption_rate if latest else 0
+        self.industry_rates = MappingProxyType(self._industry_rates(latest))
+
+        self.weighted_rate_2y = self._weighted_rate(current_year - 1)
+        self.weighted_rate_3y = self._weighted_rate(current_year - 2)
+
+        recent = [stat for stat in self.stats if stat.year >= current_year - 2]
+        self.small_business_rate_3y = _rate(
+            sum(stat.small_business_adoptions for stat in recent),
+            sum(stat.small_business_applications for stat in recent),
+        )
+        self.medium_business_rate_3y = _rate(
+            sum(stat.medium_business_adoptions for stat in recent),
+            sum(stat.medium_business_applications for stat in recent),
+        )
+
+    @staticmethod
+    def _industry_rates(stat):
+        if not stat or not isinstance(stat.industry_statistics, dict):
+            return {}
+        rates = {}
+        for industry, values in stat.industry_statistics.items():
+            if isinstance(values, dict) and values.get('adoption_rate') is not None:
+                rates[industry] = values['adoption_rate']
+        return rates
+
+    def _weighted_rate(self, min_year):
+        """min_year 以降の申請数加重平均採択率（申請数が無ければ単純平均）"""
+        window = [stat for stat in self.stats if stat.year >= min_year]
+        if not window:
+            return None
+        weighted = _rate(
+            sum(stat.total_adoptions for stat in window),
+            sum(stat.total_applications for stat in window),
+        )
+        if weighted is not None:
+            return weighted
+        return sum(stat.adoption_rate for stat in window) / len(window)
+
+    def latest_since(self, min_year):
+        """min_year 以降で最新の回次（該当なしは None）"""
+        latest = self.latest
+        return latest if latest and latest.year >= min_year else None
+
+    def recent(self, limit):
+        """最新 limit 回分の統計"""
+        return self.stats[:limit]
+
+
+_EMPTY_ROLLUP = SubsidyAdoptionRollup(None, [], 0)
+
+
+class AdoptionRollup:
+    """全補助金の採択統計を1クエリで読み込んだスナップショット
+
+    採択統計は更新が稀なため、プロセスごとに一度だけ集計し、
+    AdoptionStatistics の保存・削除シグナル（他プロセスでの変更は定期確認）で丸ごと差し替える。
+    """
+
+    def __init__(self, stats, current_year=None, version=None):
+        self.current_year = current_year or datetime.now().year
+        self.version = version
+        self.loaded_at = timezone.now()
+
+        grouped = {}
+        for stat in stats:
+            grouped.setdefault(stat.subsidy_type_id, []).append(stat)
+
+        self.by_subsidy = MappingProxyType({
+            subsidy_id: SubsidyAdoptionRollup(
+                subsidy_id,
+                sorted(subsidy_stats, key=lambda stat: (stat.year, stat.round_number), reverse=True),
+                self.current_year,
+            )
+            for subsidy_id, subsidy_stats in grouped.items()
+        })
+
+    def __len__(self):
+        return len(self.by_subsidy)
+
+    def get(self, subsidy):
+        """補助金（インスタンスまたはID）の集計。統計が無い場合は空の集計を返す"""
+        if subsidy is None:
+            return _EMPTY_ROLLUP
+        subsidy_id = getattr(subsidy, 'pk', subsidy)
+        return self.by_subsidy.get(subsidy_id, _EMPTY_ROLLUP)
+
+    def latest(self, subsidy):
+        """最新回次の AdoptionStatistics（なければ None）"""
+        return self.get(subsidy).latest
+
+
+_rollup = None
+_rollup_expires_at = 0.0
+_rollup_lock = threading.Lock()
+
+
+def adoption_statistics_version():
+    from ..models import AdoptionStatistics
+    return table_version(AdoptionStatistics, 'updated_at')
+
+
+def _load_rollup(version=None):
+    from ..models import AdoptionStatistics
+    return AdoptionRollup(AdoptionStatistics.objects.order_by(), version=version)
+
+
+def _is_fresh(rollup):
+    return (rollup is not None and rollup.current_year == datetime.now().year
+            and time.monotonic() < _rollup_expires_at)
+
+
+def get_adoption_rollup():
+    """プロセス共有の採択統計スナップショットを取得
+
+    SNAPSHOT_RELOAD_INTERVAL 秒ごとに AdoptionStatistics の件数・最大ID・最終更新日時を確認し、
+    他プロセス（load_adoption_data コマンド・管理画面）での変更を取り込む。
+    """
+    global _rollup, _rollup_expires_at
+    rollup = _rollup
+    if _is_fresh(rollup):
+        return rollup
+
+    with _rollup_lock:
+        if _is_fresh(_rollup):
+            return _rollup
+        try:
+            version = adoption_statistics_version()
+            if _rollup is None or _rollup.version != version or _rollup.current_year != datetime.now().year:
+                _rollup = _load_rollup(version)
+        except DatabaseError as e:
+            print(f"[WARNING] AdoptionRollup: 採択統計取得失敗 ({e})")
+            if _rollup is None:
+                return AdoptionRollup([])
+        _rollup_expires_at = time.monotonic() + reload_interval()
+        return _rollup
+
+
+def invalidate_adoption_rollup(**kwargs):
+    """スナップショットを破棄し、次回アクセス時に再集計させる"""
+    global _rollup
+    with _rollup_lock:
+        _rollup = None
@@ -1,10 +1,12 @@
 # advisor/services/ai_advisor.py
 
-import requests
 import json
 import uuid
 from django.conf import settings
 from ..models import SubsidyType, Answer, ConversationHistory
+from .dify_client import get_dify_client
+from .response_cache import get_response_cache, make_cache_key
+from .conversation_writer import save_conversation_turn, save_messages
 
 class DifyAIAdvisorService:
     """DifyのGPT-4を使用するAIアドバイザーサービス"""
@@ -39,7 +41,10 @@ class DifyAIAdvisorService:
             structured_query = self._build_japanese_query(question_text, user_context, subsidies_context)
             
             # Dify API呼び出し
-            dify_response = self._call_dify_api(structured_query)
+            dify_response = self._call_dify_api(
+                structured_query,
+                cache_key=make_cache_key('ai_advisor', question_text, context=user_context)
+            )
             
             if dify_response and 'answer' in dify_response:
                 return self._process_dify_response(dify_response, question_text)
@@ -51,55 +56,16 @@ class DifyAIAdvisorService:
             print(f"Dify integration error: {e}")
             return self._generate_mock_response(question_text)
     
-    def _call_dify_api(self, query_text):
-        """修正されたDify API呼び出し"""
-        try:
-            # 成功した形式: inputs={} + query
-            request_data = {
-                "inputs": {},
-                "query": query_text,
-                "response_mode": "blocking",
-                "user": f"django_user_{hash(query_text) % 10000}"
-            }
-            
-            # 正しいURL構築
-            url = f"{self.dify_api_url}/chat-messages"
-            
-            print(f"Sending request to: {url}")
-            print(f"Request headers: {self.headers}")
-            print(f"Request data preview: {json.dumps(request_data, ensure_ascii=False)[:200]}...")
-            
-            response = requests.post(
-                url,
-                headers=self.headers,
-                json=request_data,
-                timeout=60
+    def _call_dify_api(self, query_text, cache_key=None):
+        """Dify API呼び出し（共通クライアント経由、cache_key 指定時は回答キャッシュを利用）"""
+        print(f"Calling Dify API: {self.dify_api_url}/chat-messages")
+        
+        return get_response_cache().get_or_call(
+            cache_key,
+            lambda: get_dify_client(self.dify_api_url, self.dify_api_key).chat(
+                query_text, user=f"django_user_{hash(query_text) % 10000}"
             )
-            
-            print(f"Response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                response_data = response.json()
-                print(f"Response received successfully")
-                return response_data
-            else:
-                print(f"Dify API Error: {response.status_code}")
-                print(f"Response text: {response.text}")
-                return None
-                
-        except requests.exceptions.ConnectionError as e:
-            print(f"Connection error to Dify API: {e}")
-            print(f"Attempted URL: {url}")
-            return None
-        except requests.exceptions.Timeout:
-            print("Dify API timeout")
-            return None
-        except requests.exceptions.RequestException as e:
-            print(f"Dify API request error: {e}")
-            return None
-        except Exception as e:
-            print(f"Unexpected error in Dify API call: {e}")
-            return None
+        )
     
     def _build_japanese_query(self, question, user_context, subsidies_context):
         """日本語での構造化クエリを作成"""
@@ -286,12 +252,17 @@ class ConversationManager:
     
     @staticmethod
     def save_conversation(session_id, user, message_type, content):
-        ConversationHistory.objects.create(
+        save_messages([ConversationHistory(
             session_id=session_id,
             user=user,
             message_type=message_type,
             content=content
-        )
+        )])
+
+    @staticmethod
+    def save_turn(session_id, user, question, response, intent_analysis=None, user_context=None):
+        """質問と回答を1回の一括INSERTで保存"""
+        save_conversation_turn(session_id, question, response, intent_analysis, user_context, user=user)
     
     @staticmethod
     def get_conversation_history(session_id, limit=10):
@@ -0,0 +1,166 @@
+# advisor/services/analytics_export.py - 会話履歴の分析用エクスポート（日付パーティション・差分出力）
+
+import json
+import os
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import ConversationHistory
+
+EXPORT_FORMATS = ('parquet', 'ndjson')
+WATERMARK_FILENAME = '_watermark.json'
+
+# 展開して列にする JSON フィールド（例: metadata.confidence_score → metadata__confidence_score）
+FLATTEN_FIELDS = ('metadata', 'intent_analysis', 'user_context')
+FLATTEN_SEPARATOR = '__'
+
+_BASE_FIELDS = ('id', 'session_id', 'user_id', 'user__username', 'message_type', 'content', 'timestamp')
+
+
+def flatten_json(value, prefix):
+    """ネストした dict を prefix__key__subkey 形式の1階層の dict に展開
+
+    リストは要素の型が揃わないことがあるため JSON 文字列のまま残す。
+    """
+    if isinstance(value, dict):
+        flattened = {}
+        for key, item in value.items():
+            flattened.update(flatten_json(item, f'{prefix}{FLATTEN_SEPARATOR}{key}'))
+        return flattened
+    if isinstance(value, (list, tuple)):
+        return {prefix: json.dumps(value, ensure_ascii=False)}
+    return {prefix: value}
+
+
+def flatten_row(values):
+    """values_list の1行を分析用の1レコードに変換"""
+    row = dict(zip(_BASE_FIELDS, values[:len(_BASE_FIELDS)]))
+    row['username'] = row.pop('user__username')
+    for field, value in zip(FLATTEN_FIELDS, values[len(_BASE_FIELDS):]):
+        row.update(flatten_json(value or {}, field))
+    return row
+
+
+class Watermark:
+    """前回までに出力した最後の行の (timestamp, id)"""
+
+    def __init__(self, timestamp=None, message_id=0, rows=0):
+        self.timestamp = timestamp
+        self.message_id = message_id
+        self.rows = rows
+
+    @classmethod
+    def load(cls, directory):
+        path = os.path.join(directory, WATERMARK_FILENAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(datetime.fromisoformat(data['timestamp']), data['id'], data.get('rows', 0))
+
+    def save(self, directory):
+        """一時ファイルに書いてから置き換え（途中で止まっても壊れた透かしを残さない）"""
+        path = os.path.join(directory, WATERMARK_FILENAME)
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+            json.dump({
+                'timestamp': self.timestamp.isoformat(),
+                'id': self.message_id,
+                'rows': self.rows,
+                'updated_at': timezone.now().isoformat(),
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(f'{path}.tmp', path)
+
+
+def iter_export_chunks(after=None, until=None, chunk_size=50000, using=None):
+    """(timestamp, id) 順にキーセット方式で chunk_size 件ずつ読み出す
+
+    1回のクエリを短く保ち、長い読み取りトランザクションで WAL のチェックポイントを
+    妨げないようにする。until より新しい行（書き込み中の可能性がある）は対象外。
+    """
+    queryset = ConversationHistory.objects.using(using).order_by('timestamp', 'id')
+    if until is not None:
+        queryset = queryset.filter(timestamp__lt=until)
+    fields = _BASE_FIELDS + FLATTEN_FIELDS
+    last = (after.timestamp, after.message_id) if after else None
+    while True:
+        chunk = queryset
+        if last:
+            chunk = chunk.filter(Q(timestamp__gt=last[0]) | Q(timestamp=last[0], id__gt=last[1]))
+        rows = list(chunk.values_list(*fields)[:chunk_size])
+        if not rows:
+            return
+        last = (rows[-1][_BASE_FIELDS.index('timestamp')], rows[-1][0])
+        yield [flatten_row(values) for values in rows]
+        if len(rows) < chunk_size:
+            return
+
+
+def partition_by_date(rows):
+    """レコードをローカル日付ごとにまとめる（入力は timestamp 順）"""
+    partitions = {}
+    for row in rows:
+        partitions.setdefault(timezone.localtime(row['timestamp']).date(), []).append(row)
+    return partitions
+
+
+def _column_array(pa, values):
+    """列の値を Arrow 配列に変換（型が混在する列は文字列に揃える）"""
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([
+            value if value is None or isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+            for value in values
+        ], type=pa.string())
+
+
+def write_parquet(path, rows):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    table = pa.table({column: _column_array(pa, [row.get(column) for row in rows]) for column in columns})
+    pq.write_table(table, path, compression='zstd')
+
+
+def write_ndjson(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps({**row, 'timestamp': row['timestamp'].isoformat()}, ensure_ascii=False) + '\n')
+
+
+WRITERS = {'parquet': write_parquet, 'ndjson': write_ndjson}
+
+
+def export_conversations(directory, export_format='parquet', incremental=False, chunk_size=50000,
+                         settle_seconds=60, using=None, progress=None):
+    """会話履歴を date=YYYY-MM-DD/part-*.{format} に書き出し、透かしを更新
+
+    チャンクごとに新しいファイルを作るため、差分出力でも既存ファイルは書き換えない。
+    透かしはチャンクを書き終えるたびに保存するので、中断しても続きから再開できる。
+
+    Returns:
+        (書き出した行数, ファイル数, Watermark または None)
+    """
+    write = WRITERS[export_format]
+    watermark = Watermark.load(directory) if incremental else None
+    total_rows = watermark.rows if watermark else 0
+    # 書き込み中のトランザクションがコミットされるまで直近の行は次回に回す
+    until = timezone.now() - timedelta(seconds=settle_seconds)
+    run_id = timezone.now().strftime('%Y%m%dT%H%M%S')
+
+    rows_written = files_written = 0
+    for sequence, chunk in enumerate(iter_export_chunks(watermark, until, chunk_size, using)):
+        for day, rows in partition_by_date(chunk).items():
+            partition = os.path.join(directory, f'date={day.isoformat()}')
+            os.makedirs(partition, exist_ok=True)
+            write(os.path.join(partition, f'part-{run_id}-{sequence:05d}.{export_format}'), rows)
+            files_written += 1
+        rows_written += len(chunk)
+        watermark = Watermark(chunk[-1]['timestamp'], chunk[-1]['id'], total_rows + rows_written)
+        watermark.save(directory)
+        if progress:
+            progress(rows_written)
+    return rows_written, files_written, watermark
@@ -0,0 +1,216 @@
+# advisor/services/bulk_import.py - load_* コマンド共通の一括投入パイプライン
+
+import time
+
+from django.db import transaction
+
+from ..models import AdoptionStatistics, AdoptionTips, SubsidySchedule, SubsidyType
+from ..signals import call_if_loaded, invalidate_recommendation_engine
+from .adoption_rollup import invalidate_adoption_rollup
+from .response_cache import invalidate_response_cache
+from .subsidy_catalog import invalidate_subsidy_catalog
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def resolve_subsidies(names=None, stdout=None):
+    """補助金名 → SubsidyType の dict を1クエリで作成（names 省略時は全件）
+
+    stdout を渡すと、見つからない補助金名を報告する。
+    """
+    queryset = SubsidyType.objects.all()
+    if names is not None:
+        names = list(dict.fromkeys(names))
+        queryset = queryset.filter(name__in=names)
+    subsidies = {subsidy.name: subsidy for subsidy in queryset}
+    if stdout is not None and names is not None:
+        for name in names:
+            if name not in subsidies:
+                stdout.write(f'  ⚠️ 補助金が見つかりません: {name}')
+    return subsidies
+
+
+def _has_unique_constraint(model, fields):
+    """fields の組がDB上の一意制約（unique_together・UniqueConstraint・unique=True）か"""
+    target = set(fields)
+    if len(fields) == 1 and model._meta.get_field(fields[0]).unique:
+        return True
+    if any(set(together) == target for together in model._meta.unique_together):
+        return True
+    return any(set(constraint.fields) == target for constraint in model._meta.total_unique_constraints)
+
+
+def invalidate_after_bulk_write(model, pks=()):
+    """bulk_create / bulk_update ではシグナルが飛ばないため、保存時と同じ破棄・更新を明示的に行う
+
+    他プロセスのスナップショットは定期確認（SNAPSHOT_RELOAD_INTERVAL）で反映される。
+    """
+    if model is SubsidyType:
+        invalidate_subsidy_catalog()
+    if model is AdoptionStatistics:
+        invalidate_adoption_rollup()
+    if model is SubsidySchedule:
+        invalidate_recommendation_engine()
+    if model in (SubsidyType, AdoptionStatistics, AdoptionTips):
+        invalidate_response_cache()
+    if model is AdoptionTips and pks:
+        # 読み込み済みの意味検索インデックスへ追加・更新したティップスを反映
+        call_if_loaded('advisor.services.embedding_index', 'refresh_documents', 'tip', list(pks))
+
+
+class ImportStats:
+    """一括投入の件数と処理速度"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.chunks = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (f'新規 {self.created}件 / 更新 {self.updated}件 / スキップ {self.skipped}件'
+                f'（{self.rows:,}行・{self.rows_per_second:,.0f}行/秒）')
+
+
+class BulkImporter:
+    """未保存のモデルを chunk_size 件ずつ1トランザクション・1回の bulk_create で投入
+
+    unique_fields で同一行を判定し、update_fields を指定した場合は既存行を更新、
+    省略した場合は既存行をそのまま残す（get_or_create と同じ）。何度実行しても結果は同じ。
+
+    unique_fields がDBの一意制約なら bulk_create の ON CONFLICT で処理し、
+    制約がない場合（AdoptionTips など）は既存のキーを最初に1クエリで読み込んで振り分ける。
+
+    使い方:
+        with BulkImporter(AdoptionStatistics, ['subsidy_type', 'year', 'round_number'],
+                          update_fields=['total_applications', ...]) as importer:
+            importer.add(AdoptionStatistics(...))
+        print(importer.stats.summary())
+    """
+
+    def __init__(self, model, unique_fields, update_fields=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.model = model
+        self.unique_fields = list(unique_fields)
+        self.chunk_size = max(1, chunk_size)
+        self.stats = ImportStats()
+        self._key_attnames = [model._meta.get_field(name).attname for name in self.unique_fields]
+        self._use_conflicts = _has_unique_constraint(model, self.unique_fields)
+        self._existing = None
+        self._pending = {}
+        self._written_pks = set()
+        self._started = None
+        self._initial_count = None
+        self._closed = False
+
+        self.update_fields = list(update_fields or [])
+        # bulk_update / ON CONFLICT では auto_now が働かないため明示的に更新する
+        self._auto_now_fields = [
+            field for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)
+        ] if self.update_fields else []
+        for field in self._auto_now_fields:
+            if field.name not in self.update_fields:
+                self.update_fields.append(field.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+    def key(self, obj):
+        return tuple(getattr(obj, attname) for attname in self._key_attnames)
+
+    def add(self, obj):
+        """1行追加（同じキーが重複した場合は後から追加したものを採用）"""
+        if self._started is None:
+            self._started = time.perf_counter()
+            if self._use_conflicts:
+                self._initial_count = self.model.objects.count()
+        key = self.key(obj)
+        if key in self._pending:
+            self.stats.skipped += 1
+        self._pending[key] = obj
+        self.stats.rows += 1
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+
+    def extend(self, objs):
+        for obj in objs:
+            self.add(obj)
+
+    def flush(self):
+        if not self._pending:
+            return
+        batch = list(self._pending.values())
+        self._pending = {}
+        with transaction.atomic():
+            if self._use_conflicts:
+                self._write_with_conflicts(batch)
+            else:
+                self._write_with_existing_keys(batch)
+        self._written_pks.update(obj.pk for obj in batch if obj.pk is not None)
+        self.stats.chunks += 1
+
+    def _write_with_conflicts(self, batch):
+        if self.update_fields:
+            self.model.objects.bulk_create(
+                batch, update_conflicts=True,
+                unique_fields=self.unique_fields, update_fields=self.update_fields,
+            )
+        else:
+            self.model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def _write_with_existing_keys(self, batch):
+        if self._existing is None:
+            self._existing = {
+                tuple(row[1:]): row[0]
+                for row in self.model.objects.values_list('pk', *self._key_attnames).iterator()
+            }
+        new, existing = [], []
+        for obj in batch:
+            pk = self._existing.get(self.key(obj))
+            if pk is None:
+                new.append(obj)
+            else:
+                obj.pk = pk
+                existing.append(obj)
+
+        self.model.objects.bulk_create(new)
+        for obj in new:
+            self._existing[self.key(obj)] = obj.pk
+        self.stats.created += len(new)
+
+        if self.update_fields and existing:
+            for obj in existing:
+                for field in self._auto_now_fields:
+                    field.pre_save(obj, add=False)
+            self.model.objects.bulk_update(existing, self.update_fields)
+            self.stats.updated += len(existing)
+        else:
+            self.stats.skipped += len(existing)
+
+    def close(self):
+        """残りを書き込み、件数と処理時間を確定（キャッシュの破棄もここで行う）"""
+        self.flush()
+        if self._closed or self._started is None:
+            return self.stats
+        self._closed = True
+        if self._use_conflicts:
+            # ON CONFLICT では新規・既存を区別できないため、投入前後の件数差から求める
+            created = self.model.objects.count() - self._initial_count
+            written = self.stats.rows - self.stats.skipped
+            self.stats.created = created
+            if self.update_fields:
+                self.stats.updated = written - created
+            else:
+                self.stats.skipped += written - created
+        self.stats.elapsed = time.perf_counter() - self._started
+        transaction.on_commit(lambda: invalidate_after_bulk_write(self.model, self._written_pks))
+        return self.stats
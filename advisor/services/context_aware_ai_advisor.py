@@ -2,14 +2,18 @@
 
 import logging
 from ..models import SubsidyType
+from .subsidy_catalog import get_subsidy_catalog
+from .intent_engine import classify_intent
 
 logger = logging.getLogger(__name__)
 
 class ContextAwareAIAdvisorService:
     """文脈を理解するAIアドバイザーサービス"""
     
-    def __init__(self):
-        self.subsidies = SubsidyType.objects.all()
+    @property
+    def subsidies(self):
+        """補助金一覧（カタログ差し替えに追従）"""
+        return get_subsidy_catalog().subsidies
     
     def analyze_question_with_context(self, question_text, conversation_history=None, target_subsidy=None, user_context=None):
         """文脈を考慮した質問分析と回答生成"""
@@ -31,17 +35,8 @@ class ContextAwareAIAdvisorService:
             return self._generate_general_response(question_text, target_subsidy)
     
     def _analyze_intent(self, question_text, target_subsidy):
-        """質問の意図を分析"""
-        question_lower = question_text.lower()
-        
-        if any(keyword in question_lower for keyword in ['採択率', '成功率', '確率', '上げる', '高める']):
-            return 'adoption_rate'
-        elif any(keyword in question_lower for keyword in ['申請', '手続き', '方法', 'やり方']):
-            return 'application_process'
-        elif any(keyword in question_lower for keyword in ['要件', '条件', '対象']):
-            return 'requirements'
-        else:
-            return 'general'
+        """質問の意図を分析（共通の意図判定エンジンで1回走査）"""
+        return classify_intent(question_text, 'context_aware', default='general')
     
     def _generate_adoption_rate_response(self, target_subsidy):
         """採択率向上の回答"""
@@ -0,0 +1,102 @@
+# advisor/services/conversation_history.py - 会話履歴のページ送りとストリーミングエクスポート
+
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+from ..models import ConversationHistory
+
+HISTORY_PAGE_MAX_LIMIT = 200
+EXPORT_CHUNK_SIZE = 500
+
+# エクスポート時に取得する列（モデルを組み立てずタプルのまま書き出す）
+_EXPORT_FIELDS = ('id', 'timestamp', 'message_type', 'content', 'user__username')
+
+
+def encode_cursor(message):
+    """(timestamp, id) を URL に載せられる不透明なカーソル文字列に変換"""
+    raw = f'{message.timestamp.isoformat()}|{message.id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """encode_cursor の逆変換（不正な値は ValueError）"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, message_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(message_id)
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f'Invalid cursor: {cursor}') from e
+
+
+def serialize_message(message):
+    return {
+        'id': message.id,
+        'message_type': message.message_type,
+        'content': message.content,
+        'timestamp': message.timestamp.isoformat(),
+        'user': message.user.username if message.user else 'ゲスト',
+    }
+
+
+def history_page(session_id, limit=50, before=None):
+    """セッションの履歴を新しい順にキーセット方式で1ページ分取得
+
+    (timestamp, id) の降順で before カーソルより古いものを limit 件取り、
+    時系列順に並べ替えて返す。OFFSET を使わないため、古いページでも
+    (session_id, timestamp) インデックスを辿るだけで済む。
+
+    Returns:
+        (messages, next_cursor): next_cursor はさらに古い履歴があるときのみ
+    """
+    limit = max(1, min(limit, HISTORY_PAGE_MAX_LIMIT))
+    queryset = ConversationHistory.objects.filter(session_id=session_id)
+    if before:
+        timestamp, message_id = decode_cursor(before)
+        queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=message_id))
+
+    # 1件多く取得して次のページの有無を判定
+    rows = list(queryset.select_related('user').order_by('-timestamp', '-id')[:limit + 1])
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1]) if len(rows) > limit else None
+    return list(reversed(page)), next_cursor
+
+
+def _iter_export_rows(session_id):
+    """エクスポート用の行を DB カーソルから逐次取得（セッション全体をメモリに載せない）"""
+    rows = ConversationHistory.objects.filter(session_id=session_id).order_by('timestamp', 'id')
+    for message_id, timestamp, message_type, content, username in rows.values_list(*_EXPORT_FIELDS).iterator(
+            chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'id': message_id,
+            'timestamp': timestamp.isoformat(),
+            'message_type': message_type,
+            'content': content,
+            'user': username or 'ゲスト',
+        }
+
+
+def iter_session_json(session_id, exported_at, total_messages):
+    """セッションを1つの JSON ドキュメントとして少しずつ書き出す
+
+    形式は従来の export_session と同じ（session_id・exported_at・total_messages・messages）。
+    """
+    header = json.dumps({
+        'session_id': session_id,
+        'exported_at': exported_at.isoformat(),
+        'total_messages': total_messages,
+    }, ensure_ascii=False)
+    yield header[:-1] + ', "messages": [\n'
+    separator = ''
+    for row in _iter_export_rows(session_id):
+        yield f'{separator}  {json.dumps(row, ensure_ascii=False)}'
+        separator = ',\n'
+    yield '\n]}\n'
+
+
+def iter_session_ndjson(session_id):
+    """セッションのメッセージを1行1件の NDJSON として書き出す"""
+    for row in _iter_export_rows(session_id):
+        yield json.dumps(row, ensure_ascii=False) + '\n'
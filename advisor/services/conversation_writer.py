@@ -0,0 +1,217 @@
+# advisor/services/conversation_writer.py - 会話履歴の一括書き込み
+
+import atexit
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from ..models import ConversationHistory
+from .session_summary import record_messages
+
+
+def build_turn(session_id, user_message, assistant_response, intent_analysis=None, user_context=None, user=None):
+    """ユーザー発言とアシスタント回答の1ターン分を未保存のモデルとして組み立て
+
+    timestamp は組み立て時（submit 前）に確定させ、回答はユーザー発言より必ず後にする。
+    ライトビハインドで書き込みが遅れても、ターン間・ターン内の順序は変わらない。
+    """
+    assistant_response = assistant_response or {}
+    user_id = getattr(user, 'pk', None)
+    timestamp = timezone.now()
+    return [
+        ConversationHistory(
+            session_id=session_id,
+            user_id=user_id,
+            message_type='user',
+            content=user_message,
+            intent_analysis=intent_analysis or {},
+            user_context=user_context or {},
+            timestamp=timestamp,
+        ),
+        ConversationHistory(
+            session_id=session_id,
+            user_id=user_id,
+            message_type='assistant',
+            timestamp=timestamp + timedelta(microseconds=1),
+            content=assistant_response.get('answer', ''),
+            metadata={
+                'confidence_score': assistant_response.get('confidence_score', 0),
+                'recommended_subsidies': assistant_response.get('recommended_subsidies', []),
+                'model_used': assistant_response.get('model_used', 'unknown'),
+                'intent_detected': assistant_response.get('intent_detected', ''),
+                'context_utilized': assistant_response.get('context_utilized', False)
+            },
+        ),
+    ]
+
+
+def write_messages(messages):
+    """1トランザクション・1回の bulk_create で保存し、セッション集計にも反映
+
+    bulk_create は post_save を発行しないため record_messages を明示的に呼ぶ。
+    timestamp はモデル生成時（build_turn）に設定済みの値をそのまま保存する。
+    """
+    messages = list(messages)
+    if not messages:
+        return []
+    with transaction.atomic():
+        created = ConversationHistory.objects.bulk_create(messages)
+        record_messages(created)
+    return created
+
+
+class ConversationWriter:
+    """ライトビハインド方式の書き込みキュー
+
+    submit() はキューに積むだけで即座に戻り、バックグラウンドスレッドが
+    batch_size 件または flush_interval 秒ごとにまとめて write_messages する。
+    SQLite の書き込みロック待ちがチャット応答の待ち時間に含まれなくなる。
+    キューが満杯の場合は呼び出し元で同期書き込みする（取りこぼし防止）。
+    """
+
+    def __init__(self, batch_size=200, flush_interval=0.2, max_queue=5000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._stats = {'submitted': 0, 'written': 0, 'batches': 0, 'failed': 0, 'sync_fallbacks': 0}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='conversation-writer', daemon=True)
+        self._thread.start()
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def submit(self, messages):
+        """保存対象のメッセージ（同一ターン）をキューに積む"""
+        messages = list(messages)
+        if not messages:
+            return
+        self._count('submitted', len(messages))
+        if self._closed:
+            self._write(messages)
+            return
+        try:
+            self._queue.put_nowait(messages)
+        except queue.Full:
+            self._count('sync_fallbacks')
+            self._write(messages)
+
+    def _write(self, messages):
+        try:
+            write_messages(messages)
+            self._count('written', len(messages))
+            self._count('batches')
+        except Exception as e:
+            self._count('failed', len(messages))
+            print(f"Conversation write error: {e}")
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._queue.task_done()
+                break
+
+            batch = list(first)
+            taken = 1
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                taken += 1
+                if item is None:
+                    stop = True
+                    break
+                batch.extend(item)
+
+            close_old_connections()
+            self._write(batch)
+            for _ in range(taken):
+                self._queue.task_done()
+            if stop:
+                break
+        connection.close()
+
+    def flush(self):
+        """キュー内のメッセージがすべて書き込まれるまで待つ"""
+        if self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """残りを書き込んでスレッドを停止"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['pending'] = self._queue.qsize()
+        return stats
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_conversation_writer():
+    """ライトビハインドが有効ならプロセス共有の書き込みキューを返す（無効時は None）"""
+    global _writer
+    writer = _writer
+    if writer is not None:
+        return writer
+
+    config = getattr(settings, 'CONVERSATION_WRITE_BEHIND', {})
+    if not config.get('ENABLED', False):
+        return None
+
+    with _writer_lock:
+        if _writer is None:
+            _writer = ConversationWriter(
+                batch_size=config.get('BATCH_SIZE', 200),
+                flush_interval=config.get('FLUSH_INTERVAL', 0.2),
+                max_queue=config.get('MAX_QUEUE', 5000),
+            )
+            atexit.register(_writer.close)
+        return _writer
+
+
+def reset_conversation_writer():
+    """書き込みキューを停止して破棄（テスト・設定変更時用）"""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+        _writer = None
+
+
+def save_messages(messages):
+    """設定に応じて同期書き込みまたはライトビハインドで保存"""
+    writer = get_conversation_writer()
+    if writer is None:
+        return write_messages(messages)
+    writer.submit(messages)
+    return None
+
+
+def save_conversation_turn(session_id, user_message, assistant_response, intent_analysis=None,
+                           user_context=None, user=None):
+    """会話1ターン（ユーザー発言 + 回答）を保存"""
+    return save_messages(build_turn(
+        session_id, user_message, assistant_response, intent_analysis, user_context, user
+    ))
@@ -1,15 +1,22 @@
 # advisor/services/detailed_response_service.py
 
-import requests
 import json
 import re
 from datetime import datetime, date
 from django.conf import settings
 from ..models import SubsidyType, AdoptionStatistics, AdoptionTips
+from .subsidy_matcher import get_subsidy_matcher
+from .dify_client import get_dify_client
+from .response_cache import get_response_cache, make_cache_key
+from .embedding_index import semantic_search
+from .intent_engine import classify_intent
 
 class DetailedResponseService:
     """詳細で自然な回答を生成するAIサービス"""
     
+    # 意味検索で関連ありとみなす類似度の下限
+    SEMANTIC_MIN_SCORE = 0.3
+    
     def __init__(self):
         self.dify_api_url = settings.DIFY_API_URL
         self.dify_api_key = settings.DIFY_API_KEY
@@ -49,81 +56,48 @@ class DetailedResponseService:
         }
     
     def _analyze_intent(self, question_text):
-        """質問の意図を分析"""
-        question_lower = question_text.lower()
-        
-        # 採択率に関する質問
-        if any(keyword in question_lower for keyword in ['採択率', '通る確率', '成功率', '受かる', '採択']):
-            return 'adoption_rate'
-        
-        # 申請方法に関する質問
-        if any(keyword in question_lower for keyword in ['申請方法', '申請手順', '申請の仕方', 'やり方', '手続き']):
-            return 'application_process'
-        
-        # 要件・条件に関する質問
-        if any(keyword in question_lower for keyword in ['要件', '条件', '資格', '対象', '使える']):
-            return 'requirements'
-        
-        # 金額に関する質問
-        if any(keyword in question_lower for keyword in ['金額', '補助額', 'いくら', '最大', '上限']):
-            return 'amount'
-        
-        # 期間・スケジュールに関する質問
-        if any(keyword in keyword in question_lower for keyword in ['期間', 'いつ', '締切', '期限', 'スケジュール']):
-            return 'schedule'
-        
-        # 比較に関する質問
-        if any(keyword in question_lower for keyword in ['比較', '違い', 'どちら', 'どれ', '選び方']):
-            return 'comparison'
-        
-        # 成功のコツに関する質問
-        if any(keyword in question_lower for keyword in ['コツ', '秘訣', '成功', '通るため', 'ポイント']):
-            return 'success_tips'
-        
-        # 一般的な概要
-        return 'overview'
+        """質問の意図を分析（共通の意図判定エンジンで1回走査）"""
+        return classify_intent(question_text, 'detailed', default='overview')
     
     def _find_relevant_subsidies(self, question_text, user_context):
-        """関連する補助金を特定"""
+        """関連する補助金を特定（共通照合エンジン使用）"""
         subsidies = SubsidyType.objects.all()
         relevant = []
         
-        question_lower = question_text.lower()
         business_type = user_context.get('business_type', '') if user_context else ''
         company_size = user_context.get('company_size', '') if user_context else ''
         
+        # 質問を1回だけ走査して補助金ごとのヒットを集計
+        exact_names, match_scores = get_subsidy_matcher().scan(question_text)
+        
+        # 意味検索（名称が含まれない言い換えの質問にも対応）
+        semantic_scores = {
+            hit['object_id']: hit['score']
+            for hit in semantic_search(question_text, k=5, sources=('subsidy',), min_score=self.SEMANTIC_MIN_SCORE)
+        }
+        
         for subsidy in subsidies:
             score = 0
             
             # 名前での直接マッチ
-            if subsidy.name.lower().replace('補助金', '').replace('助成金', '') in question_lower:
+            if subsidy.name in exact_names:
                 score += 100
             
-            # キーワードマッチ
-            keywords = {
-                'it': ['IT', 'デジタル', 'システム', 'ソフト', 'アプリ'],
-                'manufacturing': ['ものづくり', '製造', '設備', '機械'],
-                'marketing': ['持続化', '販路', 'マーケティング', '宣伝', '広告'],
-                'restructuring': ['再構築', '転換', '新分野'],
-                'succession': ['承継', '引継ぎ', 'M&A'],
-                'startup': ['創業', 'スタートアップ', '起業'],
-                'energy': ['省エネ', 'エネルギー', '環境'],
-                'workstyle': ['働き方', 'テレワーク', '労働'],
-                'support': ['両立', '育児', '介護']
-            }
+            # エイリアス・キーワードマッチ
+            if subsidy.name in match_scores:
+                score += 50 + match_scores[subsidy.name]
             
-            for category, words in keywords.items():
-                if any(word in question_lower for word in words):
-                    if any(word in subsidy.name or word in subsidy.description for word in words):
-                        score += 50
+            # 意味的な近さ（類似度 0〜1 を最大40点に換算）
+            if subsidy.id in semantic_scores:
+                score += int(semantic_scores[subsidy.id] * 40)
             
             # 業種・企業規模での適合性
             if business_type:
-                if business_type in subsidy.target_business:
+                if business_type in subsidy.target_business_type:
                     score += 20
             
             if company_size:
-                if company_size in subsidy.target_business:
+                if company_size in subsidy.target_business_type:
                     score += 15
             
             if score > 0:
@@ -195,7 +169,7 @@ class DetailedResponseService:
         """Dify APIを使用して回答を生成"""
         try:
             # コンテキストを構築
-            context = self._build_rich_context(detailed_data, intent, user_context)
+            context = self._build_rich_context(detailed_data, intent, user_context, question_text)
             
             payload = {
                 'inputs': {
@@ -208,25 +182,23 @@ class DetailedResponseService:
                 'user': user_context.get('user_id', 'anonymous') if user_context else 'anonymous'
             }
             
-            response = requests.post(
-                f"{self.dify_api_url}/chat-messages",
-                headers=self.headers,
-                json=payload,
-                timeout=30
+            # 共通クライアント経由（接続再利用・リトライ・サーキットブレーカー）、回答キャッシュ付き
+            cache_key = make_cache_key(
+                'detailed_response', question_text,
+                subsidy=next(iter(detailed_data), None),  # 補助金名 → 詳細データ（関連度順）
+                intent=intent, context=user_context
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('answer', self._generate_enhanced_mock_response(question_text, user_context, detailed_data, intent))
-            else:
-                print(f"Dify API error: {response.status_code} - {response.text}")
-                return self._generate_enhanced_mock_response(question_text, user_context, detailed_data, intent)
+            result = get_response_cache().get_or_call(
+                cache_key,
+                lambda: get_dify_client(self.dify_api_url, self.dify_api_key).post('chat-messages', payload)
+            )
+            return result.get('answer', self._generate_enhanced_mock_response(question_text, user_context, detailed_data, intent))
                 
         except Exception as e:
             print(f"Dify API exception: {e}")
             return self._generate_enhanced_mock_response(question_text, user_context, detailed_data, intent)
     
-    def _build_rich_context(self, detailed_data, intent, user_context):
+    def _build_rich_context(self, detailed_data, intent, user_context, question_text=''):
         """Dify用の豊富なコンテキストを構築"""
         context_parts = []
         
@@ -277,8 +249,34 @@ class DetailedResponseService:
                     for tip in data['tips'][:3]:
                         context_parts.append(f"  ・{tip['title']}: {tip['content']}")
         
+        # 質問に意味的に近いティップス（補助金データに含まれないものを補足）
+        if question_text:
+            related_tips = self._find_related_tips(question_text, detailed_data)
+            if related_tips:
+                context_parts.append("\n=== 質問に関連するアドバイス ===")
+                for tip in related_tips:
+                    context_parts.append(f"・[{tip.subsidy_type.name}] {tip.title}: {tip.content}")
+        
         return '\n'.join(context_parts)
     
+    def _find_related_tips(self, question_text, detailed_data, limit=3):
+        """意味検索で質問に近いティップスを取得（詳細データに掲載済みのものは除く）"""
+        hits = semantic_search(question_text, k=limit * 2, sources=('tip',), min_score=self.SEMANTIC_MIN_SCORE)
+        if not hits:
+            return []
+        
+        listed = {
+            tip['title']
+            for data in detailed_data.values()
+            for tip in data.get('tips', [])[:3]
+        }
+        tips = AdoptionTips.objects.select_related('subsidy_type').in_bulk([hit['object_id'] for hit in hits])
+        related = [
+            tips[hit['object_id']] for hit in hits
+            if hit['object_id'] in tips and tips[hit['object_id']].title not in listed
+        ]
+        return related[:limit]
+    
     def _generate_enhanced_mock_response(self, question_text, user_context, detailed_data, intent):
         """強化されたモック回答を生成"""
         
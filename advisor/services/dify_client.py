@@ -0,0 +1,310 @@
+# advisor/services/dify_client.py - Dify API 共通クライアント
+
+import asyncio
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from .streaming import iter_dify_stream
+
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+def is_client_error(error):
+    """リトライしない HTTP エラー（4xx など）による失敗か
+
+    Dify 自体は応答しているため、post()・stream_chat() ともブレーカーには成功として記録する。
+    """
+    status_code = getattr(error, 'status_code', None)
+    if status_code is None:
+        status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status_code is not None and status_code not in RETRYABLE_STATUS
+
+
+class DifyClientError(Exception):
+    """Dify API 呼び出しの失敗"""
+
+
+class CircuitOpenError(DifyClientError):
+    """サーキットブレーカーが開いているため呼び出しを中止"""
+
+
+class CircuitBreaker:
+    """連続失敗が閾値を超えたら一定時間呼び出しを遮断する
+
+    closed → (連続失敗 failure_threshold 回) → open
+    open → (reset_timeout 秒経過) → half_open（1件だけ試行）
+    half_open → 成功で closed / 失敗で open / どちらでもなければ release() で次の試行を許可
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """呼び出しを許可するか"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._trial_in_flight = False
+            if self.state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def release(self):
+        """成否を判定できずに終わった呼び出しの後始末（half_open の試行枠を空ける）"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    print(f"[WARNING] Dify circuit opened after {self.failures} failures")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+class DifyClient:
+    """接続プール・リトライ・同時実行数制限・サーキットブレーカー付き Dify クライアント
+
+    requests.Session を共有して keep-alive で TCP/TLS ハンドシェイクを再利用する。
+    失敗時は None を返すので、呼び出し側は従来どおりテンプレート回答にフォールバックする。
+    """
+
+    def __init__(self, base_url, api_key, timeout=(5, 30), max_retries=2, backoff=0.5,
+                 max_concurrency=8, acquire_timeout=5.0, breaker=None, total_timeout=40.0):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.timeout = timeout
+        # リトライ・バックオフを含めた1回の呼び出し全体の上限（秒）
+        self.total_timeout = total_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.acquire_timeout = acquire_timeout
+        self.breaker = breaker or CircuitBreaker()
+
+        self.headers = {
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        }
+
+        # リトライは自前で行うため urllib3 側のリトライは無効化
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'successes': 0, 'failures': 0, 'retries': 0, 'rejected': 0}
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _sleep_before_retry(self, attempt, remaining):
+        """指数バックオフ + ジッター（全体の残り時間を超えない）"""
+        time.sleep(min(random.uniform(0, self.backoff * (2 ** attempt)), max(remaining, 0)))
+
+    def _attempt_timeout(self, timeout, remaining):
+        """(接続, 読み取り) タイムアウトを全体の残り時間で切り詰める"""
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        return (min(connect, remaining), min(read, remaining))
+
+    def _acquire(self):
+        if not self.breaker.allow():
+            self._count('rejected')
+            raise CircuitOpenError('Dify circuit is open')
+        if not self._semaphore.acquire(timeout=self.acquire_timeout):
+            # 同時実行数の上限は Dify の状態と無関係なので、試行枠だけ返す
+            self.breaker.release()
+            self._count('rejected')
+            raise DifyClientError('Dify concurrency limit reached')
+
+    def post(self, path, payload, timeout=None):
+        """POST してJSONを返す（5xx・タイムアウトはリトライ、最終的な失敗は例外）
+
+        リトライを含めて total_timeout 秒で打ち切る。どの経路で終わっても
+        ブレーカーに結果を記録する（記録できなければ試行枠を返す）。
+        """
+        self._acquire()
+        self._count('requests')
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        deadline = time.monotonic() + self.total_timeout
+        settled = False
+
+        try:
+            last_error = DifyClientError('Dify request deadline exceeded')
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._count('retries')
+                    self._sleep_before_retry(attempt - 1, remaining)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    response = self.session.post(
+                        url, headers=self.headers, json=payload,
+                        timeout=self._attempt_timeout(timeout or self.timeout, remaining)
+                    )
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    last_error = DifyClientError(f"{type(e).__name__}: {e}")
+                    continue
+
+                if response.status_code == 200:
+                    try:
+                        data = response.json()
+                    except ValueError as e:
+                        last_error = DifyClientError(f"Invalid JSON response: {e}")
+                        break
+                    self.breaker.record_success()
+                    settled = True
+                    self._count('successes')
+                    return data
+
+                last_error = DifyClientError(f"{response.status_code} - {response.text[:200]}")
+                last_error.status_code = response.status_code
+                if is_client_error(last_error):
+                    # 4xx はリクエスト側の問題（Dify 自体は応答している）なのでリトライせず、
+                    # ブレーカーには成功として記録する
+                    self.breaker.record_success()
+                    settled = True
+                    self._count('failures')
+                    raise last_error
+
+            self.breaker.record_failure()
+            settled = True
+            self._count('failures')
+            raise last_error
+        finally:
+            if not settled:
+                self.breaker.release()
+            self._semaphore.release()
+
+    def chat(self, query, user, inputs=None, timeout=None):
+        """chat-messages を blocking モードで呼び出し（失敗時は None）"""
+        payload = {
+            'inputs': inputs or {},
+            'query': query,
+            'response_mode': 'blocking',
+            'user': user
+        }
+        try:
+            return self.post('chat-messages', payload, timeout=timeout)
+        except DifyClientError as e:
+            print(f"Dify API error: {e}")
+            return None
+
+    def stream_chat(self, query, user, inputs=None, timeout=None):
+        """chat-messages を streaming モードで呼び出し、回答断片を順に返す"""
+        self._acquire()
+        self._count('requests')
+        payload = {'inputs': inputs or {}, 'query': query, 'user': user}
+
+        settled = False
+        try:
+            for chunk in iter_dify_stream(
+                f"{self.base_url}/chat-messages", self.headers, payload,
+                timeout=timeout or self.timeout, session=self.session
+            ):
+                yield chunk
+        except Exception as e:
+            if is_client_error(e):
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+            settled = True
+            self._count('failures')
+            raise
+        else:
+            self.breaker.record_success()
+            settled = True
+            self._count('successes')
+        finally:
+            # 呼び出し側が途中で読むのをやめた（GeneratorExit）場合も試行枠を返す
+            if not settled:
+                self.breaker.release()
+            self._semaphore.release()
+
+    async def achat(self, query, user, inputs=None, timeout=None):
+        """chat() の asyncio 版（同時実行数は同じセマフォで制限）"""
+        return await asyncio.to_thread(self.chat, query, user, inputs, timeout)
+
+    async def achat_many(self, queries, user, timeout=None):
+        """複数クエリを並行して問い合わせ（結果はクエリ順）"""
+        return await asyncio.gather(*(self.achat(query, user, timeout=timeout) for query in queries))
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['circuit_state'] = self.breaker.state
+        return stats
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_dify_client(base_url=None, api_key=None):
+    """プロセス共有の Dify クライアントを取得（URL・APIキーごとに1つ）"""
+    base_url = base_url if base_url is not None else getattr(settings, 'DIFY_API_URL', '')
+    api_key = api_key if api_key is not None else getattr(settings, 'DIFY_API_KEY', '')
+    key = (base_url, api_key)
+
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = DifyClient(
+                base_url,
+                api_key,
+                timeout=(
+                    getattr(settings, 'DIFY_CONNECT_TIMEOUT', 5),
+                    getattr(settings, 'DIFY_READ_TIMEOUT', 30),
+                ),
+                max_retries=getattr(settings, 'DIFY_MAX_RETRIES', 2),
+                max_concurrency=getattr(settings, 'DIFY_MAX_CONCURRENCY', 8),
+                total_timeout=getattr(settings, 'DIFY_TOTAL_TIMEOUT', 40),
+                breaker=CircuitBreaker(
+                    failure_threshold=getattr(settings, 'DIFY_CIRCUIT_FAILURE_THRESHOLD', 5),
+                    reset_timeout=getattr(settings, 'DIFY_CIRCUIT_RESET_TIMEOUT', 30),
+                ),
+            )
+            _clients[key] = client
+        return client
+
+
+def reset_dify_clients():
+    """共有クライアントを破棄（テスト・設定変更時用）"""
+    with _clients_lock:
+        for client in _clients.values():
+            client.session.close()
+        _clients.clear()
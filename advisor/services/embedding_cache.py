@@ -0,0 +1,319 @@
+# advisor/services/embedding_cache.py - 質問ベクトルの永続キャッシュ
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .embeddings import get_text_encoder
+from .text_normalization import normalize_text
+
+# この件数を書き込むごとにディスク上の件数上限を確認する
+PRUNE_INTERVAL = 500
+# last_used はこの秒数より古い場合のみ更新する（件数上限での削除順に使うだけなので粗くてよい）
+TOUCH_INTERVAL = 3600
+# last_used の更新はこの秒数ごと（またはこの件数ごと）にまとめて書き込む
+TOUCH_FLUSH_INTERVAL = 30
+TOUCH_FLUSH_ENTRIES = 500
+
+
+def question_key(text):
+    """キャッシュキー（正規化した質問のハッシュ）
+
+    NLPAIAdvisorService._normalize_text と同じ normalize_text を使うので、
+    全角・半角、大文字・小文字、記号・空白だけが違う質問は同じキーになる。
+    """
+    return hashlib.sha1(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+class QueryEmbeddingCache:
+    """質問ベクトルのキャッシュ（プロセス内 LRU + SQLite ファイル）
+
+    SQLite ファイルは WAL モードで開くため、同じパスを指す複数のワーカープロセスで
+    共有できる。キャッシュにない質問はまとめて1回の encode() で計算する。
+    path が None の場合はプロセス内 LRU のみ。
+
+    ディスク上の last_used（件数上限での削除順）は、プロセス内 LRU のヒットも含めて
+    TOUCH_INTERVAL 秒より古くなった行だけを記録し、TOUCH_FLUSH_INTERVAL 秒ごとにまとめて更新する。
+    """
+
+    def __init__(self, path=None, memory_entries=2048, max_entries=100000):
+        self.path = Path(path) if path else None
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        self._disk_enabled = self.path is not None
+        self._writes_since_prune = 0
+        self._pending_touches = {}
+        self._touches_flushed_at = time.monotonic()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'encoded_batches': 0}
+
+    # --- SQLite -------------------------------------------------------------
+
+    def _connect(self):
+        """接続を取得（fork 後は子プロセスで開き直す）。ロック内で呼ぶ"""
+        if not self._disk_enabled:
+            return None
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=5, check_same_thread=False, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS query_embeddings ('
+                ' encoder TEXT NOT NULL, key TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL,'
+                ' PRIMARY KEY (encoder, key)) WITHOUT ROWID'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS query_embeddings_last_used ON query_embeddings (last_used)'
+            )
+        except (OSError, sqlite3.Error) as e:
+            self._disable_disk(e)
+            return None
+
+        self._connection = connection
+        self._pid = os.getpid()
+        return connection
+
+    def _disable_disk(self, error):
+        # ディスクが使えない場合はプロセス内キャッシュだけで継続
+        print(f"[WARNING] QueryEmbeddingCache: ディスクキャッシュを無効化します ({error})")
+        self._disk_enabled = False
+        self._connection = None
+
+    def _read(self, encoder, keys, dimension):
+        connection = self._connect()
+        if connection is None or not keys:
+            return {}
+
+        found = {}
+        try:
+            # SQLite のパラメータ上限を超えないよう分割して取得
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = connection.execute(
+                    'SELECT key, vector, last_used FROM query_embeddings '
+                    f'WHERE encoder = ? AND key IN ({placeholders})',
+                    [encoder, *chunk],
+                ).fetchall()
+                for key, blob, last_used in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    if vector.shape == (dimension,):
+                        found[key] = (vector, last_used)
+        except sqlite3.Error as e:
+            print(f"[WARNING] QueryEmbeddingCache: 読み込み失敗 ({e})")
+        return found
+
+    def _write(self, encoder, vectors):
+        connection = self._connect()
+        if connection is None or not vectors:
+            return
+
+        now = time.time()
+        try:
+            connection.executemany(
+                'INSERT OR REPLACE INTO query_embeddings (encoder, key, vector, last_used) VALUES (?, ?, ?, ?)',
+                [(encoder, key, vector.astype(np.float32).tobytes(), now) for key, vector in vectors.items()],
+            )
+            self._writes_since_prune += len(vectors)
+            if self._writes_since_prune >= PRUNE_INTERVAL:
+                self._writes_since_prune = 0
+                self._prune(connection)
+        except sqlite3.Error as e:
+            print(f"[WARNING] QueryEmbeddingCache: 書き込み失敗 ({e})")
+
+    def _touch(self, memory_key, last_used, now):
+        """last_used が古ければ更新対象に加える（書き込みは _flush_touches でまとめて行う）"""
+        if not self._disk_enabled or now - last_used < TOUCH_INTERVAL:
+            return last_used
+        self._pending_touches[memory_key] = now
+        return now
+
+    def _flush_touches(self, force=False):
+        """記録した last_used をまとめて書き込む。ロック内で呼ぶ"""
+        if not self._pending_touches:
+            return
+        if not force and len(self._pending_touches) < TOUCH_FLUSH_ENTRIES and \
+                time.monotonic() - self._touches_flushed_at < TOUCH_FLUSH_INTERVAL:
+            return
+        touches, self._pending_touches = self._pending_touches, {}
+        self._touches_flushed_at = time.monotonic()
+        connection = self._connect()
+        if connection is None:
+            return
+        try:
+            connection.executemany(
+                'UPDATE query_embeddings SET last_used = ? WHERE encoder = ? AND key = ?',
+                [(used_at, encoder, key) for (encoder, key), used_at in touches.items()],
+            )
+        except sqlite3.Error as e:
+            print(f"[WARNING] QueryEmbeddingCache: 最終利用日時の更新失敗 ({e})")
+
+    def _prune(self, connection):
+        """件数上限を超えた分を最終利用の古い順に削除"""
+        self._flush_touches(force=True)
+        count = connection.execute('SELECT COUNT(*) FROM query_embeddings').fetchone()[0]
+        if count > self.max_entries:
+            connection.execute(
+                'DELETE FROM query_embeddings WHERE (encoder, key) IN ('
+                ' SELECT encoder, key FROM query_embeddings ORDER BY last_used LIMIT ?)',
+                [count - self.max_entries],
+            )
+
+    # --- プロセス内 LRU -----------------------------------------------------
+
+    def _remember(self, memory_key, vector, last_used):
+        self._memory[memory_key] = (vector, last_used)
+        self._memory.move_to_end(memory_key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # --- 公開API ------------------------------------------------------------
+
+    def encode(self, texts, encoder=None):
+        """質問のベクトル（行列）を取得。キャッシュにないものだけまとめて計算する
+
+        同じキーの質問は最初にエンコードした表記のベクトルを共有する。
+        """
+        encoder = encoder or get_text_encoder()
+        texts = list(texts)
+        keys = [question_key(text) for text in texts]
+        result = np.zeros((len(texts), encoder.dimension), dtype=np.float32)
+
+        now = time.time()
+        with self._lock:
+            vectors = {}
+            for key in keys:
+                memory_key = (encoder.name, key)
+                entry = self._memory.get(memory_key)
+                if entry is not None:
+                    vector, last_used = entry
+                    self._memory[memory_key] = (vector, self._touch(memory_key, last_used, now))
+                    self._memory.move_to_end(memory_key)
+                    vectors[key] = vector
+            self._stats['memory_hits'] += sum(1 for key in keys if key in vectors)
+
+            pending = list(dict.fromkeys(key for key in keys if key not in vectors))
+            found = self._read(encoder.name, pending, encoder.dimension)
+            for key, (vector, last_used) in found.items():
+                memory_key = (encoder.name, key)
+                self._remember(memory_key, vector, self._touch(memory_key, last_used, now))
+                vectors[key] = vector
+            self._stats['disk_hits'] += sum(1 for key in keys if key in found)
+            self._flush_touches()
+
+        # ミス分を1回のバッチで計算（モデル推論中はロックを持たない）
+        misses = {}
+        for text, key in zip(texts, keys):
+            if key not in vectors and key not in misses:
+                misses[key] = text
+        if misses:
+            encoded = encoder.encode(list(misses.values()))
+            computed = dict(zip(misses, np.asarray(encoded, dtype=np.float32)))
+            with self._lock:
+                self._stats['misses'] += sum(1 for key in keys if key in computed)
+                self._stats['encoded_batches'] += 1
+                for key, vector in computed.items():
+                    self._remember((encoder.name, key), vector, now)
+                self._write(encoder.name, computed)
+            vectors.update(computed)
+
+        for row, key in enumerate(keys):
+            result[row] = vectors[key]
+        return result
+
+    def clear(self):
+        """プロセス内・ディスク上のキャッシュを破棄"""
+        with self._lock:
+            self._memory.clear()
+            self._pending_touches.clear()
+            connection = self._connect()
+            if connection is not None:
+                try:
+                    connection.execute('DELETE FROM query_embeddings')
+                except sqlite3.Error as e:
+                    print(f"[WARNING] QueryEmbeddingCache: 削除失敗 ({e})")
+
+    def close(self):
+        with self._lock:
+            if self._disk_enabled:
+                self._flush_touches(force=True)
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 3) if lookups else 0.0
+        stats['path'] = str(self.path) if self._disk_enabled else None
+        return stats
+
+
+class NullQueryEmbeddingCache(QueryEmbeddingCache):
+    """キャッシュ無効時のダミー（常にエンコーダーで計算）"""
+
+    def __init__(self):
+        super().__init__(path=None, memory_entries=0)
+
+    def encode(self, texts, encoder=None):
+        encoder = encoder or get_text_encoder()
+        return encoder.encode(list(texts))
+
+
+_query_cache = None
+_query_cache_lock = threading.Lock()
+
+
+def _build_query_cache():
+    config = getattr(settings, 'EMBEDDING_QUERY_CACHE', {})
+    if not config.get('ENABLED', True):
+        return NullQueryEmbeddingCache()
+    return QueryEmbeddingCache(
+        config.get('PATH') or None,
+        memory_entries=config.get('MEMORY_ENTRIES', 2048),
+        max_entries=config.get('MAX_ENTRIES', 100000),
+    )
+
+
+def get_query_embedding_cache():
+    """プロセス共有の質問ベクトルキャッシュを取得"""
+    global _query_cache
+    cache = _query_cache
+    if cache is not None:
+        return cache
+
+    with _query_cache_lock:
+        if _query_cache is None:
+            _query_cache = _build_query_cache()
+        return _query_cache
+
+
+def reset_query_embedding_cache():
+    """設定を読み直して再構築（テスト・設定変更時用）"""
+    global _query_cache
+    with _query_cache_lock:
+        if _query_cache is not None:
+            _query_cache.close()
+        _query_cache = None
+
+
+def encode_queries(texts, encoder=None):
+    """質問をベクトル化（キャッシュ経由）"""
+    return get_query_embedding_cache().encode(texts, encoder)
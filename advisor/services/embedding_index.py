@@ -0,0 +1,472 @@
+# advisor/services/embedding_index.py - 補助金・ティップスの意味検索インデックス
+
+import hashlib
+import heapq
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .embedding_cache import encode_queries
+from .embeddings import get_text_encoder
+from .snapshot_version import reload_interval
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+VECTORS_FILE = 'vectors.npy'
+META_FILE = 'meta.json'
+FAISS_FILE = 'index.faiss'
+
+SOURCES = ('subsidy', 'tip')
+
+
+def make_key(source, object_id):
+    return f'{source}:{object_id}'
+
+
+def parse_key(key):
+    source, object_id = key.split(':', 1)
+    return source, int(object_id)
+
+
+def file_version(directory):
+    """保存済みインデックスの版（メタデータファイルの inode・更新時刻。無ければ None）
+
+    save() はメタデータを最後に os.replace で置き換えるため、保存のたびに変わる。
+    """
+    try:
+        stat = os.stat(Path(directory) / META_FILE)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def subsidy_document(subsidy):
+    return f'{subsidy.name}\n{subsidy.description}\n{subsidy.requirements}'
+
+
+def tip_document(tip):
+    return f'{tip.subsidy_type.name} {tip.title}\n{tip.content}'
+
+
+def iter_documents(source=None, ids=None):
+    """インデックス対象の (キー, テキスト) を列挙（有効な補助金とそのティップス）"""
+    from ..models import SubsidyType, AdoptionTips
+
+    if source in (None, 'subsidy'):
+        subsidies = SubsidyType.objects.filter(is_active=True).order_by('id')
+        if ids is not None:
+            subsidies = subsidies.filter(id__in=ids)
+        for subsidy in subsidies.iterator():
+            yield make_key('subsidy', subsidy.id), subsidy_document(subsidy)
+
+    if source in (None, 'tip'):
+        tips = AdoptionTips.objects.filter(subsidy_type__is_active=True).select_related('subsidy_type').order_by('id')
+        if ids is not None:
+            tips = tips.filter(id__in=ids)
+        for tip in tips.iterator():
+            yield make_key('tip', tip.id), tip_document(tip)
+
+
+class EmbeddingIndex:
+    """正規化済みベクトルの内積（= コサイン類似度）による近傍検索
+
+    ベースのベクトルはディスク上の .npy をメモリマップで読み、FAISS が使える場合は
+    Flat（件数が多い場合は IVF）インデックスで検索する。使えない場合は NumPy の
+    行列積で全件検索する。行の追加・更新は差分として保持し（ベース側の旧行は
+    削除扱い）、save() 時にまとめて書き直す。
+
+    encoder=None は未構築を表す空のインデックスで、検索は常に結果なし（エンコーダーを読み込まない）。
+    """
+
+    def __init__(self, encoder, keys=(), vectors=None, hashes=None, use_faiss=True, ivf_threshold=20000,
+                 faiss_index=None):
+        self.encoder = encoder
+        self.dimension = encoder.dimension if encoder is not None else 0
+        self.use_faiss = use_faiss and faiss is not None
+        self.ivf_threshold = ivf_threshold
+
+        self._keys = list(keys)
+        self._vectors = vectors if vectors is not None else np.zeros((0, self.dimension), dtype=np.float32)
+        self._hashes = dict(hashes or {})
+        self._positions = {key: row for row, key in enumerate(self._keys)}
+        self._deleted = set()
+        self._delta = {}
+        self._faiss = faiss_index
+        self._lock = threading.RLock()
+        self.dirty = False
+        # 読み込み・保存したファイルの版（他プロセスの保存を検知して読み直すため）
+        self.file_version = None
+
+    def __len__(self):
+        return len(self._keys) - len(self._deleted) + len(self._delta)
+
+    def __contains__(self, key):
+        return key in self._delta or (key in self._positions and self._positions[key] not in self._deleted)
+
+    # --- 構築・更新 ---------------------------------------------------------
+
+    @classmethod
+    def build(cls, documents, encoder=None, batch_size=256, **kwargs):
+        """(キー, テキスト) の列から一括構築"""
+        encoder = encoder or get_text_encoder()
+        keys, hashes, chunks = [], {}, []
+        batch = []
+
+        def flush():
+            chunks.append(encoder.encode([text for _, text in batch]))
+            batch.clear()
+
+        for key, text in documents:
+            keys.append(key)
+            hashes[key] = text_hash(text)
+            batch.append((key, text))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        vectors = np.vstack(chunks) if chunks else np.zeros((0, encoder.dimension), dtype=np.float32)
+        index = cls(encoder, keys, np.ascontiguousarray(vectors, dtype=np.float32), hashes, **kwargs)
+        index.dirty = True
+        return index
+
+    def upsert(self, documents):
+        """追加・更新（テキストが変わっていない行は再計算しない）
+
+        Returns:
+            int: 再計算した件数
+        """
+        changed = [(key, text) for key, text in documents if self._hashes.get(key) != text_hash(text)
+                   or key not in self]
+        if not changed:
+            return 0
+
+        vectors = self.encoder.encode([text for _, text in changed])
+        with self._lock:
+            for (key, text), vector in zip(changed, vectors):
+                row = self._positions.get(key)
+                if row is not None:
+                    self._deleted.add(row)
+                self._delta[key] = vector
+                self._hashes[key] = text_hash(text)
+            self.dirty = True
+        return len(changed)
+
+    def remove(self, keys):
+        """削除（存在しないキーは無視）"""
+        removed = 0
+        with self._lock:
+            for key in keys:
+                if self._delta.pop(key, None) is not None:
+                    removed += 1
+                row = self._positions.get(key)
+                if row is not None and row not in self._deleted:
+                    self._deleted.add(row)
+                    removed += 1
+                self._hashes.pop(key, None)
+            if removed:
+                self.dirty = True
+        return removed
+
+    def hashes(self):
+        return dict(self._hashes)
+
+    # --- 検索 ---------------------------------------------------------------
+
+    def _faiss_index(self):
+        if not self.use_faiss or not len(self._keys):
+            return None
+        if self._faiss is None:
+            with self._lock:
+                if self._faiss is None:
+                    self._faiss = self._train_faiss(np.ascontiguousarray(self._vectors, dtype=np.float32))
+        return self._faiss
+
+    def _train_faiss(self, vectors):
+        count = len(vectors)
+        if count >= self.ivf_threshold:
+            nlist = int(np.sqrt(count))
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            index = faiss.IndexIVFFlat(quantizer, self.dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+            index.nprobe = max(1, nlist // 8)
+        else:
+            index = faiss.IndexFlatIP(self.dimension)
+        index.add(vectors)
+        return index
+
+    def _search_base(self, query, fetch):
+        """ベース部分の上位 fetch 件 [(スコア, 行番号)]"""
+        count = len(self._keys)
+        if count == 0 or fetch <= 0:
+            return []
+        fetch = min(fetch, count)
+        index = self._faiss_index()
+        if index is not None:
+            scores, rows = index.search(query.reshape(1, -1), fetch)
+            return [(float(score), int(row)) for score, row in zip(scores[0], rows[0]) if row >= 0]
+
+        scores = self._vectors @ query
+        if fetch < count:
+            rows = np.argpartition(-scores, fetch - 1)[:fetch]
+        else:
+            rows = np.arange(count)
+        return [(float(scores[row]), int(row)) for row in rows]
+
+    def search_vector(self, query, k=5, sources=None):
+        """クエリベクトルで検索 [(キー, スコア)]（スコア降順）"""
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        with self._lock:
+            deleted = set(self._deleted)
+            delta = dict(self._delta)
+
+        results = []
+        fetch = k + len(deleted)
+        while True:
+            hits = self._search_base(query, fetch)
+            results = [
+                (self._keys[row], score) for score, row in hits
+                if row not in deleted and (sources is None or self._keys[row].split(':', 1)[0] in sources)
+            ]
+            # ソース絞り込みで不足する場合は取得件数を増やして再検索
+            if len(results) >= k or fetch >= len(self._keys):
+                break
+            fetch *= 4
+
+        for key, vector in delta.items():
+            if sources is None or key.split(':', 1)[0] in sources:
+                results.append((key, float(vector @ query)))
+        return heapq.nlargest(k, results, key=lambda item: item[1])
+
+    def search(self, text, k=5, sources=None):
+        """テキストで検索 [(キー, スコア)]"""
+        if not len(self):
+            return []
+        return self.search_vector(encode_queries([text], self.encoder)[0], k=k, sources=sources)
+
+    # --- 永続化 -------------------------------------------------------------
+
+    def save(self, directory):
+        """差分を取り込んだベクトル・メタデータ（と FAISS インデックス）を原子的に書き出す"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            live_rows = [row for row in range(len(self._keys)) if row not in self._deleted]
+            keys = [self._keys[row] for row in live_rows] + list(self._delta)
+            parts = [np.asarray(self._vectors[live_rows], dtype=np.float32)] if live_rows else []
+            if self._delta:
+                parts.append(np.vstack(list(self._delta.values())).astype(np.float32, copy=False))
+            vectors = np.vstack(parts) if parts else np.zeros((0, self.dimension), dtype=np.float32)
+            hashes = {key: self._hashes[key] for key in keys}
+
+            meta = {
+                'encoder': self.encoder.name,
+                'dimension': self.dimension,
+                'keys': keys,
+                'hashes': hashes,
+                'built_at': time.time(),
+            }
+            faiss_index = self._train_faiss(vectors) if self.use_faiss and len(keys) else None
+
+            def write(name, writer):
+                # 複数のワーカーが同時に保存しても一時ファイルが衝突しないようにする
+                tmp = directory / f'{name}.{os.getpid()}.tmp'
+                writer(tmp)
+                os.replace(tmp, directory / name)
+
+            def write_vectors(path):
+                with open(path, 'wb') as f:
+                    np.save(f, vectors)
+
+            def write_meta(path):
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(meta, f, ensure_ascii=False)
+
+            write(VECTORS_FILE, write_vectors)
+            if faiss_index is not None:
+                write(FAISS_FILE, lambda path: faiss.write_index(faiss_index, str(path)))
+            elif (directory / FAISS_FILE).exists():
+                (directory / FAISS_FILE).unlink()
+            # メタデータを最後に置き換える（読み込み側はメタデータの件数で整合性を確認）
+            write(META_FILE, write_meta)
+
+            self._keys = keys
+            self._vectors = vectors
+            self._positions = {key: row for row, key in enumerate(keys)}
+            self._deleted = set()
+            self._delta = {}
+            self._faiss = faiss_index
+            self.dirty = False
+            self.file_version = file_version(directory)
+        return len(keys)
+
+    @classmethod
+    def load(cls, directory, encoder=None, mmap=True, **kwargs):
+        """保存済みインデックスを読み込む（ベクトルはメモリマップ）。無い・不整合なら None
+
+        インデックスが無い場合はエンコーダーを読み込まずに返る。
+        """
+        directory = Path(directory)
+        if not (directory / META_FILE).exists() or not (directory / VECTORS_FILE).exists():
+            return None
+        encoder = encoder or get_text_encoder()
+        try:
+            with open(directory / META_FILE, encoding='utf-8') as f:
+                meta = json.load(f)
+            vectors = np.load(directory / VECTORS_FILE, mmap_mode='r' if mmap else None)
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] EmbeddingIndex: 読み込み失敗 ({e})")
+            return None
+
+        if meta.get('encoder') != encoder.name or vectors.shape != (len(meta['keys']), encoder.dimension):
+            print(f"[WARNING] EmbeddingIndex: エンコーダーまたは件数が一致しません。再構築してください "
+                  f"({meta.get('encoder')} / {encoder.name})")
+            return None
+
+        faiss_index = None
+        use_faiss = kwargs.pop('use_faiss', True)
+        if use_faiss and faiss is not None and (directory / FAISS_FILE).exists():
+            try:
+                faiss_index = faiss.read_index(str(directory / FAISS_FILE), faiss.IO_FLAG_MMAP)
+            except Exception as e:
+                print(f"[WARNING] EmbeddingIndex: FAISS インデックス読み込み失敗 ({e})")
+
+        index = cls(encoder, meta['keys'], vectors, meta.get('hashes'), use_faiss=use_faiss,
+                    faiss_index=faiss_index, **kwargs)
+        index.file_version = file_version(directory)
+        return index
+
+
+_index = None
+_index_expires_at = 0.0
+_index_lock = threading.Lock()
+
+
+def _index_config():
+    return getattr(settings, 'EMBEDDING_INDEX', {})
+
+
+def index_directory():
+    return Path(_index_config().get('DIRECTORY', Path(settings.BASE_DIR) / 'var' / 'embedding_index'))
+
+
+def index_options():
+    config = _index_config()
+    return {
+        'use_faiss': config.get('BACKEND', 'auto') != 'numpy',
+        'ivf_threshold': config.get('IVF_THRESHOLD', 20000),
+    }
+
+
+def _current_index(check=False):
+    """読み込み済みのインデックス（ファイルが他プロセスで保存されていれば読み直す）"""
+    global _index, _index_expires_at
+    with _index_lock:
+        if _index is not None and not check and time.monotonic() < _index_expires_at:
+            return _index
+        directory = index_directory()
+        if _index is None or _index.file_version != file_version(directory):
+            loaded = EmbeddingIndex.load(directory, **index_options())
+            if loaded is not None:
+                _index = loaded
+            elif _index is None:
+                _index = EmbeddingIndex(None, **index_options())
+        _index_expires_at = time.monotonic() + reload_interval()
+        return _index
+
+
+def get_embedding_index():
+    """プロセス共有のインデックスを取得（初回のみディスクから読み込み）
+
+    インデックスはオフラインで構築する（build_embedding_index）。
+    未構築の場合はエンコーダーを持たない空のインデックスを返し、意味検索は結果なしになる。
+    SNAPSHOT_RELOAD_INTERVAL 秒ごとにファイルの版を確認し、他プロセスの保存
+    （build_embedding_index・シグナルによる差分更新）を取り込む。
+    """
+    index = _index
+    if index is not None and time.monotonic() < _index_expires_at:
+        return index
+    return _current_index()
+
+
+def preload_embedding_index():
+    """ワーカー起動時にインデックスとエンコーダーを読み込む（EMBEDDING_INDEX['PRELOAD']、既定で有効）
+
+    最初の意味検索のリクエストでモデル読み込みを待たせないようにする。
+    """
+    if _index_config().get('PRELOAD', True):
+        get_embedding_index()
+
+
+def reset_embedding_index():
+    """読み込み済みインデックスを破棄（テスト・再構築後用）"""
+    global _index, _index_expires_at
+    with _index_lock:
+        _index = None
+        _index_expires_at = 0.0
+
+
+def semantic_search(text, k=5, sources=None, min_score=0.0):
+    """意味的に近い補助金・ティップス
+
+    Returns:
+        list[dict]: [{'source': 'subsidy' | 'tip', 'object_id': int, 'score': float}, ...]
+    """
+    try:
+        hits = get_embedding_index().search(text, k=k, sources=sources)
+    except Exception as e:
+        print(f"Semantic search error: {e}")
+        return []
+    results = []
+    for key, score in hits:
+        if score < min_score:
+            continue
+        source, object_id = parse_key(key)
+        results.append({'source': source, 'object_id': object_id, 'score': score})
+    return results
+
+
+def refresh_documents(source, object_ids):
+    """行の変更を読み込み済みインデックスへ反映し、ファイルにも保存（未読み込みなら何もしない）
+
+    他のワーカーは get_embedding_index() の定期確認で保存後のファイルを読み直す。
+    保存前にファイルの版を確認し、他プロセスの保存を取り込んでから差分を適用する。
+    """
+    if _index is None or _index.encoder is None or not _index_config().get('AUTO_UPDATE', True):
+        return
+    index = _current_index(check=True)
+    # 未構築（エンコーダー無し）のインデックスは build_embedding_index で作る
+    if index.encoder is None:
+        return
+    object_ids = list(object_ids)
+    documents = list(iter_documents(source, ids=object_ids))
+    present = {key for key, _ in documents}
+    try:
+        index.upsert(documents)
+        index.remove(make_key(source, object_id) for object_id in object_ids
+                     if make_key(source, object_id) not in present)
+        if index.dirty:
+            index.save(index_directory())
+    except Exception as e:
+        print(f"Embedding index update error: {e}")
+
+
+def schedule_document_refresh(source, object_id):
+    """コミット後にインデックスの該当行を更新する（シグナル用）"""
+    if _index is None or _index.encoder is None:
+        return
+    transaction.on_commit(lambda: refresh_documents(source, [object_id]))
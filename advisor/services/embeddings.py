@@ -0,0 +1,114 @@
+# advisor/services/embeddings.py - テキスト埋め込みエンコーダー
+
+import threading
+import zlib
+
+import numpy as np
+from django.conf import settings
+
+from .text_normalization import get_tokenizer, normalize_text
+
+
+class HashingEncoder:
+    """文字 n-gram のハッシュによる埋め込み（モデル不要のフォールバック）
+
+    sentence-transformers が使えない環境でも、日本語の表記ゆれに比較的強い
+    文字2-gram・3-gram の重なりで近さを測れる。
+    形態素解析器（Janome）を渡した場合は、内容語の基本形も特徴に加える。
+    """
+
+    def __init__(self, dimension=512, ngram_range=(2, 3), tokenizer=None):
+        self.dimension = dimension
+        self.ngram_range = ngram_range
+        self.tokenizer = tokenizer
+        self.name = f'hashing-{dimension}-{ngram_range[0]}-{ngram_range[1]}'
+        if tokenizer is not None:
+            self.name += f'-{tokenizer.name}'
+
+    def _hashed(self, feature):
+        digest = zlib.crc32(feature.encode('utf-8'))
+        return digest % self.dimension, 1.0 if digest & 0x80000000 else -1.0
+
+    def _features(self, text):
+        normalized = normalize_text(text)
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(normalized) - n + 1):
+                yield self._hashed(normalized[i:i + n])
+        if self.tokenizer is not None:
+            for token in self.tokenizer.tokenize(text, content_only=True):
+                yield self._hashed(f'w:{token}')
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for column, sign in self._features(text or ''):
+                vectors[row, column] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+class SentenceTransformerEncoder:
+    """sentence-transformers のモデルによる埋め込み（正規化済み）
+
+    local_files_only=True ではローカルのキャッシュ・パスにあるモデルのみ読み込み、ダウンロードしない。
+    """
+
+    def __init__(self, model_name, batch_size=64, local_files_only=False):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, local_files_only=local_files_only)
+        self.batch_size = batch_size
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.name = f'st-{model_name}'
+
+    def encode(self, texts):
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return self.model.encode(
+            list(texts), batch_size=self.batch_size, normalize_embeddings=True, show_progress_bar=False
+        ).astype(np.float32, copy=False)
+
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+
+def _build_encoder(allow_download=False):
+    config = getattr(settings, 'EMBEDDING_INDEX', {})
+    model_name = config.get('MODEL')
+    if model_name and model_name != 'hashing':
+        try:
+            return SentenceTransformerEncoder(model_name, local_files_only=not allow_download)
+        except Exception as e:
+            # 未インストール・モデル取得失敗時はハッシュ埋め込みで継続
+            print(f"[WARNING] Embedding model unavailable ({e}); using HashingEncoder")
+    # 分かち書きは形態素解析器が使える場合のみ（字種分割では n-gram 以上の情報が無い）
+    tokenizer = get_tokenizer()
+    if not tokenizer.morphological:
+        tokenizer = None
+    return HashingEncoder(config.get('HASHING_DIMENSION', 512), tokenizer=tokenizer)
+
+
+def get_text_encoder(allow_download=False):
+    """プロセス共有のエンコーダーを取得（初回のみモデル読み込み）
+
+    リクエスト処理中にモデルをダウンロードしないよう、既定ではローカルにあるモデルのみ使う。
+    モデルの取得は管理コマンド（build_embedding_index など）で allow_download=True として行う。
+    """
+    global _encoder
+    encoder = _encoder
+    if encoder is not None:
+        return encoder
+
+    with _encoder_lock:
+        if _encoder is None:
+            _encoder = _build_encoder(allow_download)
+        return _encoder
+
+
+def reset_text_encoder():
+    """設定を読み直して再構築（テスト・設定変更時用）"""
+    global _encoder
+    with _encoder_lock:
+        _encoder = None
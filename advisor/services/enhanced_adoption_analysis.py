@@ -6,37 +6,105 @@ from django.db.models import Avg, Count, Q, Max, Min, Sum
 from django.contrib.auth.models import User
 from ..models import (
     SubsidyType, AdoptionStatistics, AdoptionTips, 
-    UserApplicationHistory, StrategicTips
+    UserApplicationHistory
 )
 
+try:
+    from ..models import StrategicTips
+except ImportError:
+    # StrategicTips モデル未導入の環境では基本ティップスのみ使用
+    StrategicTips = None
+
 class EnhancedAdoptionAnalysisService:
     """採択率分析の強化サービス"""
     
+    # 採択確率の調整テーブル（calculate_adoption_probability と一括計算で共用）
+    BUSINESS_TYPE_ADJUSTMENTS = {
+        'IT導入補助金2025': {
+            'IT・情報通信業': 5.0,
+            '製造業': 3.0,
+            'サービス業': 2.0,
+            '建設業': 1.0,
+            '卸売業': 0.0,
+            '小売業': -1.0
+        },
+        'ものづくり補助金': {
+            '製造業': 8.0,
+            '建設業': 3.0,
+            'IT・情報通信業': 1.0,
+            'サービス業': -2.0,
+            '卸売業': -3.0,
+            '小売業': -5.0
+        }
+    }
+    COMPANY_SIZE_ADJUSTMENTS = (
+        ('小規模', 5.0),  # 小規模事業者は優遇される傾向
+        ('中小企業', 2.0),
+        ('中堅企業', -3.0),  # 中堅企業は競争が激しい
+    )
+    EXPERIENCE_ADJUSTMENTS = {
+        'none': 0.0,
+        'once': 5.0,
+        'multiple': 10.0,
+        'adopted': 15.0
+    }
+    SUPPORT_ADJUSTMENTS = {
+        'none': 0.0,
+        'planned': 8.0,
+        'confirmed': 15.0
+    }
+    DEFAULT_BASE_PROBABILITY = 50.0
+    
     def __init__(self):
         self.current_year = datetime.now().year
     
     def get_comprehensive_overview(self):
-        """全補助金の統合概要分析"""
-        # 全補助金の統計取得
-        all_stats = AdoptionStatistics.objects.filter(
+        """全補助金の統合概要分析
+
+        年度×補助金でグループ化した1クエリの集計結果から、
+        全体・年度別・補助金別の合計をPython側で組み立てる。
+        """
+        rows = AdoptionStatistics.objects.filter(
             year__gte=self.current_year - 3
-        ).select_related('subsidy_type')
+        ).order_by().values(
+            'year', 'subsidy_type_id', 'subsidy_type__name', 'subsidy_type__is_active'
+        ).annotate(
+            applications=Sum('total_applications'),
+            adoptions=Sum('total_adoptions'),
+        )
         
-        if not all_stats.exists():
+        total_applications = 0
+        total_adoptions = 0
+        yearly_totals = {}
+        subsidy_totals = {}
+        for row in rows:
+            applications = row['applications'] or 0
+            adoptions = row['adoptions'] or 0
+            total_applications += applications
+            total_adoptions += adoptions
+            
+            year_total = yearly_totals.setdefault(row['year'], [0, 0])
+            year_total[0] += applications
+            year_total[1] += adoptions
+            
+            if row['subsidy_type__is_active']:
+                subsidy_total = subsidy_totals.setdefault(
+                    row['subsidy_type_id'], [row['subsidy_type__name'], 0, 0]
+                )
+                subsidy_total[1] += applications
+                subsidy_total[2] += adoptions
+        
+        if not yearly_totals:
             return self._empty_overview()
         
         # 全体統計計算
-        total_applications = all_stats.aggregate(Sum('total_applications'))['total_applications__sum'] or 0
-        total_adoptions = all_stats.aggregate(Sum('total_adoptions'))['total_adoptions__sum'] or 0
         overall_rate = (total_adoptions / total_applications * 100) if total_applications > 0 else 0
         
         # 年度別統計
         yearly_stats = []
         for year in range(self.current_year - 3, self.current_year + 1):
-            year_stats = all_stats.filter(year=year)
-            if year_stats.exists():
-                year_apps = year_stats.aggregate(Sum('total_applications'))['total_applications__sum'] or 0
-                year_adoptions = year_stats.aggregate(Sum('total_adoptions'))['total_adoptions__sum'] or 0
+            if year in yearly_totals:
+                year_apps, year_adoptions = yearly_totals[year]
                 year_rate = (year_adoptions / year_apps * 100) if year_apps > 0 else 0
                 
                 yearly_stats.append({
@@ -51,19 +119,16 @@ class EnhancedAdoptionAnalysisService:
         
         # 補助金別統計
         subsidy_stats = {}
-        for subsidy in SubsidyType.objects.filter(is_active=True):
-            subsidy_data = all_stats.filter(subsidy_type=subsidy)
-            if subsidy_data.exists():
-                subsidy_apps = subsidy_data.aggregate(Sum('total_applications'))['total_applications__sum'] or 0
-                subsidy_adoptions = subsidy_data.aggregate(Sum('total_adoptions'))['total_adoptions__sum'] or 0
-                subsidy_rate = (subsidy_adoptions / subsidy_apps * 100) if subsidy_apps > 0 else 0
-                
-                subsidy_stats[subsidy.name] = {
-                    'adoption_rate': round(subsidy_rate, 1),
-                    'total_applications': subsidy_apps,
-                    'total_adoptions': subsidy_adoptions,
-                    'competitiveness': self._calculate_competitiveness(subsidy_rate)
-                }
+        for subsidy_id in sorted(subsidy_totals):
+            name, subsidy_apps, subsidy_adoptions = subsidy_totals[subsidy_id]
+            subsidy_rate = (subsidy_adoptions / subsidy_apps * 100) if subsidy_apps > 0 else 0
+            
+            subsidy_stats[name] = {
+                'adoption_rate': round(subsidy_rate, 1),
+                'total_applications': subsidy_apps,
+                'total_adoptions': subsidy_adoptions,
+                'competitiveness': self._calculate_competitiveness(subsidy_rate)
+            }
         
         return {
             'overall_stats': {
@@ -159,7 +224,7 @@ class EnhancedAdoptionAnalysisService:
         # 戦略的ティップス
         strategic_tips = StrategicTips.objects.filter(
             subsidy_name=subsidy_type.name
-        ).order_by('-importance')
+        ).order_by('-importance') if StrategicTips else []
         
         # カテゴリ別整理
         categorized_tips = {
@@ -229,7 +294,7 @@ class EnhancedAdoptionAnalysisService:
             total_adoptions=Sum('total_adoptions')
         )
         
-        base_probability = recent_stats['avg_rate'] or 50.0
+        base_probability = recent_stats['avg_rate'] or self.DEFAULT_BASE_PROBABILITY
         
         # 調整要因
         adjustments = []
@@ -286,6 +351,15 @@ class EnhancedAdoptionAnalysisService:
             }
         }
     
+    def calculate_probability_matrix(self, user_profiles, subsidies=None):
+        """複数プロファイル × 複数補助金の採択確率を一括計算（NumPy）
+        
+        calculate_adoption_probability と同じ基本確率・調整値を使い、
+        N×M の確率行列（AdoptionProbabilityMatrix）を返す。
+        """
+        from .probability_matrix import score_profiles
+        return score_profiles(user_profiles, subsidies=subsidies, service=self)
+    
     def get_industry_comparison(self):
         """業種別比較分析"""
         industries = [
@@ -381,54 +455,21 @@ class EnhancedAdoptionAnalysisService:
     
     def _get_business_type_adjustment(self, business_type, subsidy):
         # 業種と補助金の適合性による調整
-        adjustments = {
-            'IT導入補助金2025': {
-                'IT・情報通信業': 5.0,
-                '製造業': 3.0,
-                'サービス業': 2.0,
-                '建設業': 1.0,
-                '卸売業': 0.0,
-                '小売業': -1.0
-            },
-            'ものづくり補助金': {
-                '製造業': 8.0,
-                '建設業': 3.0,
-                'IT・情報通信業': 1.0,
-                'サービス業': -2.0,
-                '卸売業': -3.0,
-                '小売業': -5.0
-            }
-        }
-        
-        subsidy_adjustments = adjustments.get(subsidy.name, {})
+        subsidy_adjustments = self.BUSINESS_TYPE_ADJUSTMENTS.get(subsidy.name, {})
         return subsidy_adjustments.get(business_type, 0.0)
     
     def _get_company_size_adjustment(self, company_size, subsidy):
-        # 企業規模による調整
-        if '小規模' in company_size:
-            return 5.0  # 小規模事業者は優遇される傾向
-        elif '中小企業' in company_size:
-            return 2.0
-        elif '中堅企業' in company_size:
-            return -3.0  # 中堅企業は競争が激しい
+        # 企業規模による調整（先に一致したキーワードを優先）
+        for keyword, adjustment in self.COMPANY_SIZE_ADJUSTMENTS:
+            if keyword in company_size:
+                return adjustment
         return 0.0
     
     def _get_experience_adjustment(self, experience):
-        adjustments = {
-            'none': 0.0,
-            'once': 5.0,
-            'multiple': 10.0,
-            'adopted': 15.0
-        }
-        return adjustments.get(experience, 0.0)
+        return self.EXPERIENCE_ADJUSTMENTS.get(experience, 0.0)
     
     def _get_support_adjustment(self, support_agency):
-        adjustments = {
-            'none': 0.0,
-            'planned': 8.0,
-            'confirmed': 15.0
-        }
-        return adjustments.get(support_agency, 0.0)
+        return self.SUPPORT_ADJUSTMENTS.get(support_agency, 0.0)
     
     def _assess_probability(self, probability):
         if probability >= 75:
@@ -1,10 +1,11 @@
 # advisor/services/enhanced_ai_advisor.py
 
-import requests
 import json
 import random
 from django.conf import settings
 from ..models import SubsidyType, Answer, ConversationHistory
+from .dify_client import get_dify_client
+from .response_cache import get_response_cache, make_cache_key
 
 class EnhancedAIAdvisorService:
     """より自然で具体的な回答を生成するAIアドバイザーサービス"""
@@ -35,7 +36,10 @@ class EnhancedAIAdvisorService:
             )
             
             # Dify API呼び出し
-            dify_response = self._call_dify_api(natural_query)
+            dify_response = self._call_dify_api(
+                natural_query,
+                cache_key=make_cache_key('enhanced_ai_advisor', question_text, context=user_context)
+            )
             
             if dify_response and 'answer' in dify_response:
                 return self._process_enhanced_response(dify_response, question_text, user_context)
@@ -301,34 +305,14 @@ class EnhancedAIAdvisorService:
             'model_used': 'enhanced-mock'
         }
     
-    def _call_dify_api(self, query_text):
-        """Dify API呼び出し（既存のまま）"""
-        try:
-            request_data = {
-                "inputs": {},
-                "query": query_text,
-                "response_mode": "blocking",
-                "user": f"django_user_{hash(query_text) % 10000}"
-            }
-            
-            url = f"{self.dify_api_url}/chat-messages"
-            
-            response = requests.post(
-                url,
-                headers=self.headers,
-                json=request_data,
-                timeout=60
+    def _call_dify_api(self, query_text, cache_key=None):
+        """Dify API呼び出し（共通クライアント経由、cache_key 指定時は回答キャッシュを利用）"""
+        return get_response_cache().get_or_call(
+            cache_key,
+            lambda: get_dify_client(self.dify_api_url, self.dify_api_key).chat(
+                query_text, user=f"django_user_{hash(query_text) % 10000}"
             )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"Dify API Error: {response.status_code}")
-                return None
-                
-        except Exception as e:
-            print(f"Dify API error: {e}")
-            return None
+        )
     
     def _process_enhanced_response(self, dify_response, original_question, user_context):
         """Difyレスポンスを処理して強化"""
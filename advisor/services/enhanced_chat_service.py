@@ -1,10 +1,19 @@
-import requests
 import json
+import logging
 import uuid
 from datetime import datetime, timedelta
 from django.conf import settings
 from django.utils import timezone
 from ..models import SubsidyType, ConversationHistory, Answer
+from .subsidy_catalog import SubsidyCatalog, get_subsidy_catalog
+from .subsidy_matcher import get_subsidy_matcher
+from .streaming import split_answer_sections
+from .dify_client import get_dify_client
+from .response_cache import get_response_cache, make_cache_key
+from .conversation_writer import save_conversation_turn
+from .intent_engine import analyze_chat_intent, conversation_flow
+
+logger = logging.getLogger(__name__)
 
 class EnhancedChatService:
     """強化されたチャット機能 - LLM連携、文脈認識、リアルタイム対応"""
@@ -44,6 +53,65 @@ class EnhancedChatService:
         
         return response
     
+    def stream_conversation(self, message, session_id, user_context=None):
+        """
+        process_conversation のストリーミング版
+        ('chunk', テキスト断片) を順に返し、最後に ('end', 回答辞書) を返す
+        """
+        
+        conversation_context = self._analyze_conversation_history(session_id)
+        intent_analysis = self._detect_question_intent(message, conversation_context)
+        
+        response = None
+        
+        # Dify の streaming モードで断片をそのまま転送
+        if self.dify_api_key:
+            cache = get_response_cache()
+            cache_key = self._response_cache_key(message, intent_analysis, conversation_context, user_context)
+            dify_response = cache.get(cache_key)
+            
+            if dify_response:
+                # キャッシュ済みの回答は見出し単位で送信
+                for section in split_answer_sections(dify_response['answer']):
+                    yield 'chunk', section
+            else:
+                enhanced_query = self._build_enhanced_query(
+                    message, intent_analysis, conversation_context, user_context
+                )
+                chunks = []
+                try:
+                    for chunk in self._stream_dify_api(enhanced_query):
+                        chunks.append(chunk)
+                        yield 'chunk', chunk
+                except Exception:
+                    if chunks:
+                        # 途中で切れた回答は完成した回答として扱わない（保存・キャッシュせず error イベントへ）
+                        logger.exception("Dify streaming interrupted after %d chunks", len(chunks))
+                        raise
+                    # まだ何も送っていなければ構造化回答にフォールバック
+                    logger.exception("Dify streaming error")
+                
+                if chunks:
+                    dify_response = {'answer': ''.join(chunks)}
+                    cache.set(cache_key, dify_response)
+            
+            if dify_response:
+                response = self._process_dify_response(
+                    dify_response, intent_analysis, conversation_context
+                )
+        
+        # フォールバック: 構造化回答を見出し単位で送信
+        if response is None:
+            response = self._generate_intent_based_response(
+                message, intent_analysis, conversation_context, user_context
+            )
+            for section in split_answer_sections(response.get('answer', '')):
+                yield 'chunk', section
+        
+        self._save_conversation_turn(session_id, message, response, intent_analysis, user_context)
+        
+        yield 'end', response
+    
     def _analyze_conversation_history(self, session_id):
         """過去の会話履歴を分析して文脈を理解"""
         recent_history = ConversationHistory.objects.filter(
@@ -77,27 +145,13 @@ class EnhancedChatService:
         return context
     
     def _extract_topics_from_message(self, message):
-        """メッセージからトピックを抽出"""
-        topics = []
-        keywords = {
-            'IT導入': ['IT', 'システム', 'デジタル', 'ソフトウェア'],
-            'ものづくり': ['製造', '設備', '機械', '工場'],
-            '事業再構築': ['再構築', '転換', '新事業', '多角化'],
-            '小規模事業者': ['小規模', '個人事業', '零細企業'],
-            '研究開発': ['研究', '開発', 'R&D', '技術開発']
-        }
-        
-        message_lower = message.lower()
-        for topic, words in keywords.items():
-            if any(word.lower() in message_lower for word in words):
-                topics.append(topic)
-        
-        return topics
+        """メッセージからトピック（関連補助金）を抽出"""
+        return [name for name, score in get_subsidy_matcher().rank(message)]
     
     def _extract_mentioned_subsidies(self, content):
         """コンテンツから言及された補助金を抽出"""
         subsidies = []
-        subsidy_types = SubsidyType.objects.all()
+        subsidy_types = get_subsidy_catalog().subsidies
         
         for subsidy in subsidy_types:
             if subsidy.name in content:
@@ -107,49 +161,11 @@ class EnhancedChatService:
     
     def _determine_conversation_flow(self, history):
         """会話の流れを判定"""
-        if len(history) <= 2:
-            return 'initial'
-        elif len(history) <= 6:
-            return 'developing'
-        else:
-            return 'continuing'
+        return conversation_flow(len(history))
     
     def _detect_question_intent(self, message, context):
-        """AIを使用した質問意図の自動判別"""
-        intent_patterns = {
-            'search_subsidy': ['補助金', '助成金', '支援', 'どんな', '探し', '見つけ'],
-            'application_process': ['申請', '手続き', 'やり方', '方法', '流れ', 'プロセス'],
-            'eligibility_check': ['対象', '条件', '要件', '使える', '適用', '当てはまる'],
-            'timing_inquiry': ['いつ', 'タイミング', '期限', '時期', 'スケジュール'],
-            'amount_inquiry': ['金額', 'いくら', '予算', '費用', '額'],
-            'success_tips': ['コツ', 'ポイント', '成功', 'アドバイス', '秘訣'],
-            'follow_up': ['続き', 'さらに', 'もっと', '詳しく', '他に']
-        }
-        
-        detected_intents = []
-        confidence_scores = {}
-        
-        message_lower = message.lower()
-        
-        for intent, keywords in intent_patterns.items():
-            score = sum(1 for keyword in keywords if keyword in message_lower)
-            if score > 0:
-                detected_intents.append(intent)
-                confidence_scores[intent] = score / len(keywords)
-        
-        # 会話履歴から継続性を判定
-        if context['conversation_flow'] == 'continuing' and 'follow_up' not in detected_intents:
-            detected_intents.append('follow_up')
-            confidence_scores['follow_up'] = 0.8
-        
-        primary_intent = max(detected_intents, key=lambda x: confidence_scores[x]) if detected_intents else 'general_inquiry'
-        
-        return {
-            'primary_intent': primary_intent,
-            'all_intents': detected_intents,
-            'confidence': confidence_scores.get(primary_intent, 0.5),
-            'is_follow_up': 'follow_up' in detected_intents
-        }
+        """質問意図の判別（共通の意図判定エンジンで1回走査）"""
+        return analyze_chat_intent(message, context['conversation_flow'])
     
     def _generate_contextual_response(self, message, intent, context, user_context):
         """文脈と意図を考慮した高度な回答生成"""
@@ -158,7 +174,10 @@ class EnhancedChatService:
         if self.dify_api_key:
             enhanced_query = self._build_enhanced_query(message, intent, context, user_context)
             
-            dify_response = self._call_dify_api(enhanced_query)
+            dify_response = self._call_dify_api(
+                enhanced_query,
+                cache_key=self._response_cache_key(message, intent, context, user_context)
+            )
             
             if dify_response and 'answer' in dify_response:
                 return self._process_dify_response(dify_response, intent, context)
@@ -166,6 +185,20 @@ class EnhancedChatService:
         # フォールバック: 意図別の構造化回答
         return self._generate_intent_based_response(message, intent, context, user_context)
     
+    def _response_cache_key(self, message, intent, context, user_context):
+        """回答キャッシュのキー（クエリに含まれる文脈もキーに含める）"""
+        return make_cache_key(
+            'enhanced_chat',
+            message,
+            intent=intent['primary_intent'],
+            context={
+                'user_context': user_context or {},
+                'previous_topics': context['previous_topics'][:3],
+                'discussed_subsidies': context['discussed_subsidies'][:3],
+                'is_follow_up': intent['is_follow_up'],
+            }
+        )
+    
     def _build_enhanced_query(self, message, intent, context, user_context):
         """文脈を考慮した高度なクエリ構築"""
         
@@ -221,7 +254,7 @@ class EnhancedChatService:
 
     def _get_relevant_subsidy_data(self, intent):
         """意図に関連する補助金データを取得"""
-        subsidies = SubsidyType.objects.filter(is_active=True)[:5]
+        subsidies = get_subsidy_catalog().active_subsidies[:5]
         
         subsidy_info = []
         for subsidy in subsidies:
@@ -234,41 +267,24 @@ class EnhancedChatService:
         
         return "\n".join(subsidy_info) if subsidy_info else "補助金データを読み込み中..."
     
-    def _call_dify_api(self, query_text):
-        """Dify API呼び出し"""
-        try:
-            request_data = {
-                "inputs": {},
-                "query": query_text,
-                "response_mode": "blocking",
-                "user": f"enhanced_chat_{uuid.uuid4().hex[:8]}"
-            }
-            
-            url = f"{self.dify_api_url}/chat-messages"
-            
-            print(f"Calling Dify API: {url}")
-            print(f"Request data preview: {str(request_data)[:200]}...")
-            
-            response = requests.post(
-                url,
-                headers=self.headers,
-                json=request_data,
-                timeout=30
+    def _call_dify_api(self, query_text, cache_key=None):
+        """Dify API呼び出し（共通クライアント経由、cache_key 指定時は回答キャッシュを利用）"""
+        print(f"Calling Dify API: {self.dify_api_url}/chat-messages")
+        
+        return get_response_cache().get_or_call(
+            cache_key,
+            lambda: get_dify_client(self.dify_api_url, self.dify_api_key).chat(
+                query_text, user=f"enhanced_chat_{uuid.uuid4().hex[:8]}"
             )
-            
-            print(f"Dify API response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                result = response.json()
-                print(f"Dify API success: {bool(result.get('answer'))}")
-                return result
-            else:
-                print(f"Dify API Error: {response.status_code} - {response.text}")
-                return None
-                
-        except Exception as e:
-            print(f"Dify API error: {e}")
-            return None
+        )
+    
+    def _stream_dify_api(self, query_text):
+        """Dify API呼び出し（streamingモード、回答断片を順に返す）"""
+        print(f"Calling Dify API (streaming): {self.dify_api_url}/chat-messages")
+        
+        return get_dify_client(self.dify_api_url, self.dify_api_key).stream_chat(
+            query_text, user=f"enhanced_chat_{uuid.uuid4().hex[:8]}"
+        )
     
     def _process_dify_response(self, dify_response, intent, context):
         """Dify回答の処理と強化"""
@@ -292,7 +308,7 @@ class EnhancedChatService:
     def _extract_recommended_subsidies(self, answer):
         """回答から推奨補助金を抽出"""
         recommended = []
-        subsidies = SubsidyType.objects.filter(is_active=True)
+        subsidies = get_subsidy_catalog().active_subsidies
         
         for subsidy in subsidies:
             if subsidy.name in answer:
@@ -372,7 +388,7 @@ class EnhancedChatService:
 ## 💡 次のステップ
 具体的な事業内容をお聞かせいただければ、より詳細なアドバイスが可能です。
 """,
-            'recommended_subsidies': list(SubsidyType.objects.filter(is_active=True)[:3].values()),
+            'recommended_subsidies': [SubsidyCatalog.as_values(s) for s in get_subsidy_catalog().active_subsidies[:3]],
             'confidence_score': 0.8,
             'model_used': 'fallback-search'
         }
@@ -442,30 +458,5 @@ class EnhancedChatService:
         }
     
     def _save_conversation_turn(self, session_id, user_message, assistant_response, intent_analysis, user_context):
-        """会話ターンの保存"""
-        timestamp = timezone.now()
-        
-        # ユーザーメッセージ
-        ConversationHistory.objects.create(
-            session_id=session_id,
-            message_type='user',
-            content=user_message,
-            intent_analysis=intent_analysis,
-            user_context=user_context or {},
-            timestamp=timestamp
-        )
-        
-        # アシスタント回答
-        ConversationHistory.objects.create(
-            session_id=session_id,
-            message_type='assistant',
-            content=assistant_response.get('answer', ''),
-            metadata={
-                'confidence_score': assistant_response.get('confidence_score', 0),
-                'recommended_subsidies': assistant_response.get('recommended_subsidies', []),
-                'model_used': assistant_response.get('model_used', 'unknown'),
-                'intent_detected': assistant_response.get('intent_detected', ''),
-                'context_utilized': assistant_response.get('context_utilized', False)
-            },
-            timestamp=timestamp + timedelta(seconds=1)
-                )
\ No newline at end of file
+        """会話ターンの保存（1回の一括INSERT、設定によりライトビハインド）"""
+        save_conversation_turn(session_id, user_message, assistant_response, intent_analysis, user_context)
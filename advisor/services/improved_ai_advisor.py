@@ -1,6 +1,8 @@
 # advisor/services/improved_ai_advisor.py
 
 from ..models import SubsidyType
+from .subsidy_catalog import get_subsidy_catalog
+from .recommendation import recommend_subsidies
 
 class ImprovedAIAdvisorService:
     """改良された質問解析機能を持つAIアドバイザー"""
@@ -24,7 +26,7 @@ class ImprovedAIAdvisorService:
         # 一般的な回答
         else:
             print("Debug: 一般的な質問として処理")
-            return self._get_general_response()
+            return self._get_general_response(question_text, user_context)
     
     def _is_monozukuri_question(self, question_lower):
         """ものづくり補助金の質問かどうか判定"""
@@ -206,7 +208,7 @@ class ImprovedAIAdvisorService:
             'model_used': 'improved-it'
         }
     
-    def _get_general_response(self):
+    def _get_general_response(self, question_text='', user_context=None):
         """一般的な回答"""
         answer = """## 💡 補助金制度について
 
@@ -224,7 +226,7 @@ class ImprovedAIAdvisorService:
 
         return {
             'answer': answer,
-            'recommended_subsidies': self._get_all_subsidies()[:3],
+            'recommended_subsidies': self._recommend_subsidies(question_text, user_context, k=3),
             'confidence_score': 0.7,
             'model_used': 'improved-general'
         }
@@ -233,20 +235,27 @@ class ImprovedAIAdvisorService:
         """キーワードで補助金を検索"""
         subsidies = []
         try:
+            catalog = get_subsidy_catalog()
             for keyword in keywords:
-                subsidy = SubsidyType.objects.filter(
-                    name__icontains=keyword
-                ).first()
+                subsidy = catalog.first_by_name(keyword)
                 if subsidy:
                     subsidies.append(subsidy)
         except Exception as e:
             print(f"補助金検索エラー: {e}")
         return subsidies
     
+    def _recommend_subsidies(self, question_text, user_context, k=3):
+        """質問・事業情報に適した補助金の上位 k 件"""
+        try:
+            return recommend_subsidies(question_text, user_context, k=k)
+        except Exception as e:
+            print(f"補助金推薦エラー: {e}")
+            return []
+    
     def _get_all_subsidies(self):
         """全補助金を取得"""
         try:
-            return list(SubsidyType.objects.all()[:5])
+            return list(get_subsidy_catalog().subsidies[:5])
         except Exception as e:
             print(f"補助金取得エラー: {e}")
             return []
@@ -0,0 +1,483 @@
+# advisor/services/intent_engine.py - 質問意図の判定エンジン
+
+import copy
+import re
+import threading
+
+from .subsidy_matcher import current_alias_table
+
+# 呼び出し元ごとの意図キーワード（各 dict の並び順が判定の優先順）
+INTENT_SCHEMES = {
+    # DetailedResponseService._analyze_intent
+    'detailed': {
+        'adoption_rate': ['採択率', '通る確率', '成功率', '受かる', '採択'],
+        'application_process': ['申請方法', '申請手順', '申請の仕方', 'やり方', '手続き'],
+        'requirements': ['要件', '条件', '資格', '対象', '使える'],
+        'amount': ['金額', '補助額', 'いくら', '最大', '上限'],
+        'schedule': ['期間', 'いつ', '締切', '期限', 'スケジュール'],
+        'comparison': ['比較', '違い', 'どちら', 'どれ', '選び方'],
+        'success_tips': ['コツ', '秘訣', '成功', '通るため', 'ポイント'],
+    },
+    # ContextAwareAIAdvisorService._analyze_intent
+    'context_aware': {
+        'adoption_rate': ['採択率', '成功率', '確率', '上げる', '高める'],
+        'application_process': ['申請', '手続き', '方法', 'やり方'],
+        'requirements': ['要件', '条件', '対象'],
+    },
+    # EnhancedChatService._detect_question_intent
+    'chat': {
+        'search_subsidy': ['補助金', '助成金', '支援', 'どんな', '探し', '見つけ'],
+        'application_process': ['申請', '手続き', 'やり方', '方法', '流れ', 'プロセス'],
+        'eligibility_check': ['対象', '条件', '要件', '使える', '適用', '当てはまる'],
+        'timing_inquiry': ['いつ', 'タイミング', '期限', '時期', 'スケジュール'],
+        'amount_inquiry': ['金額', 'いくら', '予算', '費用', '額'],
+        'success_tips': ['コツ', 'ポイント', '成功', 'アドバイス', '秘訣'],
+        'follow_up': ['続き', 'さらに', 'もっと', '詳しく', '他に'],
+    },
+    # views.build_contextual_prompt（会話中の補助金に対する追加指示）
+    'prompt': {
+        'application_process': ['申請', '方法', '手続き', 'やり方', 'プロセス', '流れ', 'どうやって'],
+        'adoption_rate': ['採択率', '成功率', '確率', '上げる', '高める', '向上', 'あがる'],
+        'requirements': ['要件', '条件', '対象', '資格', 'できる', '当てはまる'],
+        'schedule': ['いつ', '時期', '期限', 'スケジュール', 'タイミング'],
+        'success_tips': ['コツ', '秘訣', 'ポイント', 'アドバイス', 'ノウハウ'],
+    },
+}
+
+# NLPAIAdvisorService の意図パターン（patterns は「A.*B」形式の正規表現、1件3点・keywords は1件1点）
+NLP_INTENT_PATTERNS = {
+    'overview': {
+        'patterns': [
+            r'補助金.*とは', r'補助金.*について.*教え', r'補助金.*仕組み',
+            r'どんな.*補助金', r'補助金.*種類', r'補助金.*概要',
+            r'補助金.*全般', r'補助金.*基本', r'補助金.*説明'
+        ],
+        'keywords': ['とは', '教えて', '説明', '仕組み', '種類', '概要', '全般', '基本']
+    },
+    'specific_subsidy': {
+        'patterns': [],  # 補助金エイリアス辞書から生成
+        'keywords': []
+    },
+    'application_process': {
+        'patterns': [
+            r'申請.*方法', r'申請.*手順', r'申請.*やり方', r'申請.*流れ',
+            r'どう.*申請', r'申請.*について', r'申請.*したい',
+            r'必要.*書類', r'書類.*何', r'提出.*書類',
+            r'期限.*いつ', r'締切.*いつ', r'いつまで.*申請'
+        ],
+        'keywords': ['申請', '手順', 'やり方', '流れ', '書類', '期限', '締切', '提出']
+    },
+    'requirements': {
+        'patterns': [
+            r'要件.*何', r'条件.*何', r'資格.*何', r'対象.*何',
+            r'使える.*か', r'対象.*なる', r'該当.*する',
+            r'うちの.*会社.*対象', r'弊社.*対象', r'当社.*使える'
+        ],
+        'keywords': ['要件', '条件', '資格', '対象', '該当', '使える', '適用']
+    },
+    'strategy': {
+        'patterns': [
+            r'採択.*され.*方法', r'通り.*やすい', r'成功.*方法',
+            r'採択率.*上げ', r'確率.*高め', r'勝つ.*方法',
+            r'コツ.*教え', r'秘訣.*教え', r'戦略.*教え'
+        ],
+        'keywords': ['採択', '成功', '確率', 'コツ', '秘訣', '戦略', '差別化', '競合', '有利']
+    },
+    'amount_rate': {
+        'patterns': [
+            r'いくら.*もらえ', r'金額.*いくら', r'補助額.*いくら',
+            r'最大.*いくら', r'上限.*いくら', r'限度額.*いくら',
+            r'補助率.*いくら', r'何割.*補助', r'何パーセント.*補助'
+        ],
+        'keywords': ['いくら', '金額', '補助額', '最大', '上限', '限度額', '補助率', '何割', 'パーセント']
+    }
+}
+NLP_PATTERN_WEIGHT = 3
+
+# 補助金が特定できている場合に「詳細を知りたい」質問とみなすパターン
+NLP_DETAIL_PATTERNS = [r'について.*教え', r'を.*教え', r'の.*詳細', r'詳しく']
+
+
+def nlp_intent_patterns(aliases=None):
+    """NLPAIAdvisorService 用の意図パターン（specific_subsidy をエイリアス辞書から生成）"""
+    aliases = current_alias_table().aliases if aliases is None else aliases
+    patterns = copy.deepcopy(NLP_INTENT_PATTERNS)
+
+    keywords = []
+    for subsidy_name, subsidy_aliases in aliases.items():
+        # キーワードとして主要部分（「補助金」「助成金」を除いた部分）とエイリアスを使う
+        main_keywords = subsidy_name.replace('補助金', '').replace('助成金', '').split('・')
+        keywords.extend(kw.strip() for kw in main_keywords if kw.strip())
+        keywords.extend(subsidy_aliases)
+
+    patterns['specific_subsidy']['patterns'] = [re.escape(name) for name in aliases]
+    patterns['specific_subsidy']['keywords'] = list(set(keywords))
+    return patterns
+
+
+def pattern_pieces(pattern):
+    """「A.*B」形式の正規表現を固定文字列の列 ('A', 'B') に分解"""
+    pieces = tuple(re.sub(r'\\(.)', r'\1', piece) for piece in pattern.split('.*'))
+    if not all(pieces):
+        raise ValueError(f'Unsupported intent pattern: {pattern}')
+    return pieces
+
+
+class IntentScores:
+    """1つのスキームでの意図ごとのスコア（スキームの並び順を保持）"""
+
+    __slots__ = ('scheme', 'scores', 'keyword_hits')
+
+    def __init__(self, scheme, scores, keyword_hits):
+        self.scheme = scheme
+        self.scores = scores
+        self.keyword_hits = keyword_hits
+
+    def matched(self):
+        """スコアが付いた意図（優先順）"""
+        return [intent for intent, score in self.scores.items() if score > 0]
+
+    def first(self, default=None):
+        """優先順で最初にヒットした意図（if/elif の連鎖と同じ判定）"""
+        for intent, score in self.scores.items():
+            if score > 0:
+                return intent
+        return default
+
+    def best(self, default=None):
+        """最高スコアの意図（同点は優先順）"""
+        intent = max(self.scores, key=self.scores.__getitem__, default=None)
+        if intent is None or self.scores[intent] <= 0:
+            return default
+        return intent
+
+
+def trie_pattern(words):
+    """固定文字列の集合を接頭辞木の形の正規表現にする（各位置で最長一致）
+
+    例: ['補助金', '補助額', '補助'] → 補助(?:金|額)?
+    re の選択肢は先頭から順に試されるため、単純な「A|B|C…」より共通部分を
+    まとめた方が語数が多いときに速い。
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        group = '(?:' + '|'.join(branches) + ')'
+        return group + '?' if '' in node else group
+
+    return build(trie)
+
+
+class CompiledVocabulary:
+    """キーワード・パターン断片の一覧を1つの正規表現にまとめたもの
+
+    先読み (?=(...)) で全位置の最長一致を取り出し、同じ位置から始まる短い語
+    （最長一致の接頭辞）はあらかじめ求めた対応表で補う。これで重なり合う語も
+    漏れなく、C 実装の正規表現エンジン1回の走査で拾える。
+
+    entries は (固定文字列, ペイロード) の列で、ペイロードは
+    ('keyword', スキーム, 意図, 番号) または ('rule', パターンID, 断片の位置)。
+    """
+
+    def __init__(self, entries):
+        payloads = {}
+        for literal, payload in entries:
+            if literal:
+                payloads.setdefault(literal, []).append(payload)
+
+        # 最長一致した語 → その位置で一致する全語（接頭辞を含む）の (長さ, ペイロード)
+        expansions = {
+            literal: [
+                (len(prefix), payload)
+                for prefix in (literal[:n] for n in range(1, len(literal) + 1)) if prefix in payloads
+                for payload in payloads[prefix]
+            ]
+            for literal in payloads
+        }
+        self.keyword_table = {
+            literal: frozenset(payload[1:] for _, payload in expansion if payload[0] == 'keyword')
+            for literal, expansion in expansions.items()
+        }
+        self.rule_table = {
+            literal: tuple((length, payload[1], payload[2]) for length, payload in expansion if payload[0] == 'rule')
+            for literal, expansion in expansions.items()
+        }
+        self.has_rules = any(self.rule_table.values())
+        self.regex = re.compile('(?=(' + trie_pattern(payloads) + '))') if payloads else None
+
+
+class IntentEngine:
+    """全スキームのキーワード・パターンをまとめて照合する意図判定器
+
+    スキーム（または同時に判定するスキームの組）ごとに CompiledVocabulary を作り、
+    質問（小文字化）を1回走査するだけで意図スコアを求める。「A.*B」形式のパターンは、
+    同じ行の中で A の後に B が現れるかを走査中に追跡する（正規表現の . が改行に
+    マッチしないのと同じ扱い）。
+
+    キーワードは大文字・小文字を区別しないが、パターンは従来の re.search と同じく
+    元の質問に対して大文字・小文字を区別する（「IT導入補助金」は「it導入補助金」に一致しない）。
+    """
+
+    def __init__(self, schemes):
+        self.schemes = {}
+        self._rules = []
+        self._entries = {}
+        # 大文字・小文字を含むパターン断片 (ルールID, 断片の位置) → 元の表記
+        self._cased_pieces = {}
+
+        for scheme, spec in schemes.items():
+            rule_weight = spec.get('rule_weight', 1)
+            intents = {}
+            scheme_entries = self._entries[scheme] = []
+            for intent, config in spec['intents'].items():
+                keywords = list(config.get('keywords', ()))
+                for index, keyword in enumerate(keywords):
+                    scheme_entries.append((keyword.lower(), ('keyword', scheme, intent, index)))
+                for pieces in config.get('rules', ()):
+                    rule_id = len(self._rules)
+                    self._rules.append((scheme, intent, len(pieces)))
+                    for position, piece in enumerate(pieces):
+                        scheme_entries.append((piece.lower(), ('rule', rule_id, position)))
+                        if piece != piece.lower():
+                            self._cased_pieces[(rule_id, position)] = piece
+                intents[intent] = len(keywords)
+            self.schemes[scheme] = (intents, rule_weight)
+
+        self._rule_lengths = [length for _, _, length in self._rules]
+        self._vocabularies = {}
+        for scheme in self.schemes:
+            self._vocabulary((scheme,))
+        self._vocabulary(tuple(self.schemes))
+
+        # first() 用: 最長一致した語 → その位置で一致する意図のうち最も優先度が高いものの順位
+        self._priorities = {}
+        for scheme, (intents, _) in self.schemes.items():
+            vocabulary = self._vocabularies[(scheme,)]
+            if vocabulary.has_rules or vocabulary.regex is None:
+                continue
+            order = {intent: rank for rank, intent in enumerate(intents)}
+            self._priorities[scheme] = (
+                list(intents),
+                {literal: min(order[intent] for _, intent, _ in hits)
+                 for literal, hits in vocabulary.keyword_table.items()},
+            )
+
+    @classmethod
+    def from_keywords(cls, keyword_schemes, **extra):
+        """{スキーム: {意図: [キーワード]}} から構築（extra は構築済みの仕様を追加）"""
+        schemes = {
+            scheme: {'intents': {intent: {'keywords': keywords} for intent, keywords in intents.items()}}
+            for scheme, intents in keyword_schemes.items()
+        }
+        schemes.update(extra)
+        return cls(schemes)
+
+    def _vocabulary(self, schemes):
+        """スキームの組に対応する照合器（初回のみ構築してキャッシュ）"""
+        vocabulary = self._vocabularies.get(schemes)
+        if vocabulary is None:
+            vocabulary = CompiledVocabulary([entry for scheme in schemes for entry in self._entries[scheme]])
+            self._vocabularies[schemes] = vocabulary
+        return vocabulary
+
+    @staticmethod
+    def _lower(text):
+        """小文字化（位置を元の質問と揃えるため、文字数が変わる文字はそのまま残す）"""
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            return lowered
+        return ''.join(char if len(char.lower()) != 1 else char.lower() for char in text)
+
+    def _scan(self, text, schemes):
+        keyword_hits = set()
+        rule_hits = set()
+        original = text or ''
+        text = self._lower(original)
+        vocabulary = self._vocabulary(schemes)
+        if vocabulary.regex is None:
+            return keyword_hits, rule_hits
+
+        keyword_table = vocabulary.keyword_table
+        if not vocabulary.has_rules:
+            for literal in vocabulary.regex.findall(text):
+                keyword_hits.update(keyword_table[literal])
+            return keyword_hits, rule_hits
+
+        rule_table = vocabulary.rule_table
+        rule_lengths = self._rule_lengths
+        cased_pieces = self._cased_pieces
+        for line, original_line in zip(text.split('\n'), original.split('\n')):
+            progress = {}
+            for match in vocabulary.regex.finditer(line):
+                literal = match.group(1)
+                keyword_hits.update(keyword_table[literal])
+                start = match.start()
+                for length, rule_id, piece in rule_table[literal]:
+                    if rule_id in rule_hits:
+                        continue
+                    cased = cased_pieces.get((rule_id, piece)) if cased_pieces else None
+                    if cased is not None and original_line[start:start + length] != cased:
+                        continue
+                    expected, min_start = progress.get(rule_id, (0, 0))
+                    # 前の断片の終了後に始まる、次の断片の最初の出現で進める
+                    if piece == expected and start >= min_start:
+                        if piece + 1 == rule_lengths[rule_id]:
+                            rule_hits.add(rule_id)
+                        else:
+                            progress[rule_id] = (piece + 1, start + length)
+        return keyword_hits, rule_hits
+
+    def _scores(self, schemes, keyword_hits, rule_hits):
+        counts = {scheme: dict.fromkeys(self.schemes[scheme][0], 0) for scheme in schemes}
+        for scheme, intent, _ in keyword_hits:
+            counts[scheme][intent] += 1
+
+        results = {}
+        for scheme in schemes:
+            scores = dict(counts[scheme])
+            results[scheme] = IntentScores(scheme, scores, counts[scheme])
+        for rule_id in rule_hits:
+            scheme, intent, _ = self._rules[rule_id]
+            results[scheme].scores[intent] += self.schemes[scheme][1]
+        return results
+
+    def analyze(self, text, schemes=None):
+        """1回の走査で複数スキームのスコアを求める {スキーム: IntentScores}"""
+        schemes = tuple(schemes or self.schemes)
+        keyword_hits, rule_hits = self._scan(text, schemes)
+        return self._scores(schemes, keyword_hits, rule_hits)
+
+    def classify(self, text, scheme):
+        """1つのスキームでのスコア（そのスキームの語だけを照合）"""
+        return self.analyze(text, (scheme,))[scheme]
+
+    def classify_many(self, texts, scheme):
+        """複数の質問をまとめて判定（オフラインの再ラベル付け用）"""
+        return [self.classify(text, scheme) for text in texts]
+
+    def first(self, text, scheme, default=None):
+        """優先順で最初にヒットする意図（classify(...).first() と同じ結果をスコア計算なしで求める）"""
+        priorities = self._priorities.get(scheme)
+        if priorities is None:
+            return self.classify(text, scheme).first(default)
+
+        intents, ranks = priorities
+        literals = self._vocabularies[(scheme,)].regex.findall(text.lower() if text else '')
+        if not literals:
+            return default
+        return intents[min(map(ranks.__getitem__, literals))]
+
+    def keyword_count(self, scheme, intent):
+        """意図に登録されたキーワード数"""
+        return self.schemes[scheme][0][intent]
+
+
+def _pattern_scheme(intent_patterns, rule_weight):
+    return {
+        'rule_weight': rule_weight,
+        'intents': {
+            intent: {
+                'keywords': config['keywords'],
+                'rules': [pattern_pieces(pattern) for pattern in config['patterns']],
+            }
+            for intent, config in intent_patterns.items()
+        },
+    }
+
+
+def build_intent_engine(aliases=None):
+    """全呼び出し元のスキームをまとめた判定器を構築
+
+    aliases 省略時は読み込み済みのエイリアス表を使い、alias_table に記録する（差し替えの検知用）。
+    """
+    alias_table = current_alias_table() if aliases is None else None
+    nlp_patterns = nlp_intent_patterns(alias_table.aliases if alias_table is not None else aliases)
+    engine = IntentEngine.from_keywords(
+        INTENT_SCHEMES,
+        nlp=_pattern_scheme(nlp_patterns, NLP_PATTERN_WEIGHT),
+        nlp_detail=_pattern_scheme({'detail_request': {'patterns': NLP_DETAIL_PATTERNS, 'keywords': []}}, 1),
+    )
+    engine.alias_table = alias_table
+    return engine
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_intent_engine():
+    """プロセス共有の意図判定器を取得（初回のみ構築）"""
+    global _engine
+    engine = _engine
+    if engine is not None:
+        return engine
+
+    with _engine_lock:
+        if _engine is None:
+            _engine = build_intent_engine()
+        return _engine
+
+
+def reset_intent_engine():
+    """判定器を破棄（エイリアス変更時・テスト用）"""
+    global _engine
+    with _engine_lock:
+        _engine = None
+
+
+def reset_intent_engine_if_stale(alias_table):
+    """alias_table 以外のエイリアス表で構築済みの判定器を破棄"""
+    global _engine
+    with _engine_lock:
+        if _engine is not None and _engine.alias_table is not alias_table:
+            _engine = None
+
+
+def classify_intent(text, scheme, default=None):
+    """優先順で最初にヒットした意図（if/elif のキーワード判定の置き換え）"""
+    return get_intent_engine().first(text, scheme, default)
+
+
+def conversation_flow(previous_messages):
+    """直近の会話件数から会話の流れを判定（履歴は最大10件まで参照）"""
+    if previous_messages <= 2:
+        return 'initial'
+    elif previous_messages <= 6:
+        return 'developing'
+    return 'continuing'
+
+
+def analyze_chat_intent(message, flow='initial', scores=None):
+    """チャット用の意図分析結果（ConversationHistory.intent_analysis の形式）"""
+    engine = get_intent_engine()
+    scores = scores or engine.classify(message, 'chat')
+
+    detected_intents = scores.matched()
+    confidence_scores = {
+        intent: scores.keyword_hits[intent] / engine.keyword_count('chat', intent)
+        for intent in detected_intents
+    }
+
+    # 会話履歴から継続性を判定
+    if flow == 'continuing' and 'follow_up' not in detected_intents:
+        detected_intents.append('follow_up')
+        confidence_scores['follow_up'] = 0.8
+
+    primary_intent = max(detected_intents, key=lambda x: confidence_scores[x]) if detected_intents else 'general_inquiry'
+
+    return {
+        'primary_intent': primary_intent,
+        'all_intents': detected_intents,
+        'confidence': confidence_scores.get(primary_intent, 0.5),
+        'is_follow_up': 'follow_up' in detected_intents
+    }
@@ -1,10 +1,12 @@
 # advisor/services/llm_enhanced_advisor.py
 
-import requests
 import json
 from django.conf import settings
 from datetime import datetime
 from ..models import SubsidyType, AdoptionStatistics, AdoptionTips
+from .dify_client import get_dify_client
+from .response_cache import get_response_cache, make_cache_key
+from .adoption_rollup import get_adoption_rollup
 
 class LLMEnhancedAdvisorService:
     """LLM(Dify)と戦略ロジックを組み合わせた高度アドバイザー"""
@@ -71,7 +73,10 @@ class LLMEnhancedAdvisorService:
         enhanced_prompt = self._build_llm_prompt(question_text, user_context, strategic_data)
         
         try:
-            response = self._call_dify_api(enhanced_prompt)
+            response = self._call_dify_api(
+                enhanced_prompt,
+                cache_key=make_cache_key('llm_enhanced_advisor', question_text, context=user_context)
+            )
             if response and 'answer' in response:
                 return response['answer']
         except Exception as e:
@@ -260,9 +265,7 @@ class LLMEnhancedAdvisorService:
                     score += 20
             
             # 採択率ボーナス
-            recent_stats = AdoptionStatistics.objects.filter(
-                subsidy_type=subsidy
-            ).order_by('-year', '-round_number').first()
+            recent_stats = get_adoption_rollup().latest(subsidy)
             
             if recent_stats and recent_stats.adoption_rate > 60:
                 score += 10
@@ -278,9 +281,7 @@ class LLMEnhancedAdvisorService:
         if not subsidy:
             return "分析データ不足"
         
-        recent_stats = AdoptionStatistics.objects.filter(
-            subsidy_type=subsidy
-        ).order_by('-year', '-round_number').first()
+        recent_stats = get_adoption_rollup().latest(subsidy)
         
         if recent_stats:
             rate = recent_stats.adoption_rate
@@ -300,9 +301,7 @@ class LLMEnhancedAdvisorService:
         base_rate = 50
         
         if subsidy:
-            recent_stats = AdoptionStatistics.objects.filter(
-                subsidy_type=subsidy
-            ).order_by('-year', '-round_number').first()
+            recent_stats = get_adoption_rollup().latest(subsidy)
             
             if recent_stats:
                 base_rate = recent_stats.adoption_rate
@@ -370,34 +369,14 @@ class LLMEnhancedAdvisorService:
         
         return "\n".join(formatted)
     
-    def _call_dify_api(self, query_text):
-        """Dify API呼び出し"""
-        try:
-            request_data = {
-                "inputs": {},
-                "query": query_text,
-                "response_mode": "blocking",
-                "user": f"llm_enhanced_user_{hash(query_text) % 10000}"
-            }
-            
-            url = f"{self.dify_api_url}/chat-messages"
-            
-            response = requests.post(
-                url,
-                headers=self.headers,
-                json=request_data,
-                timeout=60
+    def _call_dify_api(self, query_text, cache_key=None):
+        """Dify API呼び出し（共通クライアント経由、cache_key 指定時は回答キャッシュを利用）"""
+        return get_response_cache().get_or_call(
+            cache_key,
+            lambda: get_dify_client(self.dify_api_url, self.dify_api_key).chat(
+                query_text, user=f"llm_enhanced_user_{hash(query_text) % 10000}"
             )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"Dify API Error: {response.status_code}")
-                return None
-                
-        except Exception as e:
-            print(f"Dify API error: {e}")
-            return None
+        )
 
 
 # メインサービスとして設定
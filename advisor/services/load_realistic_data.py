@@ -2,15 +2,25 @@
 
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
-from advisor.models import SubsidyType, AdoptionStatistics, AdoptionTips, UserApplicationHistory
+from advisor.models import AdoptionStatistics, AdoptionTips, UserApplicationHistory
+from advisor.services.bulk_import import DEFAULT_CHUNK_SIZE, BulkImporter, resolve_subsidies
 from datetime import date, timedelta
 import random
 
 class Command(BaseCommand):
     help = 'よりリアルな採択率分析用データを投入します'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'1トランザクションで投入する件数（デフォルト: {DEFAULT_CHUNK_SIZE}）'
+        )
+
     def handle(self, *args, **options):
         self.stdout.write('📊 リアルな採択率分析データの投入を開始します...\n')
+        self.chunk_size = options['chunk_size']
         
         # 1. リアルな採択統計データの投入
         self.load_realistic_adoption_statistics()
@@ -132,73 +142,69 @@ class Command(BaseCommand):
             }
         }
 
-        created_count = 0
+        # 既存の年度・回次はそのまま残す
+        importer = BulkImporter(
+            AdoptionStatistics, ['subsidy_type', 'year', 'round_number'], chunk_size=self.chunk_size
+        )
+        subsidies = resolve_subsidies(realistic_data, stdout=self.stdout)
         
         for subsidy_name, years_data in realistic_data.items():
-            try:
-                subsidy = SubsidyType.objects.get(name=subsidy_name)
-                
-                for year, rounds_data in years_data.items():
-                    for round_data in rounds_data:
-                        # 企業規模別の分布（実際の傾向）
-                        total_apps = round_data['apps']
-                        total_adoptions = round_data['adoptions']
-                        
-                        if '小規模' in subsidy_name:
-                            small_ratio = 0.75  # 小規模事業者持続化補助金は小規模が多い
-                        else:
-                            small_ratio = 0.40  # その他は40%程度
-                        
-                        small_apps = int(total_apps * small_ratio)
-                        medium_apps = total_apps - small_apps
-                        
-                        # 小規模事業者の方が若干採択率が高い傾向
-                        small_rate = round_data['rate'] + random.uniform(2, 8)
-                        medium_rate = round_data['rate'] - random.uniform(1, 4)
-                        
-                        small_adoptions = min(int(small_apps * small_rate / 100), 
-                                            int(total_adoptions * 0.6))
-                        medium_adoptions = total_adoptions - small_adoptions
-                        
-                        # 業種別統計を生成
-                        industry_stats = {}
-                        if subsidy_name in industry_patterns:
-                            for industry, pattern in industry_patterns[subsidy_name].items():
-                                industry_apps = int(total_apps * pattern['share'])
-                                industry_rate = round_data['rate'] + pattern['advantage']
-                                industry_adoptions = min(int(industry_apps * industry_rate / 100),
-                                                       int(total_adoptions * pattern['share'] * 1.2))
-                                
-                                industry_stats[industry] = {
-                                    'applications': industry_apps,
-                                    'adoptions': industry_adoptions,
-                                    'adoption_rate': round(industry_rate, 1)
-                                }
-                        
-                        stat, created = AdoptionStatistics.objects.get_or_create(
-                            subsidy_type=subsidy,
-                            year=year,
-                            round_number=round_data['round'],
-                            defaults={
-                                'total_applications': total_apps,
-                                'total_adoptions': total_adoptions,
-                                'adoption_rate': round_data['rate'],
-                                'small_business_applications': small_apps,
-                                'small_business_adoptions': small_adoptions,
-                                'medium_business_applications': medium_apps,
-                                'medium_business_adoptions': medium_adoptions,
-                                'industry_statistics': industry_stats
+            subsidy = subsidies.get(subsidy_name)
+            if subsidy is None:
+                continue
+            
+            for year, rounds_data in years_data.items():
+                for round_data in rounds_data:
+                    # 企業規模別の分布（実際の傾向）
+                    total_apps = round_data['apps']
+                    total_adoptions = round_data['adoptions']
+                    
+                    if '小規模' in subsidy_name:
+                        small_ratio = 0.75  # 小規模事業者持続化補助金は小規模が多い
+                    else:
+                        small_ratio = 0.40  # その他は40%程度
+                    
+                    small_apps = int(total_apps * small_ratio)
+                    medium_apps = total_apps - small_apps
+                    
+                    # 小規模事業者の方が若干採択率が高い傾向
+                    small_rate = round_data['rate'] + random.uniform(2, 8)
+                    medium_rate = round_data['rate'] - random.uniform(1, 4)
+                    
+                    small_adoptions = min(int(small_apps * small_rate / 100), 
+                                        int(total_adoptions * 0.6))
+                    medium_adoptions = total_adoptions - small_adoptions
+                    
+                    # 業種別統計を生成
+                    industry_stats = {}
+                    if subsidy_name in industry_patterns:
+                        for industry, pattern in industry_patterns[subsidy_name].items():
+                            industry_apps = int(total_apps * pattern['share'])
+                            industry_rate = round_data['rate'] + pattern['advantage']
+                            industry_adoptions = min(int(industry_apps * industry_rate / 100),
+                                                   int(total_adoptions * pattern['share'] * 1.2))
+                            
+                            industry_stats[industry] = {
+                                'applications': industry_apps,
+                                'adoptions': industry_adoptions,
+                                'adoption_rate': round(industry_rate, 1)
                             }
-                        )
-                        
-                        if created:
-                            created_count += 1
-                            self.stdout.write(f'  ✓ {subsidy_name} {year}年度第{round_data["round"]}回 採択率{round_data["rate"]}%')
-
-            except SubsidyType.DoesNotExist:
-                self.stdout.write(f'  ⚠️ 補助金が見つかりません: {subsidy_name}')
+                    
+                    importer.add(AdoptionStatistics(
+                        subsidy_type=subsidy,
+                        year=year,
+                        round_number=round_data['round'],
+                        total_applications=total_apps,
+                        total_adoptions=total_adoptions,
+                        adoption_rate=round_data['rate'],
+                        small_business_applications=small_apps,
+                        small_business_adoptions=small_adoptions,
+                        medium_business_applications=medium_apps,
+                        medium_business_adoptions=medium_adoptions,
+                        industry_statistics=industry_stats
+                    ))
         
-        self.stdout.write(f'  ✅ リアルな採択統計データ {created_count}件を作成')
+        self.stdout.write(f'  ✅ リアルな採択統計データ: {importer.close().summary()}')
 
     def load_practical_adoption_tips(self):
         """実用的で具体的な採択ティップスを投入"""
@@ -302,34 +308,30 @@ class Command(BaseCommand):
             }
         ]
 
-        created_count = 0
+        # 同じ補助金・タイトルの既存ティップスはそのまま残す
+        importer = BulkImporter(AdoptionTips, ['subsidy_type', 'title'], chunk_size=self.chunk_size)
+        subsidies = resolve_subsidies(
+            (subsidy_data['subsidy_name'] for subsidy_data in practical_tips), stdout=self.stdout
+        )
         
         for subsidy_data in practical_tips:
-            try:
-                subsidy = SubsidyType.objects.get(name=subsidy_data['subsidy_name'])
-                
-                for tip_data in subsidy_data['tips']:
-                    tip, created = AdoptionTips.objects.get_or_create(
-                        subsidy_type=subsidy,
-                        title=tip_data['title'],
-                        defaults={
-                            'category': tip_data['category'],
-                            'content': tip_data['content'],
-                            'importance': tip_data['importance'],
-                            'effective_timing': tip_data.get('effective_timing', ''),
-                            'reference_url': tip_data.get('reference_url', ''),
-                            'is_success_case': tip_data.get('is_success_case', False)
-                        }
-                    )
-                    
-                    if created:
-                        created_count += 1
-                        self.stdout.write(f'  ✓ {tip_data["title"][:30]}...')
+            subsidy = subsidies.get(subsidy_data['subsidy_name'])
+            if subsidy is None:
+                continue
             
-            except SubsidyType.DoesNotExist:
-                self.stdout.write(f'  ⚠️ 補助金が見つかりません: {subsidy_data["subsidy_name"]}')
+            for tip_data in subsidy_data['tips']:
+                importer.add(AdoptionTips(
+                    subsidy_type=subsidy,
+                    title=tip_data['title'],
+                    category=tip_data['category'],
+                    content=tip_data['content'],
+                    importance=tip_data['importance'],
+                    effective_timing=tip_data.get('effective_timing', ''),
+                    reference_url=tip_data.get('reference_url', ''),
+                    is_success_case=tip_data.get('is_success_case', False)
+                ))
         
-        self.stdout.write(f'  ✅ 実用的な採択ティップス {created_count}件を作成')
+        self.stdout.write(f'  ✅ 実用的な採択ティップス: {importer.close().summary()}')
 
     def load_realistic_application_history(self):
         """リアルなユーザー申請履歴を投入"""
@@ -388,20 +390,28 @@ class Command(BaseCommand):
             ]
         }
 
-        users = []
-        for user_data in realistic_users:
-            user, created = User.objects.get_or_create(
-                username=user_data['username'],
-                defaults={
-                    'email': user_data['email'],
-                    'first_name': user_data['first_name'],
-                    'last_name': user_data['last_name']
-                }
-            )
-            users.append((user, user_data['profile']))
+        # ユーザーは既存のものを残して一括作成し、1クエリで読み直す
+        with BulkImporter(User, ['username'], chunk_size=self.chunk_size) as user_importer:
+            for user_data in realistic_users:
+                user_importer.add(User(
+                    username=user_data['username'],
+                    email=user_data['email'],
+                    first_name=user_data['first_name'],
+                    last_name=user_data['last_name']
+                ))
+        users_by_name = User.objects.in_bulk(
+            [user_data['username'] for user_data in realistic_users], field_name='username'
+        )
+        users = [(users_by_name[user_data['username']], user_data['profile']) for user_data in realistic_users]
 
-        subsidies = SubsidyType.objects.all()
-        created_count = 0
+        subsidies = list(resolve_subsidies().values())
+        if not subsidies:
+            self.stdout.write('  ⚠️ 補助金が登録されていません')
+            return
+        # 同じユーザー・補助金・申請日の既存履歴はそのまま残す
+        importer = BulkImporter(
+            UserApplicationHistory, ['user', 'subsidy_type', 'application_date'], chunk_size=self.chunk_size
+        )
 
         for user, profile in users:
             # 経験レベルに応じた申請件数
@@ -464,22 +474,17 @@ class Command(BaseCommand):
                 else:
                     requested_amount = random.randint(int(max_amount * 0.3), int(max_amount * 0.8))
 
-                history, created = UserApplicationHistory.objects.get_or_create(
+                importer.add(UserApplicationHistory(
                     user=user,
                     subsidy_type=subsidy,
                     application_date=app_date,
-                    defaults={
-                        'application_round': random.randint(1, 3),
-                        'status': status,
-                        'result_date': result_date,
-                        'business_type_at_application': profile['business_type'],
-                        'company_size_at_application': profile['company_size'],
-                        'requested_amount': requested_amount,
-                        'feedback': feedback
-                    }
-                )
-
-                if created:
-                    created_count += 1
+                    application_round=random.randint(1, 3),
+                    status=status,
+                    result_date=result_date,
+                    business_type_at_application=profile['business_type'],
+                    company_size_at_application=profile['company_size'],
+                    requested_amount=requested_amount,
+                    feedback=feedback
+                ))
 
-        self.stdout.write(f'  ✅ リアルな申請履歴 {created_count}件を作成')
\ No newline at end of file
+        self.stdout.write(f'  ✅ リアルな申請履歴: {importer.close().summary()}')
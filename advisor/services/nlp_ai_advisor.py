@@ -5,6 +5,10 @@ import json
 import re
 from django.conf import settings
 from ..models import SubsidyType, Answer, ConversationHistory
+from .subsidy_catalog import get_subsidy_catalog
+from .subsidy_matcher import current_alias_table, get_subsidy_matcher
+from .text_normalization import normalize_text
+from .intent_engine import get_intent_engine, nlp_intent_patterns
 
 class NLPAIAdvisorService:
     """自然言語処理対応の高度なAIアドバイザー（認識精度向上版）"""
@@ -17,150 +21,26 @@ class NLPAIAdvisorService:
             'Content-Type': 'application/json'
         }
         
-        # 補助金データを事前読み込み
-        self.subsidies = list(SubsidyType.objects.all())
         self._initialize_nlp_patterns()
     
+    @property
+    def subsidies(self):
+        """補助金データ（プロセス共有カタログから取得）"""
+        return get_subsidy_catalog().subsidies
+    
+    @property
+    def subsidy_aliases(self):
+        """補助金エイリアス辞書（照合エンジンが読み込み済みの表。管理コマンドの確認用）"""
+        return current_alias_table().aliases
+    
+    @property
+    def intent_patterns(self):
+        """質問の意図分類パターン（確認用。判定は共通の意図判定エンジンで行う）"""
+        return nlp_intent_patterns(self.subsidy_aliases)
+    
     def _initialize_nlp_patterns(self):
         """自然言語パターンを初期化"""
         
-        # 完全版補助金エイリアス辞書（現在の全補助金に対応）
-        self.subsidy_aliases = {
-            'IT導入補助金': [
-                'it導入', 'ＩＴ導入', 'アイティー導入', 'ITツール', 'デジタル化補助',
-                'it導入補助金', 'IT導入補助金', 'ITシステム', 'ソフトウェア補助',
-                'デジタル補助', 'システム導入', 'デジタル化支援', 'デジタル化',
-                'システム化', 'IT化', 'デジタル変革', 'dx'
-            ],
-            'IT導入補助金2025': [
-                'it導入', 'ＩＴ導入', 'アイティー導入', 'ITツール', 'デジタル化補助',
-                'it導入補助金', 'IT導入補助金', 'ITシステム', 'ソフトウェア補助',
-                'デジタル補助', 'システム導入', 'デジタル化支援', 'デジタル化',
-                'システム化', 'IT化', 'デジタル変革', 'dx', 'it導入2025'
-            ],
-            'ものづくり補助金': [
-                'ものづくり', '製造補助', '設備投資', '生産性向上', 'ものづくり補助金',
-                '革新的サービス', '試作品開発', '生産プロセス改善', '設備更新',
-                '製造業補助', '機械設備', '製造', '工場', '生産'
-            ],
-            '小規模事業者持続化補助金【一般型】': [
-                '持続化', '小規模持続', '販路開拓', '小規模事業者', '持続化補助金',
-                '持続化一般', '一般型持続化', '販路拡大', '認知度向上',
-                '小規模補助', '販促支援', '小規模事業者持続化補助金',
-                '販路', '販売促進', '営業支援'
-            ],
-            '小規模事業者持続化補助金【創業型】': [
-                '持続化創業', '創業型持続化', '創業補助', '新規開業', '起業支援',
-                '創業5年', 'スタートアップ支援', '創業期補助', '創業支援',
-                '起業補助', '小規模事業者持続化補助金創業型', '創業',
-                '起業', 'スタートアップ', '新規事業'
-            ],
-            '省力化投資補助金': [
-                '省力化', '省力化投資', '人手不足解消', '自動化', '効率化投資',
-                'IoT補助', 'AI導入', 'ロボット導入', '省人化', '労働力不足',
-                '人材不足対策', '自動化設備', '省力化投資補助金',
-                '人手不足', '自動化システム', 'iot', 'ai', 'ロボット'
-            ],
-            '事業承継・M&A補助金': [
-                '事業承継', '承継補助', '引継ぎ', '後継者', '事業承継補助金',
-                'M&A補助', '買収補助', '経営承継', '世代交代', '事業引継ぎ',
-                'ma補助', 'エムアンドエー', '事業承継・M&A補助金',
-                '承継', '後継', 'ma', 'm&a'
-            ],
-            '新事業進出補助金': [
-                '新事業', '新分野進出', '事業拡大', '多角化', '新商品開発',
-                '新サービス', '市場開拓', '事業転換', '新規事業',
-                '分野拡大', '新事業進出補助金', '新分野', '多角化'
-            ],
-            '成長加速化補助金': [
-                '成長加速', '成長促進', '事業拡大', 'スケールアップ', '競争力強化',
-                'グローバル展開', '海外進出', '人材育成補助', '成長支援',
-                '拡大支援', '成長加速化補助金', '成長', '拡大', 'グローバル'
-            ],
-            '省エネ診断・省エネ・非化石転換補助金': [
-                '省エネ', '省エネルギー', '非化石', 'カーボンニュートラル', '脱炭素',
-                '再生可能エネルギー', 'CO2削減', '環境対応', 'グリーン化',
-                '省エネ設備', '環境補助', '省エネ診断', '環境',
-                'カーボン', '脱炭素化', 'co2'
-            ],
-            '雇用調整助成金': [
-                '雇用調整', '雇調金', '休業補償', '雇用維持', '労働者支援',
-                '一時休業', '事業縮小', '雇用安定', '雇用助成',
-                '休業手当', '雇用調整助成金', '休業', '雇用'
-            ],
-            '業務改善助成金': [
-                '業務改善', '賃金引上げ', '最低賃金', '生産性向上', '働き方改革',
-                '労働環境改善', '設備改善', '職場改善', '賃上げ',
-                '労働条件改善', '業務改善助成金', '賃金', '最低賃金'
-            ],
-            '創業助成金': [
-                '創業', '起業', 'スタートアップ', '新規開業', '開業支援',
-                '創業支援', '起業助成', '新規事業', '開業助成', '創業助成金'
-            ],
-            '事業再構築補助金': [
-                '再構築', '事業転換', '新分野展開', '業態転換', '事業再構築補助金',
-                'V字回復', '事業変革', '構造改革', 'ピボット', '転換'
-            ],
-            '事業承継・引継ぎ補助金': [
-                '事業承継', '承継補助', '引継ぎ補助金', '後継者支援'
-            ],
-            '小規模事業者持続化補助金': [
-                '持続化', '小規模事業者補助'
-            ]
-        }
-        
-        # 質問の意図分類パターン
-        self.intent_patterns = {
-            'overview': {
-                'patterns': [
-                    r'補助金.*とは', r'補助金.*について.*教え', r'補助金.*仕組み',
-                    r'どんな.*補助金', r'補助金.*種類', r'補助金.*概要',
-                    r'補助金.*全般', r'補助金.*基本', r'補助金.*説明'
-                ],
-                'keywords': ['とは', '教えて', '説明', '仕組み', '種類', '概要', '全般', '基本']
-            },
-            'specific_subsidy': {
-                'patterns': [],  # 動的に生成
-                'keywords': []   # 動的に生成
-            },
-            'application_process': {
-                'patterns': [
-                    r'申請.*方法', r'申請.*手順', r'申請.*やり方', r'申請.*流れ',
-                    r'どう.*申請', r'申請.*について', r'申請.*したい',
-                    r'必要.*書類', r'書類.*何', r'提出.*書類',
-                    r'期限.*いつ', r'締切.*いつ', r'いつまで.*申請'
-                ],
-                'keywords': ['申請', '手順', 'やり方', '流れ', '書類', '期限', '締切', '提出']
-            },
-            'requirements': {
-                'patterns': [
-                    r'要件.*何', r'条件.*何', r'資格.*何', r'対象.*何',
-                    r'使える.*か', r'対象.*なる', r'該当.*する',
-                    r'うちの.*会社.*対象', r'弊社.*対象', r'当社.*使える'
-                ],
-                'keywords': ['要件', '条件', '資格', '対象', '該当', '使える', '適用']
-            },
-            'strategy': {
-                'patterns': [
-                    r'採択.*され.*方法', r'通り.*やすい', r'成功.*方法',
-                    r'採択率.*上げ', r'確率.*高め', r'勝つ.*方法',
-                    r'コツ.*教え', r'秘訣.*教え', r'戦略.*教え'
-                ],
-                'keywords': ['採択', '成功', '確率', 'コツ', '秘訣', '戦略', '差別化', '競合', '有利']
-            },
-            'amount_rate': {
-                'patterns': [
-                    r'いくら.*もらえ', r'金額.*いくら', r'補助額.*いくら',
-                    r'最大.*いくら', r'上限.*いくら', r'限度額.*いくら',
-                    r'補助率.*いくら', r'何割.*補助', r'何パーセント.*補助'
-                ],
-                'keywords': ['いくら', '金額', '補助額', '最大', '上限', '限度額', '補助率', '何割', 'パーセント']
-            }
-        }
-        
-        # specific_subsidy の動的パターン生成
-        self._generate_dynamic_patterns()
-        
         # 感情・丁寧度の分析
         self.tone_patterns = {
             'polite': [r'いただけ', r'お聞かせ', r'お教え', r'恐れ入り', r'申し訳', r'よろしく'],
@@ -169,26 +49,6 @@ class NLPAIAdvisorService:
             'confused': [r'分から', r'よく.*理解', r'難し', r'複雑', r'混乱']
         }
 
-    def _generate_dynamic_patterns(self):
-        """エイリアス辞書から動的にパターンを生成"""
-        patterns = []
-        keywords = []
-        
-        for subsidy_name, aliases in self.subsidy_aliases.items():
-            # 正式名称をパターンに追加
-            escaped_name = re.escape(subsidy_name)
-            patterns.append(escaped_name)
-            
-            # キーワードとして主要部分を抽出
-            main_keywords = subsidy_name.replace('補助金', '').replace('助成金', '').split('・')
-            keywords.extend([kw.strip() for kw in main_keywords if kw.strip()])
-            
-            # エイリアスもキーワードに追加
-            keywords.extend(aliases)
-        
-        self.intent_patterns['specific_subsidy']['patterns'] = patterns
-        self.intent_patterns['specific_subsidy']['keywords'] = list(set(keywords))
-
     def analyze_question(self, question_text, user_context=None):
         """自然言語解析による質問分析（完全版エイリアス対応）"""
         
@@ -212,67 +72,30 @@ class NLPAIAdvisorService:
         return response
 
     def _identify_target_subsidy_enhanced(self, question_text):
-        """拡張エイリアスを使用した補助金特定（改良版）"""
-        question_lower = question_text.lower()
-        
-        # 正規化処理（全角→半角、記号除去など）
-        normalized_question = self._normalize_text(question_lower)
+        """拡張エイリアスを使用した補助金特定（照合エンジン版）"""
+        # 正規化済みの質問を1回だけ走査
+        normalized_question = self._normalize_text(question_text)
+        exact_names, subsidy_scores = get_subsidy_matcher().scan(normalized_question, normalized=True)
         
         # Step 1: 正式名称での完全一致
-        for subsidy in self.subsidies:
-            subsidy_normalized = self._normalize_text(subsidy.name.lower())
-            if subsidy_normalized in normalized_question:
-                return subsidy
-        
-        # Step 2: エイリアス辞書を使用した特定（スコアベース）
-        subsidy_scores = {}
-        
-        for subsidy_name, aliases in self.subsidy_aliases.items():
-            score = 0
-            
-            # 正式名称での部分マッチ
-            main_parts = subsidy_name.replace('補助金', '').replace('助成金', '').split('・')
-            for part in main_parts:
-                if part and self._normalize_text(part.lower()) in normalized_question:
-                    score += 5
-            
-            # エイリアスでのマッチ
-            for alias in aliases:
-                alias_normalized = self._normalize_text(alias.lower())
-                if alias_normalized in normalized_question:
-                    # エイリアスの長さに応じてスコア調整（長いほど高スコア）
-                    score += max(1, len(alias_normalized) // 2)
-            
-            if score > 0:
-                subsidy_scores[subsidy_name] = score
+        subsidies_by_name = get_subsidy_catalog().by_name
+        for name in exact_names:
+            if name in subsidies_by_name:
+                return subsidies_by_name[name]
         
-        # 最高スコアの補助金を返す
+        # Step 2: エイリアススコアが最高の補助金を返す
         if subsidy_scores:
             best_match = max(subsidy_scores.keys(), key=lambda x: subsidy_scores[x])
-            try:
-                return SubsidyType.objects.get(name=best_match)
-            except SubsidyType.DoesNotExist:
-                pass
+            subsidy = get_subsidy_catalog().by_name.get(best_match)
+            if subsidy:
+                return subsidy
         
         # Step 3: パターンマッチングによる推定（フォールバック）
         return self._pattern_based_identification(question_text)
 
     def _normalize_text(self, text):
         """テキスト正規化（全角→半角、記号除去など）"""
-        # 全角英数字を半角に変換
-        text = text.translate(str.maketrans(
-            'ＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺ'
-            'ａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｖｗｘｙｚ'
-            '０１２３４５６７８９',
-            'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
-            'abcdefghijklmnopqrstuvwxyz'
-            '0123456789'
-        ))
-        
-        # 記号・空白を除去
-        text = re.sub(r'[^\w]', '', text)
-        
-        return text
+        return normalize_text(text)
 
     def _pattern_based_identification(self, question_text):
         """パターンベースの補助金特定（フォールバック）"""
@@ -318,45 +141,31 @@ class NLPAIAdvisorService:
             (r'再構築|転換|ピボット|業態転換', ['事業再構築補助金'])
         ]
         
+        catalog = get_subsidy_catalog()
         for pattern, candidate_names in patterns:
             if re.search(pattern, normalized_question):
                 # 候補の中からデータベースに存在するものを返す
                 for name in candidate_names:
-                    try:
-                        return SubsidyType.objects.get(name=name)
-                    except SubsidyType.DoesNotExist:
-                        continue
+                    subsidy = catalog.by_name.get(name)
+                    if subsidy:
+                        return subsidy
         
         return None
 
     def _analyze_intent(self, question_text):
         """質問の意図を分析"""
-        question_lower = question_text.lower()
-        intent_scores = {}
+        # パターン・キーワードのスコアは1回の走査でまとめて求める
+        results = get_intent_engine().analyze(question_text, schemes=('nlp', 'nlp_detail'))
+        intent_scores = dict(results['nlp'].scores)
         
         # 補助金が特定されているかチェック
         has_specific_subsidy = self._identify_target_subsidy_enhanced(question_text) is not None
         
-        for intent_type, config in self.intent_patterns.items():
-            score = 0
-            
-            # パターンマッチング
-            for pattern in config['patterns']:
-                if re.search(pattern, question_text):
-                    score += 3
-            
-            # キーワードマッチング
-            for keyword in config['keywords']:
-                if keyword.lower() in question_lower:
-                    score += 1
-            
-            intent_scores[intent_type] = score
-        
         # 特定の補助金が識別された場合の重み調整
         if has_specific_subsidy:
             intent_scores['specific_subsidy'] += 5
             
-            if re.search(r'について.*教え|を.*教え|の.*詳細|詳しく', question_text):
+            if results['nlp_detail'].first():
                 intent_scores['specific_subsidy'] += 10
         
         # 最高スコアの意図を返す
@@ -0,0 +1,139 @@
+# advisor/services/probability_matrix.py - 採択確率の一括計算（N プロファイル × M 補助金）
+
+import numpy as np
+from django.db.models import Avg
+
+from ..models import SubsidyType, AdoptionStatistics
+
+PROFILE_FIELDS = ('business_type', 'company_size', 'experience', 'support_agency')
+MIN_PROBABILITY = 5.0
+MAX_PROBABILITY = 95.0
+
+
+class AdoptionProbabilityMatrix:
+    """一括計算の結果
+
+    probabilities[i, j] は profiles[i] の subsidies[j] に対する採択確率（%）。
+    """
+
+    def __init__(self, subsidies, base_rates, probabilities):
+        self.subsidies = list(subsidies)
+        self.base_rates = base_rates
+        self.probabilities = probabilities
+
+    @property
+    def shape(self):
+        return self.probabilities.shape
+
+    def best(self):
+        """各プロファイルで最も確率の高い補助金の列番号と確率"""
+        if not self.subsidies:
+            count = self.probabilities.shape[0]
+            return np.full(count, -1), np.zeros(count)
+        columns = self.probabilities.argmax(axis=1)
+        return columns, self.probabilities[np.arange(len(columns)), columns]
+
+    def top_k(self, k):
+        """各プロファイルの上位 k 件の列番号（確率の降順）"""
+        k = min(k, len(self.subsidies))
+        if k == 0:
+            return np.empty((self.probabilities.shape[0], 0), dtype=int)
+        columns = np.argpartition(-self.probabilities, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(-self.probabilities, columns, axis=1).argsort(axis=1, kind='stable')
+        return np.take_along_axis(columns, order, axis=1)
+
+
+class ProbabilityTables:
+    """補助金ごとの基本確率と調整テーブルを事前計算したもの
+
+    calculate_adoption_probability の逐次調整（業種・企業規模・経験・支援機関）と
+    同じ値を、プロファイル側の値をカテゴリ番号に変換して行列演算で求める。
+    """
+
+    def __init__(self, service, subsidies=None):
+        self.service = service
+        if subsidies is None:
+            subsidies = SubsidyType.objects.filter(is_active=True).order_by('id')
+        self.subsidies = list(subsidies)
+
+        average_rates = dict(
+            AdoptionStatistics.objects.filter(
+                subsidy_type__in=[subsidy.pk for subsidy in self.subsidies],
+                year__gte=service.current_year - 2,
+            ).order_by().values('subsidy_type_id').annotate(avg_rate=Avg('adoption_rate'))
+            .values_list('subsidy_type_id', 'avg_rate')
+        )
+        self.base_rates = np.array([
+            average_rates.get(subsidy.pk) or service.DEFAULT_BASE_PROBABILITY
+            for subsidy in self.subsidies
+        ], dtype=np.float64)
+
+        # 業種 × 補助金の調整表（最終行は表に無い業種用の0）
+        self.business_types = sorted({
+            business_type
+            for adjustments in service.BUSINESS_TYPE_ADJUSTMENTS.values()
+            for business_type in adjustments
+        })
+        self.business_index = {business_type: i for i, business_type in enumerate(self.business_types)}
+        self.business_table = np.zeros((len(self.business_types) + 1, len(self.subsidies)), dtype=np.float64)
+        for column, subsidy in enumerate(self.subsidies):
+            for business_type, adjustment in service.BUSINESS_TYPE_ADJUSTMENTS.get(subsidy.name, {}).items():
+                self.business_table[self.business_index[business_type], column] = adjustment
+
+    def _encode(self, values, mapper):
+        """値の種類ごとに一度だけ mapper を呼んで配列化"""
+        cache = {}
+        return np.array([
+            cache[value] if value in cache else cache.setdefault(value, mapper(value))
+            for value in values
+        ])
+
+    def score(self, profiles):
+        """profiles（dict のリスト）を採点して N×M の確率行列を返す"""
+        profiles = list(profiles)
+        service = self.service
+        unknown_business = len(self.business_types)
+
+        business_rows = self._encode(
+            (profile.get('business_type') or '' for profile in profiles),
+            lambda value: self.business_index.get(value, unknown_business),
+        ).astype(np.intp, copy=False)
+        profile_adjustments = (
+            self._encode(
+                (profile.get('company_size') or '' for profile in profiles),
+                lambda value: service._get_company_size_adjustment(value, None),
+            )
+            + self._encode(
+                (profile.get('experience') or 'none' for profile in profiles),
+                service._get_experience_adjustment,
+            )
+            + self._encode(
+                (profile.get('support_agency') or 'none' for profile in profiles),
+                service._get_support_adjustment,
+            )
+        ).astype(np.float64, copy=False).reshape(-1, 1)
+
+        if not profiles:
+            probabilities = np.empty((0, len(self.subsidies)), dtype=np.float64)
+        else:
+            probabilities = self.base_rates + self.business_table[business_rows] + profile_adjustments
+            np.clip(probabilities, MIN_PROBABILITY, MAX_PROBABILITY, out=probabilities)
+
+        return AdoptionProbabilityMatrix(self.subsidies, self.base_rates, probabilities)
+
+
+def score_profiles(profiles, subsidies=None, service=None):
+    """N 件のプロファイル × M 件の補助金の採択確率行列を計算
+
+    Args:
+        profiles: {'business_type', 'company_size', 'experience', 'support_agency'} の dict のリスト
+        subsidies: 対象補助金（省略時は有効な全補助金）
+        service: EnhancedAdoptionAnalysisService（調整テーブルの取得元）
+
+    Returns:
+        AdoptionProbabilityMatrix
+    """
+    if service is None:
+        from .enhanced_adoption_analysis import EnhancedAdoptionAnalysisService
+        service = EnhancedAdoptionAnalysisService()
+    return ProbabilityTables(service, subsidies).score(profiles)
@@ -0,0 +1,342 @@
+# advisor/services/recommendation.py - 補助金レコメンドエンジン
+
+import heapq
+import math
+import threading
+import time
+
+import numpy as np
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .snapshot_version import reload_interval, table_version
+from .subsidy_catalog import get_subsidy_catalog
+from .subsidy_matcher import get_subsidy_matcher
+
+# 業種 → 補助金名・説明に含まれると適合とみなすキーワード
+BUSINESS_KEYWORDS = {
+    'IT': ('IT', 'デジタル', 'ソフトウェア', 'システム'),
+    '製造': ('ものづくり', '設備', '省力化', '生産', '省エネ'),
+    '建設': ('省力化', '設備', '省エネ', '事業再構築'),
+    'サービス': ('持続化', '販路', 'IT', '業務改善'),
+    '小売': ('持続化', '販路', 'IT'),
+    '卸売': ('IT', '省力化', '販路'),
+    '飲食': ('持続化', '販路', '業務改善', '省力化'),
+    '創業': ('創業',),
+}
+
+# 企業規模 → (対象に含まれれば完全一致とするキーワード, 対象に含まれれば対象内とするキーワード)
+SIZE_KEYWORDS = {
+    '小規模': (('小規模',), ('中小企業', '事業主')),
+    '中小': (('中小企業',), ('事業主',)),
+    '中堅': (('中堅',), ('事業主',)),
+    '創業': (('創業',), ()),
+}
+
+# 各特徴量の重み（点数）
+WEIGHTS = {
+    'keyword_exact': 40.0,
+    'keyword_alias': 3.0,
+    'keyword_alias_max': 30.0,
+    'business_type': 20.0,
+    'company_size': 10.0,
+    'success_rate': 15.0,
+    'difficulty': 5.0,
+    'amount': 5.0,
+    'amount_fit': 10.0,
+    'schedule': 10.0,
+}
+
+STATIC_FEATURES = ('success_rate', 'difficulty', 'amount', 'schedule')
+
+REASON_LABELS = {
+    'keyword': '質問内容に一致',
+    'business_type': '業種に適合',
+    'company_size': '企業規模が対象',
+    'success_rate': '採択率が高い',
+    'difficulty': '申請難易度が低い',
+    'amount': '補助上限額が大きい',
+    'amount_fit': '投資予定額をカバー',
+    'schedule': '公募時期が近い',
+}
+
+
+def _months_until(month, months):
+    """month から次の申請月までの月数（0 = 当月）。申請月が不明なら None"""
+    months = [m for m in months or [] if isinstance(m, int) and 1 <= m <= 12]
+    if not months:
+        return None
+    return min((m - month) % 12 for m in months)
+
+
+def _category(value, categories):
+    """自由入力の業種・規模をカテゴリ名に変換（該当なしは None）"""
+    if not value:
+        return None
+    for category in categories:
+        if category in value:
+            return category
+    return None
+
+
+class RecommendationEngine:
+    """補助金カタログ全体を質問・ユーザー文脈で採点し、上位 k 件を返す
+
+    補助金ごとの特徴量（採択率・難易度・上限額・公募時期・業種/規模適合）は
+    構築時に行列として前計算する。質問に依存しない事前スコアは
+    （業種, 規模）の組み合わせごとに降順の並びをキャッシュし、質問でヒットした
+    補助金だけを加点して候補に加えるため、1回の推薦は
+    O(ヒット数 + k) でカタログ件数に依存しない。
+    """
+
+    def __init__(self, subsidies, today=None, schedules=None):
+        self.subsidies = tuple(subsidies)
+        self.today = today or timezone.localdate()
+        self.index = {subsidy.name: i for i, subsidy in enumerate(self.subsidies)}
+        count = len(self.subsidies)
+
+        # 質問・文脈に依存しない特徴量（0〜1）
+        max_amount = max((subsidy.max_amount or 0 for subsidy in self.subsidies), default=0)
+        self.features = np.zeros((count, len(STATIC_FEATURES)), dtype=np.float64)
+        for i, subsidy in enumerate(self.subsidies):
+            self.features[i] = (
+                min(1.0, max(0.0, subsidy.historical_success_rate or 0.0)),
+                (5 - min(5, max(1, subsidy.application_difficulty or 3))) / 4,
+                math.log1p(subsidy.max_amount or 0) / math.log1p(max_amount) if max_amount else 0.0,
+                self._schedule_feature(subsidy, self.today, schedules),
+            )
+        self.weights = np.array([WEIGHTS[name] for name in STATIC_FEATURES])
+        self.static_scores = self.features @ self.weights
+
+        # 業種・規模カテゴリ × 補助金の適合表（先頭行はカテゴリ不明 = 0）
+        self.business_categories = (None,) + tuple(BUSINESS_KEYWORDS)
+        self.business_table = np.zeros((len(self.business_categories), count))
+        self.size_categories = (None,) + tuple(SIZE_KEYWORDS)
+        self.size_table = np.zeros((len(self.size_categories), count))
+        for i, subsidy in enumerate(self.subsidies):
+            text = f'{subsidy.name} {subsidy.description}'
+            for row, category in enumerate(self.business_categories[1:], start=1):
+                if any(keyword in text for keyword in BUSINESS_KEYWORDS[category]):
+                    self.business_table[row, i] = 1.0
+            target = subsidy.target_business_type or ''
+            for row, category in enumerate(self.size_categories[1:], start=1):
+                exact, eligible = SIZE_KEYWORDS[category]
+                if any(keyword in target for keyword in exact):
+                    self.size_table[row, i] = 1.0
+                elif any(keyword in target for keyword in eligible):
+                    self.size_table[row, i] = 0.5
+                elif target:
+                    self.size_table[row, i] = -0.5
+
+        self._prior_order = {}
+        self._prior_lock = threading.Lock()
+
+    @staticmethod
+    def _schedule_feature(subsidy, today, schedules):
+        """公募中 = 1、以降は次の公募までの月数に応じて減衰"""
+        upcoming = (schedules or {}).get(subsidy.pk)
+        if upcoming is not None:
+            start, end = upcoming
+            if start <= today <= end:
+                return 1.0
+            months = (start.year - today.year) * 12 + start.month - today.month
+        else:
+            months = _months_until(today.month, subsidy.typical_application_months)
+        if months is None:
+            return 0.0
+        return max(0.0, 1.0 - months / 12)
+
+    def _context_rows(self, user_context):
+        user_context = user_context or {}
+        business = _category(user_context.get('business_type') or '', BUSINESS_KEYWORDS)
+        size = _category(user_context.get('company_size') or '', SIZE_KEYWORDS)
+        return self.business_categories.index(business), self.size_categories.index(size)
+
+    def _prior(self, business_row, size_row):
+        return (
+            self.static_scores
+            + WEIGHTS['business_type'] * self.business_table[business_row]
+            + WEIGHTS['company_size'] * self.size_table[size_row]
+        )
+
+    def _prior_ranking(self, business_row, size_row):
+        """（業種, 規模）ごとの事前スコアと降順の並び（初回のみ計算）"""
+        key = (business_row, size_row)
+        cached = self._prior_order.get(key)
+        if cached is None:
+            prior = self._prior(business_row, size_row)
+            order = np.argsort(-prior, kind='stable').tolist()
+            cached = (prior.tolist(), order)
+            with self._prior_lock:
+                self._prior_order[key] = cached
+        return cached
+
+    def _keyword_scores(self, question):
+        """質問で言及された補助金への加点 {列番号: 点数}"""
+        if not question:
+            return {}
+        exact_names, alias_scores = get_subsidy_matcher().scan(question)
+        scores = {}
+        for name, score in alias_scores.items():
+            i = self.index.get(name)
+            if i is not None:
+                scores[i] = min(WEIGHTS['keyword_alias_max'], WEIGHTS['keyword_alias'] * score)
+        for name in exact_names:
+            i = self.index.get(name)
+            if i is not None:
+                scores[i] = scores.get(i, 0.0) + WEIGHTS['keyword_exact']
+        return scores
+
+    def _amount_fit(self, budget):
+        """投資予定額（万円）に対する上限額の充足度（0〜1）"""
+        return np.array([
+            min(1.0, (subsidy.max_amount or 0) / budget) for subsidy in self.subsidies
+        ])
+
+    def recommend(self, question='', user_context=None, k=3, explain=False, month=None):
+        """上位 k 件の補助金を返す
+
+        Args:
+            question: ユーザーの質問（補助金名・エイリアスのヒットで加点）
+            user_context: business_type / company_size / budget（投資予定額・万円）
+            k: 件数
+            explain: True の場合、スコア内訳と理由を含む dict のリストを返す
+            month: 公募時期の評価に使う月（省略時は構築日の月）
+
+        Returns:
+            list[SubsidyType] または explain=True の場合 list[dict]
+        """
+        if not self.subsidies or k <= 0:
+            return []
+
+        business_row, size_row = self._context_rows(user_context)
+        keyword_scores = self._keyword_scores(question)
+        try:
+            budget = float((user_context or {}).get('budget') or 0) or None
+        except (TypeError, ValueError):
+            budget = None
+
+        if budget or month:
+            # 連続値・月指定は事前の並びを使えないため全件をヒープで選ぶ
+            scores = self._prior(business_row, size_row)
+            if month:
+                scores = scores + WEIGHTS['schedule'] * (self._month_schedule(month) - self.features[:, 3])
+            if budget:
+                scores = scores + WEIGHTS['amount_fit'] * self._amount_fit(budget)
+            scores = scores.tolist()
+            for i, bonus in keyword_scores.items():
+                scores[i] += bonus
+            top = heapq.nlargest(k, range(len(scores)), key=lambda i: (scores[i], -i))
+        else:
+            prior, order = self._prior_ranking(business_row, size_row)
+            candidates = set(keyword_scores)
+            candidates.update(order[:k])
+            top = heapq.nlargest(
+                k, candidates, key=lambda i: (prior[i] + keyword_scores.get(i, 0.0), -i)
+            )
+
+        if not explain:
+            return [self.subsidies[i] for i in top]
+        return [self._explain(i, business_row, size_row, keyword_scores, budget, month) for i in top]
+
+    def _month_schedule(self, month):
+        return np.array([
+            max(0.0, 1.0 - months / 12) if months is not None else 0.0
+            for months in (_months_until(month, subsidy.typical_application_months) for subsidy in self.subsidies)
+        ])
+
+    def _explain(self, i, business_row, size_row, keyword_scores, budget, month):
+        contributions = {name: float(self.features[i, j] * self.weights[j]) for j, name in enumerate(STATIC_FEATURES)}
+        if month:
+            contributions['schedule'] = float(WEIGHTS['schedule'] * self._month_schedule(month)[i])
+        contributions['keyword'] = float(keyword_scores.get(i, 0.0))
+        contributions['business_type'] = float(WEIGHTS['business_type'] * self.business_table[business_row, i])
+        contributions['company_size'] = float(WEIGHTS['company_size'] * self.size_table[size_row, i])
+        if budget:
+            contributions['amount_fit'] = float(WEIGHTS['amount_fit'] * self._amount_fit(budget)[i])
+
+        reasons = [
+            REASON_LABELS[name]
+            for name, value in sorted(contributions.items(), key=lambda item: -item[1])
+            if value >= 5.0
+        ]
+        return {
+            'subsidy': self.subsidies[i],
+            'score': round(sum(contributions.values()), 2),
+            'contributions': {name: round(value, 2) for name, value in contributions.items()},
+            'reasons': reasons,
+        }
+
+
+_engine = None
+_engine_expires_at = 0.0
+_engine_lock = threading.Lock()
+
+
+def subsidy_schedule_version():
+    from ..models import SubsidySchedule
+    return table_version(SubsidySchedule, 'updated_at')
+
+
+def _load_upcoming_schedules(today):
+    """補助金ごとに次の（または公募中の）公募期間を1クエリで取得"""
+    from ..models import SubsidySchedule
+    schedules = {}
+    try:
+        rows = SubsidySchedule.objects.filter(
+            application_end_date__gte=today
+        ).exclude(status='closed').order_by('application_start_date').values_list(
+            'subsidy_type_id', 'application_start_date', 'application_end_date'
+        )
+        for subsidy_id, start, end in rows:
+            schedules.setdefault(subsidy_id, (start, end))
+    except DatabaseError as e:
+        print(f"[WARNING] RecommendationEngine: 公募スケジュール取得失敗 ({e})")
+    return schedules
+
+
+def _is_current(engine, catalog, today):
+    return engine is not None and engine.catalog is catalog and engine.today == today
+
+
+def get_recommendation_engine():
+    """プロセス共有のレコメンドエンジンを取得
+
+    補助金カタログ更新時・日付変更時に再構築する。公募スケジュールは
+    SNAPSHOT_RELOAD_INTERVAL 秒ごとに件数・最大ID・最終更新日時を確認し、他プロセスでの変更も取り込む。
+    """
+    global _engine, _engine_expires_at
+    catalog = get_subsidy_catalog()
+    # サーバーの OS タイムゾーンではなく TIME_ZONE（Asia/Tokyo）の日付で締切・残り日数を計算
+    today = timezone.localdate()
+    engine = _engine
+    if _is_current(engine, catalog, today) and time.monotonic() < _engine_expires_at:
+        return engine
+
+    with _engine_lock:
+        if _is_current(_engine, catalog, today) and time.monotonic() < _engine_expires_at:
+            return _engine
+        try:
+            version = subsidy_schedule_version()
+        except DatabaseError as e:
+            print(f"[WARNING] RecommendationEngine: 公募スケジュール取得失敗 ({e})")
+            version = None
+        if not _is_current(_engine, catalog, today) or _engine.schedule_version != version:
+            engine = RecommendationEngine(catalog.active_subsidies, today, _load_upcoming_schedules(today))
+            engine.catalog = catalog
+            engine.schedule_version = version
+            _engine = engine
+        _engine_expires_at = time.monotonic() + reload_interval()
+        return _engine
+
+
+def invalidate_recommendation_engine(**kwargs):
+    """公募スケジュール変更時にエンジンを破棄する"""
+    global _engine
+    with _engine_lock:
+        _engine = None
+
+
+def recommend_subsidies(question='', user_context=None, k=3, explain=False, month=None):
+    """質問・ユーザー文脈に最も適した補助金の上位 k 件"""
+    return get_recommendation_engine().recommend(question, user_context, k=k, explain=explain, month=month)
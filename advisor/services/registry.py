@@ -0,0 +1,74 @@
+# advisor/services/registry.py - ワーカー単位のサービスレジストリ
+
+import logging
+import threading
+import time
+
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+    """アドバイザーサービスをワーカーごとに1度だけ構築して共有する
+
+    Django のクラスベースビューはリクエストごとにインスタンス化されるため、
+    サービスをビュー側で生成すると毎回初期化コストがかかる。
+    ここで遅延・スレッドセーフに構築し、構築時間を記録する。
+    """
+
+    def __init__(self):
+        self._services = {}
+        self._stats = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(service_class):
+        return f"{service_class.__module__}.{service_class.__qualname__}"
+
+    def get(self, service_class):
+        """サービスを取得（未構築なら構築）"""
+        key = self._key(service_class)
+        service = self._services.get(key)
+        if service is not None:
+            return service
+
+        with self._lock:
+            service = self._services.get(key)
+            if service is None:
+                start = time.perf_counter()
+                service = service_class()
+                elapsed = time.perf_counter() - start
+
+                self._services[key] = service
+                self._stats[key] = {
+                    'service': service_class.__name__,
+                    'construction_ms': round(elapsed * 1000, 3),
+                    'constructed_at': timezone.now().isoformat(),
+                }
+                logger.debug("%s constructed in %.1fms", service_class.__name__, elapsed * 1000)
+            return service
+
+    def stats(self):
+        """構築済みサービスの構築時間一覧"""
+        with self._lock:
+            return [dict(stat) for stat in self._stats.values()]
+
+    def reset(self, service_class=None):
+        """構築済みサービスを破棄（テスト・設定変更時用）"""
+        with self._lock:
+            if service_class is None:
+                self._services.clear()
+                self._stats.clear()
+            else:
+                key = self._key(service_class)
+                self._services.pop(key, None)
+                self._stats.pop(key, None)
+
+
+service_registry = ServiceRegistry()
+
+
+def get_service(service_class):
+    """ワーカー共有のサービスインスタンスを取得"""
+    return service_registry.get(service_class)
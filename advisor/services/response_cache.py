@@ -0,0 +1,266 @@
+# advisor/services/response_cache.py - Dify 回答キャッシュ
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .intent_engine import get_intent_engine
+from .snapshot_version import reload_interval, table_version
+from .subsidy_matcher import get_subsidy_matcher
+from .text_normalization import normalize_text
+
+# 質問の言い回しの違い（丁寧表現・助詞）を吸収するための除去パターン
+_POLITE_ENDING_RE = re.compile(
+    r'(について|に関して|をおしえてください|を教えてください|おしえてください|教えてください'
+    r'|を教えて|教えて|ください|でしょうか|ですか|ますか|とは)'
+)
+# 漢字・カタカナ・英数字に挟まれた（または末尾の）単独の助詞
+_PARTICLE_RE = re.compile(r'(?<=[^ぁ-ゖ])[はがをのにでへとも](?=[^ぁ-ゖ]|$)')
+_TRAILING_KA_RE = re.compile(r'(?<=[^ぁ-ゖ])か$')
+
+
+def normalize_question(question):
+    """キャッシュキー用の質問正規化
+
+    normalize_text（全角→半角・記号除去）に加えて、丁寧表現と単独の助詞を除去する。
+    例: 「IT導入補助金の申請方法」「ＩＴ導入補助金 申請方法は？」→「it導入補助金申請方法」
+    """
+    text = normalize_text(question)
+    text = _POLITE_ENDING_RE.sub('', text)
+    text = _PARTICLE_RE.sub('', text)
+    return _TRAILING_KA_RE.sub('', text)
+
+
+def make_cache_key(namespace, question, subsidy=None, intent=None, context=None):
+    """正規化した質問・対象補助金・意図（と回答に影響する文脈）からキーを生成
+
+    subsidy を省略した場合は補助金照合器で、intent を省略した場合は意図判定器で検出する
+    （助詞を除去するため、意図の異なる質問が同じキーにならないよう意図もキーに含める）。
+    """
+    if subsidy is None:
+        subsidy = get_subsidy_matcher().best(question) or ''
+    if intent is None:
+        intent = ','.join(get_intent_engine().classify(question, 'detailed').matched())
+
+    context_part = json.dumps(context, sort_keys=True, ensure_ascii=False, default=str) if context else ''
+    raw = '|'.join([namespace, subsidy or '', intent or '', normalize_question(question), context_part])
+    return f"{namespace}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+
+class LocalMemoryBackend:
+    """プロセス内 LRU + TTL バックエンド
+
+    シグナルによる無効化は同じプロセスにしか届かないため、get_response_cache() が
+    SNAPSHOT_RELOAD_INTERVAL 秒ごとに元データの変更を確認して破棄する。
+    """
+
+    shared = False
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoCacheBackend:
+    """Django のキャッシュ（Redis・Memcached 等）を使うバックエンド
+
+    プロセス間で共有されるため、無効化は世代番号の更新で行う
+    （古い世代のエントリは TTL で自然に消える）。
+    """
+
+    GENERATION_KEY = 'dify_response_cache:generation'
+    shared = True
+
+    def __init__(self, alias='default'):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+
+    def _generation(self):
+        generation = self.cache.get(self.GENERATION_KEY)
+        if generation is None:
+            self.cache.add(self.GENERATION_KEY, 1, timeout=None)
+            generation = self.cache.get(self.GENERATION_KEY, 1)
+        return generation
+
+    def _key(self, key):
+        return f"dify_response_cache:{self._generation()}:{key}"
+
+    def get(self, key):
+        return self.cache.get(self._key(key))
+
+    def set(self, key, value, ttl):
+        self.cache.set(self._key(key), value, timeout=ttl)
+
+    def clear(self):
+        try:
+            self.cache.incr(self.GENERATION_KEY)
+        except ValueError:
+            self.cache.set(self.GENERATION_KEY, 2, timeout=None)
+
+
+class ResponseCache:
+    """Dify 回答のキャッシュ（ヒット・ミス数を記録）"""
+
+    def __init__(self, backend, ttl=3600):
+        self.backend = backend
+        self.ttl = ttl
+        self.version = None
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'invalidations': 0}
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def get(self, key):
+        value = self.backend.get(key)
+        self._count('hits' if value is not None else 'misses')
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value, self.ttl)
+        self._count('sets')
+
+    def get_or_call(self, key, func):
+        """キャッシュにあれば返し、なければ func() の結果を保存して返す
+
+        key が None の場合や func() が None（API失敗）の場合はキャッシュしない。
+        """
+        if key is None:
+            return func()
+
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        value = func()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def invalidate(self):
+        self.backend.clear()
+        self._count('invalidations')
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['backend'] = type(self.backend).__name__
+        return stats
+
+
+class NullResponseCache(ResponseCache):
+    """キャッシュ無効時のダミー（常に func() を呼ぶ）"""
+
+    def __init__(self):
+        super().__init__(backend=None, ttl=0)
+
+    def get_or_call(self, key, func):
+        return func()
+
+    def invalidate(self):
+        pass
+
+
+_response_cache = None
+_response_cache_expires_at = 0.0
+_response_cache_lock = threading.Lock()
+
+
+def response_source_version():
+    """回答の元データ（補助金・採択統計・ティップス）の版"""
+    from ..models import AdoptionStatistics, AdoptionTips, SubsidyType
+    return (
+        table_version(SubsidyType, 'last_updated'),
+        table_version(AdoptionStatistics, 'updated_at'),
+        table_version(AdoptionTips, 'updated_at'),
+    )
+
+
+def _build_response_cache():
+    config = getattr(settings, 'DIFY_RESPONSE_CACHE', {})
+    if not config.get('ENABLED', True):
+        return NullResponseCache()
+
+    if config.get('BACKEND', 'local') == 'django':
+        backend = DjangoCacheBackend(config.get('CACHE_ALIAS', 'default'))
+    else:
+        backend = LocalMemoryBackend(config.get('MAX_ENTRIES', 1000))
+    return ResponseCache(backend, ttl=config.get('TTL', 3600))
+
+
+def get_response_cache():
+    """プロセス共有の回答キャッシュを取得
+
+    プロセス内のバックエンドでは SNAPSHOT_RELOAD_INTERVAL 秒ごとに元データの版を確認し、
+    他プロセス（管理画面・load_* コマンド）での変更があればキャッシュ済み回答を破棄する。
+    """
+    global _response_cache, _response_cache_expires_at
+    cache = _response_cache
+    if cache is not None and time.monotonic() < _response_cache_expires_at:
+        return cache
+
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = _build_response_cache()
+        cache = _response_cache
+        if time.monotonic() < _response_cache_expires_at:
+            return cache
+        if cache.backend is not None and not cache.backend.shared:
+            try:
+                version = response_source_version()
+                if cache.version is not None and cache.version != version:
+                    cache.invalidate()
+                cache.version = version
+            except DatabaseError as e:
+                print(f"[WARNING] ResponseCache: 元データの版の取得失敗 ({e})")
+        _response_cache_expires_at = time.monotonic() + reload_interval()
+        return cache
+
+
+def invalidate_response_cache(**kwargs):
+    """補助金・採択データ変更時にキャッシュ済み回答を破棄"""
+    get_response_cache().invalidate()
+
+
+def reset_response_cache():
+    """設定を読み直して再構築（テスト・設定変更時用）"""
+    global _response_cache, _response_cache_expires_at
+    with _response_cache_lock:
+        _response_cache = None
+        _response_cache_expires_at = 0.0
@@ -0,0 +1,181 @@
+# advisor/services/session_summary.py - 会話セッション集計の差分更新
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q
+from django.db.models.functions import Greatest, Least
+
+from ..models import ConversationHistory, ConversationSession
+
+PREVIEW_LENGTH = ConversationSession._meta.get_field('last_user_message').max_length
+
+_COUNTER_FIELDS = {
+    'user': 'user_messages',
+    'assistant': 'assistant_messages',
+    'system': 'system_messages',
+}
+
+
+def _summarize(messages):
+    """同一セッションのメッセージ群から差分を計算"""
+    delta = {
+        'message_count': len(messages),
+        'started_at': min(message.timestamp for message in messages),
+        'last_activity': max(message.timestamp for message in messages),
+        'user_id': next((message.user_id for message in messages if message.user_id), None),
+        'last_user': None,
+    }
+    for field in _COUNTER_FIELDS.values():
+        delta[field] = 0
+
+    for message in messages:
+        field = _COUNTER_FIELDS.get(message.message_type)
+        if field:
+            delta[field] += 1
+        if message.message_type == 'user' and (
+            delta['last_user'] is None or message.timestamp >= delta['last_user'].timestamp
+        ):
+            delta['last_user'] = message
+    return delta
+
+
+def record_messages(messages):
+    """保存済みの ConversationHistory をセッション集計に反映
+
+    セッションごとに get_or_create + F式による加算で更新するため、
+    同一セッションへの並行書き込みでも件数が失われない。
+    """
+    by_session = {}
+    for message in messages:
+        by_session.setdefault(message.session_id, []).append(message)
+
+    for session_id, session_messages in by_session.items():
+        delta = _summarize(session_messages)
+        last_user = delta['last_user']
+
+        with transaction.atomic():
+            session, created = ConversationSession.objects.get_or_create(
+                session_id=session_id,
+                defaults={
+                    'user_id': delta['user_id'],
+                    'started_at': delta['started_at'],
+                    'last_activity': delta['last_activity'],
+                    'message_count': delta['message_count'],
+                    'last_user_message': last_user.content[:PREVIEW_LENGTH] if last_user else '',
+                    'last_user_message_at': last_user.timestamp if last_user else None,
+                    **{field: delta[field] for field in _COUNTER_FIELDS.values()},
+                }
+            )
+            if created:
+                continue
+
+            sessions = ConversationSession.objects.filter(pk=session.pk)
+            sessions.update(
+                message_count=F('message_count') + delta['message_count'],
+                started_at=Least(F('started_at'), delta['started_at']),
+                last_activity=Greatest(F('last_activity'), delta['last_activity']),
+                **{field: F(field) + delta[field] for field in _COUNTER_FIELDS.values() if delta[field]},
+            )
+            if last_user:
+                sessions.filter(
+                    Q(last_user_message_at__isnull=True) | Q(last_user_message_at__lte=last_user.timestamp)
+                ).update(
+                    last_user_message=last_user.content[:PREVIEW_LENGTH],
+                    last_user_message_at=last_user.timestamp,
+                )
+            if delta['user_id']:
+                sessions.filter(user__isnull=True).update(user_id=delta['user_id'])
+
+
+def delete_messages(messages):
+    """ConversationHistory を一括削除し、影響したセッションの集計を1回ずつ再構築
+
+    ConversationHistory には post_delete の受信側を置かない（置くと Django の高速削除が
+    無効になり、1行ずつ読み込んでシグナルを送ることになる）。削除はこの関数を経由する。
+
+    Returns:
+        int: 削除したメッセージ数
+    """
+    with transaction.atomic():
+        session_ids = set(messages.order_by().values_list('session_id', flat=True).distinct())
+        deleted, _ = messages.delete()
+        if session_ids:
+            refresh_sessions(session_ids)
+    return deleted
+
+
+def refresh_sessions(session_ids):
+    """指定セッションの集計を再構築し、メッセージが残っていないセッションは削除"""
+    session_ids = list(session_ids)
+    rebuild_session_summaries(session_ids)
+    remaining = ConversationHistory.objects.filter(session_id__in=session_ids).values('session_id')
+    ConversationSession.objects.filter(session_id__in=session_ids).exclude(session_id__in=remaining).delete()
+
+
+def rebuild_session_summaries(session_ids=None, batch_size=1000):
+    """ConversationHistory から集計を再構築（バックフィル用）
+
+    件数・期間はセッション単位の集約1クエリ、プレビューとユーザーは
+    batch_size セッションごとに1クエリで取得する。
+
+    Returns:
+        int: 再構築したセッション数
+    """
+    history = ConversationHistory.objects.all()
+    if session_ids is not None:
+        history = history.filter(session_id__in=session_ids)
+
+    rows = history.order_by().values('session_id').annotate(
+        started_at=Min('timestamp'),
+        last_activity=Max('timestamp'),
+        message_count=Count('id'),
+        user_messages=Count('id', filter=Q(message_type='user')),
+        assistant_messages=Count('id', filter=Q(message_type='assistant')),
+        system_messages=Count('id', filter=Q(message_type='system')),
+    )
+
+    rebuilt = 0
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            rebuilt += _upsert_summaries(batch)
+            batch = []
+    if batch:
+        rebuilt += _upsert_summaries(batch)
+    return rebuilt
+
+
+def _upsert_summaries(rows):
+    """集約結果にプレビュー・ユーザーを補ってまとめて書き込み"""
+    details = {}
+    messages = ConversationHistory.objects.filter(
+        session_id__in=[row['session_id'] for row in rows]
+    ).filter(
+        Q(message_type='user') | Q(user__isnull=False)
+    ).order_by('session_id', 'timestamp', 'id').values_list(
+        'session_id', 'message_type', 'content', 'timestamp', 'user_id'
+    )
+    for session_id, message_type, content, timestamp, user_id in messages.iterator():
+        detail = details.setdefault(session_id, {
+            'user_id': None, 'last_user_message': '', 'last_user_message_at': None
+        })
+        if user_id and detail['user_id'] is None:
+            detail['user_id'] = user_id
+        if message_type == 'user':
+            detail['last_user_message'] = content[:PREVIEW_LENGTH]
+            detail['last_user_message_at'] = timestamp
+
+    sessions = [
+        ConversationSession(**row, **details.get(row['session_id'], {}))
+        for row in rows
+    ]
+    ConversationSession.objects.bulk_create(
+        sessions,
+        update_conflicts=True,
+        unique_fields=['session_id'],
+        update_fields=[
+            'user', 'started_at', 'last_activity', 'message_count', 'user_messages',
+            'assistant_messages', 'system_messages', 'last_user_message', 'last_user_message_at',
+        ],
+    )
+    return len(sessions)
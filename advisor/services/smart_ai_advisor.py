@@ -1,10 +1,13 @@
 # advisor/services/smart_ai_advisor.py
 
-import requests
 import json
 import re
 from django.conf import settings
 from ..models import SubsidyType, Answer, ConversationHistory
+from .subsidy_catalog import get_subsidy_catalog
+from .recommendation import recommend_subsidies
+from .dify_client import get_dify_client
+from .response_cache import get_response_cache, make_cache_key
 
 class SmartAIAdvisorService:
     """質問のレベルに応じて適切な回答を選択するAIアドバイザー"""
@@ -146,7 +149,7 @@ class SmartAIAdvisorService:
 ---
 *お客様の事業発展のお手伝いができれば幸いです。何でもお気軽にご質問ください！*"""
 
-        recommended_subsidies = list(SubsidyType.objects.all()[:2])
+        recommended_subsidies = recommend_subsidies(question_text, user_context, k=2)
         
         return {
             'answer': basic_response,
@@ -159,18 +162,18 @@ class SmartAIAdvisorService:
         """具体的な申請支援回答を生成"""
         
         # 特定の補助金を特定
-        subsidies = SubsidyType.objects.all()
+        subsidies = get_subsidy_catalog()
         question_lower = question_text.lower()
         
         target_subsidy = None
         if 'it' in question_lower:
-            target_subsidy = subsidies.filter(name__contains='IT導入').first()
+            target_subsidy = subsidies.first_by_name('IT導入')
         elif '再構築' in question_lower:
-            target_subsidy = subsidies.filter(name__contains='事業再構築').first()
+            target_subsidy = subsidies.first_by_name('事業再構築')
         elif 'ものづくり' in question_lower:
-            target_subsidy = subsidies.filter(name__contains='ものづくり').first()
+            target_subsidy = subsidies.first_by_name('ものづくり')
         elif '持続化' in question_lower:
-            target_subsidy = subsidies.filter(name__contains='持続化').first()
+            target_subsidy = subsidies.first_by_name('持続化')
         
         if not target_subsidy:
             target_subsidy = subsidies.first()
@@ -276,7 +279,10 @@ A: はい、次回の公募で再申請が可能です
         if self.dify_api_key:
             # Dify APIを使用した自然な回答
             query = self._build_adaptive_query(question_text, user_context)
-            dify_response = self._call_dify_api(query)
+            dify_response = self._call_dify_api(
+                query,
+                cache_key=make_cache_key('smart_ai_advisor', question_text, context=user_context)
+            )
             
             if dify_response and 'answer' in dify_response:
                 return self._process_dify_response(dify_response, question_text, user_context)
@@ -345,11 +351,11 @@ A: はい、次回の公募で再申請が可能です
         # 既存の戦略的回答生成ロジックを使用
         # （llm_enhanced_advisor.pyの内容を活用）
         
-        subsidies = SubsidyType.objects.all()
+        subsidies = get_subsidy_catalog()
         business_type = user_context.get('business_type', '') if user_context else ''
         
         recommended = []
-        if subsidies.exists():
+        if subsidies.first():
             recommended.append(subsidies.first())
         
         strategic_response = f"""## 🎯 採択率を最大化する戦略的アプローチ
@@ -400,34 +406,14 @@ A: はい、次回の公募で再申請が可能です
             'model_used': 'strategic-enhanced'
         }
     
-    def _call_dify_api(self, query_text):
-        """Dify API呼び出し"""
-        try:
-            request_data = {
-                "inputs": {},
-                "query": query_text,
-                "response_mode": "blocking",
-                "user": f"smart_user_{hash(query_text) % 10000}"
-            }
-            
-            url = f"{self.dify_api_url}/chat-messages"
-            
-            response = requests.post(
-                url,
-                headers=self.headers,
-                json=request_data,
-                timeout=60
+    def _call_dify_api(self, query_text, cache_key=None):
+        """Dify API呼び出し（共通クライアント経由、cache_key 指定時は回答キャッシュを利用）"""
+        return get_response_cache().get_or_call(
+            cache_key,
+            lambda: get_dify_client(self.dify_api_url, self.dify_api_key).chat(
+                query_text, user=f"smart_user_{hash(query_text) % 10000}"
             )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"Dify API Error: {response.status_code}")
-                return None
-                
-        except Exception as e:
-            print(f"Dify API error: {e}")
-            return None
+        )
     
     def _process_dify_response(self, dify_response, original_question, user_context):
         """Difyレスポンス処理"""
@@ -452,7 +438,7 @@ A: はい、次回の公募で再申請が可能です
     
     def _extract_recommended_subsidies(self, answer_text):
         """推奨補助金抽出"""
-        subsidies = SubsidyType.objects.all()
+        subsidies = get_subsidy_catalog().subsidies
         recommended = []
         
         for subsidy in subsidies:
@@ -0,0 +1,20 @@
+# advisor/services/snapshot_version.py - プロセス内スナップショットの変更検知
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+
+def table_version(model, updated_field):
+    """件数・最大ID・最終更新日時（他プロセスでの追加・削除・更新の検知用）
+
+    シグナルは同じプロセスにしか届かないため、スナップショットを持つサービスは
+    reload_interval() 秒ごとにこの値を比べて、変わっていれば読み直す。
+    QuerySet.update() で直接更新する場合は updated_field も更新すること（auto_now は適用されない）。
+    """
+    summary = model.objects.order_by().aggregate(count=Count('id'), max_id=Max('id'), updated=Max(updated_field))
+    return summary['count'], summary['max_id'], summary['updated']
+
+
+def reload_interval():
+    """他プロセスでの変更を確認する間隔（秒）"""
+    return getattr(settings, 'SNAPSHOT_RELOAD_INTERVAL', 30)
@@ -1,11 +1,15 @@
 # advisor/services/strategic_ai_advisor.py
 
-import requests
 import json
 import random
 from django.conf import settings
 from datetime import datetime, timedelta
 from ..models import SubsidyType, Answer, ConversationHistory, AdoptionStatistics
+from .subsidy_catalog import get_subsidy_catalog
+from .dify_client import get_dify_client
+from .response_cache import get_response_cache, make_cache_key
+from .adoption_rollup import get_adoption_rollup
+from .conversation_writer import save_conversation_turn, save_messages
 
 class StrategicAIAdvisorService:
     """戦略・作戦を考える高度なAIアドバイザーサービス"""
@@ -42,7 +46,10 @@ class StrategicAIAdvisorService:
             )
             
             # Dify API呼び出し
-            dify_response = self._call_dify_api(strategic_query)
+            dify_response = self._call_dify_api(
+                strategic_query,
+                cache_key=make_cache_key('strategic_ai_advisor', question_text, context=user_context)
+            )
             
             if dify_response and 'answer' in dify_response:
                 return self._process_strategic_response(dify_response, question_text, user_context)
@@ -106,18 +113,16 @@ class StrategicAIAdvisorService:
     
     def _prepare_strategic_context(self):
         """戦略的コンテキストを準備"""
-        subsidies = SubsidyType.objects.all()
+        subsidies = get_subsidy_catalog().subsidies
         current_year = datetime.now().year
         
-        # 最新の採択統計を取得
-        recent_stats = AdoptionStatistics.objects.filter(
-            year__gte=current_year - 1
-        ).select_related('subsidy_type').order_by('-year', '-round_number')
+        # 最新の採択統計を取得（補助金ごとの集計スナップショットから）
+        rollup = get_adoption_rollup()
         
         strategic_data = []
         
         for subsidy in subsidies:
-            subsidy_stats = recent_stats.filter(subsidy_type=subsidy).first()
+            subsidy_stats = rollup.get(subsidy).latest_since(current_year - 1)
             
             if subsidy_stats:
                 trend_analysis = self._analyze_trend(subsidy_stats)
@@ -239,7 +244,7 @@ class StrategicAIAdvisorService:
     
     def _generate_strategic_mock_response(self, question_text, user_context):
         """戦略的なモック回答を生成"""
-        subsidies = SubsidyType.objects.all()
+        subsidies = get_subsidy_catalog().subsidies
         business_type = user_context.get('business_type', '') if user_context else ''
         company_size = user_context.get('company_size', '') if user_context else ''
         
@@ -435,9 +440,7 @@ class StrategicAIAdvisorService:
                     score += 20
             
             # 採択率による調整
-            recent_stats = AdoptionStatistics.objects.filter(
-                subsidy_type=subsidy
-            ).order_by('-year', '-round_number').first()
+            recent_stats = get_adoption_rollup().latest(subsidy)
             
             if recent_stats:
                 if recent_stats.adoption_rate > 60:
@@ -451,16 +454,14 @@ class StrategicAIAdvisorService:
         if scoring:
             return max(scoring.keys(), key=lambda x: scoring[x])
         
-        return subsidies.first() if subsidies.exists() else None
+        return subsidies[0] if subsidies else None
     
     def _assess_competition_from_context(self, subsidy, business_type):
         """競合状況の評価"""
         if not subsidy:
             return "競争状況不明"
         
-        recent_stats = AdoptionStatistics.objects.filter(
-            subsidy_type=subsidy
-        ).order_by('-year', '-round_number').first()
+        recent_stats = get_adoption_rollup().latest(subsidy)
         
         if recent_stats:
             rate = recent_stats.adoption_rate
@@ -478,9 +479,7 @@ class StrategicAIAdvisorService:
         base_rate = 50  # ベース確率
         
         if subsidy:
-            recent_stats = AdoptionStatistics.objects.filter(
-                subsidy_type=subsidy
-            ).order_by('-year', '-round_number').first()
+            recent_stats = get_adoption_rollup().latest(subsidy)
             
             if recent_stats:
                 base_rate = recent_stats.adoption_rate
@@ -566,33 +565,14 @@ class StrategicAIAdvisorService:
         else:
             return "★★☆☆☆（慎重判断）"
     
-    def _call_dify_api(self, query_text):
-        """Dify API呼び出し（既存のまま）"""
-        try:
-            request_data = {
-                "inputs": {},
-                "query": query_text,
-                "response_mode": "blocking",
-                "user": f"strategic_user_{hash(query_text) % 10000}"
-            }
-            
-            url = f"{self.dify_api_url}/chat-messages"
-            
-            response = requests.post(
-                url,
-                headers=self.headers,
-                json=request_data,
-                timeout=60
+    def _call_dify_api(self, query_text, cache_key=None):
+        """Dify API呼び出し（共通クライアント経由、cache_key 指定時は回答キャッシュを利用）"""
+        return get_response_cache().get_or_call(
+            cache_key,
+            lambda: get_dify_client(self.dify_api_url, self.dify_api_key).chat(
+                query_text, user=f"strategic_user_{hash(query_text) % 10000}"
             )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return None
-                
-        except Exception as e:
-            print(f"Strategic Dify API error: {e}")
-            return None
+        )
     
     def _process_strategic_response(self, dify_response, original_question, user_context):
         """戦略的レスポンスの処理"""
@@ -646,7 +626,7 @@ class StrategicAIAdvisorService:
     
     def _extract_recommended_subsidies_from_text(self, answer_text):
         """回答テキストから推奨補助金を抽出"""
-        subsidies = SubsidyType.objects.all()
+        subsidies = get_subsidy_catalog().subsidies
         recommended = []
         
         for subsidy in subsidies:
@@ -666,12 +646,17 @@ class ConversationManager:
     
     @staticmethod
     def save_conversation(session_id, user, message_type, content):
-        ConversationHistory.objects.create(
+        save_messages([ConversationHistory(
             session_id=session_id,
             user=user,
             message_type=message_type,
             content=content
-        )
+        )])
+
+    @staticmethod
+    def save_turn(session_id, user, question, response, intent_analysis=None, user_context=None):
+        """質問と回答を1回の一括INSERTで保存"""
+        save_conversation_turn(session_id, question, response, intent_analysis, user_context, user=user)
     
     @staticmethod
     def get_conversation_history(session_id, limit=10):
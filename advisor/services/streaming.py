@@ -0,0 +1,59 @@
+# advisor/services/streaming.py - 回答のストリーミング配信ユーティリティ
+
+import json
+import re
+
+_SECTION_SPLIT_RE = re.compile(r'(?m)^(?=#)')
+
+
+class DifyStreamError(Exception):
+    """Dify ストリーミング応答のエラー（HTTP エラー時は status_code を持つ）"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def split_answer_sections(answer):
+    """Markdown の見出し単位で回答を分割（連結すると元の回答に戻る）"""
+    if not answer:
+        return []
+    return [section for section in _SECTION_SPLIT_RE.split(answer) if section]
+
+
+def iter_dify_stream(url, headers, payload, timeout=(5, 60), session=None):
+    """Dify の streaming モード応答から回答テキストの断片を順に返す
+
+    Dify は Server-Sent Events 形式で `data: {"event": "message", "answer": "..."}`
+    を逐次送信し、`message_end` で終了する。
+    """
+    payload = dict(payload, response_mode='streaming')
+    if session is None:
+        # requests は読み込みに時間がかかるため、実際に通信する時点で読み込む
+        import requests
+        session = requests
+
+    with session.post(url, headers=headers, json=payload, stream=True, timeout=timeout) as response:
+        if response.status_code != 200:
+            raise DifyStreamError(f"{response.status_code} - {response.text[:200]}", response.status_code)
+
+        for raw_line in response.iter_lines():
+            # text/event-stream は charset 省略が多いため UTF-8 で明示的にデコード
+            line = raw_line.decode('utf-8') if isinstance(raw_line, bytes) else raw_line
+            if not line.startswith('data:'):
+                continue
+
+            try:
+                event = json.loads(line[5:].strip())
+            except json.JSONDecodeError:
+                continue
+
+            event_type = event.get('event')
+            if event_type in ('message', 'agent_message'):
+                answer = event.get('answer')
+                if answer:
+                    yield answer
+            elif event_type == 'message_end':
+                return
+            elif event_type == 'error':
+                raise DifyStreamError(event.get('message', 'unknown error'))
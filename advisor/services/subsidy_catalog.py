@@ -0,0 +1,126 @@
+# advisor/services/subsidy_catalog.py - 補助金マスタのプロセス内スナップショット
+
+import threading
+import time
+from types import MappingProxyType
+
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .snapshot_version import reload_interval, table_version
+from .text_normalization import normalize_text
+
+
+class SubsidyCatalog:
+    """SubsidyType の読み取り専用スナップショット
+
+    補助金マスタは小さく更新も稀なため、プロセスごとに一度だけ読み込み、
+    SubsidyType の保存・削除シグナル（他プロセスでの変更は定期確認）で丸ごと差し替える。
+    保持するインスタンスは共有されるため、呼び出し側で変更しないこと。
+    """
+
+    def __init__(self, subsidies, version=None):
+        self.subsidies = tuple(subsidies)
+        self.version = version
+        self.names = tuple(subsidy.name for subsidy in self.subsidies)
+        self.loaded_at = timezone.now()
+
+        by_id = {}
+        by_name = {}
+        by_normalized_name = {}
+        for subsidy in self.subsidies:
+            by_id[subsidy.id] = subsidy
+            by_name.setdefault(subsidy.name, subsidy)
+            by_normalized_name.setdefault(normalize_text(subsidy.name), subsidy)
+
+        self.by_id = MappingProxyType(by_id)
+        self.by_name = MappingProxyType(by_name)
+        self.by_normalized_name = MappingProxyType(by_normalized_name)
+        self.active_subsidies = tuple(subsidy for subsidy in self.subsidies if subsidy.is_active)
+
+    def __len__(self):
+        return len(self.subsidies)
+
+    def __iter__(self):
+        return iter(self.subsidies)
+
+    def get(self, subsidy_id):
+        """IDで補助金を取得（該当なしは None）"""
+        return self.by_id.get(subsidy_id)
+
+    def get_by_name(self, name):
+        """名称で補助金を取得（完全一致 → 正規化名一致）"""
+        if not name:
+            return None
+        subsidy = self.by_name.get(name)
+        if subsidy is None:
+            subsidy = self.by_normalized_name.get(normalize_text(name))
+        return subsidy
+
+    def filter_by_name(self, keyword, active_only=False):
+        """名称に keyword を含む補助金一覧（name__icontains 相当）"""
+        keyword_lower = keyword.lower()
+        subsidies = self.active_subsidies if active_only else self.subsidies
+        return [subsidy for subsidy in subsidies if keyword_lower in subsidy.name.lower()]
+
+    def first_by_name(self, keyword, active_only=False):
+        """名称に keyword を含む最初の補助金（該当なしは None）"""
+        matches = self.filter_by_name(keyword, active_only=active_only)
+        return matches[0] if matches else None
+
+    def first(self):
+        return self.subsidies[0] if self.subsidies else None
+
+    @staticmethod
+    def as_values(subsidy):
+        """QuerySet.values() と同じ形式の辞書に変換"""
+        return {field.attname: getattr(subsidy, field.attname) for field in subsidy._meta.concrete_fields}
+
+
+_catalog = None
+_catalog_expires_at = 0.0
+_catalog_lock = threading.Lock()
+
+
+def subsidy_catalog_version():
+    from ..models import SubsidyType
+    return table_version(SubsidyType, 'last_updated')
+
+
+def _load_catalog(version=None):
+    from ..models import SubsidyType
+    return SubsidyCatalog(SubsidyType.objects.order_by('id'), version=version)
+
+
+def get_subsidy_catalog():
+    """プロセス共有の補助金カタログを取得
+
+    SNAPSHOT_RELOAD_INTERVAL 秒ごとに SubsidyType の件数・最大ID・最終更新日時を確認し、
+    他プロセス（load_subsidies コマンド・管理画面）での変更を取り込む。
+    """
+    global _catalog, _catalog_expires_at
+    catalog = _catalog
+    if catalog is not None and time.monotonic() < _catalog_expires_at:
+        return catalog
+
+    with _catalog_lock:
+        if _catalog is not None and time.monotonic() < _catalog_expires_at:
+            return _catalog
+        try:
+            version = subsidy_catalog_version()
+            if _catalog is None or _catalog.version != version:
+                _catalog = _load_catalog(version)
+        except DatabaseError as e:
+            # マイグレーション前などは空のカタログを返す（キャッシュしない）
+            print(f"[WARNING] SubsidyCatalog: 補助金データ取得失敗 ({e})")
+            if _catalog is None:
+                return SubsidyCatalog([])
+        _catalog_expires_at = time.monotonic() + reload_interval()
+        return _catalog
+
+
+def invalidate_subsidy_catalog(**kwargs):
+    """カタログを破棄し、次回アクセス時に再読み込みさせる"""
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
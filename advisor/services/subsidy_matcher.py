@@ -0,0 +1,378 @@
+# advisor/services/subsidy_matcher.py - 補助金エイリアス照合エンジン
+
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count, Max
+
+from .text_normalization import normalize_text, normalized_aliases
+
+# 完全版補助金エイリアス辞書（全サービス共通）
+SUBSIDY_ALIASES = {
+    'IT導入補助金': [
+        'it導入', 'ＩＴ導入', 'アイティー導入', 'ITツール', 'デジタル化補助',
+        'it導入補助金', 'IT導入補助金', 'ITシステム', 'ソフトウェア補助',
+        'デジタル補助', 'システム導入', 'デジタル化支援', 'デジタル化',
+        'システム化', 'IT化', 'デジタル変革', 'dx'
+    ],
+    'IT導入補助金2025': [
+        'it導入', 'ＩＴ導入', 'アイティー導入', 'ITツール', 'デジタル化補助',
+        'it導入補助金', 'IT導入補助金', 'ITシステム', 'ソフトウェア補助',
+        'デジタル補助', 'システム導入', 'デジタル化支援', 'デジタル化',
+        'システム化', 'IT化', 'デジタル変革', 'dx', 'it導入2025'
+    ],
+    'ものづくり補助金': [
+        'ものづくり', '製造補助', '設備投資', '生産性向上', 'ものづくり補助金',
+        '革新的サービス', '試作品開発', '生産プロセス改善', '設備更新',
+        '製造業補助', '機械設備', '製造', '工場', '生産'
+    ],
+    '小規模事業者持続化補助金【一般型】': [
+        '持続化', '小規模持続', '販路開拓', '小規模事業者', '持続化補助金',
+        '持続化一般', '一般型持続化', '販路拡大', '認知度向上',
+        '小規模補助', '販促支援', '小規模事業者持続化補助金',
+        '販路', '販売促進', '営業支援'
+    ],
+    '小規模事業者持続化補助金【創業型】': [
+        '持続化創業', '創業型持続化', '創業補助', '新規開業', '起業支援',
+        '創業5年', 'スタートアップ支援', '創業期補助', '創業支援',
+        '起業補助', '小規模事業者持続化補助金創業型', '創業',
+        '起業', 'スタートアップ', '新規事業'
+    ],
+    '省力化投資補助金': [
+        '省力化', '省力化投資', '人手不足解消', '自動化', '効率化投資',
+        'IoT補助', 'AI導入', 'ロボット導入', '省人化', '労働力不足',
+        '人材不足対策', '自動化設備', '省力化投資補助金',
+        '人手不足', '自動化システム', 'iot', 'ai', 'ロボット'
+    ],
+    '事業承継・M&A補助金': [
+        '事業承継', '承継補助', '引継ぎ', '後継者', '事業承継補助金',
+        'M&A補助', '買収補助', '経営承継', '世代交代', '事業引継ぎ',
+        'ma補助', 'エムアンドエー', '事業承継・M&A補助金',
+        '承継', '後継', 'ma', 'm&a'
+    ],
+    '新事業進出補助金': [
+        '新事業', '新分野進出', '事業拡大', '多角化', '新商品開発',
+        '新サービス', '市場開拓', '事業転換', '新規事業',
+        '分野拡大', '新事業進出補助金', '新分野', '多角化'
+    ],
+    '成長加速化補助金': [
+        '成長加速', '成長促進', '事業拡大', 'スケールアップ', '競争力強化',
+        'グローバル展開', '海外進出', '人材育成補助', '成長支援',
+        '拡大支援', '成長加速化補助金', '成長', '拡大', 'グローバル'
+    ],
+    '省エネ診断・省エネ・非化石転換補助金': [
+        '省エネ', '省エネルギー', '非化石', 'カーボンニュートラル', '脱炭素',
+        '再生可能エネルギー', 'CO2削減', '環境対応', 'グリーン化',
+        '省エネ設備', '環境補助', '省エネ診断', '環境',
+        'カーボン', '脱炭素化', 'co2'
+    ],
+    '雇用調整助成金': [
+        '雇用調整', '雇調金', '休業補償', '雇用維持', '労働者支援',
+        '一時休業', '事業縮小', '雇用安定', '雇用助成',
+        '休業手当', '雇用調整助成金', '休業', '雇用'
+    ],
+    '業務改善助成金': [
+        '業務改善', '賃金引上げ', '最低賃金', '生産性向上', '働き方改革',
+        '労働環境改善', '設備改善', '職場改善', '賃上げ',
+        '労働条件改善', '業務改善助成金', '賃金', '最低賃金'
+    ],
+    '創業助成金': [
+        '創業', '起業', 'スタートアップ', '新規開業', '開業支援',
+        '創業支援', '起業助成', '新規事業', '開業助成', '創業助成金'
+    ],
+    '事業再構築補助金': [
+        '再構築', '事業転換', '新分野展開', '業態転換', '事業再構築補助金',
+        'V字回復', '事業変革', '構造改革', 'ピボット', '転換'
+    ],
+    '事業承継・引継ぎ補助金': [
+        '事業承継', '承継補助', '引継ぎ補助金', '後継者支援'
+    ],
+    '小規模事業者持続化補助金': [
+        '持続化', '小規模事業者補助'
+    ]
+}
+
+def _main_name_parts(subsidy_name):
+    """補助金名から「補助金」「助成金」を除いた主要部分を取得"""
+    return subsidy_name.replace('補助金', '').replace('助成金', '').split('・')
+
+
+class AhoCorasickAutomaton:
+    """Aho–Corasick法による複数パターン同時照合"""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+        self.pattern_count = 0
+
+    def add(self, pattern, payload):
+        """パターンを登録（build() 前のみ）"""
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            node = next_node
+        self._outputs[node].append((self.pattern_count, payload))
+        self.pattern_count += 1
+
+    def build(self):
+        """失敗リンクを計算して出力を統合"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+        return self
+
+    def iter_matches(self, text):
+        """テキストを1回走査し、(パターンID, ペイロード) を出現順に返す"""
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if outputs[node]:
+                yield from outputs[node]
+
+
+def alias_weight(normalized):
+    """エイリアスの既定スコア（長いほど高スコア）"""
+    return max(1, len(normalized) // 2)
+
+
+class AliasTable:
+    """照合に使うエイリアス表のスナップショット（組み込み辞書または SubsidyAlias から作成）
+
+    entries は (補助金名, エイリアス, 正規化済みエイリアス, 重み) の列で、
+    並び順がスコア同点時の優先順になる。重みが None の場合は alias_weight で算出する。
+    """
+
+    def __init__(self, entries, version=None):
+        self.version = version
+        self.aliases = {}
+        self.weighted = {}
+        for name, alias, normalized, weight in entries:
+            self.aliases.setdefault(name, []).append(alias)
+            weighted = self.weighted.setdefault(name, [])
+            if normalized:
+                weighted.append((normalized, weight or alias_weight(normalized)))
+
+    @classmethod
+    def from_aliases(cls, aliases, version=None):
+        """{補助金名: [エイリアス, ...]} 形式の辞書から作成"""
+        normalized_table = normalized_aliases(aliases)
+        table = cls((), version=version)
+        for name, alias_list in aliases.items():
+            table.aliases[name] = list(alias_list)
+            table.weighted[name] = [
+                (normalized, alias_weight(normalized)) for normalized in normalized_table[name] if normalized
+            ]
+        return table
+
+    def __len__(self):
+        return sum(len(alias_list) for alias_list in self.aliases.values())
+
+
+class SubsidyMatcher:
+    """補助金名・エイリアスを1つのオートマトンにまとめた照合器"""
+
+    PART_WEIGHT = 5
+
+    def __init__(self, subsidy_names, aliases=None):
+        if aliases is None:
+            aliases = builtin_alias_table()
+        elif not isinstance(aliases, AliasTable):
+            aliases = AliasTable.from_aliases(aliases)
+        self.alias_table = aliases
+        self.subsidy_names = list(subsidy_names)
+        self.catalog = None
+        self._name_order = {name: i for i, name in enumerate(self.subsidy_names)}
+
+        # スコアの同点時はエイリアス表の順序 → DB順で優先
+        self.candidates = list(aliases.aliases.keys())
+        self.candidates.extend(name for name in self.subsidy_names if name not in aliases.aliases)
+        self._candidate_order = {name: i for i, name in enumerate(self.candidates)}
+
+        automaton = AhoCorasickAutomaton()
+
+        # 正式名称（完全一致は最優先）
+        for name in self.subsidy_names:
+            automaton.add(normalize_text(name), ('name', name, 0))
+
+        for name in self.candidates:
+            # 正式名称の部分一致
+            for part in _main_name_parts(name):
+                if part:
+                    automaton.add(normalize_text(part), ('part', name, self.PART_WEIGHT))
+
+            # エイリアス（正規化・重み計算済みの表を使用）
+            for alias_normalized, weight in aliases.weighted.get(name, ()):
+                automaton.add(alias_normalized, ('alias', name, weight))
+
+        self.automaton = automaton.build()
+
+    def scan(self, text, normalized=False):
+        """1回の走査で全ヒットを集計
+
+        Returns:
+            (exact_names, scores): 正式名称で完全一致した補助金名（DB順）と
+            補助金名ごとのエイリアススコア（エイリアス辞書順）
+        """
+        if not normalized:
+            text = normalize_text(text)
+
+        seen = set()
+        exact = set()
+        scores = {}
+        for pattern_id, (kind, name, weight) in self.automaton.iter_matches(text):
+            if pattern_id in seen:
+                continue
+            seen.add(pattern_id)
+            if kind == 'name':
+                exact.add(name)
+            else:
+                scores[name] = scores.get(name, 0) + weight
+
+        exact_names = sorted(exact, key=self._name_order.__getitem__)
+        ordered_scores = {name: scores[name] for name in sorted(scores, key=self._candidate_order.__getitem__)}
+        return exact_names, ordered_scores
+
+    def rank(self, text, normalized=False):
+        """ヒットした補助金を (補助金名, スコア) のリストで返す（完全一致 → スコア順）"""
+        exact_names, scores = self.scan(text, normalized=normalized)
+        ranked = [(name, scores.get(name, 0)) for name in exact_names]
+        ranked.extend(sorted(
+            ((name, score) for name, score in scores.items() if name not in exact_names),
+            key=lambda item: -item[1]
+        ))
+        return ranked
+
+    def best(self, text, normalized=False):
+        """最も可能性の高い補助金名を返す（該当なしは None）"""
+        ranked = self.rank(text, normalized=normalized)
+        return ranked[0][0] if ranked else None
+
+
+_builtin_table = None
+_alias_table = None
+_alias_table_expires_at = 0.0
+_alias_table_lock = threading.Lock()
+
+
+def builtin_alias_table():
+    """組み込み辞書 SUBSIDY_ALIASES のエイリアス表（SubsidyAlias が空の場合に使用）"""
+    global _builtin_table
+    if _builtin_table is None:
+        _builtin_table = AliasTable.from_aliases(SUBSIDY_ALIASES)
+    return _builtin_table
+
+
+def alias_table_version():
+    """SubsidyAlias の件数と最終更新日時（変更検知用）
+
+    QuerySet.update() で直接更新する場合は updated_at も更新すること（auto_now は適用されない）。
+    """
+    from ..models import SubsidyAlias
+    summary = SubsidyAlias.objects.aggregate(count=Count('id'), updated_at=Max('updated_at'))
+    return summary['count'], summary['updated_at']
+
+
+def _load_alias_table(version):
+    from ..models import SubsidyAlias
+    entries = list(
+        SubsidyAlias.objects.filter(is_active=True).order_by('id')
+        .values_list('subsidy_name', 'alias', 'normalized', 'weight')
+    )
+    if not entries:
+        return builtin_alias_table()
+    return AliasTable(entries, version=version)
+
+
+def get_alias_table():
+    """プロセス共有のエイリアス表を取得
+
+    SUBSIDY_ALIAS_RELOAD_INTERVAL 秒ごとに SubsidyAlias の件数・最終更新日時を確認し、
+    他プロセス（update_subsidy_aliases コマンド・管理画面）での変更をコードの再読み込みなしで取り込む。
+    """
+    global _alias_table, _alias_table_expires_at
+    table = _alias_table
+    if table is not None and time.monotonic() < _alias_table_expires_at:
+        return table
+
+    with _alias_table_lock:
+        if _alias_table is not None and time.monotonic() < _alias_table_expires_at:
+            return _alias_table
+
+        previous = _alias_table
+        try:
+            version = alias_table_version()
+            if previous is None or previous.version != version:
+                _alias_table = _load_alias_table(version)
+        except DatabaseError as e:
+            # マイグレーション前などは組み込み辞書で継続（次の確認時に再試行）
+            print(f"[WARNING] SubsidyMatcher: エイリアス取得失敗 ({e})")
+            if _alias_table is None:
+                _alias_table = builtin_alias_table()
+        _alias_table_expires_at = time.monotonic() + getattr(settings, 'SUBSIDY_ALIAS_RELOAD_INTERVAL', 5)
+        table = _alias_table
+
+    if table is not previous:
+        # 意図判定エンジンも補助金名・エイリアスを語彙に含むため、別の表で構築済みなら作り直させる
+        # （初回の読み込み前に組み込み辞書で構築された場合も含む）
+        from .intent_engine import reset_intent_engine_if_stale
+        reset_intent_engine_if_stale(table)
+    return table
+
+
+def current_alias_table():
+    """読み込み済みのエイリアス表（DBには問い合わせない。未読み込みなら組み込み辞書）"""
+    return _alias_table or builtin_alias_table()
+
+
+def invalidate_alias_table(**kwargs):
+    """次回アクセス時に SubsidyAlias を確認させる（同一プロセス内の変更を即時反映）"""
+    global _alias_table_expires_at
+    with _alias_table_lock:
+        _alias_table_expires_at = 0.0
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_subsidy_matcher():
+    """プロセス共有の照合器を取得（補助金カタログ・エイリアス表の更新時のみ再構築）"""
+    global _matcher
+    from .subsidy_catalog import get_subsidy_catalog
+
+    catalog = get_subsidy_catalog()
+    alias_table = get_alias_table()
+    matcher = _matcher
+    if matcher is not None and matcher.catalog is catalog and matcher.alias_table is alias_table:
+        return matcher
+
+    with _matcher_lock:
+        if _matcher is None or _matcher.catalog is not catalog or _matcher.alias_table is not alias_table:
+            matcher = SubsidyMatcher(catalog.names, alias_table)
+            matcher.catalog = catalog
+            _matcher = matcher
+        return _matcher
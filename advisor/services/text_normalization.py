@@ -0,0 +1,159 @@
+# advisor/services/text_normalization.py - 日本語テキスト正規化・分かち書き
+
+import re
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+
+# 全角英数字→半角の変換テーブル
+_FULLWIDTH_TABLE = str.maketrans(
+    'ＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺ'
+    'ａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｖｗｘｙｚ'
+    '０１２３４５６７８９',
+    'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    'abcdefghijklmnopqrstuvwxyz'
+    '0123456789'
+)
+_NON_WORD_RE = re.compile(r'[^\w]')
+
+# 同じ質問は1リクエスト内でも照合・キャッシュキー・意図判定などで何度も正規化されるため
+# 短いテキストの結果だけを LRU で保持する（長文の説明文などはキャッシュを汚さないよう素通し）
+NORMALIZE_CACHE_SIZE = 4096
+NORMALIZE_CACHE_MAX_LENGTH = 512
+
+# 形態素解析器が無い場合の字種の切れ目による分割
+_SEGMENT_RE = re.compile(r'[a-z0-9]+|[一-龥々〆ヵヶ]+|[ァ-ヴー]+|[ぁ-ゖ]+')
+# 分かち書きで内容語として残さない品詞
+_FUNCTION_POS = ('助詞', '助動詞', '記号', 'フィラー')
+
+
+def _normalize(text):
+    return _NON_WORD_RE.sub('', text.lower().translate(_FULLWIDTH_TABLE))
+
+
+_normalize_cached = lru_cache(maxsize=NORMALIZE_CACHE_SIZE)(_normalize)
+
+
+def normalize_text(text):
+    """テキスト正規化（小文字化、全角→半角、記号・空白除去）"""
+    if not text:
+        return ''
+    if len(text) > NORMALIZE_CACHE_MAX_LENGTH:
+        return _normalize(text)
+    return _normalize_cached(text)
+
+
+def normalize_cache_info():
+    """正規化キャッシュのヒット状況（functools の CacheInfo）"""
+    return _normalize_cached.cache_info()
+
+
+_alias_tables = {}
+_alias_tables_lock = threading.Lock()
+
+
+def normalized_aliases(aliases):
+    """エイリアス辞書の正規化済みの形 {補助金名: (正規化済みエイリアス, ...)} を返す
+
+    辞書ごとに1回だけ計算して保持する（辞書を差し替えた場合は新しい辞書で再計算）。
+    元のエイリアスと同じ順序・件数で返す（表記ゆれで重複するものもスコアに加算されるため残す）。
+    """
+    entry = _alias_tables.get(id(aliases))
+    if entry is not None and entry[0] is aliases:
+        return entry[1]
+
+    table = {}
+    for name, alias_list in aliases.items():
+        table[name] = tuple(normalize_text(alias) for alias in alias_list)
+
+    with _alias_tables_lock:
+        # 同じ id が別の（破棄済みの）辞書を指していた場合に備えて辞書自体も保持する
+        _alias_tables[id(aliases)] = (aliases, table)
+    return table
+
+
+class RegexTokenizer:
+    """字種（英数字・漢字・カタカナ・ひらがな）の切れ目による簡易分かち書き"""
+
+    name = 'regex'
+    morphological = False
+
+    def tokenize(self, text, content_only=False):
+        segments = _SEGMENT_RE.findall(text.lower().translate(_FULLWIDTH_TABLE))
+        if content_only:
+            # ひらがなだけの断片は助詞・活用語尾であることが多い
+            return [segment for segment in segments if not 'ぁ' <= segment[0] <= 'ゖ']
+        return segments
+
+
+class JanomeTokenizer:
+    """Janome による形態素解析（辞書の読み込みに時間がかかるため初回使用時に構築）"""
+
+    name = 'janome'
+    morphological = True
+
+    def __init__(self):
+        from janome.tokenizer import Tokenizer
+        self._tokenizer = Tokenizer()
+        self._lock = threading.Lock()
+
+    def tokenize(self, text, content_only=False):
+        text = text.lower().translate(_FULLWIDTH_TABLE)
+        tokens = []
+        with self._lock:
+            analyzed = list(self._tokenizer.tokenize(text))
+        for token in analyzed:
+            pos = token.part_of_speech.split(',')[0]
+            if pos == '記号' or (content_only and pos in _FUNCTION_POS):
+                continue
+            # 活用形は基本形にそろえる（未知語は表層形のまま）
+            base_form = token.base_form if token.base_form and token.base_form != '*' else token.surface
+            tokens.append(base_form.strip())
+        return [token for token in tokens if token]
+
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def _build_tokenizer():
+    config = getattr(settings, 'TEXT_NORMALIZATION', {})
+    backend = config.get('TOKENIZER', 'auto')
+    if backend in ('auto', 'janome'):
+        try:
+            return JanomeTokenizer()
+        except ImportError as e:
+            if backend == 'janome':
+                print(f"[WARNING] Janome unavailable ({e}); using RegexTokenizer")
+    return RegexTokenizer()
+
+
+def get_tokenizer():
+    """プロセス共有の分かち書き器を取得（Janome は初回呼び出し時にのみ読み込む）"""
+    global _tokenizer
+    tokenizer = _tokenizer
+    if tokenizer is not None:
+        return tokenizer
+
+    with _tokenizer_lock:
+        if _tokenizer is None:
+            _tokenizer = _build_tokenizer()
+        return _tokenizer
+
+
+def tokenize(text, content_only=False):
+    """テキストを語に分割（content_only=True で助詞・助動詞などを除く）"""
+    if not text:
+        return []
+    return get_tokenizer().tokenize(text, content_only=content_only)
+
+
+def reset_text_normalization():
+    """正規化キャッシュと分かち書き器を破棄（テスト・設定変更時用）"""
+    global _tokenizer
+    _normalize_cached.cache_clear()
+    with _alias_tables_lock:
+        _alias_tables.clear()
+    with _tokenizer_lock:
+        _tokenizer = None
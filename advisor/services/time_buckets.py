@@ -0,0 +1,181 @@
+# advisor/services/time_buckets.py - 時間バケット集計ヘルパー
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate, TruncHour, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from ..models import ConversationDailyStat, ConversationHistory
+
+GRANULARITIES = {
+    'hour': TruncHour,
+    'day': TruncDate,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def _bucket_start(value, granularity, tz):
+    """値をバケットの先頭（hour は aware datetime、それ以外は date）に切り捨て"""
+    if isinstance(value, datetime):
+        value = timezone.localtime(value, tz)
+        if granularity == 'hour':
+            return value.replace(minute=0, second=0, microsecond=0)
+        value = value.date()
+    if granularity == 'week':
+        return value - timedelta(days=value.weekday())
+    if granularity == 'month':
+        return value.replace(day=1)
+    return value
+
+
+def _next_bucket(value, granularity):
+    if granularity == 'hour':
+        return value + timedelta(hours=1)
+    if granularity == 'day':
+        return value + timedelta(days=1)
+    if granularity == 'week':
+        return value + timedelta(weeks=1)
+    return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _normalize_bucket(value, granularity, tz):
+    """DBから返ったバケット値を _bucket_start と同じ型に揃える"""
+    if granularity == 'hour':
+        return timezone.localtime(value, tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+    return value.date() if isinstance(value, datetime) else value
+
+
+def bucket_counts(queryset, start, end=None, granularity='day', field='timestamp',
+                  distinct=None, filter=None, fill=True, tz=None):
+    """期間 [start, end) を時間バケットごとに1クエリで件数集計
+
+    Args:
+        queryset: 集計対象（例: ConversationHistory.objects.all()）
+        start, end: 集計期間（end 省略時は現在時刻）
+        granularity: 'hour' / 'day' / 'week' / 'month'
+        distinct: 指定時はそのフィールドのユニーク数を数える（例: 'session_id'）
+        filter: Count に渡す追加条件（Q）
+        fill: 件数0のバケットも含める
+        tz: バケット境界のタイムゾーン（既定は TIME_ZONE = Asia/Tokyo）
+
+    Returns:
+        list[dict]: [{'bucket': date または datetime, 'count': int}, ...]（昇順）
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unsupported granularity: {granularity}")
+
+    tz = tz or timezone.get_current_timezone()
+    end = end or timezone.now()
+
+    count = Count(distinct or 'id', distinct=bool(distinct), filter=filter)
+    rows = queryset.filter(**{
+        f'{field}__gte': start,
+        f'{field}__lt': end,
+    }).order_by().annotate(
+        bucket=GRANULARITIES[granularity](field, tzinfo=tz)
+    ).values('bucket').annotate(count=count).values_list('bucket', 'count')
+
+    counts = {}
+    for bucket, value in rows:
+        if bucket is not None:
+            counts[_normalize_bucket(bucket, granularity, tz)] = value
+
+    if not fill:
+        return [{'bucket': bucket, 'count': counts[bucket]} for bucket in sorted(counts) if counts[bucket]]
+
+    results = []
+    bucket = _bucket_start(start, granularity, tz)
+    last = _bucket_start(end - timedelta(microseconds=1), granularity, tz)
+    while bucket <= last:
+        results.append({'bucket': bucket, 'count': counts.get(bucket, 0)})
+        bucket = _next_bucket(bucket, granularity)
+    return results
+
+
+def local_day_start(day, tz=None):
+    """ローカル日付の0時（aware datetime）"""
+    return timezone.make_aware(datetime.combine(day, time.min), tz or timezone.get_current_timezone())
+
+
+def daily_conversation_counts(days=30, message_type='user', use_rollups=None):
+    """直近 days 日（今日を含む）の日別会話数
+
+    日次ロールアップ（ConversationDailyStat）が有効な場合、確定済みの日は
+    ロールアップから、今日の分のみ会話履歴から集計する（いずれも1クエリ）。
+
+    Returns:
+        list[dict]: [{'bucket': date, 'count': int}, ...]
+    """
+    if use_rollups is None:
+        use_rollups = getattr(settings, 'CONVERSATION_DAILY_ROLLUPS', False)
+
+    today = timezone.localdate()
+    first_day = today - timedelta(days=days - 1)
+    history = ConversationHistory.objects.all()
+    type_filter = Q(message_type=message_type) if message_type else None
+
+    if not use_rollups:
+        return bucket_counts(history, local_day_start(first_day), filter=type_filter)
+
+    column = f'{message_type}_messages' if message_type else 'message_count'
+    rolled_up = dict(
+        ConversationDailyStat.objects.filter(date__gte=first_day, date__lt=today)
+        .values_list('date', column)
+    )
+    results = [
+        {'bucket': first_day + timedelta(days=i), 'count': rolled_up.get(first_day + timedelta(days=i), 0)}
+        for i in range(days - 1)
+    ]
+    results.extend(bucket_counts(history, local_day_start(today), filter=type_filter))
+    return results
+
+
+def refresh_daily_rollups(start_day, end_day=None):
+    """[start_day, end_day) の日次ロールアップを会話履歴から再計算（1集計クエリ + 一括upsert）
+
+    Returns:
+        int: 更新した日数
+    """
+    end_day = end_day or timezone.localdate()
+    tz = timezone.get_current_timezone()
+
+    rows = ConversationHistory.objects.filter(
+        timestamp__gte=local_day_start(start_day), timestamp__lt=local_day_start(end_day)
+    ).order_by().annotate(
+        day=TruncDate('timestamp', tzinfo=tz)
+    ).values('day').annotate(
+        message_count=Count('id'),
+        user_messages=Count('id', filter=Q(message_type='user')),
+        assistant_messages=Count('id', filter=Q(message_type='assistant')),
+        system_messages=Count('id', filter=Q(message_type='system')),
+        session_count=Count('session_id', distinct=True),
+    )
+
+    stats = {row['day']: row for row in rows}
+    rollups = []
+    day = start_day
+    while day < end_day:
+        row = stats.get(day, {})
+        rollups.append(ConversationDailyStat(
+            date=day,
+            message_count=row.get('message_count', 0),
+            user_messages=row.get('user_messages', 0),
+            assistant_messages=row.get('assistant_messages', 0),
+            system_messages=row.get('system_messages', 0),
+            session_count=row.get('session_count', 0),
+        ))
+        day += timedelta(days=1)
+
+    ConversationDailyStat.objects.bulk_create(
+        rollups,
+        update_conflicts=True,
+        unique_fields=['date'],
+        update_fields=[
+            'message_count', 'user_messages', 'assistant_messages', 'system_messages', 'session_count', 'updated_at'
+        ],
+    )
+    return len(rollups)
+
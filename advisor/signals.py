@@ -0,0 +1,100 @@
+# advisor/signals.py - モデル変更時のキャッシュ無効化
+
+import sys
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import (
+    SubsidyType, SubsidySchedule, SubsidyAlias, AdoptionStatistics, AdoptionTips, ConversationHistory,
+)
+from .services.adoption_rollup import invalidate_adoption_rollup
+from .services.response_cache import invalidate_response_cache
+from .services.session_summary import record_messages
+from .services.subsidy_catalog import invalidate_subsidy_catalog
+from .services.subsidy_matcher import invalidate_alias_table
+
+
+def call_if_loaded(module_name, function_name, *args):
+    """サービスモジュールが読み込み済みの場合のみ関数を呼び出す
+
+    numpy を使うモジュール（意味検索インデックス・レコメンド）は初回利用時まで読み込まない。
+    未読み込みのプロセスには破棄・更新すべき状態も無いため、呼び出しを省略してよい。
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        getattr(module, function_name)(*args)
+
+
+invalidate_recommendation_engine = partial(
+    call_if_loaded, 'advisor.services.recommendation', 'invalidate_recommendation_engine'
+)
+
+
+@receiver(post_save, sender=SubsidyType, dispatch_uid='subsidy_catalog_on_save')
+@receiver(post_delete, sender=SubsidyType, dispatch_uid='subsidy_catalog_on_delete')
+def subsidy_type_changed(sender, **kwargs):
+    """補助金マスタ変更時にカタログ（と照合器）を差し替える"""
+    invalidate_subsidy_catalog()
+    # 他スレッドがコミット前の状態を読み込んだ場合に備えてコミット後にも破棄
+    transaction.on_commit(invalidate_subsidy_catalog)
+
+
+@receiver(post_save, sender=SubsidyAlias, dispatch_uid='subsidy_alias_on_save')
+@receiver(post_delete, sender=SubsidyAlias, dispatch_uid='subsidy_alias_on_delete')
+def subsidy_alias_changed(sender, **kwargs):
+    """エイリアス変更時に照合器を作り直させる（他プロセスは定期確認で反映）"""
+    invalidate_alias_table()
+    transaction.on_commit(invalidate_alias_table)
+
+
+@receiver(post_save, sender=AdoptionStatistics, dispatch_uid='adoption_rollup_on_save')
+@receiver(post_delete, sender=AdoptionStatistics, dispatch_uid='adoption_rollup_on_delete')
+def adoption_statistics_changed(sender, **kwargs):
+    """採択統計変更時に補助金別の集計スナップショットを破棄する"""
+    invalidate_adoption_rollup()
+    transaction.on_commit(invalidate_adoption_rollup)
+
+
+@receiver(post_save, sender=SubsidyType, dispatch_uid='embedding_subsidy_on_save')
+@receiver(post_delete, sender=SubsidyType, dispatch_uid='embedding_subsidy_on_delete')
+def subsidy_document_changed(sender, instance, **kwargs):
+    """読み込み済みの意味検索インデックスへ補助金の変更を反映する"""
+    call_if_loaded('advisor.services.embedding_index', 'schedule_document_refresh', 'subsidy', instance.pk)
+
+
+@receiver(post_save, sender=AdoptionTips, dispatch_uid='embedding_tip_on_save')
+@receiver(post_delete, sender=AdoptionTips, dispatch_uid='embedding_tip_on_delete')
+def tip_document_changed(sender, instance, **kwargs):
+    """読み込み済みの意味検索インデックスへティップスの変更を反映する"""
+    call_if_loaded('advisor.services.embedding_index', 'schedule_document_refresh', 'tip', instance.pk)
+
+
+@receiver(post_save, sender=SubsidySchedule, dispatch_uid='recommendation_schedule_on_save')
+@receiver(post_delete, sender=SubsidySchedule, dispatch_uid='recommendation_schedule_on_delete')
+def subsidy_schedule_changed(sender, **kwargs):
+    """公募スケジュール変更時にレコメンドエンジンを再構築させる（補助金マスタ変更はカタログ経由で検知）"""
+    invalidate_recommendation_engine()
+    transaction.on_commit(invalidate_recommendation_engine)
+
+
+@receiver(post_save, sender=SubsidyType, dispatch_uid='response_cache_subsidy_on_save')
+@receiver(post_delete, sender=SubsidyType, dispatch_uid='response_cache_subsidy_on_delete')
+@receiver(post_save, sender=AdoptionStatistics, dispatch_uid='response_cache_statistics_on_save')
+@receiver(post_delete, sender=AdoptionStatistics, dispatch_uid='response_cache_statistics_on_delete')
+@receiver(post_save, sender=AdoptionTips, dispatch_uid='response_cache_tips_on_save')
+@receiver(post_delete, sender=AdoptionTips, dispatch_uid='response_cache_tips_on_delete')
+def answer_source_changed(sender, **kwargs):
+    """回答の元データ変更時にキャッシュ済みの Dify 回答を破棄する"""
+    invalidate_response_cache()
+    transaction.on_commit(invalidate_response_cache)
+
+
+@receiver(post_save, sender=ConversationHistory, dispatch_uid='conversation_session_on_save')
+def conversation_message_saved(sender, instance, created, raw=False, **kwargs):
+    """会話履歴の追加をセッション集計に反映する（bulk_create 時は呼び出し側で record_messages）"""
+    if created and not raw:
+        record_messages([instance])
+
@@ -0,0 +1,111 @@
+# advisor/tests/test_adoption_rollup.py
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from advisor.models import SubsidyType, AdoptionStatistics
+from advisor.services.adoption_analysis import AdoptionAnalysisService
+from advisor.services.adoption_rollup import get_adoption_rollup, invalidate_adoption_rollup
+from advisor.services.strategic_ai_advisor import StrategicAIAdvisorService
+
+
+class TestAdoptionRollup(TestCase):
+    """採択統計スナップショットのテスト"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.year = datetime.now().year
+        cls.subsidy = SubsidyType.objects.create(
+            name='ものづくり補助金',
+            description='設備投資を支援',
+            max_amount=1250,
+            target_business_type='中小企業',
+            requirements='付加価値額の向上',
+        )
+        cls.empty_subsidy = SubsidyType.objects.create(
+            name='統計なし補助金',
+            description='テスト用',
+            max_amount=100,
+            target_business_type='中小企業',
+            requirements='テスト要件',
+        )
+        rows = [
+            (cls.year, 2, 1000, 600, 60.0, {'製造業': {'adoption_rate': 70.0}}),
+            (cls.year, 1, 1000, 400, 40.0, {}),
+            (cls.year - 2, 1, 2000, 500, 25.0, {}),
+            (cls.year - 5, 1, 500, 450, 90.0, {}),
+        ]
+        for year, round_number, applications, adoptions, rate, industries in rows:
+            AdoptionStatistics.objects.create(
+                subsidy_type=cls.subsidy, year=year, round_number=round_number,
+                total_applications=applications, total_adoptions=adoptions, adoption_rate=rate,
+                small_business_applications=applications // 2, small_business_adoptions=adoptions // 4,
+                medium_business_applications=applications // 2, medium_business_adoptions=adoptions // 2,
+                industry_statistics=industries,
+            )
+
+    def setUp(self):
+        invalidate_adoption_rollup()
+
+    def test_rollup_values(self):
+        rollup = get_adoption_rollup().get(self.subsidy)
+
+        self.assertEqual((rollup.latest.year, rollup.latest.round_number), (self.year, 2))
+        self.assertEqual(rollup.latest_rate, 60.0)
+        self.assertAlmostEqual(rollup.weighted_rate_2y, 1000 / 2000 * 100)
+        self.assertAlmostEqual(rollup.weighted_rate_3y, 1500 / 4000 * 100)
+        self.assertAlmostEqual(rollup.small_business_rate, 150 / 500 * 100)
+        self.assertAlmostEqual(rollup.medium_business_rate_3y, 750 / 2000 * 100)
+        self.assertEqual(dict(rollup.industry_rates), {'製造業': 70.0})
+        self.assertEqual([stat.year for stat in rollup.recent(3)], [self.year, self.year, self.year - 2])
+
+        empty = get_adoption_rollup().get(self.empty_subsidy)
+        self.assertIsNone(empty.latest)
+        self.assertIsNone(empty.weighted_rate_3y)
+
+    def test_services_read_snapshot_without_queries(self):
+        get_adoption_rollup()
+        service = StrategicAIAdvisorService()
+        subsidies = [self.subsidy, self.empty_subsidy]
+
+        with self.assertNumQueries(0):
+            self.assertEqual(service._strategic_subsidy_selection('ものづくり', '製造業', subsidies), self.subsidy)
+            self.assertEqual(service._assess_competition_from_context(self.subsidy, '製造業'),
+                             '競争やや激化（戦略的差別化必要）')
+            self.assertEqual(service._calculate_strategic_success_rate(self.empty_subsidy, '', ''), 70)
+
+    def test_adoption_probability_uses_size_and_industry_rates(self):
+        user = User.objects.create_user('rollup-user')
+        probability = AdoptionAnalysisService().calculate_adoption_probability(
+            user, self.subsidy, {'company_size': '小規模事業者', 'business_type': '製造業'}
+        )
+        self.assertAlmostEqual(probability, (30.0 + 70.0) / 2)
+
+    def test_refreshed_when_statistics_change(self):
+        self.assertEqual(get_adoption_rollup().get(self.subsidy).latest_rate, 60.0)
+
+        AdoptionStatistics.objects.create(
+            subsidy_type=self.subsidy, year=self.year, round_number=3,
+            total_applications=100, total_adoptions=80, adoption_rate=80.0,
+        )
+        self.assertEqual(get_adoption_rollup().get(self.subsidy).latest_rate, 80.0)
+
+    def test_changes_from_other_processes_are_picked_up_after_interval(self):
+        # シグナルの飛ばない一括更新（= 別プロセスでの変更）は確認間隔が過ぎるまで反映しない
+        with override_settings(SNAPSHOT_RELOAD_INTERVAL=3600):
+            invalidate_adoption_rollup()
+            get_adoption_rollup()
+            AdoptionStatistics.objects.filter(year=self.year, round_number=2).update(
+                adoption_rate=55.0, updated_at=timezone.now()
+            )
+            self.assertEqual(get_adoption_rollup().get(self.subsidy).latest_rate, 60.0)
+
+        with override_settings(SNAPSHOT_RELOAD_INTERVAL=0):
+            invalidate_adoption_rollup()
+            self.assertEqual(get_adoption_rollup().get(self.subsidy).latest_rate, 55.0)
+            AdoptionStatistics.objects.filter(year=self.year, round_number=2).update(
+                adoption_rate=50.0, updated_at=timezone.now()
+            )
+            self.assertEqual(get_adoption_rollup().get(self.subsidy).latest_rate, 50.0)
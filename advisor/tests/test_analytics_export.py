@@ -0,0 +1,112 @@
+# advisor/tests/test_analytics_export.py
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from advisor.models import ConversationHistory
+from advisor.services.analytics_export import WATERMARK_FILENAME, flatten_json
+
+
+class TestExportConversations(TestCase):
+    """会話履歴の分析用エクスポート（日付パーティション・差分出力）のテスト"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.day1 = timezone.make_aware(datetime(2026, 10, 1, 23, 30))
+        self.day2 = self.day1 + timedelta(hours=1)
+
+    def create_messages(self, session_id, timestamp, count):
+        messages = ConversationHistory.objects.bulk_create([
+            ConversationHistory(
+                session_id=session_id, message_type='assistant', content=f'回答 {i}',
+                metadata={'confidence_score': 0.5 + i / 10, 'model_used': 'test', 'recommended_subsidies': ['A']},
+                intent_analysis={'primary_intent': 'application_process', 'scores': {'amount': 2}},
+            )
+            for i in range(count)
+        ])
+        for message in messages:
+            message.timestamp = timestamp
+        ConversationHistory.objects.bulk_update(messages, ['timestamp'])
+
+    def export(self, *args, **options):
+        out = StringIO()
+        call_command('export_conversations', self.directory, *args, format='ndjson', chunk_size=4,
+                     stdout=out, **options)
+        return out.getvalue()
+
+    def read_partitions(self):
+        partitions = {}
+        for name in sorted(os.listdir(self.directory)):
+            if name.startswith('date='):
+                for filename in sorted(os.listdir(os.path.join(self.directory, name))):
+                    with open(os.path.join(self.directory, name, filename), encoding='utf-8') as f:
+                        partitions.setdefault(name, []).extend(json.loads(line) for line in f)
+        return partitions
+
+    def test_flatten_json(self):
+        self.assertEqual(
+            flatten_json({'a': 1, 'b': {'c': 'x', 'd': [1, 2]}}, 'metadata'),
+            {'metadata__a': 1, 'metadata__b__c': 'x', 'metadata__b__d': '[1, 2]'}
+        )
+
+    def test_full_then_incremental_export(self):
+        self.create_messages('s1', self.day1, 5)
+        self.create_messages('s2', self.day2, 3)
+
+        output = self.export()
+        self.assertIn('8行を', output)
+        partitions = self.read_partitions()
+        self.assertEqual({name: len(rows) for name, rows in partitions.items()},
+                         {'date=2026-10-01': 5, 'date=2026-10-02': 3})
+        row = partitions['date=2026-10-01'][0]
+        self.assertEqual(row['metadata__model_used'], 'test')
+        self.assertEqual(row['metadata__recommended_subsidies'], '["A"]')
+        self.assertEqual(row['intent_analysis__scores__amount'], 2)
+        self.assertEqual(row['username'], None)
+
+        # 差分出力は透かしより新しい行のみ
+        self.assertIn('新しい会話履歴はありません', self.export(incremental=True))
+        self.create_messages('s3', self.day2 + timedelta(minutes=5), 2)
+        self.assertIn('2行を', self.export(incremental=True))
+        self.assertEqual(len(self.read_partitions()['date=2026-10-02']), 5)
+        with open(os.path.join(self.directory, WATERMARK_FILENAME), encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['rows'], 10)
+
+    def test_recent_rows_wait_for_next_run(self):
+        ConversationHistory.objects.create(session_id='live', message_type='user', content='書き込み中')
+        self.assertIn('新しい会話履歴はありません', self.export())
+        self.assertIn('1行を', self.export(incremental=True, settle_seconds=-1))
+
+    def test_existing_output_requires_incremental_or_overwrite(self):
+        self.create_messages('s1', self.day1, 2)
+        self.export()
+        with self.assertRaises(CommandError):
+            self.export()
+        self.assertIn('2行を', self.export(overwrite=True))
+        self.assertEqual(len(self.read_partitions()['date=2026-10-01']), 2)
+
+    def test_parquet_requires_pyarrow(self):
+        with mock.patch.dict(sys.modules, {'pyarrow': None}), self.assertRaises(CommandError):
+            call_command('export_conversations', self.directory, stdout=StringIO())
+
+    @skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow がインストールされていません')
+    def test_parquet_export(self):
+        import pyarrow.dataset as ds
+
+        self.create_messages('s1', self.day1, 5)
+        call_command('export_conversations', self.directory, chunk_size=3, stdout=StringIO())
+        table = ds.dataset(self.directory, format='parquet', partitioning='hive').to_table()
+        self.assertEqual(table.num_rows, 5)
+        self.assertIn('metadata__confidence_score', table.column_names)
@@ -0,0 +1,120 @@
+# advisor/tests/test_benchmark_commands.py
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+from django.test import SimpleTestCase, TestCase
+
+from advisor.management.commands.benchmark_conversation_history import BENCH_DB_ALIAS
+from advisor.models import SubsidyType
+
+
+class TestBenchmarkConversationHistory(SimpleTestCase):
+    """会話履歴ベンチマークコマンドのテスト（使い捨ての SQLite で実行し、既定の DB には触れない）"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # コマンドが実行中だけ登録する DB エイリアスへの接続のみ許可する
+        cls.databases = frozenset({BENCH_DB_ALIAS})
+
+    def test_seed_and_measure_in_throwaway_db(self):
+        out = StringIO()
+        call_command(
+            'benchmark_conversation_history',
+            rows=500, sessions=20, batch_size=200, repeat=2, stdout=out
+        )
+        output = out.getvalue()
+
+        self.assertIn('500件を投入しました', output)
+        self.assertIn('倍）', output)
+        self.assertNotIn(BENCH_DB_ALIAS, connections.settings)
+
+    def test_reuses_db_path(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.sqlite3')
+            options = dict(rows=100, sessions=5, batch_size=50, repeat=1, skip_before=True, db_path=path)
+            call_command('benchmark_conversation_history', stdout=StringIO(), **options)
+            self.assertTrue(os.path.exists(path))
+
+            out = StringIO()
+            call_command('benchmark_conversation_history', stdout=out, **options)
+            self.assertIn('再利用します', out.getvalue())
+            self.assertIn('対象件数: 100件', out.getvalue())
+
+    def test_refuses_non_benchmark_db(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'other.sqlite3')
+            sqlite3.connect(path).close()
+            with self.assertRaisesMessage(CommandError, 'ベンチマーク用の DB ではありません'):
+                call_command('benchmark_conversation_history', db_path=path, stdout=StringIO())
+
+
+class TestBenchmarkAdoptionOverview(TestCase):
+    """採択率概要ベンチマークコマンドのテスト"""
+
+    def test_grouped_overview_matches_legacy(self):
+        out = StringIO()
+        call_command('benchmark_adoption_overview', subsidies=12, years=5, rounds=2, repeat=1, stdout=out)
+        output = out.getvalue()
+
+        self.assertIn('1クエリ集計', output)
+        self.assertIn('結果一致: ✅', output)
+        self.assertFalse(SubsidyType.objects.filter(name__startswith='ベンチマーク補助金').exists())
+
+
+class TestBenchmarkIntentEngine(TestCase):
+    """意図判定ベンチマークコマンドのテスト"""
+
+    def test_engine_matches_legacy_loops(self):
+        out = StringIO()
+        call_command('benchmark_intent_engine', samples=True, repeat=1, stdout=out)
+        output = out.getvalue()
+
+        self.assertIn('全呼び出し元の判定', output)
+        self.assertEqual(output.count('不一致 0件'), 5)
+
+
+class TestBenchmarkImportTime(SimpleTestCase):
+    """import 時間ベンチマークコマンドのテスト（別プロセスで計測）"""
+
+    def test_services_cold_import_is_within_budget(self):
+        """設定モジュールだけ指定した新しいインタプリタで advisor.services を計測するか"""
+        out = StringIO()
+        call_command('benchmark_import_time', repeat=1, stdout=out)
+        output = out.getvalue()
+
+        self.assertIn('✅ advisor.services の import 時間', output)
+        self.assertNotIn('重いパッケージ', output)
+
+    def test_views_import_is_within_budget_without_heavy_packages(self):
+        out = StringIO()
+        call_command('benchmark_import_time', module='advisor.views', django_setup=True, repeat=1,
+                     budget_ms=5000, stdout=out)
+        output = out.getvalue()
+
+        self.assertIn('✅ advisor.views の import 時間', output)
+        self.assertNotIn('重いパッケージ', output)
+
+    def test_fails_when_over_budget(self):
+        with self.assertRaisesMessage(CommandError, '予算 0.001ms を超えています'):
+            call_command('benchmark_import_time', repeat=1, budget_ms=0.001, stdout=StringIO())
+
+
+class TestBenchmarkSQLiteConcurrency(SimpleTestCase):
+    """SQLite 同時実行ベンチマークコマンドのテスト（一時ファイルで実行）"""
+
+    def test_compares_default_and_tuned_profiles(self):
+        out = StringIO()
+        call_command(
+            'benchmark_sqlite_concurrency', writers=2, readers=1, duration=0.3, seed_rows=200, stdout=out
+        )
+        output = out.getvalue()
+
+        self.assertIn('[default]', output)
+        self.assertIn('[tuned] WAL', output)
+        self.assertIn('（本番向け設定 / 既定設定）', output)
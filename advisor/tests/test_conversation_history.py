@@ -0,0 +1,109 @@
+# advisor/tests/test_conversation_history.py
+import json
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from advisor.models import ConversationHistory
+from advisor.services.conversation_history import decode_cursor, history_page
+
+
+class ConversationHistoryTestMixin:
+    def create_session(self, session_id, count, user=None):
+        """同じタイムスタンプを含む count 件の履歴を作成（キーセットの同順位の確認用）"""
+        base = timezone.now() - timedelta(hours=1)
+        messages = ConversationHistory.objects.bulk_create([
+            ConversationHistory(
+                session_id=session_id, user=user, message_type='user' if i % 2 == 0 else 'assistant',
+                content=f'メッセージ {i}',
+            )
+            for i in range(count)
+        ])
+        for i, message in enumerate(messages):
+            message.timestamp = base + timedelta(minutes=i // 3)
+        ConversationHistory.objects.bulk_update(messages, ['timestamp'])
+        return messages
+
+
+class TestHistoryPagination(ConversationHistoryTestMixin, TestCase):
+    """会話履歴APIのキーセット方式ページ送りのテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='taro')
+        self.messages = self.create_session('page-1', 25, user=self.user)
+
+    def fetch(self, **params):
+        response = self.client.get(reverse('advisor:conversation_history', args=['page-1']), params)
+        return response.status_code, response.json()
+
+    def test_pages_cover_history_without_gaps(self):
+        seen = []
+        cursor = None
+        while True:
+            status, data = self.fetch(limit=7, **({'before': cursor} if cursor else {}))
+            self.assertEqual(status, 200)
+            seen = [message['content'] for message in data['history']] + seen
+            cursor = data['next_cursor']
+            self.assertEqual(data['has_more'], cursor is not None)
+            if not cursor:
+                break
+        self.assertEqual(seen, [f'メッセージ {i}' for i in range(25)])
+
+    def test_page_is_loaded_with_one_query(self):
+        _, cursor = history_page('page-1', limit=5)
+        with CaptureQueriesContext(connection) as queries:
+            page, _ = history_page('page-1', limit=5, before=cursor)
+            usernames = {message.user.username for message in page}
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(usernames, {'taro'})
+        self.assertEqual(decode_cursor(cursor)[1], page[-1].id + 1)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.fetch(before='!!invalid!!')[0], 400)
+        self.assertEqual(self.fetch(limit='abc')[0], 400)
+        status, data = self.fetch(limit=100000)
+        self.assertEqual(len(data['history']), 25)
+
+    def test_unknown_session_is_404(self):
+        response = self.client.get(reverse('advisor:conversation_history', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+
+class TestExportSession(ConversationHistoryTestMixin, TestCase):
+    """セッションエクスポートのストリーミング出力のテスト"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create(username='admin', is_staff=True))
+        self.user = User.objects.create(username='hanako')
+        self.create_session('export-1', 10, user=self.user)
+        ConversationHistory.objects.filter(session_id='export-1', message_type='assistant').update(user=None)
+
+    def export(self, **params):
+        return self.client.get(reverse('advisor:export_session', args=['export-1']), params)
+
+    def test_json_export_is_streamed(self):
+        response = self.export()
+        self.assertTrue(response.streaming)
+        self.assertIn('session_export-1.json', response['Content-Disposition'])
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['session_id'], 'export-1')
+        self.assertEqual(data['total_messages'], 10)
+        self.assertEqual([m['content'] for m in data['messages']], [f'メッセージ {i}' for i in range(10)])
+        self.assertEqual({m['user'] for m in data['messages']}, {'hanako', 'ゲスト'})
+
+    def test_ndjson_export(self):
+        response = self.export(format='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 10)
+        self.assertEqual(json.loads(lines[0])['content'], 'メッセージ 0')
+
+    def test_invalid_format_and_missing_session(self):
+        self.assertEqual(self.export(format='xml').status_code, 400)
+        response = self.client.get(reverse('advisor:export_session', args=['missing']))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,71 @@
+# advisor/tests/test_conversation_writer.py
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from advisor.models import ConversationHistory, ConversationSession
+from advisor.services.conversation_writer import ConversationWriter, build_turn, write_messages
+from advisor.services.enhanced_chat_service import EnhancedChatService
+
+
+class TestWriteMessages(TestCase):
+    """1ターン一括保存のテスト"""
+
+    def test_turn_is_saved_with_single_insert(self):
+        messages = build_turn('writer-1', '申請方法は？', {'answer': '回答です', 'model_used': 'test'},
+                              intent_analysis={'primary_intent': 'application_process'})
+
+        with CaptureQueriesContext(connection) as queries:
+            write_messages(messages)
+
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "advisor_conversationhistory"')]
+        self.assertEqual(len(inserts), 1)
+
+        saved = list(ConversationHistory.objects.filter(session_id='writer-1').order_by('timestamp', 'id'))
+        self.assertEqual([m.message_type for m in saved], ['user', 'assistant'])
+        self.assertEqual(saved[1].metadata['model_used'], 'test')
+        self.assertLess(saved[0].timestamp, saved[1].timestamp)
+
+        session = ConversationSession.objects.get(session_id='writer-1')
+        self.assertEqual((session.message_count, session.user_messages, session.assistant_messages), (2, 1, 1))
+        self.assertEqual(session.last_user_message, '申請方法は？')
+
+    def test_enhanced_chat_service_uses_writer(self):
+        EnhancedChatService()._save_conversation_turn('writer-2', '質問', {'answer': '回答'}, {}, None)
+        self.assertEqual(ConversationHistory.objects.filter(session_id='writer-2').count(), 2)
+        self.assertEqual(ConversationSession.objects.get(session_id='writer-2').message_count, 2)
+
+
+    def test_timestamps_are_fixed_when_turn_is_built(self):
+        """書き込みが遅れても timestamp は組み立て時の値のまま保存されるか"""
+        first = build_turn('writer-3', '最初の質問', {'answer': '最初の回答'})
+        second = build_turn('writer-3', '次の質問', {'answer': '次の回答'})
+        write_messages(second)
+        write_messages(first)
+
+        saved = ConversationHistory.objects.filter(session_id='writer-3').order_by('timestamp', 'id')
+        self.assertEqual([m.content for m in saved], ['最初の質問', '最初の回答', '次の質問', '次の回答'])
+        self.assertEqual(saved[0].timestamp, first[0].timestamp)
+
+
+class TestWriteBehind(TransactionTestCase):
+    """ライトビハインドキューのテスト"""
+
+    def test_batches_are_flushed_in_background(self):
+        writer = ConversationWriter(batch_size=100, flush_interval=0.5)
+        try:
+            for i in range(10):
+                writer.submit(build_turn(f'behind-{i % 3}', f'質問{i}', {'answer': f'回答{i}'}))
+            writer.flush()
+            stats = writer.stats()
+        finally:
+            writer.close()
+
+        self.assertEqual(ConversationHistory.objects.filter(session_id__startswith='behind-').count(), 20)
+        self.assertEqual(stats['written'], 20)
+        self.assertEqual(stats['pending'], 0)
+        self.assertLess(stats['batches'], 10)
+        self.assertEqual(
+            sum(ConversationSession.objects.filter(session_id__startswith='behind-').values_list('message_count', flat=True)),
+            20,
+        )
@@ -0,0 +1,161 @@
+# advisor/tests/test_dify_client.py
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from advisor.services.dify_client import CircuitBreaker, DifyClient
+from advisor.services.streaming import DifyStreamError
+
+
+class ScriptedDifyHandler(BaseHTTPRequestHandler):
+    """server.statuses の順にステータスを返す疑似 Dify"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length))
+        with self.server.lock:
+            self.server.calls += 1
+            self.server.connections.add(self.client_address)
+            status = self.server.statuses.pop(0) if self.server.statuses else 200
+
+        payload = json.dumps({'answer': f"回答: {body['query']}"}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestDifyClient(SimpleTestCase):
+    """共通 Dify クライアントのテスト"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), ScriptedDifyHandler)
+        cls.server.lock = threading.Lock()
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.statuses = []
+        self.server.calls = 0
+        self.server.connections = set()
+
+    def _client(self, **kwargs):
+        kwargs.setdefault('backoff', 0.01)
+        return DifyClient(self.base_url, 'test-key', **kwargs)
+
+    def test_connection_reused(self):
+        """keep-alive で同じ接続を使い回すか"""
+        client = self._client()
+        for i in range(5):
+            self.assertEqual(client.chat(f"q{i}", user='u')['answer'], f"回答: q{i}")
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_retry_on_5xx(self):
+        self.server.statuses = [503, 502]
+        client = self._client(max_retries=2)
+        self.assertEqual(client.chat('q', user='u')['answer'], '回答: q')
+        self.assertEqual(self.server.calls, 3)
+        self.assertEqual(client.stats()['retries'], 2)
+
+    def test_no_retry_on_4xx(self):
+        self.server.statuses = [400]
+        client = self._client(max_retries=2)
+        self.assertIsNone(client.chat('q', user='u'))
+        self.assertEqual(self.server.calls, 1)
+        self.assertEqual(client.breaker.state, 'closed')
+
+    def test_circuit_opens_and_recovers(self):
+        """連続失敗でブレーカーが開き、リクエストを送らずに即座に失敗するか"""
+        self.server.statuses = [500] * 4
+        client = self._client(max_retries=1, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.2))
+
+        self.assertIsNone(client.chat('q', user='u'))
+        self.assertIsNone(client.chat('q', user='u'))
+        self.assertEqual(client.breaker.state, 'open')
+
+        calls = self.server.calls
+        start = time.perf_counter()
+        self.assertIsNone(client.chat('q', user='u'))
+        self.assertLess(time.perf_counter() - start, 0.05)
+        self.assertEqual(self.server.calls, calls)
+        self.assertEqual(client.stats()['rejected'], 1)
+
+        time.sleep(0.25)
+        self.assertEqual(client.chat('q', user='u')['answer'], '回答: q')
+        self.assertEqual(client.breaker.state, 'closed')
+
+    def _half_open_client(self):
+        client = self._client(max_retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05))
+        self.server.statuses = [500]
+        self.assertIsNone(client.chat('q', user='u'))
+        self.assertEqual(client.breaker.state, 'open')
+        time.sleep(0.1)
+        return client
+
+    def test_4xx_settles_half_open_trial(self):
+        """half_open 中の 4xx で試行枠が残らず、以降の呼び出しが通るか"""
+        client = self._half_open_client()
+        self.server.statuses = [400]
+        self.assertIsNone(client.chat('q', user='u'))
+        self.assertEqual(client.breaker.state, 'closed')
+        self.assertEqual(client.chat('q', user='u')['answer'], '回答: q')
+
+    def test_stream_4xx_does_not_open_circuit(self):
+        """ストリーミングでも post() と同じく 4xx は失敗として数えず、5xx は数えるか"""
+        client = self._client(breaker=CircuitBreaker(failure_threshold=2, reset_timeout=30))
+        self.server.statuses = [400, 404, 422]
+        for _ in range(3):
+            with self.assertRaises(DifyStreamError):
+                list(client.stream_chat('q', user='u'))
+        self.assertEqual(client.breaker.state, 'closed')
+
+        self.server.statuses = [500, 503]
+        for _ in range(2):
+            with self.assertRaises(DifyStreamError):
+                list(client.stream_chat('q', user='u'))
+        self.assertEqual(client.breaker.state, 'open')
+
+    def test_abandoned_stream_releases_trial(self):
+        """ストリームを途中で破棄しても half_open の試行枠が空くか"""
+        client = self._half_open_client()
+        with mock.patch('advisor.services.dify_client.iter_dify_stream', return_value=iter(['a', 'b'])):
+            stream = client.stream_chat('q', user='u')
+            self.assertEqual(next(stream), 'a')
+            stream.close()
+        self.assertEqual(client.breaker.state, 'half_open')
+        self.assertEqual(client.chat('q', user='u')['answer'], '回答: q')
+        self.assertEqual(client.breaker.state, 'closed')
+
+    def test_total_timeout_bounds_retries(self):
+        """リトライとバックオフを含めて total_timeout で打ち切るか"""
+        self.server.statuses = [503] * 10
+        client = self._client(max_retries=9, backoff=1.0, total_timeout=0.3)
+        start = time.perf_counter()
+        self.assertIsNone(client.chat('q', user='u'))
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(client.breaker.failures, 1)
+
+    def test_async_entry_point(self):
+        client = self._client(max_concurrency=2)
+        results = asyncio.run(client.achat_many(['a', 'b', 'c'], user='u'))
+        self.assertEqual([r['answer'] for r in results], ['回答: a', '回答: b', '回答: c'])
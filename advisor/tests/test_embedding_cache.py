@@ -0,0 +1,165 @@
+# advisor/tests/test_embedding_cache.py
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from advisor.models import ConversationHistory
+from advisor.services.embedding_cache import (
+    NullQueryEmbeddingCache, QueryEmbeddingCache, encode_queries, get_query_embedding_cache, question_key,
+    reset_query_embedding_cache,
+)
+from advisor.services.embeddings import HashingEncoder, reset_text_encoder
+
+
+class CountingEncoder(HashingEncoder):
+    """encode() の呼び出しを記録するエンコーダー"""
+
+    def __init__(self, dimension=64):
+        super().__init__(dimension)
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        return super().encode(texts)
+
+
+class TestQueryEmbeddingCache(SimpleTestCase):
+    """質問ベクトルキャッシュのテスト"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'cache', 'query_embeddings.sqlite3')
+        self.encoder = CountingEncoder()
+
+    def make_cache(self, **kwargs):
+        cache = QueryEmbeddingCache(self.path, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_question_key_uses_normalized_text(self):
+        self.assertEqual(question_key('IT導入補助金の申請方法？'), question_key('ＩＴ導入補助金の 申請方法'))
+        self.assertNotEqual(question_key('IT導入補助金の申請方法'), question_key('ものづくり補助金の申請方法'))
+
+    def test_misses_are_encoded_in_one_batch(self):
+        cache = self.make_cache()
+        texts = ['IT導入補助金とは', 'ものづくり補助金の採択率', 'ＩＴ導入補助金とは？', '事業再構築補助金の要件']
+        vectors = cache.encode(texts, self.encoder)
+
+        self.assertEqual(vectors.shape, (4, 64))
+        self.assertEqual(self.encoder.calls, [['IT導入補助金とは', 'ものづくり補助金の採択率', '事業再構築補助金の要件']])
+        np.testing.assert_array_equal(vectors[0], vectors[2])
+        np.testing.assert_allclose(vectors[1], self.encoder.encode(['ものづくり補助金の採択率'])[0])
+
+        cache.encode(texts, self.encoder)
+        self.assertEqual(len(self.encoder.calls), 2)  # 2回目は計算しない（上の比較用の呼び出しのみ）
+        stats = cache.stats()
+        self.assertEqual(stats['misses'], 4)
+        self.assertEqual(stats['memory_hits'], 4)
+
+    def test_disk_cache_is_shared_between_instances(self):
+        first = self.make_cache()
+        expected = first.encode(['IT導入補助金とは', '採択率を上げるコツ'], self.encoder)
+        first.close()
+
+        # 別プロセスの代わりに新しいインスタンスで同じファイルを開く
+        second = self.make_cache()
+        encoder = CountingEncoder()
+        vectors = second.encode(['採択率を上げるコツ', 'IT導入補助金とは', '新しい質問'], encoder)
+        self.assertEqual(encoder.calls, [['新しい質問']])
+        np.testing.assert_array_equal(vectors[:2], expected[::-1])
+        self.assertEqual(second.stats()['disk_hits'], 2)
+
+    def test_vectors_are_separated_by_encoder(self):
+        cache = self.make_cache()
+        cache.encode(['IT導入補助金とは'], self.encoder)
+        other = CountingEncoder(dimension=32)
+        self.assertEqual(cache.encode(['IT導入補助金とは'], other).shape, (1, 32))
+        self.assertEqual(len(other.calls), 1)
+
+    def test_lru_and_disk_limits(self):
+        cache = self.make_cache(memory_entries=2, max_entries=3)
+        with mock.patch('advisor.services.embedding_cache.PRUNE_INTERVAL', 1):
+            for i in range(5):
+                cache.encode([f'質問{i}'], self.encoder)
+
+        self.assertEqual(cache.stats()['memory_entries'], 2)
+        count = cache._connection.execute('SELECT COUNT(*) FROM query_embeddings').fetchone()[0]
+        self.assertEqual(count, 3)
+
+    def test_last_used_is_refreshed_in_throttled_batches(self):
+        """古い行の last_used だけを、メモリのヒットも含めてまとめて更新する"""
+        first = self.make_cache()
+        first.encode(['IT導入補助金とは', '採択率を上げるコツ'], self.encoder)
+        first._connection.execute('UPDATE query_embeddings SET last_used = 0')
+        first.close()
+
+        cache = self.make_cache()
+
+        def last_used():
+            return sorted(row[0] for row in cache._connection.execute('SELECT last_used FROM query_embeddings'))
+
+        # ディスクのヒットは更新対象に記録するが、書き込みは間隔が経つまで保留
+        cache.encode(['IT導入補助金とは'], self.encoder)
+        self.assertEqual(last_used(), [0, 0])
+        with mock.patch('advisor.services.embedding_cache.TOUCH_FLUSH_INTERVAL', 0):
+            cache.encode(['採択率を上げるコツ'], self.encoder)
+        self.assertTrue(all(value > 0 for value in last_used()))
+
+        # 更新済みの行は TOUCH_INTERVAL が経つまで記録しない
+        cache.encode(['IT導入補助金とは', '採択率を上げるコツ'], self.encoder)
+        self.assertEqual(cache._pending_touches, {})
+        with mock.patch('advisor.services.embedding_cache.TOUCH_INTERVAL', 0):
+            cache.encode(['IT導入補助金とは'], self.encoder)
+        self.assertEqual(len(cache._pending_touches), 1)
+
+    def test_unwritable_path_falls_back_to_memory(self):
+        blocker = os.path.join(self.directory.name, 'file')
+        open(blocker, 'w').close()
+        cache = QueryEmbeddingCache(os.path.join(blocker, 'cache.sqlite3'))
+        cache.encode(['IT導入補助金とは'], self.encoder)
+        cache.encode(['IT導入補助金とは'], self.encoder)
+        self.assertEqual(len(self.encoder.calls), 1)
+        self.assertIsNone(cache.stats()['path'])
+
+    def test_disabled_cache_always_encodes(self):
+        with override_settings(EMBEDDING_QUERY_CACHE={'ENABLED': False}):
+            reset_query_embedding_cache()
+            self.addCleanup(reset_query_embedding_cache)
+            self.assertIsInstance(get_query_embedding_cache(), NullQueryEmbeddingCache)
+            encode_queries(['IT導入補助金とは'], self.encoder)
+            encode_queries(['IT導入補助金とは'], self.encoder)
+        self.assertEqual(len(self.encoder.calls), 2)
+
+
+class TestWarmQueryEmbeddingCacheCommand(TestCase):
+    """warm_query_embedding_cache コマンドのテスト"""
+
+    def test_warm_frequent_questions(self):
+        for content, count in [('IT導入補助金とは', 3), ('採択率を上げるコツ', 2), ('事業再構築補助金の要件', 1)]:
+            for i in range(count):
+                ConversationHistory.objects.create(session_id=f's{i}', message_type='user', content=content)
+        ConversationHistory.objects.create(session_id='s0', message_type='assistant', content='回答')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'query_embeddings.sqlite3')
+            config = {'ENABLED': True, 'PATH': path}
+            with override_settings(EMBEDDING_QUERY_CACHE=config, EMBEDDING_INDEX={'MODEL': 'hashing'}):
+                reset_text_encoder()
+                reset_query_embedding_cache()
+                self.addCleanup(reset_text_encoder)
+                self.addCleanup(reset_query_embedding_cache)
+
+                out = StringIO()
+                call_command('warm_query_embedding_cache', '--limit', '2', stdout=out)
+                self.assertIn('2件の質問を処理しました（新規計算 2件', out.getvalue())
+
+                encoder = CountingEncoder(512)
+                get_query_embedding_cache().encode(['IT導入補助金とは', '採択率を上げるコツ'], encoder)
+                self.assertEqual(encoder.calls, [])
+                reset_query_embedding_cache()
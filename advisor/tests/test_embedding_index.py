@@ -0,0 +1,223 @@
+# advisor/tests/test_embedding_index.py
+import tempfile
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from advisor.models import AdoptionTips, SubsidyType
+from advisor.services.embedding_index import (
+    EmbeddingIndex, get_embedding_index, make_key, reset_embedding_index, semantic_search,
+)
+from advisor.services.embedding_cache import reset_query_embedding_cache
+from advisor.services.embeddings import HashingEncoder, get_text_encoder, reset_text_encoder
+
+DOCUMENTS = [
+    ('subsidy:1', 'IT導入補助金\n会計ソフトや受発注システムなどITツールの導入費用を支援'),
+    ('subsidy:2', 'ものづくり補助金\n革新的な製品開発のための設備投資を支援'),
+    ('tip:1', 'IT導入補助金 ITベンダーの選び方\n登録されたIT導入支援事業者と事前に相談する'),
+    ('tip:2', 'ものづくり補助金 事業計画書の書き方\n設備投資による生産性向上を数値で示す'),
+    ('tip:3', '事業再構築補助金 認定支援機関\n認定経営革新等支援機関と計画を策定する'),
+]
+
+
+@override_settings(EMBEDDING_QUERY_CACHE={'ENABLED': True, 'PATH': None})
+class TestEmbeddingIndex(SimpleTestCase):
+    """埋め込みインデックス（NumPy 検索）のテスト"""
+
+    def setUp(self):
+        reset_query_embedding_cache()
+        self.addCleanup(reset_query_embedding_cache)
+        self.encoder = HashingEncoder(256)
+        self.index = EmbeddingIndex.build(DOCUMENTS, self.encoder, use_faiss=False)
+
+    def test_search_matches_brute_force(self):
+        query = self.encoder.encode(['設備投資の事業計画'])[0]
+        expected = sorted(
+            ((key, float(vector @ query)) for (key, _), vector in
+             zip(DOCUMENTS, self.encoder.encode([text for _, text in DOCUMENTS]))),
+            key=lambda item: item[1], reverse=True,
+        )[:3]
+        hits = self.index.search_vector(query, k=3)
+        self.assertEqual([key for key, _ in hits], [key for key, _ in expected])
+        for (_, score), (_, expected_score) in zip(hits, expected):
+            self.assertAlmostEqual(score, expected_score, places=5)
+
+    def test_source_filter(self):
+        hits = self.index.search('ITツール', k=5, sources=('tip',))
+        self.assertTrue(hits)
+        self.assertTrue(all(key.startswith('tip:') for key, _ in hits))
+        self.assertEqual(hits[0][0], 'tip:1')
+
+    def test_upsert_and_remove(self):
+        self.assertEqual(self.index.upsert(DOCUMENTS[:2]), 0)  # 変更なしは再計算しない
+        self.assertEqual(self.index.upsert([('tip:3', '省エネ設備 補助対象\n高効率空調への更新費用')]), 1)
+        self.assertEqual(self.index.upsert([('tip:4', '小規模事業者持続化補助金 販路開拓\nチラシ作成や展示会出展')]), 1)
+        self.assertEqual(len(self.index), 6)
+
+        hits = self.index.search('展示会出展 販路開拓', k=1)
+        self.assertEqual(hits[0][0], 'tip:4')
+        hits = self.index.search('認定経営革新等支援機関', k=5)
+        self.assertNotIn('tip:3', [key for key, score in hits if score > 0.5])
+
+        self.assertEqual(self.index.remove(['tip:4', 'tip:99']), 1)
+        self.assertNotIn('tip:4', self.index)
+        self.assertEqual(len(self.index), 5)
+
+    def test_save_and_load_with_mmap(self):
+        self.index.upsert([('tip:4', '小規模事業者持続化補助金 販路開拓\nチラシ作成や展示会出展')])
+        self.index.remove(['tip:2'])
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual(self.index.save(directory), 5)
+            self.assertFalse(self.index.dirty)
+
+            loaded = EmbeddingIndex.load(directory, self.encoder, use_faiss=False)
+            self.assertIsInstance(loaded._vectors, np.memmap)
+            self.assertEqual(len(loaded), 5)
+            self.assertNotIn('tip:2', loaded)
+            self.assertEqual(loaded.search('展示会出展', k=1)[0][0], 'tip:4')
+            self.assertEqual(loaded.hashes(), self.index.hashes())
+            del loaded
+
+            # エンコーダーが変わったら読み込まない（再構築が必要）
+            self.assertIsNone(EmbeddingIndex.load(directory, HashingEncoder(128), use_faiss=False))
+
+    def test_load_missing_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertIsNone(EmbeddingIndex.load(directory, self.encoder))
+
+    def test_missing_index_does_not_load_encoder(self):
+        """未構築ならエンコーダー（モデル）を読み込まず、空のインデックスの検索は結果なし"""
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(EMBEDDING_INDEX={'DIRECTORY': directory, 'BACKEND': 'numpy'}), \
+                mock.patch('advisor.services.embedding_index.get_text_encoder') as get_encoder:
+            reset_embedding_index()
+            self.addCleanup(reset_embedding_index)
+            self.assertIsNone(EmbeddingIndex.load(directory))
+            index = get_embedding_index()
+            self.assertIsNone(index.encoder)
+            self.assertEqual(index.search('ITツール'), [])
+            self.assertEqual(semantic_search('ITツール'), [])
+        get_encoder.assert_not_called()
+
+    def test_request_path_loads_model_from_local_files_only(self):
+        with override_settings(EMBEDDING_INDEX={'MODEL': 'some-model'}), \
+                mock.patch('advisor.services.embeddings.SentenceTransformerEncoder') as model_encoder:
+            reset_text_encoder()
+            self.addCleanup(reset_text_encoder)
+            get_text_encoder()
+            model_encoder.assert_called_once_with('some-model', local_files_only=True)
+
+            reset_text_encoder()
+            get_text_encoder(allow_download=True)
+            model_encoder.assert_called_with('some-model', local_files_only=False)
+
+
+class TestEmbeddingIndexIntegration(TestCase):
+    """インデックスの構築コマンド・シグナルによる差分更新のテスト"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.override = override_settings(
+            EMBEDDING_INDEX={
+                'DIRECTORY': self.directory.name, 'MODEL': 'hashing', 'BACKEND': 'numpy', 'AUTO_UPDATE': True,
+            },
+            EMBEDDING_QUERY_CACHE={'ENABLED': True, 'PATH': None},
+        )
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        reset_text_encoder()
+        reset_embedding_index()
+        reset_query_embedding_cache()
+        self.addCleanup(reset_text_encoder)
+        self.addCleanup(reset_query_embedding_cache)
+        self.addCleanup(reset_embedding_index)
+
+        self.it = SubsidyType.objects.create(
+            name='IT導入補助金', description='ITツールの導入を支援', target_business_type='中小企業',
+            requirements='IT導入支援事業者との共同申請', max_amount=450,
+        )
+        self.monozukuri = SubsidyType.objects.create(
+            name='ものづくり補助金', description='革新的な設備投資を支援', target_business_type='中小企業',
+            requirements='付加価値額の年率3%以上向上', max_amount=1000,
+        )
+        self.tip = AdoptionTips.objects.create(
+            subsidy_type=self.monozukuri, category='application', title='事業計画書の書き方',
+            content='設備投資による生産性向上を数値で示す',
+        )
+
+    def build(self, *args):
+        out = StringIO()
+        call_command('build_embedding_index', *args, stdout=out)
+        return out.getvalue()
+
+    def test_build_and_semantic_search(self):
+        output = self.build()
+        self.assertIn('3件のインデックスを保存しました', output)
+
+        hits = semantic_search('生産性向上の数値目標', k=1, sources=('tip',))
+        self.assertEqual(hits[0]['source'], 'tip')
+        self.assertEqual(hits[0]['object_id'], self.tip.id)
+        hits = semantic_search('ITツール導入', k=1, sources=('subsidy',))
+        self.assertEqual(hits[0]['object_id'], self.it.id)
+
+    def test_incremental_build(self):
+        self.build()
+        self.tip.content = '認定支援機関と連携して計画を策定する'
+        self.tip.save()
+        self.it.delete()
+
+        output = self.build('--incremental')
+        self.assertIn('更新 1件 / 削除 1件 / 変更なし 1件', output)
+        index = get_embedding_index()
+        self.assertEqual(len(index), 2)
+        self.assertNotIn(make_key('subsidy', self.it.id), index)
+
+    def test_signals_update_loaded_index(self):
+        self.build()
+        index = get_embedding_index()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tip = AdoptionTips.objects.create(
+                subsidy_type=self.it, category='strategy', title='ITベンダーの選び方',
+                content='登録されたIT導入支援事業者と事前に相談する',
+            )
+        self.assertIn(make_key('tip', tip.id), index)
+        self.assertEqual(semantic_search('IT導入支援事業者に相談', k=1, sources=('tip',))[0]['object_id'], tip.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tip.delete()
+        self.assertNotIn(make_key('tip', tip.id), index)
+
+    @override_settings(SNAPSHOT_RELOAD_INTERVAL=0)
+    def test_signal_updates_are_saved_and_picked_up_by_other_workers(self):
+        """差分更新がファイルに保存され、別ワーカー（別のインデックス）も定期確認で読み直すか"""
+        self.build()
+        other_worker = EmbeddingIndex.load(self.directory.name, use_faiss=False)
+        get_embedding_index()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tip = AdoptionTips.objects.create(
+                subsidy_type=self.it, category='strategy', title='ITベンダーの選び方',
+                content='登録されたIT導入支援事業者と事前に相談する',
+            )
+        self.assertIn(make_key('tip', tip.id), EmbeddingIndex.load(self.directory.name, use_faiss=False))
+        self.assertNotEqual(other_worker.file_version, get_embedding_index().file_version)
+
+        # 別ワーカーでの保存（このプロセスにはシグナルが届かない）
+        other_worker.remove([make_key('subsidy', self.it.id)])
+        other_worker.save(self.directory.name)
+        self.assertNotIn(make_key('subsidy', self.it.id), get_embedding_index())
+
+    def test_search_without_index_returns_nothing(self):
+        self.assertEqual(semantic_search('ITツール'), [])
+
+        # 未構築のインデックスにはシグナルで行を追加しない（構築は build_embedding_index で行う）
+        with self.captureOnCommitCallbacks(execute=True):
+            AdoptionTips.objects.create(
+                subsidy_type=self.it, category='strategy', title='ITベンダーの選び方', content='事前に相談する',
+            )
+        self.assertEqual(len(get_embedding_index()), 0)
@@ -0,0 +1,130 @@
+# advisor/tests/test_intent_engine.py
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from advisor.management.commands.benchmark_intent_engine import (
+    SAMPLE_QUESTIONS, legacy_chat_intent, legacy_first, legacy_nlp_scores,
+)
+from advisor.models import ConversationHistory
+from advisor.services.intent_engine import (
+    IntentEngine, analyze_chat_intent, build_intent_engine, classify_intent, nlp_intent_patterns, trie_pattern,
+)
+from advisor.services.nlp_ai_advisor import NLPAIAdvisorService
+
+EDGE_QUESTIONS = SAMPLE_QUESTIONS + [
+    '',
+    '補助額と金額の上限について',           # 重なり合うキーワード（金額・額）
+    '採択率と採択の違い',
+    'いつまでに申請すればいい？',             # 「いつまで.*申請」
+    '申請はいつまで？',                       # 順序が逆なので「いつまで.*申請」は不一致
+    '補助金\nとは',                           # 改行をまたぐ「補助金.*とは」は不一致
+    '補助金とは？\n申請の流れも教えて',
+    'うちの小さな会社も対象ですか',
+    'ＩＴ導入補助金 DX 申請方法',
+    'it導入補助金の申請方法',                 # パターン（補助金名）は大文字・小文字を区別
+    'IT導入補助金とit導入補助金',
+]
+
+
+class TestIntentEngine(SimpleTestCase):
+    """意図判定エンジンのテスト"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.engine = build_intent_engine()
+
+    def test_trie_pattern_prefers_longest_match(self):
+        self.assertEqual(trie_pattern(['補助', '補助金', '補助額']), '補助(?:金|額)?')
+        engine = IntentEngine.from_keywords({'test': {'rate': ['採択率'], 'adoption': ['採択'], 'fee': ['額']}})
+        scores = engine.classify('採択率と補助額', 'test').scores
+        self.assertEqual(scores, {'rate': 1, 'adoption': 1, 'fee': 1})
+
+    def test_priority_schemes_match_legacy_if_chains(self):
+        for scheme, default in [('detailed', 'overview'), ('context_aware', 'general'), ('prompt', None)]:
+            for question in EDGE_QUESTIONS:
+                with self.subTest(scheme=scheme, question=question):
+                    expected = legacy_first(scheme, question, default)
+                    self.assertEqual(self.engine.first(question, scheme, default), expected)
+                    self.assertEqual(self.engine.classify(question, scheme).first(default), expected)
+
+    def test_chat_intent_matches_legacy(self):
+        for question in EDGE_QUESTIONS:
+            for flow in ('initial', 'continuing'):
+                with self.subTest(question=question, flow=flow):
+                    self.assertEqual(analyze_chat_intent(question, flow), legacy_chat_intent(question, flow))
+
+    def test_nlp_scores_match_legacy_regex(self):
+        patterns = nlp_intent_patterns()
+        for question in EDGE_QUESTIONS:
+            with self.subTest(question=question):
+                results = self.engine.analyze(question, schemes=('nlp', 'nlp_detail'))
+                expected_scores, expected_detail = legacy_nlp_scores(patterns, question)
+                self.assertEqual(results['nlp'].scores, expected_scores)
+                self.assertEqual(bool(results['nlp_detail'].first()), expected_detail)
+
+    def test_analyze_all_schemes_in_one_pass(self):
+        question = 'IT導入補助金の申請方法を詳しく教えて'
+        results = self.engine.analyze(question)
+        for scheme in self.engine.schemes:
+            self.assertEqual(results[scheme].scores, self.engine.classify(question, scheme).scores)
+
+    def test_classify_intent_helper(self):
+        self.assertEqual(classify_intent('採択率を上げたい', 'detailed'), 'adoption_rate')
+        self.assertEqual(classify_intent('こんにちは', 'detailed', default='overview'), 'overview')
+
+
+class TestNLPIntentAnalysis(TestCase):
+    """NLPAIAdvisorService の意図判定（エンジン経由）のテスト"""
+
+    def test_specific_subsidy_detail_request(self):
+        service = NLPAIAdvisorService()
+        result = service._analyze_intent('申請方法について教えて')
+        self.assertEqual(result['primary'], 'application_process')
+        self.assertGreater(result['scores']['application_process'], result['scores']['overview'])
+
+
+class TestRelabelConversationIntents(TestCase):
+    """relabel_conversation_intents コマンドのテスト"""
+
+    def setUp(self):
+        for i in range(5):
+            ConversationHistory.objects.create(session_id='s1', message_type='user', content=f'質問{i}: 申請方法は？')
+            ConversationHistory.objects.create(session_id='s1', message_type='assistant', content='回答')
+        ConversationHistory.objects.create(
+            session_id='s2', message_type='user', content='補助金の金額はいくら？',
+            intent_analysis={'primary_intent': 'manual'},
+        )
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('relabel_conversation_intents', '--batch-size', '3', *args, stdout=out)
+        return out.getvalue()
+
+    def test_relabel_with_conversation_flow(self):
+        output = self.run_command()
+        self.assertIn('6件を判定し、6件を更新しました', output)
+
+        labels = list(
+            ConversationHistory.objects.filter(session_id='s1', message_type='user')
+            .order_by('timestamp', 'id').values_list('intent_analysis', flat=True)
+        )
+        self.assertEqual(labels[0], analyze_chat_intent('質問0: 申請方法は？'))
+        self.assertFalse(labels[3]['is_follow_up'])
+        # 8件目以降の発言は履歴が7件以上あるので継続中の会話として扱う
+        self.assertTrue(labels[4]['is_follow_up'])
+        self.assertEqual(
+            ConversationHistory.objects.get(session_id='s2').intent_analysis['primary_intent'], 'amount_inquiry'
+        )
+        self.assertFalse(ConversationHistory.objects.filter(message_type='assistant').exclude(intent_analysis={}).exists())
+
+        self.assertIn('6件を判定し、0件を更新しました', self.run_command())
+
+    def test_only_missing_and_dry_run(self):
+        self.assertIn('5件を判定し、5件が変更対象です', self.run_command('--only-missing', '--dry-run'))
+        self.assertFalse(ConversationHistory.objects.filter(session_id='s1').exclude(intent_analysis={}).exists())
+
+        self.run_command('--only-missing')
+        self.assertEqual(ConversationHistory.objects.get(session_id='s2').intent_analysis, {'primary_intent': 'manual'})
@@ -0,0 +1,77 @@
+# advisor/tests/test_probability_matrix.py
+import csv
+import os
+import tempfile
+from datetime import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from advisor.models import SubsidyType, AdoptionStatistics
+from advisor.services.enhanced_adoption_analysis import EnhancedAdoptionAnalysisService
+
+PROFILES = [
+    {'business_type': '製造業', 'company_size': '小規模事業者', 'experience': 'adopted', 'support_agency': 'confirmed'},
+    {'business_type': 'IT・情報通信業', 'company_size': '中小企業', 'experience': 'none', 'support_agency': 'none'},
+    {'business_type': '小売業', 'company_size': '中堅企業', 'experience': 'once', 'support_agency': 'planned'},
+    {'business_type': '農業', 'company_size': '', 'experience': 'unknown', 'support_agency': ''},
+]
+
+
+class TestProbabilityMatrix(TestCase):
+    """採択確率の一括計算のテスト"""
+
+    @classmethod
+    def setUpTestData(cls):
+        year = datetime.now().year
+        cls.subsidies = []
+        for name, rates in [('IT導入補助金2025', [70.0, 60.0]), ('ものづくり補助金', [30.0]), ('統計なし補助金', [])]:
+            subsidy = SubsidyType.objects.create(
+                name=name, description='テスト用', max_amount=100,
+                target_business_type='中小企業', requirements='テスト要件',
+            )
+            for round_number, rate in enumerate(rates, start=1):
+                AdoptionStatistics.objects.create(
+                    subsidy_type=subsidy, year=year, round_number=round_number,
+                    total_applications=1000, total_adoptions=int(rate * 10), adoption_rate=rate,
+                )
+            cls.subsidies.append(subsidy)
+
+    def test_matches_single_profile_calculation(self):
+        service = EnhancedAdoptionAnalysisService()
+
+        with self.assertNumQueries(1):
+            matrix = service.calculate_probability_matrix(PROFILES, subsidies=self.subsidies)
+
+        self.assertEqual(matrix.shape, (len(PROFILES), len(self.subsidies)))
+        for i, profile in enumerate(PROFILES):
+            for j, subsidy in enumerate(self.subsidies):
+                expected = service.calculate_adoption_probability(profile, subsidy.id)['probability']
+                self.assertAlmostEqual(round(matrix.probabilities[i, j], 1), expected, msg=(profile, subsidy.name))
+
+        columns, probabilities = matrix.best()
+        self.assertEqual(columns[0], 0)
+        self.assertEqual(matrix.top_k(2)[0].tolist(), [0, 2])
+        self.assertEqual(service.calculate_probability_matrix([], subsidies=self.subsidies).shape, (0, 3))
+
+    def test_score_command_writes_csv(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'clients.csv')
+            output = os.path.join(tmp, 'scores.csv')
+            with open(source, 'w', newline='', encoding='utf-8-sig') as f:
+                writer = csv.DictWriter(f, fieldnames=['client_id', 'business_type', 'company_size',
+                                                       'experience', 'support_agency'])
+                writer.writeheader()
+                for i, profile in enumerate(PROFILES):
+                    writer.writerow({'client_id': f'C{i}', **profile})
+
+            call_command('score_adoption_probabilities', source, output, top=2, chunk_size=3, stdout=StringIO())
+
+            with open(output, newline='', encoding='utf-8-sig') as f:
+                rows = list(csv.DictReader(f))
+
+        self.assertEqual([row['client_id'] for row in rows], ['C0', 'C1', 'C2', 'C3'])
+        self.assertEqual(rows[0]['rank1_subsidy'], 'IT導入補助金2025')
+        self.assertEqual(float(rows[0]['rank1_probability']), 95.0)
+        self.assertIn('rank2_subsidy', rows[0])
@@ -0,0 +1,104 @@
+# advisor/tests/test_read_replica.py
+import os
+import tempfile
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from advisor import views
+from advisor.db import ReadReplicaRouter, read_from_replica
+from advisor.models import ConversationHistory, ConversationSession
+from advisor.services.conversation_writer import build_turn, write_messages
+
+REPLICA = 'replica_test'
+
+
+@override_settings(DATABASE_REPLICA_ALIAS=REPLICA)
+class TestReadReplicaRouting(TestCase):
+    """ダッシュボードの読み取りをレプリカ（別の SQLite ファイル）へ振り分けるテスト"""
+
+    # レプリカはクラス内で登録するため、テストランナーの事前チェック対象には含めない
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        # プライマリと同じ設定で、ファイルだけ別にしたレプリカを登録
+        connections.settings[REPLICA] = {
+            **connections['default'].settings_dict,
+            'NAME': os.path.join(cls.directory.name, 'replica.sqlite3'),
+        }
+        with connections[REPLICA].schema_editor(atomic=False) as editor:
+            for model in apps.get_models():
+                editor.create_model(model)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        cls.directory.cleanup()
+
+    def setUp(self):
+        self.staff = User.objects.create(username='staff', is_staff=True)
+        now = timezone.now()
+        ConversationSession.objects.create(
+            session_id='primary-only', started_at=now, last_activity=now, message_count=2
+        )
+        ConversationSession.objects.using(REPLICA).create(
+            session_id='replica-only', started_at=now, last_activity=now, message_count=4
+        )
+
+    def get(self, view):
+        request = RequestFactory().get('/')
+        request.user = self.staff
+        return view(request)
+
+    def test_dashboards_read_from_replica(self):
+        response = self.get(views.session_list)
+        self.assertContains(response, 'replica-only')
+        self.assertNotContains(response, 'primary-only')
+
+        for view in [views.statistics_dashboard, views.admin_dashboard, views.trend_analysis,
+                     views.prediction_dashboard]:
+            with CaptureQueriesContext(connections['default']) as primary, \
+                    CaptureQueriesContext(connections[REPLICA]) as replica:
+                self.assertEqual(self.get(view).status_code, 200)
+            # プライマリへの読み取りは認証などの advisor 以外のテーブルのみ
+            self.assertFalse([query for query in primary if 'advisor_' in query['sql']], view.__name__)
+            self.assertGreater(len(replica), 0, view.__name__)
+
+    def test_auth_reads_stay_on_primary(self):
+        with read_from_replica():
+            self.assertIsNone(ReadReplicaRouter().db_for_read(User))
+            self.assertEqual(User.objects.get(username='staff'), self.staff)
+            self.assertEqual(ReadReplicaRouter().db_for_read(ConversationSession), REPLICA)
+
+    def test_other_reads_use_primary(self):
+        self.assertEqual(
+            list(ConversationSession.objects.values_list('session_id', flat=True)), ['primary-only']
+        )
+
+    def test_chat_writes_go_to_primary(self):
+        with read_from_replica():
+            write_messages(build_turn('chat-1', '申請方法は？', {'answer': '回答です'}))
+            replica_session = ConversationSession.objects.get(session_id='replica-only')
+            replica_session.message_count = 10
+            replica_session.save()
+
+        self.assertEqual(ConversationHistory.objects.filter(session_id='chat-1').count(), 2)
+        self.assertFalse(ConversationHistory.objects.using(REPLICA).exists())
+        self.assertEqual(ConversationSession.objects.get(session_id='replica-only').message_count, 10)
+        self.assertEqual(ConversationSession.objects.using(REPLICA).get(session_id='replica-only').message_count, 4)
+
+    def test_missing_replica_falls_back_to_primary(self):
+        with override_settings(DATABASE_REPLICA_ALIAS='not-configured'), read_from_replica():
+            self.assertIsNone(ReadReplicaRouter().db_for_read(ConversationSession))
+            self.assertContains(self.get(views.session_list), 'primary-only')
+        self.assertFalse(ReadReplicaRouter().allow_migrate(REPLICA, 'advisor'))
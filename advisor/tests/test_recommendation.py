@@ -0,0 +1,114 @@
+# advisor/tests/test_recommendation.py
+from datetime import date, timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from advisor.models import SubsidySchedule, SubsidyType
+from advisor.services.recommendation import RecommendationEngine, get_recommendation_engine, recommend_subsidies
+from advisor.services.subsidy_catalog import invalidate_subsidy_catalog
+
+SUBSIDIES = [
+    # name, description, target, max_amount, success_rate, difficulty, months
+    ('雇用調整助成金', '雇用維持を支援', '雇用保険適用事業主', 330, 0.85, 2, list(range(1, 13))),
+    ('事業再構築補助金', '新分野展開を支援', '中小企業・中堅企業', 8000, 0.45, 5, [3, 7, 11]),
+    ('小規模事業者持続化補助金', '販路開拓を支援', '小規模事業者', 200, 0.72, 2, [2, 5, 8, 11]),
+    ('ものづくり補助金', '革新的な設備投資を支援', '中小企業・小規模事業者', 1000, 0.55, 4, [2, 6, 10]),
+    ('IT導入補助金', 'ITツール導入を支援', '中小企業・小規模事業者', 450, 0.68, 2, [1, 4, 7, 10]),
+]
+
+
+class TestRecommendationEngine(TestCase):
+    """補助金レコメンドエンジンのテスト"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for name, description, target, amount, rate, difficulty, months in SUBSIDIES:
+            SubsidyType.objects.create(
+                name=name, description=description, target_business_type=target, requirements='テスト要件',
+                max_amount=amount, historical_success_rate=rate, application_difficulty=difficulty,
+                typical_application_months=months,
+            )
+
+    def setUp(self):
+        invalidate_subsidy_catalog()
+        self.engine = RecommendationEngine(SubsidyType.objects.order_by('id'), today=date(2025, 4, 1))
+
+    def brute_force(self, question, user_context, k):
+        """全件を採点して並べた場合の上位 k 件"""
+        business_row, size_row = self.engine._context_rows(user_context)
+        scores = self.engine._prior(business_row, size_row)
+        keyword_scores = self.engine._keyword_scores(question)
+        ranked = sorted(
+            range(len(scores)), key=lambda i: (-(scores[i] + keyword_scores.get(i, 0.0)), i)
+        )
+        return [self.engine.subsidies[i].name for i in ranked[:k]]
+
+    def test_question_and_context_drive_ranking(self):
+        top = self.engine.recommend('ものづくり補助金で設備投資したい', {'business_type': '製造業'}, k=2)
+        self.assertEqual(top[0].name, 'ものづくり補助金')
+
+        top = self.engine.recommend('持続化補助金の申請', {'company_size': '小規模事業者'}, k=1)
+        self.assertEqual(top[0].name, '小規模事業者持続化補助金')
+
+    def test_candidate_pruning_matches_full_scan(self):
+        cases = [
+            ('', None),
+            ('IT導入補助金', {'business_type': 'IT・情報通信業', 'company_size': '中小企業'}),
+            ('持続化補助金と事業再構築', {'business_type': '小売業', 'company_size': '小規模'}),
+            ('設備投資', {'business_type': '建設業', 'company_size': '中堅企業'}),
+        ]
+        for question, user_context in cases:
+            for k in (1, 3, 5):
+                names = [subsidy.name for subsidy in self.engine.recommend(question, user_context, k=k)]
+                self.assertEqual(names, self.brute_force(question, user_context, k), msg=(question, k))
+
+    def test_result_does_not_depend_on_table_order(self):
+        reversed_engine = RecommendationEngine(SubsidyType.objects.order_by('-id'), today=date(2025, 4, 1))
+        context = {'business_type': 'IT・情報通信業', 'company_size': '中小企業'}
+        self.assertEqual(
+            [s.name for s in self.engine.recommend('補助金を探しています', context, k=3)],
+            [s.name for s in reversed_engine.recommend('補助金を探しています', context, k=3)],
+        )
+
+    def test_explain_budget_and_month(self):
+        without_budget = [s.name for s in self.engine.recommend('補助金', None, k=5)]
+        results = self.engine.recommend('補助金', {'budget': 5000}, k=5, explain=True)
+        by_name = {result['subsidy'].name: result for result in results}
+        self.assertLess([r['subsidy'].name for r in results].index('事業再構築補助金'),
+                        without_budget.index('事業再構築補助金'))
+        remodel = by_name['事業再構築補助金']
+        self.assertEqual(remodel['contributions']['amount_fit'], 10.0)
+        self.assertAlmostEqual(remodel['score'], sum(remodel['contributions'].values()), places=1)
+        self.assertIn('投資予定額をカバー', remodel['reasons'])
+
+        february = self.engine.recommend(k=5, month=2, explain=True)
+        by_name = {result['subsidy'].name: result for result in february}
+        self.assertEqual(by_name['ものづくり補助金']['contributions']['schedule'], 10.0)
+
+    def test_shared_engine_uses_active_catalog(self):
+        SubsidyType.objects.filter(name='雇用調整助成金').update(is_active=False)
+        invalidate_subsidy_catalog()
+        names = [subsidy.name for subsidy in recommend_subsidies(k=5)]
+        self.assertEqual(len(names), 4)
+        self.assertNotIn('雇用調整助成金', names)
+
+    def test_default_today_uses_project_time_zone(self):
+        """既定の基準日が OS のタイムゾーンではなく TIME_ZONE の日付になるか"""
+        with mock.patch('advisor.services.recommendation.timezone.localdate', return_value=date(2025, 12, 31)):
+            engine = RecommendationEngine(SubsidyType.objects.order_by('id'))
+        self.assertEqual(engine.today, date(2025, 12, 31))
+
+    def test_schedules_from_other_processes_are_picked_up_after_interval(self):
+        with override_settings(SNAPSHOT_RELOAD_INTERVAL=0):
+            engine = get_recommendation_engine()
+            self.assertIs(get_recommendation_engine(), engine)
+
+            # シグナルの飛ばない一括作成（= 別プロセスでの変更）
+            today = timezone.localdate()
+            SubsidySchedule.objects.bulk_create([SubsidySchedule(
+                subsidy_type=SubsidyType.objects.get(name='ものづくり補助金'), year=today.year,
+                application_start_date=today, application_end_date=today + timedelta(days=30),
+            )])
+            self.assertIsNot(get_recommendation_engine(), engine)
@@ -0,0 +1,130 @@
+# advisor/tests/test_response_cache.py
+import time
+
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.utils import timezone
+
+from advisor.models import SubsidyType, AdoptionTips
+from advisor.services.response_cache import (
+    DjangoCacheBackend, LocalMemoryBackend, ResponseCache,
+    get_response_cache, make_cache_key, normalize_question, reset_response_cache,
+)
+
+
+class TestCacheKey(SimpleTestCase):
+    """キャッシュキー生成のテスト"""
+
+    def test_near_identical_questions_share_key(self):
+        self.assertEqual(normalize_question('IT導入補助金の申請方法'), normalize_question('ＩＴ導入補助金 申請方法は？'))
+        self.assertEqual(
+            make_cache_key('test', 'IT導入補助金の申請方法', subsidy='IT導入補助金', intent='application_process'),
+            make_cache_key('test', 'ＩＴ導入補助金 申請方法を教えてください', subsidy='IT導入補助金', intent='application_process'),
+        )
+
+    def test_intent_and_context_change_key(self):
+        base = make_cache_key('test', '申請方法', subsidy='IT導入補助金', intent='application_process')
+        self.assertNotEqual(base, make_cache_key('test', '申請方法', subsidy='IT導入補助金', intent='timing_inquiry'))
+        self.assertNotEqual(base, make_cache_key('test', '申請方法', subsidy='IT導入補助金', intent='application_process',
+                                                 context={'business_type': '製造業'}))
+        self.assertNotEqual(base, make_cache_key('other', '申請方法', subsidy='IT導入補助金', intent='application_process'))
+
+
+    def test_omitted_intent_is_detected(self):
+        """intent 省略時も意図判定の結果がキーに入るか（助詞除去で別の質問が同じキーにならないように）"""
+        self.assertEqual(
+            make_cache_key('test', 'IT導入補助金の申請方法', subsidy='IT導入補助金'),
+            make_cache_key('test', 'IT導入補助金の申請方法', subsidy='IT導入補助金', intent='application_process'),
+        )
+        self.assertNotEqual(
+            make_cache_key('test', 'IT導入補助金の申請方法', subsidy='IT導入補助金'),
+            make_cache_key('test', 'IT導入補助金の申請方法', subsidy='IT導入補助金', intent=''),
+        )
+
+
+class TestResponseCache(SimpleTestCase):
+    """バックエンドと統計のテスト"""
+
+    def test_lru_eviction_and_ttl(self):
+        backend = LocalMemoryBackend(max_entries=2)
+        backend.set('a', 1, ttl=60)
+        backend.set('b', 2, ttl=60)
+        backend.get('a')
+        backend.set('c', 3, ttl=60)
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual(backend.get('a'), 1)
+
+        backend.set('d', 4, ttl=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(backend.get('d'))
+
+    def test_get_or_call_counts_hits_and_skips_failures(self):
+        cache = ResponseCache(LocalMemoryBackend())
+        calls = []
+
+        def call():
+            calls.append(1)
+            return {'answer': 'ok'}
+
+        self.assertEqual(cache.get_or_call('k', call), {'answer': 'ok'})
+        self.assertEqual(cache.get_or_call('k', call), {'answer': 'ok'})
+        self.assertEqual(len(calls), 1)
+
+        self.assertIsNone(cache.get_or_call('failed', lambda: None))
+        self.assertIsNone(cache.get_or_call('failed', lambda: None))
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['sets']), (1, 3, 1))
+
+    def test_django_cache_backend_invalidation(self):
+        cache = ResponseCache(DjangoCacheBackend('default'))
+        cache.set('k', {'answer': 'ok'})
+        self.assertEqual(cache.get('k'), {'answer': 'ok'})
+        cache.invalidate()
+        self.assertIsNone(cache.get('k'))
+
+
+@override_settings(DIFY_RESPONSE_CACHE={'BACKEND': 'local', 'TTL': 60})
+class TestResponseCacheInvalidation(TestCase):
+    """元データ変更時の無効化テスト"""
+
+    def setUp(self):
+        reset_response_cache()
+        self.subsidy = SubsidyType.objects.create(
+            name='キャッシュテスト補助金',
+            description='テスト用',
+            max_amount=100,
+            target_business_type='中小企業',
+            requirements='テスト要件',
+        )
+
+    def tearDown(self):
+        reset_response_cache()
+
+    def test_invalidated_on_tip_change(self):
+        cache = get_response_cache()
+        cache.set('k', {'answer': 'cached'})
+
+        AdoptionTips.objects.create(
+            subsidy_type=self.subsidy, category='preparation', title='早めの準備', content='テスト'
+        )
+        self.assertIsNone(cache.get('k'))
+
+    def test_invalidated_on_subsidy_change(self):
+        cache = get_response_cache()
+        cache.set('k', {'answer': 'cached'})
+
+        self.subsidy.max_amount = 200
+        self.subsidy.save()
+        self.assertIsNone(cache.get('k'))
+
+    @override_settings(SNAPSHOT_RELOAD_INTERVAL=0)
+    def test_invalidated_on_change_from_other_process(self):
+        """シグナルの届かない変更（他プロセス）も定期確認で破棄されるか"""
+        reset_response_cache()
+        cache = get_response_cache()
+        cache.set('k', {'answer': 'cached'})
+        self.assertEqual(get_response_cache().get('k'), {'answer': 'cached'})
+
+        # QuerySet.update() はシグナルを送らない
+        SubsidyType.objects.filter(pk=self.subsidy.pk).update(max_amount=300, last_updated=timezone.now())
+        self.assertIsNone(get_response_cache().get('k'))
@@ -0,0 +1,46 @@
+# advisor/tests/test_service_registry.py
+import threading
+
+from django.test import SimpleTestCase
+
+from advisor.services.registry import ServiceRegistry
+
+
+class CountingService:
+    instances = 0
+
+    def __init__(self):
+        CountingService.instances += 1
+
+
+class TestServiceRegistry(SimpleTestCase):
+    """サービスレジストリのテスト"""
+
+    def setUp(self):
+        CountingService.instances = 0
+        self.registry = ServiceRegistry()
+
+    def test_constructed_once_across_threads(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.registry.get(CountingService)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(CountingService.instances, 1)
+        self.assertEqual(len({id(service) for service in results}), 1)
+
+    def test_stats_and_reset(self):
+        self.registry.get(CountingService)
+        stats = self.registry.stats()
+        self.assertEqual(stats[0]['service'], 'CountingService')
+        self.assertGreaterEqual(stats[0]['construction_ms'], 0)
+
+        self.registry.reset(CountingService)
+        self.assertEqual(self.registry.stats(), [])
+        self.registry.get(CountingService)
+        self.assertEqual(CountingService.instances, 2)
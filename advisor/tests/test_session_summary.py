@@ -0,0 +1,104 @@
+# advisor/tests/test_session_summary.py
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from advisor.models import ConversationHistory, ConversationSession
+from advisor.services.session_summary import delete_messages
+
+
+class TestConversationSessionSummary(TestCase):
+    """セッション集計の差分更新テスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('summary_user', password='pass')
+
+    def _create(self, session_id, message_type, content, minutes_ago, user=None):
+        message = ConversationHistory.objects.create(
+            session_id=session_id, message_type=message_type, content=content, user=user
+        )
+        # auto_now_add を上書きして時刻をずらす（集計はテスト側でバックフィル）
+        ConversationHistory.objects.filter(pk=message.pk).update(
+            timestamp=timezone.now() - timedelta(minutes=minutes_ago)
+        )
+        return message
+
+    def test_incremental_update(self):
+        ConversationHistory.objects.create(session_id='s1', message_type='user', content='最初の質問')
+        ConversationHistory.objects.create(session_id='s1', message_type='assistant', content='回答')
+        ConversationHistory.objects.create(session_id='s1', message_type='user', content='次の質問', user=self.user)
+
+        summary = ConversationSession.objects.get(session_id='s1')
+        self.assertEqual(summary.message_count, 3)
+        self.assertEqual(summary.user_messages, 2)
+        self.assertEqual(summary.assistant_messages, 1)
+        self.assertEqual(summary.last_user_message, '次の質問')
+        self.assertEqual(summary.user, self.user)
+        self.assertLessEqual(summary.started_at, summary.last_activity)
+
+    def test_delete_rebuilds_session(self):
+        """メッセージ削除で件数・プレビューが戻り、空になったセッションは消えるか"""
+        ConversationHistory.objects.create(session_id='s5', message_type='user', content='最初の質問')
+        ConversationHistory.objects.create(session_id='s5', message_type='assistant', content='回答')
+        latest = ConversationHistory.objects.create(session_id='s5', message_type='user', content='次の質問')
+
+        self.assertEqual(delete_messages(ConversationHistory.objects.filter(pk=latest.pk)), 1)
+        summary = ConversationSession.objects.get(session_id='s5')
+        self.assertEqual(summary.message_count, 2)
+        self.assertEqual(summary.user_messages, 1)
+        self.assertEqual(summary.last_user_message, '最初の質問')
+
+        delete_messages(ConversationHistory.objects.filter(session_id='s5'))
+        self.assertFalse(ConversationSession.objects.filter(session_id='s5').exists())
+
+    def test_bulk_delete_keeps_fast_delete(self):
+        """会話履歴の一括削除が行を読み込まずに DELETE 1文で済むか（post_delete の受信側が無い）"""
+        for index in range(3):
+            ConversationHistory.objects.create(session_id='s6', message_type='user', content=f'質問{index}')
+        with CaptureQueriesContext(connection) as queries:
+            ConversationHistory.objects.filter(session_id='s6').delete()
+        self.assertEqual(len(queries), 1)
+
+    def test_backfill_matches_history(self):
+        self._create('s2', 'user', '古い質問', 30)
+        self._create('s2', 'assistant', '回答', 29)
+        self._create('s2', 'user', '新しい質問' * 20, 5, user=self.user)
+        self._create('s3', 'system', '開始', 10)
+        ConversationSession.objects.all().delete()
+
+        out = StringIO()
+        call_command('backfill_conversation_sessions', stdout=out)
+        self.assertIn('2セッション', out.getvalue())
+
+        summary = ConversationSession.objects.get(session_id='s2')
+        history = ConversationHistory.objects.filter(session_id='s2')
+        self.assertEqual(summary.message_count, 3)
+        self.assertEqual(summary.started_at, history.order_by('timestamp').first().timestamp)
+        self.assertEqual(summary.last_activity, history.order_by('-timestamp').first().timestamp)
+        self.assertTrue(summary.last_user_message.startswith('新しい質問'))
+        self.assertTrue(summary.last_message_preview.endswith('...'))
+        self.assertEqual(summary.user, self.user)
+        self.assertEqual(ConversationSession.objects.get(session_id='s3').system_messages, 1)
+
+    def test_session_list_query_count_is_constant(self):
+        staff = User.objects.create_user('staff', password='pass', is_staff=True)
+        self.client.force_login(staff)
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/advisor/session-list/')
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        ConversationHistory.objects.create(session_id='q0', message_type='user', content='質問')
+        baseline = count_queries()
+
+        for i in range(1, 20):
+            ConversationHistory.objects.create(session_id=f'q{i}', message_type='user', content='質問', user=self.user)
+        self.assertEqual(count_queries(), baseline)
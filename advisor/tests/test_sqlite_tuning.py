@@ -0,0 +1,59 @@
+# advisor/tests/test_sqlite_tuning.py
+import os
+import tempfile
+
+from django.db import connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+
+from advisor.db import apply_sqlite_pragmas
+
+PRAGMAS = {
+    'busy_timeout': 4321,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 1048576,
+}
+
+
+class TestSQLiteTuning(SimpleTestCase):
+    """本番向け SQLite 設定（connection_created フック）のテスト"""
+
+    def open_connection(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_dict = {
+            **connections['default'].settings_dict,
+            'NAME': os.path.join(directory.name, 'tuning.sqlite3'),
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+        }
+        wrapper = DatabaseWrapper(settings_dict, alias='tuning_test')
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_to_new_connections(self):
+        with override_settings(SQLITE_PRAGMAS=PRAGMAS):
+            wrapper = self.open_connection()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 4321)
+        self.assertEqual(self.pragma(wrapper, 'mmap_size'), 1048576)
+
+    def test_default_profile_leaves_connection_untouched(self):
+        with override_settings(SQLITE_PRAGMAS={}):
+            wrapper = self.open_connection()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+
+    def test_invalid_pragma_is_rejected(self):
+        wrapper = self.open_connection()
+        with wrapper.cursor() as cursor:
+            with self.assertRaises(ValueError):
+                apply_sqlite_pragmas(cursor, {'journal_mode': 'WAL; DROP TABLE x'})
+            with self.assertRaises(ValueError):
+                apply_sqlite_pragmas(cursor, {'cache size': 1})
@@ -0,0 +1,151 @@
+# advisor/tests/test_streaming.py
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.test import TestCase, SimpleTestCase, RequestFactory, override_settings
+
+from advisor.api.enhanced_chat_api import enhanced_chat_conversation
+from advisor.models import ConversationHistory
+from advisor.services.enhanced_chat_service import EnhancedChatService
+from advisor.services.registry import service_registry
+from advisor.services.response_cache import reset_response_cache
+from advisor.services.streaming import split_answer_sections
+
+
+DIFY_CHUNKS = ['IT導入補助金は', '中小企業の', 'ITツール導入を支援します。']
+
+
+class FakeDifyHandler(BaseHTTPRequestHandler):
+    """Dify の streaming モードを模したハンドラ"""
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length))
+        self.server.requests.append(body)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        self.wfile.write(b'event: ping\n\n')
+        for chunk in DIFY_CHUNKS:
+            event = {'event': 'message', 'answer': chunk, 'conversation_id': 'c1'}
+            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+        self.wfile.write(b'data: {"event": "message_end", "conversation_id": "c1"}\n\n')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def parse_sse(content):
+    """SSE本文を (event, data) のリストに変換"""
+    events = []
+    for block in content.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+class TestSplitAnswerSections(SimpleTestCase):
+    """見出し単位の分割テスト"""
+
+    def test_sections_rejoin_to_answer(self):
+        answer = "前置き\n\n# 見出し1\n本文1\n## 見出し2\n本文2"
+        sections = split_answer_sections(answer)
+        self.assertEqual(len(sections), 3)
+        self.assertTrue(sections[1].startswith('# 見出し1'))
+        self.assertEqual(''.join(sections), answer)
+        self.assertEqual(split_answer_sections(''), [])
+
+
+class TestEnhancedChatStreaming(TestCase):
+    """ローカルの疑似 Dify サーバーを使ったストリーミングテスト"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeDifyHandler)
+        cls.server.requests = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        service_registry.reset(EnhancedChatService)
+        reset_response_cache()
+
+    def tearDown(self):
+        service_registry.reset(EnhancedChatService)
+
+    def _post(self, payload):
+        request = self.factory.post(
+            '/api/enhanced-chat/', data=json.dumps(payload), content_type='application/json'
+        )
+        response = enhanced_chat_conversation(request)
+        return response, parse_sse(b''.join(response.streaming_content).decode('utf-8'))
+
+    def test_dify_chunks_are_forwarded(self):
+        """Dify の断片がそのまま chunk イベントとして転送されるか"""
+        url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        with override_settings(DIFY_API_URL=url, DIFY_API_KEY='test-key'):
+            response, events = self._post({'message': 'IT導入補助金とは', 'session_id': 's1', 'stream': True})
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        self.assertEqual(self.server.requests[-1]['response_mode'], 'streaming')
+        self.assertEqual(events[0][0], 'start')
+        self.assertEqual([data['text'] for name, data in events if name == 'chunk'], DIFY_CHUNKS)
+        self.assertEqual(events[-1][0], 'end')
+        self.assertEqual(events[-1][1]['answer'], ''.join(DIFY_CHUNKS))
+        self.assertEqual(events[-1][1]['model_used'], 'dify-enhanced')
+        self.assertEqual(ConversationHistory.objects.filter(session_id='s1').count(), 2)
+
+    def test_template_answer_streamed_by_section(self):
+        """Dify 未設定時は構造化回答を見出し単位で送信するか"""
+        with override_settings(DIFY_API_KEY=''):
+            _, events = self._post({'message': '申請の流れを教えて', 'session_id': 's2', 'stream': True})
+
+        chunks = [data['text'] for name, data in events if name == 'chunk']
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), events[-1][1]['answer'])
+        self.assertEqual(ConversationHistory.objects.filter(session_id='s2').count(), 2)
+
+
+    def test_interrupted_stream_is_not_saved(self):
+        """Dify の応答が途中で切れた場合は error イベントを送り、途中までの回答を保存しないか"""
+        def interrupted(service, query):
+            yield DIFY_CHUNKS[0]
+            raise ConnectionError('stream closed')
+
+        with override_settings(DIFY_API_KEY='test-key'), \
+                mock.patch.object(EnhancedChatService, '_stream_dify_api', interrupted), \
+                self.assertLogs('advisor.services.enhanced_chat_service', 'ERROR'):
+            _, events = self._post({'message': 'IT導入補助金とは', 'session_id': 's3', 'stream': True})
+
+        self.assertEqual([name for name, _ in events], ['start', 'chunk', 'error'])
+        self.assertFalse(ConversationHistory.objects.filter(session_id='s3').exists())
+
+
+class TestContextAwareChatStreaming(TestCase):
+    """文脈認識チャットAPIのストリーミングテスト"""
+
+    def test_accept_header_enables_streaming(self):
+        response = self.client.post(
+            '/advisor/api/context-aware-chat/',
+            data=json.dumps({'message': 'IT導入補助金の申請方法', 'session_id': 's3'}),
+            content_type='application/json',
+            HTTP_ACCEPT='text/event-stream',
+        )
+        events = parse_sse(b''.join(response.streaming_content).decode('utf-8'))
+
+        self.assertEqual(events[0], ('start', {'success': True, 'session_id': 's3'}))
+        chunks = [data['text'] for name, data in events if name == 'chunk']
+        self.assertTrue(chunks[0].startswith('# IT導入補助金 申請方法'))
+        self.assertEqual(''.join(chunks), events[-1][1]['answer'])
@@ -0,0 +1,122 @@
+# advisor/tests/test_subsidy_alias.py
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from advisor.models import SubsidyAlias, SubsidyType
+from advisor.services import subsidy_matcher
+from advisor.services.intent_engine import get_intent_engine, reset_intent_engine
+from advisor.services.subsidy_catalog import get_subsidy_catalog
+from advisor.services.subsidy_matcher import (
+    SUBSIDY_ALIASES, SubsidyMatcher, builtin_alias_table, get_alias_table, get_subsidy_matcher,
+    invalidate_alias_table,
+)
+
+QUESTIONS = [
+    'IT導入補助金の申請方法', 'ＩＴ導入 補助金は？', '工場の設備更新とロボット導入',
+    '雇調金', '多角化したい', 'M&Aで事業承継', '販路開拓と新規事業', '省エネ設備のCO2削減',
+]
+
+
+class TestSubsidyAliasTable(TestCase):
+    """DB のエイリアス表と照合器の再読み込みのテスト"""
+
+    def setUp(self):
+        invalidate_alias_table()
+        self.addCleanup(invalidate_alias_table)
+        for name in ['IT導入補助金', 'テスト専用補助金']:
+            SubsidyType.objects.create(
+                name=name, description='テスト用', max_amount=100,
+                target_business_type='中小企業', requirements='テスト要件',
+            )
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('update_subsidy_aliases', *args, stdout=out)
+        return out.getvalue()
+
+    def test_empty_table_uses_builtin_aliases(self):
+        self.assertIs(get_alias_table(), builtin_alias_table())
+
+    def test_command_upserts_and_keeps_builtin_scores(self):
+        output = self.run_command()
+        self.assertIn('エイリアス表を更新しました（新規', output)
+        self.assertEqual(
+            SubsidyAlias.objects.filter(source='builtin').count(),
+            sum(len(set(aliases)) for aliases in SUBSIDY_ALIASES.values())
+        )
+        generated = SubsidyAlias.objects.filter(source='generated')
+        self.assertEqual(set(generated.values_list('alias', flat=True)), {'テスト専用補助金', 'テスト専用'})
+        # 重複していたエイリアスは重みで同じスコアを保つ
+        self.assertEqual(SubsidyAlias.objects.get(subsidy_name='新事業進出補助金', alias='多角化').weight, 2)
+
+        # 組み込み辞書のみで照合した場合と結果が一致する
+        generated.update(is_active=False)
+        invalidate_alias_table()
+        expected = SubsidyMatcher(get_subsidy_catalog().names, SUBSIDY_ALIASES)
+        matcher = get_subsidy_matcher()
+        self.assertIsNot(matcher.alias_table, builtin_alias_table())
+        for question in QUESTIONS:
+            self.assertEqual(matcher.scan(question), expected.scan(question), question)
+
+        # 2回目は無効化した自動生成分のみ更新
+        self.assertIn('新規 0件 / 更新 2件 / 削除 0件', self.run_command())
+
+    def test_manual_aliases_are_preserved_and_pruned_rows_removed(self):
+        self.run_command()
+        manual = SubsidyAlias.objects.create(subsidy_name='IT導入補助金', alias='dx推進', weight=9)
+        self.assertEqual(manual.normalized, 'dx推進')
+        SubsidyAlias.objects.create(subsidy_name='IT導入補助金', alias='古い別名', source='generated')
+
+        self.assertIn('削除 1件', self.run_command('--prune'))
+        self.assertTrue(SubsidyAlias.objects.filter(pk=manual.pk, weight=9).exists())
+        self.assertFalse(SubsidyAlias.objects.filter(alias='古い別名').exists())
+
+    def test_preview_does_not_write(self):
+        output = self.run_command('--preview')
+        self.assertIn('--preview モードのため', output)
+        self.assertFalse(SubsidyAlias.objects.exists())
+
+    def test_saved_alias_is_matched_immediately(self):
+        self.assertIsNone(get_subsidy_matcher().best('クラウド会計を入れたい'))
+        SubsidyAlias.objects.create(subsidy_name='IT導入補助金', alias='クラウド会計')
+        self.assertEqual(get_subsidy_matcher().best('クラウド会計を入れたい'), 'IT導入補助金')
+
+    def test_changes_from_other_processes_are_picked_up_after_interval(self):
+        SubsidyAlias.objects.create(subsidy_name='IT導入補助金', alias='クラウド会計')
+        self.assertEqual(get_subsidy_matcher().best('クラウド会計を入れたい'), 'IT導入補助金')
+        matcher = get_subsidy_matcher()
+
+        # シグナルの飛ばない一括更新（= 別プロセスでの変更）は確認間隔が過ぎるまで反映しない
+        with override_settings(SUBSIDY_ALIAS_RELOAD_INTERVAL=3600):
+            invalidate_alias_table()
+            get_alias_table()
+            SubsidyAlias.objects.update(is_active=False, updated_at=timezone.now())
+            self.assertIs(get_subsidy_matcher(), matcher)
+
+        with override_settings(SUBSIDY_ALIAS_RELOAD_INTERVAL=0):
+            invalidate_alias_table()
+            self.assertIsNone(get_subsidy_matcher().best('クラウド会計を入れたい'))
+
+    def test_intent_engine_follows_alias_table(self):
+        get_alias_table()
+        self.assertEqual(get_intent_engine().classify('クラウド会計', 'nlp').scores.get('specific_subsidy', 0), 0)
+        SubsidyAlias.objects.create(subsidy_name='IT導入補助金', alias='クラウド会計')
+        get_alias_table()
+        self.assertGreater(get_intent_engine().classify('クラウド会計', 'nlp').scores['specific_subsidy'], 0)
+
+    def test_intent_engine_built_before_first_load_is_rebuilt(self):
+        """エイリアス表の初回読み込み前に組み込み辞書で構築した判定器も作り直すか"""
+        SubsidyAlias.objects.create(subsidy_name='IT導入補助金', alias='クラウド会計')
+        with mock.patch.object(subsidy_matcher, '_alias_table', None):
+            reset_intent_engine()
+            self.addCleanup(reset_intent_engine)
+            engine = get_intent_engine()
+            self.assertIs(engine.alias_table, builtin_alias_table())
+
+            get_alias_table()
+            self.assertIsNot(get_intent_engine(), engine)
+            self.assertGreater(get_intent_engine().classify('クラウド会計', 'nlp').scores['specific_subsidy'], 0)
@@ -0,0 +1,75 @@
+# advisor/tests/test_subsidy_catalog.py
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from advisor.models import SubsidyType
+from advisor.services.subsidy_catalog import get_subsidy_catalog, invalidate_subsidy_catalog
+
+
+class TestSubsidyCatalog(TestCase):
+    """補助金カタログのスナップショットテスト"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.it_subsidy = SubsidyType.objects.create(
+            name='IT導入補助金',
+            description='ITツール導入による業務効率化を支援',
+            max_amount=450,
+            target_business_type='中小企業・小規模事業者',
+            requirements='gBizIDプライム取得',
+            typical_application_months=[1, 4, 7, 10],
+        )
+        cls.inactive_subsidy = SubsidyType.objects.create(
+            name='終了済み補助金',
+            description='テスト用',
+            max_amount=100,
+            target_business_type='中小企業',
+            requirements='テスト要件',
+            is_active=False,
+        )
+
+    def setUp(self):
+        invalidate_subsidy_catalog()
+
+    def test_lookup_without_queries(self):
+        """読み込み後はクエリを発行しない"""
+        get_subsidy_catalog()
+        with self.assertNumQueries(0):
+            catalog = get_subsidy_catalog()
+            self.assertEqual(catalog.get(self.it_subsidy.id).name, 'IT導入補助金')
+            self.assertEqual(catalog.get_by_name('ＩＴ導入補助金').id, self.it_subsidy.id)
+            self.assertEqual(catalog.first_by_name('it導入').id, self.it_subsidy.id)
+            self.assertEqual([s.name for s in catalog.active_subsidies], ['IT導入補助金'])
+
+    def test_swapped_on_save_and_delete(self):
+        catalog = get_subsidy_catalog()
+
+        self.it_subsidy.max_amount = 500
+        self.it_subsidy.save()
+        updated = get_subsidy_catalog()
+        self.assertIsNot(updated, catalog)
+        self.assertEqual(updated.get(self.it_subsidy.id).max_amount, 500)
+
+        self.inactive_subsidy.delete()
+        self.assertIsNone(get_subsidy_catalog().get_by_name('終了済み補助金'))
+
+    def test_changes_from_other_processes_are_picked_up_after_interval(self):
+        # シグナルの飛ばない一括更新（= 別プロセスでの変更）は確認間隔が過ぎるまで反映しない
+        with override_settings(SNAPSHOT_RELOAD_INTERVAL=3600):
+            catalog = get_subsidy_catalog()
+            SubsidyType.objects.filter(id=self.it_subsidy.id).update(max_amount=300, last_updated=timezone.now())
+            self.assertIs(get_subsidy_catalog(), catalog)
+
+        with override_settings(SNAPSHOT_RELOAD_INTERVAL=0):
+            invalidate_subsidy_catalog()
+            self.assertEqual(get_subsidy_catalog().get(self.it_subsidy.id).max_amount, 300)
+            SubsidyType.objects.bulk_create([SubsidyType(
+                name='新設補助金', description='テスト用', max_amount=100,
+                target_business_type='中小企業', requirements='テスト要件',
+            )])
+            self.assertIsNotNone(get_subsidy_catalog().get_by_name('新設補助金'))
+
+    def test_as_values_matches_queryset_values(self):
+        catalog = get_subsidy_catalog()
+        expected = SubsidyType.objects.filter(id=self.it_subsidy.id).values().get()
+        self.assertEqual(catalog.as_values(catalog.get(self.it_subsidy.id)), expected)
@@ -0,0 +1,74 @@
+# advisor/tests/test_subsidy_matcher.py
+from django.test import TestCase, SimpleTestCase
+
+from advisor.models import SubsidyType
+from advisor.services.subsidy_matcher import (
+    AhoCorasickAutomaton, SubsidyMatcher, SUBSIDY_ALIASES,
+    get_subsidy_matcher, normalize_text,
+)
+
+
+class TestAhoCorasickAutomaton(SimpleTestCase):
+    """オートマトン単体のテスト"""
+
+    def test_overlapping_patterns(self):
+        """重なり合うパターンを全て検出できるか"""
+        automaton = AhoCorasickAutomaton()
+        for pattern in ['he', 'she', 'his', 'hers']:
+            automaton.add(pattern, pattern)
+        automaton.build()
+
+        found = [payload for _, payload in automaton.iter_matches('ushers')]
+        self.assertEqual(sorted(found), ['he', 'hers', 'she'])
+
+    def test_matches_naive_substring_search(self):
+        """単純な部分文字列判定と同じ結果になるか"""
+        patterns = sorted({normalize_text(a) for aliases in SUBSIDY_ALIASES.values() for a in aliases})
+        automaton = AhoCorasickAutomaton()
+        for pattern in patterns:
+            automaton.add(pattern, pattern)
+        automaton.build()
+
+        for text in ['IT導入補助金の申請方法', 'ＩＴ導入 補助金は？', '工場の設備更新とロボット導入', '雇調金']:
+            normalized = normalize_text(text)
+            expected = {p for p in patterns if p in normalized}
+            found = {payload for _, payload in automaton.iter_matches(normalized)}
+            self.assertEqual(found, expected, text)
+
+
+class TestSubsidyMatcher(SimpleTestCase):
+    """照合器のスコアリングテスト"""
+
+    def setUp(self):
+        self.matcher = SubsidyMatcher(['IT導入補助金', 'ものづくり補助金', '雇用調整助成金'])
+
+    def test_exact_name_has_priority(self):
+        exact_names, _ = self.matcher.scan('ものづくり補助金とIT導入について')
+        self.assertEqual(exact_names, ['ものづくり補助金'])
+        self.assertEqual(self.matcher.best('ものづくり補助金とIT導入について'), 'ものづくり補助金')
+
+    def test_alias_and_fullwidth(self):
+        self.assertEqual(self.matcher.best('ＩＴ導入の申請方法は？'), 'IT導入補助金')
+        self.assertEqual(self.matcher.best('雇調金の要件'), '雇用調整助成金')
+
+    def test_no_match(self):
+        self.assertIsNone(self.matcher.best('こんにちは'))
+        self.assertEqual(self.matcher.rank(''), [])
+
+
+class TestSubsidyMatcherInvalidation(TestCase):
+    """SubsidyType 変更時の再構築テスト"""
+
+    def test_rebuilt_on_subsidy_change(self):
+        get_subsidy_matcher()
+        subsidy = SubsidyType.objects.create(
+            name='テスト専用補助金',
+            description='テスト用',
+            max_amount=100,
+            target_business_type='中小企業',
+            requirements='テスト要件',
+        )
+        self.assertIn('テスト専用補助金', get_subsidy_matcher().subsidy_names)
+
+        subsidy.delete()
+        self.assertNotIn('テスト専用補助金', get_subsidy_matcher().subsidy_names)
@@ -0,0 +1,136 @@
+# advisor/tests/test_text_normalization.py
+import sys
+import types
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from advisor.services import text_normalization
+from advisor.services.embeddings import HashingEncoder, get_text_encoder, reset_text_encoder
+from advisor.services.subsidy_matcher import SUBSIDY_ALIASES, SubsidyMatcher
+from advisor.services.text_normalization import (
+    JanomeTokenizer, RegexTokenizer, get_tokenizer, normalize_cache_info, normalize_text, normalized_aliases,
+    reset_text_normalization, tokenize,
+)
+
+
+class FakeToken:
+    def __init__(self, surface, part_of_speech, base_form):
+        self.surface = surface
+        self.part_of_speech = part_of_speech
+        self.base_form = base_form
+
+
+class FakeJanomeTokenizer:
+    """janome.tokenizer.Tokenizer の代わり（固定の解析結果を返す）"""
+
+    def tokenize(self, text):
+        return [
+            FakeToken('it', '名詞,固有名詞,組織,*', '*'),
+            FakeToken('導入', '名詞,サ変接続,*,*', '導入'),
+            FakeToken('し', '動詞,自立,*,*', 'する'),
+            FakeToken('たい', '助動詞,*,*,*', 'たい'),
+            FakeToken('！', '記号,一般,*,*', '！'),
+        ]
+
+
+def fake_janome_modules():
+    package = types.ModuleType('janome')
+    module = types.ModuleType('janome.tokenizer')
+    module.Tokenizer = FakeJanomeTokenizer
+    package.tokenizer = module
+    return {'janome': package, 'janome.tokenizer': module}
+
+
+class TestNormalizeText(SimpleTestCase):
+    """正規化とキャッシュのテスト"""
+
+    def setUp(self):
+        reset_text_normalization()
+        self.addCleanup(reset_text_normalization)
+
+    def test_normalization(self):
+        self.assertEqual(normalize_text('ＩＴ導入補助金の 申請方法？'), 'it導入補助金の申請方法')
+        self.assertEqual(normalize_text('Ｍ＆Ａ補助金'), 'ma補助金')
+        self.assertEqual(normalize_text(''), '')
+        self.assertEqual(normalize_text(None), '')
+
+    def test_repeated_questions_hit_cache(self):
+        for _ in range(3):
+            normalize_text('ものづくり補助金の採択率は？')
+        info = normalize_cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 2))
+
+    def test_long_text_bypasses_cache(self):
+        text = 'ＩＴ導入補助金。' * 200
+        self.assertEqual(normalize_text(text), 'it導入補助金' * 200)
+        self.assertEqual(normalize_cache_info().currsize, 0)
+
+
+class TestNormalizedAliases(SimpleTestCase):
+    """エイリアス正規化表のテスト"""
+
+    def setUp(self):
+        reset_text_normalization()
+        self.addCleanup(reset_text_normalization)
+
+    def test_table_is_computed_once_per_dict(self):
+        table = normalized_aliases(SUBSIDY_ALIASES)
+        self.assertIs(normalized_aliases(SUBSIDY_ALIASES), table)
+        self.assertIn('it導入', table['IT導入補助金'])
+        self.assertEqual(len(table['IT導入補助金']), len(SUBSIDY_ALIASES['IT導入補助金']))
+
+        replaced = {'IT導入補助金': ['ＩＴツール']}
+        self.assertEqual(normalized_aliases(replaced), {'IT導入補助金': ('itツール',)})
+
+    def test_matcher_does_not_renormalize_aliases(self):
+        SubsidyMatcher(['IT導入補助金'])
+        with mock.patch.object(text_normalization, 'normalize_text', wraps=normalize_text) as wrapped:
+            SubsidyMatcher(['IT導入補助金'])
+        wrapped.assert_not_called()
+
+
+class TestTokenizer(SimpleTestCase):
+    """分かち書きのテスト"""
+
+    def setUp(self):
+        reset_text_normalization()
+        self.addCleanup(reset_text_normalization)
+
+    def test_regex_fallback(self):
+        with override_settings(TEXT_NORMALIZATION={'TOKENIZER': 'regex'}):
+            self.assertIsInstance(get_tokenizer(), RegexTokenizer)
+            self.assertEqual(tokenize('ＩＴ導入補助金の申請方法を教えて'),
+                             ['it', '導入補助金', 'の', '申請方法', 'を', '教', 'えて'])
+            self.assertEqual(tokenize('ＩＴ導入補助金の申請方法', content_only=True), ['it', '導入補助金', '申請方法'])
+            self.assertEqual(tokenize(''), [])
+
+    def test_missing_janome_falls_back_to_regex(self):
+        with override_settings(TEXT_NORMALIZATION={'TOKENIZER': 'janome'}), \
+                mock.patch.dict(sys.modules, {'janome': None, 'janome.tokenizer': None}), \
+                mock.patch('builtins.print'):
+            self.assertIsInstance(get_tokenizer(), RegexTokenizer)
+
+    def test_janome_is_loaded_lazily(self):
+        with override_settings(TEXT_NORMALIZATION={'TOKENIZER': 'auto'}), \
+                mock.patch.dict(sys.modules, fake_janome_modules()):
+            self.assertIsNone(text_normalization._tokenizer)
+            tokenizer = get_tokenizer()
+            self.assertIsInstance(tokenizer, JanomeTokenizer)
+            self.assertIs(get_tokenizer(), tokenizer)
+            self.assertEqual(tokenize('IT導入したい！'), ['it', '導入', 'する', 'たい'])
+            self.assertEqual(tokenize('IT導入したい！', content_only=True), ['it', '導入', 'する'])
+
+    def test_hashing_encoder_uses_morphological_tokens(self):
+        with override_settings(TEXT_NORMALIZATION={'TOKENIZER': 'auto'}, EMBEDDING_INDEX={'MODEL': 'hashing'}), \
+                mock.patch.dict(sys.modules, fake_janome_modules()):
+            reset_text_encoder()
+            self.addCleanup(reset_text_encoder)
+            encoder = get_text_encoder()
+            self.assertEqual(encoder.name, 'hashing-512-2-3-janome')
+            self.assertFalse((encoder.encode(['IT導入したい']) == HashingEncoder().encode(['IT導入したい'])).all())
+
+        with override_settings(TEXT_NORMALIZATION={'TOKENIZER': 'regex'}, EMBEDDING_INDEX={'MODEL': 'hashing'}):
+            reset_text_normalization()
+            reset_text_encoder()
+            self.assertEqual(get_text_encoder().name, 'hashing-512-2-3')
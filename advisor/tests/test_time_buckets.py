@@ -0,0 +1,58 @@
+# advisor/tests/test_time_buckets.py
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.test import TestCase
+from django.utils import timezone
+
+from advisor.models import ConversationHistory
+from advisor.services.time_buckets import (
+    bucket_counts, daily_conversation_counts, local_day_start, refresh_daily_rollups,
+)
+
+
+class TestTimeBuckets(TestCase):
+    """時間バケット集計のテスト"""
+
+    def _create_at(self, when, message_type='user', session_id='s1'):
+        message = ConversationHistory.objects.create(session_id=session_id, message_type=message_type, content='質問')
+        ConversationHistory.objects.filter(pk=message.pk).update(timestamp=when)
+
+    def test_day_buckets_use_tokyo_dates(self):
+        """UTC 15:30 は日本時間の翌日として数えるか"""
+        self._create_at(datetime(2025, 4, 1, 15, 30, tzinfo=dt_timezone.utc))  # JST 4/2 00:30
+        self._create_at(datetime(2025, 4, 1, 14, 30, tzinfo=dt_timezone.utc))  # JST 4/1 23:30
+
+        start = local_day_start(datetime(2025, 4, 1).date())
+        rows = bucket_counts(ConversationHistory.objects.all(), start, start + timedelta(days=3))
+
+        self.assertEqual([row['count'] for row in rows], [1, 1, 0])
+        self.assertEqual(rows[0]['bucket'].isoformat(), '2025-04-01')
+
+    def test_hour_buckets_and_distinct(self):
+        start = local_day_start(datetime(2025, 4, 1).date())
+        self._create_at(start + timedelta(minutes=10), session_id='a')
+        self._create_at(start + timedelta(minutes=20), session_id='a')
+        self._create_at(start + timedelta(hours=2), session_id='b')
+
+        rows = bucket_counts(ConversationHistory.objects.all(), start, start + timedelta(hours=3),
+                             granularity='hour', distinct='session_id')
+        self.assertEqual([row['count'] for row in rows], [1, 0, 1])
+        self.assertEqual(rows[2]['bucket'], start + timedelta(hours=2))
+
+        sparse = bucket_counts(ConversationHistory.objects.all(), start, start + timedelta(hours=3),
+                               granularity='hour', fill=False)
+        self.assertEqual([row['count'] for row in sparse], [2, 1])
+
+    def test_rollups_match_live_counts(self):
+        now = timezone.now()
+        for days_ago in (0, 1, 1, 5, 12):
+            self._create_at(now - timedelta(days=days_ago))
+        self._create_at(now - timedelta(days=1), message_type='assistant')
+
+        refresh_daily_rollups(timezone.localdate() - timedelta(days=30))
+
+        with self.assertNumQueries(2):
+            rolled_up = daily_conversation_counts(days=14, use_rollups=True)
+        self.assertEqual(rolled_up, daily_conversation_counts(days=14, use_rollups=False))
+        self.assertEqual(len(rolled_up), 14)
+        self.assertEqual(sum(row['count'] for row in rolled_up), 5)
@@ -2,22 +2,32 @@
 # 補助金アドバイザーのビュー関数
 
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, HttpResponse, HttpResponseForbidden
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from django.contrib.auth.models import User
-from django.db.models import Q, Count, Avg, Max, Min
+from django.db.models import Q, Count, Avg, Max, Min, Sum
 from datetime import timedelta, datetime
+import importlib.util
 import json
 import uuid
 import logging
+from functools import lru_cache
+from .db import read_from_replica
 from .models import ConversationHistory
 from .services.context_aware_ai_advisor import ContextAwareAIAdvisorService
+from .services.conversation_history import history_page, iter_session_json, iter_session_ndjson, serialize_message
+from .services.subsidy_matcher import get_subsidy_matcher
+from .services.registry import get_service
+from .services.session_summary import delete_messages
+from .services.time_buckets import bucket_counts, daily_conversation_counts
+from .services.intent_engine import classify_intent
+from .api.base import wants_event_stream, sse_response, stream_chat_events, iter_answer_sections
 # モデルのインポート
 from .models import (
-    SubsidyType, Answer, ConversationHistory, AdoptionStatistics, 
+    SubsidyType, Answer, ConversationHistory, ConversationSession, AdoptionStatistics, 
     AdoptionTips
 )
 from django.utils.decorators import method_decorator
@@ -35,18 +45,15 @@ except ImportError:
     TrendAnalysis = None
     NEW_MODELS_AVAILABLE = False
 
-# サービスのインポート
-from .services import AIAdvisorService, ConversationManager
+# 拡張サービス（EnhancedChatService・SubsidyPredictionService）は pandas/numpy を読み込むため、
+# モジュール読み込み時には import せず、依存パッケージの有無だけを確認する
+ENHANCED_SERVICE_DEPENDENCIES = ('pandas', 'numpy', 'requests')
 
-# 新しいサービス（段階的に利用可能）
-try:
-    from .services.enhanced_chat_service import EnhancedChatService
-    from .services.subsidy_prediction_service import SubsidyPredictionService
-    ENHANCED_SERVICES_AVAILABLE = True
-except ImportError:
-    EnhancedChatService = None
-    SubsidyPredictionService = None
-    ENHANCED_SERVICES_AVAILABLE = False
+
+@lru_cache(maxsize=None)
+def enhanced_services_available():
+    """拡張サービスが利用可能か（依存パッケージがインストールされているか）"""
+    return all(importlib.util.find_spec(name) is not None for name in ENHANCED_SERVICE_DEPENDENCIES)
 
 # ========== メインページ・基本ビュー ==========
 
@@ -55,11 +62,14 @@ def index(request):
     try:
         subsidies = SubsidyType.objects.all()
         
-        # 基本統計
+        # 基本統計（会話件数はセッション集計から取得）
+        session_totals = ConversationSession.objects.aggregate(
+            sessions=Count('id'), messages=Sum('message_count')
+        )
         basic_stats = {
             'total_subsidies': subsidies.count(),
-            'total_conversations': ConversationHistory.objects.count(),
-            'active_sessions': ConversationHistory.objects.values('session_id').distinct().count(),
+            'total_conversations': session_totals['messages'] or 0,
+            'active_sessions': session_totals['sessions'],
         }
         
         # 最新の会話履歴
@@ -72,7 +82,7 @@ def index(request):
             'subsidies': subsidies,
             'recent_conversations': recent_conversations,
             'basic_stats': basic_stats,
-            'enhanced_services_available': ENHANCED_SERVICES_AVAILABLE,
+            'enhanced_services_available': enhanced_services_available(),
             'new_models_available': NEW_MODELS_AVAILABLE,
         }
         
@@ -170,15 +180,24 @@ def enhanced_chat_api(request):
         else:
             response_text = "ご質問ありがとうございます。補助金について詳しくご案内いたします。"
         
+        response = {
+            'answer': response_text,  # 🔥 重要: 文字列で返す
+            'recommended_subsidies': [],
+            'confidence_score': 0.8,
+            'model_used': 'enhanced-fallback'
+        }
+        
+        # ストリーミング配信（見出し単位で送信）
+        if wants_event_stream(request, data):
+            return sse_response(stream_chat_events(
+                iter_answer_sections(response_text, response),
+                {'success': True, 'session_id': session_id, 'timestamp': timezone.now().isoformat()}
+            ))
+        
         return JsonResponse({
             'success': True,
             'session_id': session_id,
-            'response': {
-                'answer': response_text,  # 🔥 重要: 文字列で返す
-                'recommended_subsidies': [],
-                'confidence_score': 0.8,
-                'model_used': 'enhanced-fallback'
-            },
+            'response': response,
             'timestamp': timezone.now().isoformat()
         })
         
@@ -194,6 +213,16 @@ def enhanced_chat_api(request):
 
 
 
+# 会話中の補助金について、質問の意図ごとに追加する指示
+CONTEXTUAL_PROMPT_INSTRUCTIONS = {
+    'application_process': "\n【特別指示】ユーザーは{subsidy}の申請方法について質問しています。{subsidy}の具体的な申請手順を詳しく説明してください。\n",
+    'adoption_rate': "\n【特別指示】ユーザーは{subsidy}の採択率を上げる方法について質問しています。{subsidy}特有の採択率向上のコツを具体的に教えてください。\n",
+    'requirements': "\n【特別指示】ユーザーは{subsidy}の申請要件について質問しています。{subsidy}の詳細な申請要件を説明してください。\n",
+    'schedule': "\n【特別指示】ユーザーは{subsidy}の申請スケジュールについて質問しています。{subsidy}の申請時期や期限について詳しく説明してください。\n",
+    'success_tips': "\n【特別指示】ユーザーは{subsidy}の申請のコツやポイントについて質問しています。{subsidy}申請の実践的なアドバイスを提供してください。\n",
+}
+
+
 def build_contextual_prompt(current_message, conversation_context, context_string):
     """強化版: 文脈を考慮したプロンプトを構築"""
     
@@ -233,35 +262,11 @@ def build_contextual_prompt(current_message, conversation_context, context_strin
         
         base_prompt += "\n【重要】上記の会話の流れを踏まえて、現在のユーザーの質問に答えてください。\n"
         
-        # 特定のパターンを検出（強化版）
-        current_lower = current_message.lower()
-        
+        # 特定のパターンを検出（共通の意図判定エンジンで1回走査）
         if target_subsidy and context_confidence > 0.5:
-            # より多くのパターンに対応
-            if any(keyword in current_lower for keyword in [
-                '申請', '方法', '手続き', 'やり方', 'プロセス', '流れ', 'どうやって'
-            ]):
-                base_prompt += f"\n【特別指示】ユーザーは{target_subsidy}の申請方法について質問しています。{target_subsidy}の具体的な申請手順を詳しく説明してください。\n"
-                
-            elif any(keyword in current_lower for keyword in [
-                '採択率', '成功率', '確率', '上げる', '高める', '向上', 'あがる'
-            ]):
-                base_prompt += f"\n【特別指示】ユーザーは{target_subsidy}の採択率を上げる方法について質問しています。{target_subsidy}特有の採択率向上のコツを具体的に教えてください。\n"
-                
-            elif any(keyword in current_lower for keyword in [
-                '要件', '条件', '対象', '資格', 'できる', '当てはまる'
-            ]):
-                base_prompt += f"\n【特別指示】ユーザーは{target_subsidy}の申請要件について質問しています。{target_subsidy}の詳細な申請要件を説明してください。\n"
-                
-            elif any(keyword in current_lower for keyword in [
-                'いつ', '時期', '期限', 'スケジュール', 'タイミング'
-            ]):
-                base_prompt += f"\n【特別指示】ユーザーは{target_subsidy}の申請スケジュールについて質問しています。{target_subsidy}の申請時期や期限について詳しく説明してください。\n"
-                
-            elif any(keyword in current_lower for keyword in [
-                'コツ', '秘訣', 'ポイント', 'アドバイス', 'ノウハウ'
-            ]):
-                base_prompt += f"\n【特別指示】ユーザーは{target_subsidy}の申請のコツやポイントについて質問しています。{target_subsidy}申請の実践的なアドバイスを提供してください。\n"
+            prompt_intent = classify_intent(current_message, 'prompt')
+            if prompt_intent in CONTEXTUAL_PROMPT_INSTRUCTIONS:
+                base_prompt += CONTEXTUAL_PROMPT_INSTRUCTIONS[prompt_intent].format(subsidy=target_subsidy)
                 
             elif len(current_message.strip()) < 10:
                 # 短い質問の場合は前の文脈により強く依存
@@ -280,77 +285,40 @@ def build_contextual_prompt(current_message, conversation_context, context_strin
 
 
 def detect_subsidy_from_text(text):
-    """テキストから補助金名を検出（強化版）"""
+    """テキストから補助金名を検出（共通照合エンジン使用）"""
     if not text:
         return None
     
-    text_lower = text.lower()
-    
-    # より詳細なパターンマッチング
-    subsidy_patterns = {
-        'IT導入補助金': [
-            'it導入補助金', 'IT導入補助金', 'it導入', 'IT導入',
-            'itツール', 'ITツール', 'ソフトウェア導入', 'デジタル化',
-            'デジタル変革', 'dx', 'DX', 'システム導入'
-        ],
-        '事業再構築補助金': [
-            '事業再構築補助金', '事業再構築', '再構築', '事業転換',
-            '新分野展開', '業態転換', '新事業', '事業変革'
-        ],
-        'ものづくり補助金': [
-            'ものづくり補助金', 'ものづくり', '設備投資', '機械導入',
-            '装置', '製造業', '生産性向上', '革新的'
-        ],
-        '小規模事業者持続化補助金': [
-            '小規模事業者持続化補助金', '持続化補助金', '持続化',
-            '小規模事業者', '販路開拓', '広告宣伝', '小規模'
-        ]
-    }
-    
-    for subsidy_name, patterns in subsidy_patterns.items():
-        for pattern in patterns:
-            if pattern.lower() in text_lower:
-                return subsidy_name
-    
-    return None
+    return get_subsidy_matcher().best(text)
 
 
 def conversation_history(request, session_id):
-    """会話履歴取得API"""
+    """会話履歴取得API（新しい順に limit 件、before カーソルでさらに古い履歴を取得）"""
     try:
         limit = int(request.GET.get('limit', 50))
+        before = request.GET.get('before')
         
-        history = ConversationHistory.objects.filter(
-            session_id=session_id
-        ).order_by('-timestamp')[:limit]
+        history, next_cursor = history_page(session_id, limit=limit, before=before)
         
-        if not history.exists():
+        if not history and not before:
             return JsonResponse({
                 'success': False,
                 'error': '指定されたセッションの履歴が見つかりません'
             }, status=404)
         
-        history_data = []
-        for message in history:
-            history_data.append({
-                'id': message.id,
-                'message_type': message.message_type,
-                'content': message.content,
-                'timestamp': message.timestamp.isoformat(),
-                'user': message.user.username if message.user else 'ゲスト',
-            })
-        
         return JsonResponse({
             'success': True,
-            'history': list(reversed(history_data)),
+            'history': [serialize_message(message) for message in history],
             'session_id': session_id,
-            'total_messages': len(history_data)
+            'total_messages': len(history),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
         })
         
     except ValueError:
         return JsonResponse({
             'success': False,
-            'error': 'limitパラメータは数値である必要があります'
+            'error': 'limitパラメータは数値、beforeパラメータは前回のnext_cursorである必要があります'
         }, status=400)
     except Exception as e:
         return JsonResponse({
@@ -444,28 +412,25 @@ def subsidy_statistics(request):
             avg_amount=Avg('max_amount')
         ).order_by('-count')[:10]
         
-        # 会話統計
-        conversation_stats = ConversationHistory.objects.aggregate(
-            total_messages=Count('id'),
-            unique_sessions=Count('session_id', distinct=True)
+        # 会話統計（セッション集計から取得）
+        conversation_stats = ConversationSession.objects.aggregate(
+            total_messages=Sum('message_count'),
+            unique_sessions=Count('id')
         )
         
-        # 最近の活動（過去30日）
+        # 最近の活動（過去30日、Asia/Tokyo の日付で集計）
         last_30_days = timezone.now() - timedelta(days=30)
-        recent_activity = ConversationHistory.objects.filter(
-            timestamp__gte=last_30_days
-        ).extra(
-            select={'day': 'date(timestamp)'}
-        ).values('day').annotate(
-            message_count=Count('id')
-        ).order_by('day')
+        recent_activity = [
+            {'day': row['bucket'], 'message_count': row['count']}
+            for row in bucket_counts(ConversationHistory.objects.all(), last_30_days, fill=False)
+        ]
         
         context = {
             'page_title': '補助金統計',
             'subsidy_stats': subsidy_stats,
             'business_type_stats': business_type_stats,
             'conversation_stats': conversation_stats,
-            'recent_activity': list(recent_activity),
+            'recent_activity': recent_activity,
         }
         
         return render(request, 'advisor/statistics.html', context)
@@ -474,6 +439,7 @@ def subsidy_statistics(request):
         print(f"Statistics error: {e}")
         return render(request, 'advisor/error.html', {'error': str(e)})
 
+@read_from_replica()
 def prediction_dashboard(request):
     """予測ダッシュボード"""
     try:
@@ -571,6 +537,7 @@ def user_alerts(request):
     
     return render(request, 'advisor/user_alerts.html', context)
 
+@read_from_replica()
 def trend_analysis(request):
     """トレンド分析ページ"""
     context = {
@@ -608,17 +575,21 @@ def trend_analysis(request):
     
     return render(request, 'advisor/trend_analysis.html', context)
 
+@read_from_replica()
 def admin_dashboard(request):
     """管理ダッシュボード"""
     if not request.user.is_staff:
         return HttpResponseForbidden("管理者権限が必要です")
     
     try:
-        # 基本統計
+        # 基本統計（会話件数はセッション集計から取得）
+        session_totals = ConversationSession.objects.aggregate(
+            sessions=Count('id'), messages=Sum('message_count')
+        )
         basic_stats = {
             'total_users': User.objects.count(),
-            'total_conversations': ConversationHistory.objects.count(),
-            'unique_sessions': ConversationHistory.objects.values('session_id').distinct().count(),
+            'total_conversations': session_totals['messages'] or 0,
+            'unique_sessions': session_totals['sessions'],
             'total_subsidies': SubsidyType.objects.count(),
         }
         
@@ -631,7 +602,7 @@ def admin_dashboard(request):
             'recent_conversations': recent_conversations,
             'features_status': {
                 'basic_chat': True,
-                'enhanced_chat': ENHANCED_SERVICES_AVAILABLE,
+                'enhanced_chat': enhanced_services_available(),
                 'predictions': NEW_MODELS_AVAILABLE,
                 'alerts': NEW_MODELS_AVAILABLE,
                 'trends': NEW_MODELS_AVAILABLE,
@@ -744,64 +715,13 @@ def prediction_calendar(request):
         print(f"Prediction calendar error: {e}")
         return render(request, 'advisor/error.html', {'error': str(e)})
 
-def statistics_dashboard(request):
-    """統計ダッシュボード（詳細版）"""
-    try:
-        # 基本統計
-        basic_stats = {
-            'total_subsidies': SubsidyType.objects.count(),
-            'total_conversations': ConversationHistory.objects.count(),
-            'active_sessions': ConversationHistory.objects.values('session_id').distinct().count(),
-        }
-        
-        # 補助金統計
-        subsidy_stats = SubsidyType.objects.aggregate(
-            avg_amount=Avg('max_amount'),
-            max_amount_value=Max('max_amount'),
-            min_amount_value=Min('max_amount')
-        )
-        
-        # 事業種別統計
-        business_type_stats = SubsidyType.objects.values('target_business_type').annotate(
-            count=Count('id'),
-            avg_amount=Avg('max_amount')
-        ).order_by('-count')[:10]
-        
-        # 時系列データ（過去30日の会話数）
-        last_30_days = timezone.now() - timedelta(days=30)
-        daily_conversations = []
-        
-        for i in range(30):
-            date = last_30_days + timedelta(days=i)
-            count = ConversationHistory.objects.filter(
-                timestamp__date=date.date(),
-                message_type='user'
-            ).count()
-            daily_conversations.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'count': count
-            })
-        
-        context = {
-            'basic_stats': basic_stats,
-            'subsidy_stats': subsidy_stats,
-            'business_type_stats': business_type_stats,
-            'daily_conversations': daily_conversations,
-            'page_title': '統計ダッシュボード'
-        }
-        
-        return render(request, 'advisor/statistics_dashboard.html', context)
-        
-    except Exception as e:
-        print(f"Statistics dashboard error: {e}")
-        return render(request, 'advisor/error.html', {'error': str(e)})
-
 def generate_monthly_predictions(year, month):
     """指定月の予測データを生成"""
     predictions = {}
     
-    # 実際の補助金データを取得
-    subsidies = SubsidyType.objects.all()[:5]  # 最初の5つの補助金を使用
+    # 指定月の公募時期・採択率などで上位5つの補助金を選ぶ（numpy を使うため呼び出し時に読み込む）
+    from .services.recommendation import recommend_subsidies
+    subsidies = recommend_subsidies(k=5, month=month)
     
     for i, subsidy in enumerate(subsidies):
         # 簡単な予測ロジック
@@ -867,6 +787,7 @@ def prediction_detail_api(request):
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
+@read_from_replica()
 def session_list(request):
     """
     セッション一覧表示ビュー - 実際のデータベースからの情報を表示
@@ -875,36 +796,15 @@ def session_list(request):
         return HttpResponseForbidden("管理者権限が必要です")
     
     try:
-        # セッションごとの統計情報を取得
-        sessions_data = ConversationHistory.objects.values('session_id').annotate(
-            message_count=Count('id'),
-            last_activity=Max('timestamp'),
-            user_messages=Count('id', filter=Q(message_type='user')),
-            assistant_messages=Count('id', filter=Q(message_type='assistant'))
-        ).order_by('-last_activity')[:100]  # 最新100セッション
+        # セッション集計から最新100セッションを取得（1クエリ）
+        session_summaries = ConversationSession.objects.select_related('user').order_by('-last_activity')[:100]
         
         # セッション詳細情報を構築
         sessions = []
-        for session_data in sessions_data:
-            # 最初のメッセージを取得（セッション開始時刻として使用）
-            first_message = ConversationHistory.objects.filter(
-                session_id=session_data['session_id']
-            ).order_by('timestamp').first()
-            
-            # 最後のユーザーメッセージを取得（プレビュー用）
-            last_user_message = ConversationHistory.objects.filter(
-                session_id=session_data['session_id'],
-                message_type='user'
-            ).order_by('-timestamp').first()
-            
-            # ユーザー情報を取得
-            session_user = ConversationHistory.objects.filter(
-                session_id=session_data['session_id'],
-                user__isnull=False
-            ).values('user__username').first()
-            
+        now = timezone.now()
+        for summary in session_summaries:
             # セッションのステータス判定
-            time_since_last = timezone.now() - session_data['last_activity']
+            time_since_last = now - summary.last_activity
             if time_since_last < timedelta(minutes=30):
                 status = 'active'
                 status_class = 'success'
@@ -916,14 +816,14 @@ def session_list(request):
                 status_class = 'secondary'
             
             sessions.append({
-                'session_id': session_data['session_id'],
-                'user': session_user['user__username'] if session_user else 'ゲスト',
-                'message_count': session_data['message_count'],
-                'user_messages': session_data['user_messages'],
-                'assistant_messages': session_data['assistant_messages'],
-                'started_at': first_message.timestamp if first_message else None,
-                'last_activity': session_data['last_activity'],
-                'last_message_preview': last_user_message.content[:50] + '...' if last_user_message and len(last_user_message.content) > 50 else (last_user_message.content if last_user_message else ''),
+                'session_id': summary.session_id,
+                'user': summary.user.username if summary.user else 'ゲスト',
+                'message_count': summary.message_count,
+                'user_messages': summary.user_messages,
+                'assistant_messages': summary.assistant_messages,
+                'started_at': summary.started_at,
+                'last_activity': summary.last_activity,
+                'last_message_preview': summary.last_message_preview,
                 'status': status,
                 'status_class': status_class,
                 'time_since_last': time_since_last
@@ -936,9 +836,9 @@ def session_list(request):
         
         # 今日の活動統計
         today = timezone.now().date()
-        today_sessions = ConversationHistory.objects.filter(
-            timestamp__date=today
-        ).values('session_id').distinct().count()
+        today_sessions = ConversationSession.objects.filter(
+            last_activity__date=today
+        ).count()
         
         context = {
             'sessions': sessions,
@@ -1012,46 +912,38 @@ def debug_history(request):
 
 def export_session(request, session_id):
     """
-    セッションエクスポート機能
+    セッションエクスポート機能（?format=ndjson で1行1メッセージ）
+    
+    DB カーソルから読んだ行をそのまま書き出すため、長いセッションでもメモリ使用量は一定。
     """
     if not request.user.is_staff:
         return HttpResponseForbidden("管理者権限が必要です")
     
     try:
-        # セッション履歴を取得
-        history = ConversationHistory.objects.filter(
-            session_id=session_id
-        ).order_by('timestamp')
+        export_format = request.GET.get('format', 'json')
+        if export_format not in ('json', 'ndjson'):
+            return JsonResponse({
+                'success': False,
+                'error': 'formatパラメータは json または ndjson を指定してください'
+            }, status=400)
         
-        if not history.exists():
+        total_messages = ConversationHistory.objects.filter(session_id=session_id).count()
+        if not total_messages:
             return JsonResponse({
                 'success': False, 
                 'error': '指定されたセッションが見つかりません'
             }, status=404)
         
-        # エクスポートデータを構築
-        export_data = {
-            'session_id': session_id,
-            'exported_at': timezone.now().isoformat(),
-            'total_messages': history.count(),
-            'messages': []
-        }
-        
-        for message in history:
-            export_data['messages'].append({
-                'id': message.id,
-                'timestamp': message.timestamp.isoformat(),
-                'message_type': message.message_type,
-                'content': message.content,
-                'user': message.user.username if message.user else 'ゲスト',
-            })
-        
-        # JSONレスポンスとして返す
-        response = HttpResponse(
-            json.dumps(export_data, ensure_ascii=False, indent=2),
-            content_type='application/json; charset=utf-8'
-        )
-        response['Content-Disposition'] = f'attachment; filename="session_{session_id}.json"'
+        if export_format == 'ndjson':
+            response = StreamingHttpResponse(
+                iter_session_ndjson(session_id), content_type='application/x-ndjson; charset=utf-8'
+            )
+        else:
+            response = StreamingHttpResponse(
+                iter_session_json(session_id, timezone.now(), total_messages),
+                content_type='application/json; charset=utf-8'
+            )
+        response['Content-Disposition'] = f'attachment; filename="session_{session_id}.{export_format}"'
         return response
         
     except Exception as e:
@@ -1081,8 +973,8 @@ def delete_session(request, session_id):
                 'error': '指定されたセッションが見つかりません'
             }, status=404)
         
-        # セッション削除
-        deleted_count = session_messages.delete()[0]
+        # セッション削除（集計も削除）
+        deleted_count = delete_messages(session_messages)
         
         return JsonResponse({
             'success': True, 
@@ -1149,18 +1041,44 @@ def prediction_calendar(request):
         print(f"Prediction calendar error: {e}")
         return render(request, 'advisor/error.html', {'error': str(e)})
 
+@read_from_replica()
 def statistics_dashboard(request):
     """統計ダッシュボード（詳細版）"""
     try:
-        # 基本統計
+        # 基本統計（会話件数はセッション集計から取得）
+        session_totals = ConversationSession.objects.aggregate(
+            sessions=Count('id'), messages=Sum('message_count')
+        )
         basic_stats = {
             'total_subsidies': SubsidyType.objects.count(),
-            'total_conversations': ConversationHistory.objects.count(),
-            'active_sessions': ConversationHistory.objects.values('session_id').distinct().count(),
+            'total_conversations': session_totals['messages'] or 0,
+            'active_sessions': session_totals['sessions'],
         }
         
+        # 補助金統計
+        subsidy_stats = SubsidyType.objects.aggregate(
+            avg_amount=Avg('max_amount'),
+            max_amount_value=Max('max_amount'),
+            min_amount_value=Min('max_amount')
+        )
+        
+        # 事業種別統計（テンプレートでJSに埋め込むためリスト化）
+        business_type_stats = list(SubsidyType.objects.values('target_business_type').annotate(
+            count=Count('id'),
+            avg_amount=Avg('max_amount')
+        ).order_by('-count')[:10])
+        
+        # 時系列データ（過去30日のユーザー発言数、日別に1クエリで集計）
+        daily_conversations = [
+            {'date': row['bucket'].strftime('%Y-%m-%d'), 'count': row['count']}
+            for row in daily_conversation_counts(days=30, message_type='user')
+        ]
+        
         context = {
             'basic_stats': basic_stats,
+            'subsidy_stats': subsidy_stats,
+            'business_type_stats': business_type_stats,
+            'daily_conversations': daily_conversations,
             'page_title': '統計ダッシュボード'
         }
         
@@ -1211,16 +1129,18 @@ def prediction_detail_api(request):
 class ContextAwareChatAPIView(View):
     """文脈を理解するチャットAPI - エラー修正版"""
     
-    def __init__(self):
-        super().__init__()
+    @property
+    def ai_service(self):
+        """ワーカー共有のサービス（初回アクセス時のみ構築）"""
         try:
-            self.ai_service = ContextAwareAIAdvisorService()
-            self.service_available = True
-            print("[DEBUG] ContextAwareAIAdvisorService初期化成功")
+            return get_service(ContextAwareAIAdvisorService)
         except Exception as e:
-            self.ai_service = None
-            self.service_available = False
             print(f"[DEBUG] ContextAwareAIAdvisorService初期化失敗: {e}")
+            return None
+    
+    @property
+    def service_available(self):
+        return self.ai_service is not None
     
     def post(self, request):
         """POST /advisor/api/context-aware-chat/"""
@@ -1262,6 +1182,13 @@ class ContextAwareChatAPIView(View):
             # フォールバック回答生成
             response = self._generate_fallback_response(message, target_subsidy, detected_subsidy_name, session_id)
             
+            # ストリーミング配信（見出し単位で送信）
+            if wants_event_stream(request, data):
+                return sse_response(stream_chat_events(
+                    iter_answer_sections(response['response']['answer'], response['response']),
+                    {'success': True, 'session_id': session_id}
+                ))
+            
             return JsonResponse(response)
             
         except Exception as e:
@@ -1276,18 +1203,7 @@ class ContextAwareChatAPIView(View):
     
     def _detect_subsidy_from_message(self, message):
         """メッセージから補助金検出"""
-        message_lower = message.lower()
-        
-        if 'it導入' in message_lower or 'it補助金' in message_lower:
-            return 'IT導入補助金'
-        elif 'ものづくり' in message_lower:
-            return 'ものづくり補助金'
-        elif '持続化' in message_lower:
-            return '小規模事業者持続化補助金'
-        elif '事業再構築' in message_lower:
-            return '事業再構築補助金'
-        
-        return None
+        return detect_subsidy_from_text(message)
     
     def _generate_fallback_response(self, message, target_subsidy, detected_subsidy_name, session_id):
         """フォールバック回答生成"""
@@ -53,13 +53,75 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'subsidy_advisor_project.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# データベース
+# DATABASE_ENGINE=postgresql で PostgreSQL を使用（既定は SQLite）
+# DATABASE_PROFILE=production で接続の再利用などを本番向けに調整
+DATABASE_ENGINE = os.getenv('DATABASE_ENGINE', 'sqlite')
+DATABASE_PROFILE = os.getenv('DATABASE_PROFILE', 'development')
+# ダッシュボードなど読み取り専用ビューの読み取り先（DATABASES に無ければプライマリを使用）
+DATABASE_REPLICA_ALIAS = 'replica'
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'subsidy_advisor'),
+            'USER': os.getenv('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+        }
     }
+    # 読み取りレプリカ（ホストを指定した場合のみ）
+    if os.getenv('POSTGRES_REPLICA_HOST'):
+        DATABASES[DATABASE_REPLICA_ALIAS] = {
+            **DATABASES['default'],
+            'HOST': os.getenv('POSTGRES_REPLICA_HOST'),
+            'PORT': os.getenv('POSTGRES_REPLICA_PORT', DATABASES['default']['PORT']),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+    # 検証用にプライマリの複製ファイルをレプリカとして使う場合
+    if os.getenv('SQLITE_REPLICA_PATH'):
+        DATABASES[DATABASE_REPLICA_ALIAS] = {**DATABASES['default'], 'NAME': os.getenv('SQLITE_REPLICA_PATH')}
+
+if DATABASE_REPLICA_ALIAS in DATABASES:
+    # テストではレプリカをプライマリのミラーとして扱う
+    DATABASES[DATABASE_REPLICA_ALIAS]['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['advisor.db.ReadReplicaRouter']
+
+# 本番向けの SQLite PRAGMA（benchmark_sqlite_concurrency でも比較に使用）
+SQLITE_PRODUCTION_PRAGMAS = {
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    # 書き込み中もダッシュボードの読み取りをブロックしない
+    'journal_mode': 'WAL',
+    # WAL ではチェックポイント時のみ fsync（電源断で直近のコミットを失う可能性はあるが破損はしない）
+    'synchronous': 'NORMAL',
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+    'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-20000')),  # 負の値は KiB 単位
+    'temp_store': 'MEMORY',
 }
 
+# 接続ごとに設定する SQLite の PRAGMA（advisor.db.configure_sqlite_connection で定義順に適用）
+SQLITE_PRAGMAS = {}
+
+if DATABASE_PROFILE == 'production':
+    for database in DATABASES.values():
+        database.update({
+            # ワーカーごとに接続を再利用し、接続・PRAGMA 設定のコストを省く
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),
+            'CONN_HEALTH_CHECKS': True,
+        })
+    if DATABASE_ENGINE != 'postgresql':
+        # 書き込みトランザクションは開始時にロックを取る（読み取り→書き込みの昇格で SQLITE_BUSY にしない）
+        DATABASES['default']['OPTIONS'] = {'transaction_mode': 'IMMEDIATE'}
+        SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -90,6 +152,66 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 DIFY_API_URL = os.getenv('DIFY_API_URL', 'http://dify-v01.xtem.jp/v1')
 DIFY_API_KEY = os.getenv('DIFY_API_KEY', '')
 
+# Dify クライアント設定（接続プール・リトライ・サーキットブレーカー）
+DIFY_CONNECT_TIMEOUT = float(os.getenv('DIFY_CONNECT_TIMEOUT', '5'))
+DIFY_READ_TIMEOUT = float(os.getenv('DIFY_READ_TIMEOUT', '30'))
+DIFY_MAX_RETRIES = int(os.getenv('DIFY_MAX_RETRIES', '2'))
+# リトライ・バックオフを含めた1回の呼び出し全体の上限（秒）
+DIFY_TOTAL_TIMEOUT = float(os.getenv('DIFY_TOTAL_TIMEOUT', '40'))
+DIFY_MAX_CONCURRENCY = int(os.getenv('DIFY_MAX_CONCURRENCY', '8'))
+DIFY_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('DIFY_CIRCUIT_FAILURE_THRESHOLD', '5'))
+DIFY_CIRCUIT_RESET_TIMEOUT = float(os.getenv('DIFY_CIRCUIT_RESET_TIMEOUT', '30'))
+
+# Dify 回答キャッシュ（BACKEND: 'local' = プロセス内LRU / 'django' = CACHES[CACHE_ALIAS]）
+DIFY_RESPONSE_CACHE = {
+    'ENABLED': os.getenv('DIFY_RESPONSE_CACHE_ENABLED', 'True').lower() == 'true',
+    'BACKEND': os.getenv('DIFY_RESPONSE_CACHE_BACKEND', 'local'),
+    'CACHE_ALIAS': 'default',
+    'TTL': int(os.getenv('DIFY_RESPONSE_CACHE_TTL', '3600')),
+    'MAX_ENTRIES': int(os.getenv('DIFY_RESPONSE_CACHE_MAX_ENTRIES', '1000')),
+}
+
+# 会話数の日次ロールアップを使う（refresh_conversation_rollups を日次実行している場合のみ有効化）
+CONVERSATION_DAILY_ROLLUPS = os.getenv('CONVERSATION_DAILY_ROLLUPS', 'False').lower() == 'true'
+
+# 会話履歴のライトビハインド書き込み（有効時はバックグラウンドスレッドがまとめてINSERT）
+CONVERSATION_WRITE_BEHIND = {
+    'ENABLED': os.getenv('CONVERSATION_WRITE_BEHIND', 'False').lower() == 'true',
+    'BATCH_SIZE': int(os.getenv('CONVERSATION_WRITE_BATCH_SIZE', '200')),
+    'FLUSH_INTERVAL': float(os.getenv('CONVERSATION_WRITE_FLUSH_INTERVAL', '0.2')),
+    'MAX_QUEUE': int(os.getenv('CONVERSATION_WRITE_MAX_QUEUE', '5000')),
+}
+
+# 意味検索インデックス（build_embedding_index で構築。MODEL='hashing' でモデル不要の文字n-gram埋め込み）
+EMBEDDING_INDEX = {
+    'DIRECTORY': os.getenv('EMBEDDING_INDEX_DIR', str(BASE_DIR / 'var' / 'embedding_index')),
+    'MODEL': os.getenv('EMBEDDING_MODEL', 'paraphrase-multilingual-MiniLM-L12-v2'),
+    'BACKEND': os.getenv('EMBEDDING_INDEX_BACKEND', 'auto'),  # 'auto'（FAISSがあれば使用）/ 'numpy'
+    'IVF_THRESHOLD': int(os.getenv('EMBEDDING_INDEX_IVF_THRESHOLD', '20000')),
+    'AUTO_UPDATE': True,
+    # ワーカー起動時（wsgi）にインデックスとモデルを読み込む。リクエスト処理中はモデルをダウンロードしない
+    'PRELOAD': os.getenv('EMBEDDING_INDEX_PRELOAD', 'True').lower() == 'true',
+}
+
+# 質問ベクトルのキャッシュ（SQLite ファイルは同じパスを指すワーカープロセス間で共有）
+EMBEDDING_QUERY_CACHE = {
+    'ENABLED': os.getenv('EMBEDDING_QUERY_CACHE_ENABLED', 'True').lower() == 'true',
+    'PATH': os.getenv('EMBEDDING_QUERY_CACHE_PATH', str(BASE_DIR / 'var' / 'query_embeddings.sqlite3')),
+    'MEMORY_ENTRIES': int(os.getenv('EMBEDDING_QUERY_CACHE_MEMORY_ENTRIES', '2048')),
+    'MAX_ENTRIES': int(os.getenv('EMBEDDING_QUERY_CACHE_MAX_ENTRIES', '100000')),
+}
+
+# SubsidyAlias の変更を確認する間隔（秒）。他プロセスでの更新はこの間隔以内に照合器へ反映される
+SUBSIDY_ALIAS_RELOAD_INTERVAL = float(os.getenv('SUBSIDY_ALIAS_RELOAD_INTERVAL', '5'))
+
+# 補助金カタログ・採択統計・レコメンドエンジンのスナップショットが他プロセスでの変更を確認する間隔（秒）
+SNAPSHOT_RELOAD_INTERVAL = float(os.getenv('SNAPSHOT_RELOAD_INTERVAL', '30'))
+
+# テキスト正規化・分かち書き（Janome は requirements に含むが、未インストールなら字種分割で代替）
+TEXT_NORMALIZATION = {
+    'TOKENIZER': os.getenv('TEXT_TOKENIZER', 'auto'),  # 'auto'（Janomeがあれば使用）/ 'janome' / 'regex'
+}
+
 # REST Framework設定
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
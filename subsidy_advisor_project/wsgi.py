@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'subsidy_advisor_project.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.EMBEDDING_INDEX.get('PRELOAD', True):
+    # 意味検索のモデル読み込みを最初のリクエストではなくワーカー起動時に行う（既定で有効）
+    from advisor.services.embedding_index import preload_embedding_index  # noqa: E402
+    preload_embedding_index()